@@ -0,0 +1,81 @@
+"""
+Benchmarks of the Cython orbit integrators. These are too slow to run with the
+test suite, and only print timings. To run all (or some) of them::
+
+    python benchmarks/integrate.py [bench_name ...]
+"""
+
+# Standard library
+import sys
+import time
+
+# Third-party
+import numpy as np
+
+# Project
+from gala.integrate import (DOPRI853Integrator, ForestRuth4Integrator,
+                            LeapfrogIntegrator, Suzuki4Integrator,
+                            Yoshida6Integrator, Yoshida8Integrator)
+from gala.integrate.cyintegrators import (dop853_integrate_hamiltonian,
+                                          leapfrog_integrate_hamiltonian)
+from gala.potential import Hamiltonian, MilkyWayPotential
+
+
+def bench_leapfrog_threads():
+    H = Hamiltonian(MilkyWayPotential())
+
+    rnd = np.random.RandomState(42)
+    n = 1000000
+    w0 = np.hstack((rnd.normal(0, 10., size=(n, 3)),
+                    rnd.normal(0, 0.1, size=(n, 3))))
+    t = np.linspace(0, 10., 11)
+
+    times = dict()
+    for n_threads in [1, 2, 4, 8]:
+        t0 = time.time()
+        leapfrog_integrate_hamiltonian(H, w0, t, n_threads=n_threads)
+        times[n_threads] = time.time() - t0
+        print("{} threads: {:.2f} s, speedup {:.2f}"
+              .format(n_threads, times[n_threads], times[1]/times[n_threads]))
+
+
+def bench_composition_accuracy_cost():
+    H = Hamiltonian(MilkyWayPotential())
+    w0 = np.array([[8., 0, 0.5, 0.02, 0.2, 0.05]])
+
+    # 10 Gyr
+    T = 10000.
+
+    integrators = [LeapfrogIntegrator, ForestRuth4Integrator,
+                   Suzuki4Integrator, Yoshida6Integrator, Yoshida8Integrator]
+    n_stages = [1] + [len(I.weights) for I in integrators[1:]]
+    for Integrator, s in zip(integrators, n_stages):
+        for dt in [2., 1., 0.5, 0.25]:
+            n_steps = int(T / dt)
+            t0 = time.time()
+            orbit = H.integrate_orbit(w0.T, dt=dt, n_steps=n_steps,
+                                      Integrator=Integrator)
+            run_time = time.time() - t0
+            E = H.energy(orbit).value
+            dE = np.abs((E - E[0]) / E[0]).max()
+            print("{:>24s} dt={:<5} n_force={:<8d} max |dE/E|={:.2e} "
+                  "time={:.3f} s".format(Integrator.__name__, dt, n_steps*s,
+                                         dE, run_time))
+
+    for tol in [1E-8, 1E-10, 1E-12]:
+        t0 = time.time()
+        _, w = dop853_integrate_hamiltonian(H, w0, np.linspace(0, T, 1001),
+                                            tol, tol)
+        run_time = time.time() - t0
+        E = H.energy(np.rollaxis(w, -1)).value
+        dE = np.abs((E - E[0]) / E[0]).max()
+        print("{:>24s} tol={:<5} max |dE/E|={:.2e} time={:.3f} s"
+              .format(DOPRI853Integrator.__name__, tol, dE, run_time))
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or [k for k in list(globals())
+                             if k.startswith('bench_')]
+    for name in names:
+        print(name)
+        globals()[name]()
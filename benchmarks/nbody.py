@@ -0,0 +1,102 @@
+"""
+Benchmarks of the N-body integration. These are too slow to run with the test
+suite, and only print timings. To run all (or some) of them::
+
+    python benchmarks/nbody.py [bench_name ...]
+"""
+
+# Standard library
+import sys
+import time
+
+# Third-party
+import astropy.units as u
+import numpy as np
+
+# Project
+from gala.dynamics import PhaseSpacePosition
+from gala.dynamics.nbody import DirectNBody, HermiteIntegrator
+from gala.dynamics.nbody.nbody import (pairwise_nbody_acceleration,
+                                       tree_nbody_acceleration)
+from gala.integrate import DOPRI853Integrator, LeapfrogIntegrator
+from gala.potential import NFWPotential, PlummerPotential
+from gala.units import galactic
+
+
+def _energy(nbody, w):
+    """
+    The total energy per unit G of the Plummer particles of ``nbody`` at
+    phase-space positions ``w`` (norbits, 6).
+    """
+    m = nbody._particle_m
+    b = nbody._particle_b
+    q = np.ascontiguousarray(w[:, :3])
+
+    E = np.sum(m * (0.5 * np.sum(w[:, 3:]**2, axis=1) +
+                    nbody.external_potential._energy(q, t=np.array([0.]))))
+
+    r2 = np.sum((q[:, None] - q[None]) ** 2, axis=-1)
+    pairs = m[:, None] * m[None] / np.sqrt(r2 + b[None]**2)
+    np.fill_diagonal(pairs, 0.)
+    return E - 0.5 * np.sum(pairs)
+
+
+def bench_tree_scaling():
+    # the cost of the tree grows much slower than the N^2 of the direct sum
+    rng = np.random.default_rng(42)
+
+    for n in [4000, 32000]:
+        x = rng.normal(0, 1., size=(n, 3))
+        m = np.ones(n) / n
+        b = np.zeros(n)
+
+        t0 = time.perf_counter()
+        tree_nbody_acceleration(x, m, b, theta=0.7)
+        t_tree = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        pairwise_nbody_acceleration(x, m, b)
+        t_direct = time.perf_counter() - t0
+
+        print("N={:<6d} tree {:.3f} s, direct {:.3f} s"
+              .format(n, t_tree, t_direct))
+
+
+def bench_integrators():
+    # Plummer spheres with the same scale radius (so that the forces between
+    # them are symmetric and the energy is conserved) in an NFW halo
+    rng = np.random.default_rng(42)
+    n = 256
+    w0 = PhaseSpacePosition(pos=rng.normal(0, 1., size=(3, n)) * u.kpc,
+                            vel=rng.normal(0, 10., size=(3, n)) * u.km/u.s)
+    pots = [PlummerPotential(m=1e8*u.Msun, b=0.1*u.kpc, units=galactic)
+            for i in range(n)]
+    nbody = DirectNBody(w0, pots,
+                        external_potential=NFWPotential(m=1e11, r_s=10,
+                                                        units=galactic))
+    E0 = _energy(nbody, nbody._c_w0)
+
+    runs = [
+        ('DOP853', DOPRI853Integrator, 0.5*u.Myr, dict()),
+        ('Leapfrog', LeapfrogIntegrator, 0.01*u.Myr, dict()),
+        ('Hermite', HermiteIntegrator, 0.5*u.Myr, dict(eta=0.01))
+    ]
+    for name, Integrator, dt, kwargs in runs:
+        t0 = time.perf_counter()
+        orbits = nbody.integrate_orbit(dt=dt, t1=0, t2=100*u.Myr,
+                                       Integrator=Integrator,
+                                       Integrator_kwargs=kwargs)
+        dt_wall = time.perf_counter() - t0
+
+        w = np.vstack((orbits.xyz[:, -1].decompose(galactic).value,
+                       orbits.v_xyz[:, -1].decompose(galactic).value)).T
+        print("{:>8s} |dE/E|={:.2e} time={:.3f} s"
+              .format(name, abs(_energy(nbody, w) / E0 - 1), dt_wall))
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or [k for k in list(globals())
+                             if k.startswith('bench_')]
+    for name in names:
+        print(name)
+        globals()[name]()
@@ -0,0 +1,93 @@
+"""
+Benchmarks of the evaluation of the C potentials. These are too slow to run
+with the test suite, and only print timings. To run all (or some) of them::
+
+    python benchmarks/potential.py [bench_name ...]
+"""
+
+# Standard library
+import os
+import sys
+import time
+
+# Third-party
+import astropy.units as u
+import numpy as np
+
+# Project
+from gala.potential import (CCompositePotential, HernquistPotential,
+                            MiyamotoNagaiPotential, NFWPotential,
+                            PlummerPotential)
+from gala.units import galactic
+
+
+def bench_n_threads_scaling():
+    p = (HernquistPotential(m=1E10, c=1., units=galactic) +
+         MiyamotoNagaiPotential(m=5E10, a=3., b=0.3, units=galactic))
+    xyz = np.random.uniform(-10, 10, size=(3, 1_000_000))
+
+    all_n_threads = [1, 2, 4, 8, 16, 32]
+    all_n_threads = [n for n in all_n_threads if n <= os.cpu_count()]
+
+    for name in ['energy', 'gradient', 'hessian']:
+        func = getattr(p, name)
+        times = []
+        for n_threads in all_n_threads:
+            t0 = time.time()
+            func(xyz, n_threads=n_threads)
+            times.append(time.time() - t0)
+
+        times = np.array(times)
+        print(name)
+        for n_threads, dt, speedup in zip(all_n_threads, times,
+                                          times[0] / times):
+            print("\t{:2d} threads: {:.3f} s ({:.1f}x)"
+                  .format(n_threads, dt, speedup))
+
+
+def bench_shift_rotate_overhead():
+    xyz = np.random.uniform(-10, 10, size=(3, 1_000_000))
+    kw = dict(m=1E10, c=1., units=galactic)
+
+    for n_components in [1, 8]:
+        plain = CCompositePotential()
+        shifted = CCompositePotential()
+        for i in range(n_components):
+            plain[str(i)] = HernquistPotential(**kw)
+            shifted[str(i)] = HernquistPotential(origin=[1e-8, 0, 0]*u.kpc,
+                                                 **kw)
+
+        print("{} component(s)".format(n_components))
+        for name in ['energy', 'gradient']:
+            times = []
+            for p in [plain, shifted]:
+                t0 = time.time()
+                getattr(p, name)(xyz)
+                times.append(time.time() - t0)
+            print("\t{}: no shift {:.3f} s, shift {:.3f} s ({:.2f}x)"
+                  .format(name, times[0], times[1], times[1] / times[0]))
+
+
+def bench_gradient_batch():
+    q = np.ascontiguousarray(np.random.uniform(-10, 10, size=(1_000_000, 3)))
+    pots = {'plummer': PlummerPotential(m=1E10, b=1., units=galactic),
+            'hernquist': HernquistPotential(m=1E10, c=1., units=galactic),
+            'nfw': NFWPotential(m=1E11, r_s=15., units=galactic),
+            'mn': MiyamotoNagaiPotential(m=1E10, a=3., b=0.3,
+                                         units=galactic)}
+    for name, p in pots.items():
+        times = []
+        for t in [np.array([0.]), np.zeros(len(q))]:
+            t0 = time.time()
+            p.c_instance.gradient(q, t=t)
+            times.append(time.time() - t0)
+        print("{}: batch {:.3f} s, single {:.3f} s ({:.2f}x)"
+              .format(name, times[0], times[1], times[1] / times[0]))
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or [k for k in list(globals())
+                             if k.startswith('bench_')]
+    for name in names:
+        print(name)
+        globals()[name]()
@@ -0,0 +1,76 @@
+"""
+Benchmarks of the spline potentials. These are too slow to run with the test
+suite, and only print timings. To run all (or some) of them::
+
+    python benchmarks/spline.py [bench_name ...]
+"""
+
+# Standard library
+import sys
+import time
+
+# Third-party
+import astropy.units as u
+import numpy as np
+
+# Project
+from gala.potential import (CCompositePotential, CylSplinePotential,
+                            InterpolatedPotential, MiyamotoNagaiPotential,
+                            MultipolePotential, NFWPotential,
+                            PlummerPotential)
+from gala.units import galactic
+
+
+def bench_interp():
+    source = CCompositePotential()
+    source['disk'] = MiyamotoNagaiPotential(m=6E10, a=3., b=0.28,
+                                            units=galactic)
+    source['halo'] = NFWPotential(m=6E11, r_s=16., units=galactic)
+
+    pots = {
+        'source': source,
+        'cartesian': InterpolatedPotential.from_potential(
+            source, -40*u.kpc, 40*u.kpc, 128, scale=0.5*u.kpc),
+        'cylindrical': InterpolatedPotential.from_potential(
+            source, [0, 0]*u.kpc, [40, 40]*u.kpc, [128, 128],
+            grid_type='cylindrical', scale=0.5*u.kpc, symmetric=True)
+    }
+
+    xyz = np.random.uniform(-20, 20, size=(3, 1000000))
+    for name, pot in pots.items():
+        t0 = time.time()
+        pot.gradient(xyz)
+        print("{}: {:.3f} sec".format(name, time.time() - t0))
+
+
+def bench_multipole():
+    source = PlummerPotential(m=1E11, b=1., units=galactic,
+                              origin=[0.2, 0.1, -0.1])
+
+    xyz = np.random.uniform(-20, 20, size=(3, 1000000))
+    for lmax in [0, 2, 4, 8, 16]:
+        pot = MultipolePotential.from_density(source, 0.01, 200, lmax=lmax)
+        t0 = time.time()
+        pot.gradient(xyz)
+        print("lmax={}: {:.3f} sec".format(lmax, time.time() - t0))
+
+
+def bench_cylspline():
+    source = PlummerPotential(m=1E11, b=1., units=galactic,
+                              origin=[0.2, 0.1, -0.1])
+
+    xyz = np.random.uniform(-20, 20, size=(3, 1000000))
+    for mmax in [0, 2, 4, 8]:
+        pot = CylSplinePotential.from_density(source, 30, 30, mmax=mmax,
+                                              scale=1.)
+        t0 = time.time()
+        pot.gradient(xyz)
+        print("mmax={}: {:.3f} sec".format(mmax, time.time() - t0))
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or [k for k in list(globals())
+                             if k.startswith('bench_')]
+    for name in names:
+        print(name)
+        globals()[name]()
@@ -22,6 +22,22 @@ if sys.version_info < tuple((int(val) for val in __minimum_python_version__.spli
 
 # For egg_info test builds to pass, put package imports here.
 if not _ASTROPY_SETUP_:
+    from astropy import config as _config
+
+    class Conf(_config.ConfigNamespace):
+        """
+        Configuration parameters for `gala`.
+        """
+        n_threads = _config.ConfigItem(
+            1,
+            "The default number of OpenMP threads used when evaluating C "
+            "potentials at many positions. Set to 0 to use all available "
+            "CPU cores. This can be overridden for a single call by passing "
+            "``n_threads`` to the relevant method.",
+            cfgtype='integer')
+
+    conf = Conf()
+
     from . import coordinates
     from . import dynamics
     from . import integrate
@@ -500,7 +500,7 @@ class PhaseSpacePosition(object):
         return np.vstack((x, v))
 
     @classmethod
-    def from_w(cls, w, units=None, **kwargs):
+    def from_w(cls, w, units=None, copy=True, **kwargs):
         """
         Create a {name} object from a single array specifying positions
         and velocities. This is mainly for backwards-compatibility and
@@ -513,6 +513,10 @@ class PhaseSpacePosition(object):
         units : `~gala.units.UnitSystem` (optional)
             The unit system that the input position+velocity array, ``w``,
             is represented in.
+        copy : bool (optional)
+            If False, the positions and velocities of 3D phase-space
+            positions reference the input array rather than a copy of it
+            (e.g., to avoid reading a large `numpy.memmap` into memory).
         **kwargs
             Any aditional keyword arguments passed to the class initializer.
 
@@ -522,7 +526,10 @@ class PhaseSpacePosition(object):
 
         """.format(name=cls.__name__)
 
-        w = np.array(w)
+        if copy:
+            w = np.array(w)
+        else:
+            w = np.asarray(w)
 
         ndim = w.shape[0]//2
         pos = w[:ndim]
@@ -532,8 +539,16 @@ class PhaseSpacePosition(object):
         # Dimensionless
         if units is not None and not isinstance(units, DimensionlessUnitSystem):
             units = UnitSystem(units)
-            pos = pos*units['length']
-            vel = vel*units['length']/units['time']  # from _core_units
+            pos = u.Quantity(pos, units['length'], copy=False)
+            vel = u.Quantity(vel, units['length']/units['time'],  # from _core_units
+                             copy=False)
+
+        if not copy and ndim == 3:
+            # the representation classes copy their input by default
+            pos = coord.CartesianRepresentation(u.Quantity(pos, copy=False),
+                                                copy=False)
+            vel = coord.CartesianDifferential(u.Quantity(vel, copy=False),
+                                              copy=False)
 
         return cls(pos=pos, vel=vel, **kwargs)
 
@@ -18,6 +18,7 @@ from libc.math cimport log
 from ...integrate.cyintegrators.dop853 cimport dop853_step
 from ...potential.potential.cpotential cimport CPotentialWrapper
 from ...potential.frame.cframe cimport CFrameWrapper
+from ...integrate.timespec import _store_indices
 
 cdef extern from "frame/src/cframe.h":
     ctypedef struct CFrame:
@@ -38,9 +39,13 @@ cdef extern from "dopri/dop853.h":
 cpdef dop853_lyapunov_max(hamiltonian, double[::1] w0,
                           double dt, int n_steps, double t0,
                           double d0, int n_steps_per_pullback, int noffset_orbits,
-                          double atol=1E-10, double rtol=1E-10, int nmax=0):
+                          double atol=1E-10, double rtol=1E-10, int nmax=0,
+                          int store_every=1):
+    store_idx = _store_indices(n_steps, store_every)
+
     cdef:
         int i, j, k, jiter
+        int s = 0
         int res
         unsigned ndim = w0.size
         unsigned norbits = noffset_orbits + 1
@@ -55,7 +60,7 @@ cpdef dop853_lyapunov_max(hamiltonian, double[::1] w0,
         double d1_mag, norm
         double[:,::1] d1 = np.empty((norbits,ndim))
         double[:,::1] LEs = np.zeros((niter,noffset_orbits))
-        double[:,:,::1] all_w = np.zeros((n_steps,norbits,ndim))
+        double[:,:,::1] all_w = np.zeros((len(store_idx),norbits,ndim))
 
         # temp stuff
         double[:,::1] d0_vec = np.random.uniform(size=(noffset_orbits,ndim))
@@ -90,9 +95,11 @@ cpdef dop853_lyapunov_max(hamiltonian, double[::1] w0,
                     atol, rtol, nmax)
 
         # store position of main orbit
-        for i in range(norbits):
-            for k in range(ndim):
-                all_w[j,i,k] = w[i*ndim + k]
+        if (j % store_every) == 0 or j == n_steps-1:
+            s += 1
+            for i in range(norbits):
+                for k in range(ndim):
+                    all_w[s,i,k] = w[i*ndim + k]
 
         if (j % n_steps_per_pullback) == 0:
             # get magnitude of deviation vector
@@ -111,7 +118,7 @@ cpdef dop853_lyapunov_max(hamiltonian, double[::1] w0,
 
     LEs = np.array([np.sum(LEs[:j],axis=0)/t[j*n_steps_per_pullback]
                     for j in range(1,niter)])
-    return np.asarray(t), np.asarray(all_w), np.asarray(LEs)
+    return np.asarray(t)[store_idx], np.asarray(all_w), np.asarray(LEs)
 
 cpdef dop853_lyapunov_max_dont_save(hamiltonian, double[::1] w0,
                                     double dt, int n_steps, double t0,
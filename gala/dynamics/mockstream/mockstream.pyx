@@ -27,14 +27,13 @@ from ...integrate.cyintegrators.dop853 cimport (dop853_step,
                                                 dop853_helper_save_all)
 from ...potential.potential.cpotential cimport CPotentialWrapper, CPotential
 from ...potential.frame.cframe cimport CFrameWrapper, CFrame
-from ...potential.potential.builtin.cybuiltin import NullWrapper
 
 from ...potential import Hamiltonian
 from ...potential.frame import StaticFrame
 from ...io import quantity_to_hdf5
 from ...potential.potential.io import to_dict
 
-from ..nbody.nbody cimport MAX_NBODY
+from ..nbody.nbody cimport ParticlePotentials
 from .df cimport BaseStreamDF
 
 __all__ = ['mockstream_dop853', 'mockstream_dop853_animate']
@@ -80,7 +79,7 @@ cpdef mockstream_dop853(nbody, double[::1] time,
 
         # For N-body support:
         void *args
-        CPotential *c_particle_potentials[MAX_NBODY]
+        ParticlePotentials c_particle_potentials
 
         # Time-stepping parameters:
         int ntimes = time.shape[0]
@@ -91,11 +90,6 @@ cpdef mockstream_dop853(nbody, double[::1] time,
         CPotential cp = (<CPotentialWrapper>(nbody.H.potential.c_instance)).cpotential
         CFrame cf = (<CFrameWrapper>(nbody.H.frame.c_instance)).cframe
 
-        # for the test particles
-        CPotentialWrapper null_wrapper = NullWrapper(1., [],
-                                                     np.zeros(3), np.eye(3))
-        CPotential null_p = null_wrapper.cpotential
-
         int nbodies = nbody._c_w0.shape[0] # includes the progenitor
         double [:, ::1] nbody_w0 = nbody._c_w0
 
@@ -106,14 +100,10 @@ cpdef mockstream_dop853(nbody, double[::1] time,
         double[:, :, ::1] nbody_w = np.empty((ntimes, nbodies, ndim))
 
     # set the potential objects of the progenitor (index 0) and any other
-    # massive bodies included in the stream generation
-    for i in range(nbodies):
-        c_particle_potentials[i] = &(<CPotentialWrapper>(nbody.particle_potentials[i].c_instance)).cpotential
-
-    # set null potentials for all of the stream particles
-    for i in range(nbodies, nbodies + max_nstream):
-        c_particle_potentials[i] = &null_p
-    args = <void *>(&c_particle_potentials[0])
+    # massive bodies included in the stream generation (the stream particles
+    # are test particles, which the N-body force function skips)
+    c_particle_potentials = ParticlePotentials(list(nbody.particle_potentials))
+    args = <void *>(c_particle_potentials.ptrs)
 
     # First have to integrate the nbody orbits so we have their positions at
     # each timestep
@@ -201,7 +191,7 @@ cpdef mockstream_dop853_animate(nbody, double[::1] t,
 
         # For N-body support:
         void *args
-        CPotential *c_particle_potentials[MAX_NBODY]
+        ParticlePotentials c_particle_potentials
 
         # Snapshotting:
         int noutput_times = (ntimes-1) // output_every + 1
@@ -226,9 +216,8 @@ cpdef mockstream_dop853_animate(nbody, double[::1] t,
 
     # set the potential objects of the progenitor (index 0) and any other
     # massive bodies included in the stream generation
-    for i in range(nbodies):
-        c_particle_potentials[i] = &(<CPotentialWrapper>(nbody.particle_potentials[i].c_instance)).cpotential
-    args = <void *>(&c_particle_potentials[0])
+    c_particle_potentials = ParticlePotentials(list(nbody.particle_potentials))
+    args = <void *>(c_particle_potentials.ptrs)
 
     # Initialize the output file:
     import h5py
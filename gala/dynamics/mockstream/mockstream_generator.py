@@ -53,6 +53,9 @@ class MockStreamGenerator:
 
         # Validate the inpute hamiltonian
         self.hamiltonian = Hamiltonian(hamiltonian)
+        if self.hamiltonian.extra_forces:
+            raise ValueError('Extra forces on the input hamiltonian are not '
+                             'supported by the mock stream generator.')
 
         if progenitor_potential is not None:
             # validate the potential class
@@ -87,6 +90,10 @@ class MockStreamGenerator:
                                  'stream input hamiltonian! {} vs. {}'
                                  .format(nbody.frame, self.hamiltonian.frame))
 
+            if nbody.extra_forces is not None:
+                raise ValueError('Extra forces on the input nbody instance are '
+                                 'not supported by the mock stream generator.')
+
             kwargs['w0'] = combine((prog_w0, nbody.w0))
             kwargs['particle_potentials'] = ([self.progenitor_potential] +
                                              nbody.particle_potentials)
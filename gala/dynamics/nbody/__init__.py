@@ -1 +1 @@
-from .core import DirectNBody
+from .core import DirectNBody, HermiteIntegrator
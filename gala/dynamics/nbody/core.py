@@ -8,27 +8,78 @@
 # Third-party
 import numpy as np
 
-from ...potential import Hamiltonian, NullPotential, StaticFrame
+from ...potential import (Hamiltonian, NullPotential, StaticFrame,
+                          KeplerPotential, PlummerPotential, CForceBase)
 from ...units import UnitSystem
 from ...util import atleast_2d
-from ...integrate.timespec import parse_time_specification
+from ...integrate import LeapfrogIntegrator, DOPRI853Integrator
+from ...integrate.core import Integrator
+from ...integrate.timespec import parse_time_specification, _store_indices
 from .. import Orbit, PhaseSpacePosition
 
-from .nbody import direct_nbody_dop853
-
-__all__ = ['DirectNBody']
+from .nbody import (DirectForce, PairwiseForce, TreeForce, ExtraForce,
+                    nbody_dop853, nbody_leapfrog, hermite_nbody)
+
+__all__ = ['DirectNBody', 'HermiteIntegrator']
+
+
+class HermiteIntegrator(Integrator):
+    r"""
+    A 4th order Hermite predictor-corrector integrator with individual block
+    time steps, for N-body integration with `~gala.dynamics.nbody.DirectNBody`.
+
+    The Hermite scheme uses the accelerations and their time derivatives (the
+    jerks) at both ends of a step, so it is only available for N-body
+    integration of Kepler and Plummer particles, where the jerks are computed
+    analytically (and from the Hessian of the external potential). Each
+    particle has its own time step, which is the interval between the output
+    times divided by a power of 2, chosen with the criterion of Aarseth (1985)
+    with the accuracy parameter ``eta``. Particles that are due at the same
+    time are advanced together as a block.
+
+    .. seealso::
+
+        - Makino, J. & Aarseth, S. J. (1992), PASJ, 44, 141
+
+    Parameters
+    ----------
+    func : func
+        A callable object that computes the phase-space coordinate
+        derivatives with respect to the independent variable at a point
+        in phase space.
+    func_args : tuple (optional)
+        Any extra arguments for the function.
+    func_units : `~gala.units.UnitSystem` (optional)
+        If using units, this is the unit system assumed by the
+        integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+    eta : float (optional)
+        The accuracy parameter of the time steps. Typical values are between
+        0.01 and 0.03.
+
+    """
+
+    def __init__(self, func, func_args=(), func_units=None, progress=False,
+                 eta=0.02):
+        super().__init__(func, func_args=func_args, func_units=func_units,
+                         progress=progress)
+        self.eta = float(eta)
+
+    def run(self, w0, mmap=None, **time_spec):
+        raise TypeError("HermiteIntegrator can only be used for N-body "
+                        "integration, with DirectNBody.integrate_orbit("
+                        "Integrator=HermiteIntegrator).")
 
 
 class DirectNBody:
 
     def __init__(self, w0, particle_potentials, external_potential=None,
-                 frame=None, units=None, save_all=True):
+                 frame=None, units=None, save_all=True, method='direct',
+                 theta=0.5, softening=0., extra_forces=None):
         """Perform orbit integration using direct N-body forces between
         particles, optionally in an external background potential.
 
-        TODO: could add another option, like in other contexts, for
-        "extra_force" to support, e.g., dynamical friction
-
         Parameters
         ----------
         w0 : `~gala.dynamics.PhaseSpacePosition`
@@ -47,6 +98,39 @@ class DirectNBody:
         save_all : bool (optional)
             Save the full orbits of each particle. If ``False``, only returns
             the final phase-space positions of each particle.
+        method : str (optional)
+            How to compute the forces between the particles: ``'direct'``
+            (the default) sums the forces from all particles, and ``'tree'``
+            approximates the forces from distant groups of particles with a
+            Barnes-Hut octree, which scales as :math:`N \log N` instead of
+            :math:`N^2`. The tree only supports particle potentials that are
+            `~gala.potential.KeplerPotential` or
+            `~gala.potential.PlummerPotential` instances (or ``None``). If all
+            particle potentials are of these types, the direct sum is computed
+            with a specialized kernel that visits each pair of particles once
+            and runs in parallel with OpenMP.
+        theta : float (optional)
+            The opening angle of the tree for ``method='tree'``: the force
+            from a cell of the tree is approximated by its monopole if its
+            size is smaller than ``theta`` times its distance. Smaller values
+            are more accurate, and ``theta=0`` is equivalent to the direct
+            sum. Must be between 0 and 1. Note that the approximated forces
+            change discontinuously when cells are opened, which forces the
+            adaptive integrator to take smaller steps, so the tree pays off
+            for large numbers of massive particles.
+        softening : `~astropy.units.Quantity`, numeric (optional)
+            A softening length that is added in quadrature to the scale radii
+            of all particles. Only supported for Kepler and Plummer particle
+            potentials. Assumed to be in the unit system ``units`` if not a
+            Quantity.
+        extra_forces : list (optional)
+            Additional forces on the particles, such as
+            `~gala.potential.force.ChandrasekharDynamicalFriction` (which uses
+            the density of the external potential), with one entry per
+            particle: a `~gala.potential.force.CForceBase` instance, a list of
+            them, or ``None`` for no extra forces. The forces must be in the
+            unit system ``units``, and are only supported in static frames
+            and not with the `~gala.dynamics.nbody.HermiteIntegrator`.
 
         """
         if not isinstance(w0, PhaseSpacePosition):
@@ -60,12 +144,6 @@ class DirectNBody:
                                  " match the number of particle potentials "
                                  "passed in with `particle_potentials`.")
 
-            # TODO: this is a MAJOR HACK
-            if w0.shape[0] > 65536: # see MAX_NBODY in _nbody.pyx
-                raise NotImplementedError("We currently only support direct "
-                                          "N-body integration for <= 65536 "
-                                          "particles.")
-
         # First, figure out how to get units - first place to check is the arg
         if units is None:
             # Next, check the particle potentials
@@ -112,6 +190,70 @@ class DirectNBody:
         self.particle_potentials = _particle_potentials
         self.save_all = save_all
 
+        if method not in ('direct', 'tree'):
+            raise ValueError("method must be 'direct' or 'tree', not '{}'."
+                             .format(method))
+        self.method = method
+
+        # with the opening criterion of the tree, theta > 2/sqrt(3) would allow
+        # the cell containing a particle to be approximated by its monopole
+        if not 0 <= theta <= 1:
+            raise ValueError("The opening angle theta must be between 0 and "
+                             "1.")
+        self.theta = float(theta)
+
+        if hasattr(softening, 'unit'):
+            softening = softening.decompose(units).value
+        self.softening = float(softening)
+
+        # Kepler and Plummer particles are handled by specialized C kernels
+        self._particle_m = self._particle_b = None
+        if all(type(pp) in (NullPotential, KeplerPotential, PlummerPotential)
+               for pp in self.particle_potentials):
+            self._particle_m, self._particle_b = self._particle_parameters()
+
+        elif self.method == 'tree' or self.softening != 0:
+            names = set(pp.__class__.__name__
+                        for pp in self.particle_potentials
+                        if type(pp) not in (NullPotential, KeplerPotential,
+                                            PlummerPotential))
+            raise ValueError("method='tree' and softening only support Kepler "
+                             "and Plummer particle potentials, not {}."
+                             .format(', '.join(sorted(names))))
+
+        if extra_forces is not None:
+            if len(extra_forces) != len(self.particle_potentials):
+                raise ValueError("The number of extra forces must match the "
+                                 "number of particle potentials.")
+
+            _extra_forces = []
+            for forces in extra_forces:
+                if forces is None:
+                    forces = []
+                elif isinstance(forces, CForceBase):
+                    forces = [forces]
+
+                if (not isinstance(forces, (list, tuple)) or
+                        not all(isinstance(f, CForceBase) for f in forces)):
+                    raise ValueError("Extra forces must be CForceBase "
+                                     "subclasses.")
+                forces = list(forces)
+
+                for force in forces:
+                    if force.units != units:
+                        raise ValueError("Extra forces must be in the unit "
+                                         "system of the integration ({} vs "
+                                         "{})".format(units, force.units))
+                _extra_forces.append(forces)
+
+            if not any(_extra_forces):
+                _extra_forces = None
+            elif not isinstance(self.frame, StaticFrame):
+                raise ValueError("Extra forces are only supported in static "
+                                 "frames.")
+            extra_forces = _extra_forces
+        self.extra_forces = extra_forces
+
         self.H = Hamiltonian(self.external_potential,
                              frame=self.frame)
         if not self.H.c_enabled:
@@ -119,8 +261,30 @@ class DirectNBody:
                              "components in the input external potential are "
                              "Python-only.")
 
+        for forces in self.extra_forces or []:
+            for force in forces:
+                force._validate_potential(self.external_potential)
+
         self.w0 = w0
 
+    def _particle_parameters(self):
+        """
+        Return the masses (times the gravitational constant) and the scale
+        radii of the Kepler and Plummer particles (including the softening
+        length) for the C force kernels.
+        """
+        m = np.zeros(len(self.particle_potentials))
+        b = np.zeros(len(self.particle_potentials))
+        for i, pp in enumerate(self.particle_potentials):
+            if isinstance(pp, NullPotential):
+                continue
+
+            m[i] = pp.G * pp.parameters['m'].decompose(self.units).value
+            if isinstance(pp, PlummerPotential):
+                b[i] = pp.parameters['b'].decompose(self.units).value
+
+        return m, np.sqrt(b**2 + self.softening**2)
+
     @property
     def w0(self):
         return self._w0
@@ -145,15 +309,56 @@ class DirectNBody:
         else:
             return "<{} bodies=1>".format(self.__class__.__name__)
 
-    def integrate_orbit(self, **time_spec):
+    def _force(self, n_threads=None):
+        """
+        Return the N-body forces between the particles for the C integrators.
+        """
+        if self.method == 'tree':
+            force = TreeForce(self._particle_m, self._particle_b,
+                              theta=self.theta, n_threads=n_threads)
+        elif self._particle_m is not None:
+            force = PairwiseForce(self._particle_m, self._particle_b,
+                                  n_threads=n_threads)
+        else:
+            force = DirectForce(self.particle_potentials)
+
+        if self.extra_forces is not None:
+            force = ExtraForce(force, self.extra_forces)
+        return force
+
+    def integrate_orbit(self, store_every=1, n_threads=None, Integrator=None,
+                        Integrator_kwargs=dict(), **time_spec):
         """
         Integrate the initial conditions in the combined external potential
         plus N-body forces.
 
-        This integration uses the `~gala.integrate.DOPRI853Integrator`.
+        By default, this integration uses the
+        `~gala.integrate.DOPRI853Integrator`, with a step size that is adapted
+        to the error of all particles. The fixed-step
+        `~gala.integrate.LeapfrogIntegrator` (kick-drift-kick, one force
+        evaluation per step) and the `~gala.dynamics.nbody.HermiteIntegrator`
+        (individual block time steps, only for Kepler and Plummer particles
+        with ``method='direct'``) are also supported, in static frames. The
+        Hermite integrator computes the jerks from the external potential
+        with its Hessian, so the external potential must implement one.
 
         Parameters
         ----------
+        store_every : int (optional)
+            Only store the orbits at every ``store_every``-th timestep. The
+            final state of the orbits is always stored. Ignored if
+            ``save_all=False``.
+        n_threads : int (optional)
+            The number of threads to compute the forces between Kepler and
+            Plummer particles with. Defaults to ``gala.conf.n_threads``.
+        Integrator : `~gala.integrate.Integrator` (optional)
+            The integrator class to use: `~gala.integrate.DOPRI853Integrator`
+            (the default), `~gala.integrate.LeapfrogIntegrator`, or
+            `~gala.dynamics.nbody.HermiteIntegrator`.
+        Integrator_kwargs : dict (optional)
+            Keyword arguments for the integrator: ``atol``, ``rtol``, and
+            ``nmax`` for `~gala.integrate.DOPRI853Integrator`, and ``eta`` for
+            `~gala.dynamics.nbody.HermiteIntegrator`.
         **time_spec
             Specification of how long to integrate. See documentation
             for `~gala.integrate.parse_time_specification`.
@@ -165,14 +370,60 @@ class DirectNBody:
 
         """
 
+        if Integrator is None:
+            Integrator = DOPRI853Integrator
+
+        if Integrator not in (DOPRI853Integrator, LeapfrogIntegrator,
+                              HermiteIntegrator):
+            raise ValueError("Integrator must be DOPRI853Integrator, "
+                             "LeapfrogIntegrator, or HermiteIntegrator.")
+
+        if (Integrator is not DOPRI853Integrator and
+                not isinstance(self.frame, StaticFrame)):
+            raise ValueError("{} only supports static frames."
+                             .format(Integrator.__name__))
+
         # Prepare the time-stepping array
         t = parse_time_specification(self.units, **time_spec)
 
-        ws = direct_nbody_dop853(self._c_w0, t, self.H,
-                                 self.particle_potentials,
-                                 save_all=self.save_all)
+        if Integrator is HermiteIntegrator:
+            if self._particle_m is None or self.method != 'direct':
+                raise ValueError("HermiteIntegrator only supports Kepler and "
+                                 "Plummer particle potentials with "
+                                 "method='direct'.")
+
+            if self.extra_forces is not None:
+                raise ValueError("HermiteIntegrator does not support extra "
+                                 "forces.")
+
+            # the jerks use the Hessian of the external potential, which some
+            # potentials only implement as NaN
+            hess = self.external_potential._hessian(np.full((1, 3), 0.5),
+                                                    t=np.array([0.]))
+            if not np.all(np.isfinite(hess)):
+                raise ValueError("HermiteIntegrator requires an external "
+                                 "potential with a finite Hessian, but {} "
+                                 "does not implement a Hessian."
+                                 .format(self.external_potential
+                                         .__class__.__name__))
+
+            ws = hermite_nbody(self._c_w0, t, self.H,
+                               self._particle_m, self._particle_b,
+                               n_threads=n_threads, save_all=self.save_all,
+                               store_every=store_every, **Integrator_kwargs)
+
+        elif Integrator is LeapfrogIntegrator:
+            ws = nbody_leapfrog(self._c_w0, t, self.H, self._force(n_threads),
+                                save_all=self.save_all,
+                                store_every=store_every, **Integrator_kwargs)
+
+        else:
+            ws = nbody_dop853(self._c_w0, t, self.H, self._force(n_threads),
+                              save_all=self.save_all,
+                              store_every=store_every, **Integrator_kwargs)
 
         if self.save_all:
+            t = t[_store_indices(len(t), store_every)]
             pos = np.rollaxis(np.array(ws[..., :3]), axis=2)
             vel = np.rollaxis(np.array(ws[..., 3:]), axis=2)
 
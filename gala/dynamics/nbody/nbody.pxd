@@ -1,2 +1,6 @@
-cdef extern from "nbody_helper.h":
-    const int MAX_NBODY
+from ...potential.potential.cpotential cimport CPotential
+
+cdef class ParticlePotentials:
+    cdef CPotential **ptrs
+    cdef int n
+    cdef list potentials
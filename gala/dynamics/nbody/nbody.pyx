@@ -17,14 +17,19 @@ cimport numpy as np
 np.import_array()
 
 from libc.math cimport sqrt
+from libc.stdlib cimport malloc, free
 from cpython.exc cimport PyErr_CheckSignals
 
 from ...potential import Hamiltonian
 from ...potential.potential.cpotential cimport (CPotentialWrapper,
-                                                MAX_N_COMPONENTS, CPotential)
+                                                CPotential)
 from ...potential.frame.cframe cimport CFrameWrapper
+from ...potential.force.cforce cimport (CForce, CForceList, ForceArgs,
+                                        Fwrapper_forces)
+from ...potential.potential.cpotential import _validate_n_threads
 from ...integrate.cyintegrators.dop853 cimport (dop853_helper,
                                                 dop853_helper_save_all)
+from ...integrate.timespec import _store_indices
 
 cdef extern from "frame/src/cframe.h":
     ctypedef struct CFrame:
@@ -38,10 +43,432 @@ cdef extern from "dopri/dop853.h":
                                CPotential *p, CFrame *fr, unsigned norbits,
                                unsigned nbody, void *args)
 
+cdef extern from "src/tree.h":
+    ctypedef struct NBodyTree:
+        int failed
+
+    int tree_init(NBodyTree *tree, int n_body, double *m, double *b2,
+                  double theta, int n_threads)
+    void tree_free(NBodyTree *tree)
+    int tree_build(NBodyTree *tree, double *w, int ndim) nogil
+    void tree_acceleration(NBodyTree *tree, double *w, int ndim, double *x,
+                           int self, double *acc) nogil
+    void Fwrapper_tree_nbody(unsigned ndim, double t, double *w, double *f,
+                             CPotential *p, CFrame *fr, unsigned norbits,
+                             unsigned nbody, void *args)
+
+cdef extern from "src/pairwise.h":
+    ctypedef struct NBodyPairs:
+        pass
+
+    int pairs_init(NBodyPairs *pairs, int n_body, double *m, double *b2,
+                   int n_threads)
+    void pairs_free(NBodyPairs *pairs)
+    void pairs_acceleration(NBodyPairs *pairs, double *w, int ndim,
+                            double *acc, int stride) nogil
+    void Fwrapper_pairwise_nbody(unsigned ndim, double t, double *w,
+                                 double *f, CPotential *p, CFrame *fr,
+                                 unsigned norbits, unsigned nbody, void *args)
+
+cdef extern from "src/hermite.h":
+    ctypedef struct NBodyHermite:
+        long n_steps
+        long n_blocks
+
+    int hermite_init(NBodyHermite *h, int n_body, double *m, double *b2,
+                     double eta, int n_threads)
+    void hermite_free(NBodyHermite *h)
+    void hermite_start(NBodyHermite *h, CPotential *p, CFrame *fr, double t,
+                       double *w, int ndim, double dt) nogil
+    void hermite_evolve(NBodyHermite *h, CPotential *p, CFrame *fr,
+                        double t1, double t2, double *w, int ndim) nogil
+
+cdef class ParticlePotentials:
+    """
+    The C potentials of the particles of an N-body integration as an array of
+    pointers, which is passed to ``Fwrapper_direct_nbody()``. The potential
+    objects are referenced for the lifetime of this object.
+    """
+
+    def __cinit__(self, list potentials):
+        cdef int i
+
+        self.potentials = potentials
+        self.n = len(potentials)
+        self.ptrs = <CPotential **>malloc(max(self.n, 1) * sizeof(CPotential *))
+        if self.ptrs == NULL:
+            raise MemoryError("Failed to allocate the particle potentials.")
+
+        for i in range(self.n):
+            self.ptrs[i] = &(<CPotentialWrapper>(potentials[i].c_instance)).cpotential
+
+    def __dealloc__(self):
+        free(self.ptrs)
+
+cdef class NBodyForce:
+    """
+    The forces between the particles of an N-body integration: a force
+    function with the signature of ``Fwrapper_direct_nbody()``, which adds
+    the forces between the particles to the derivatives in the external
+    potential, and the extra arguments that are passed to it. The subclasses
+    own the memory of the arguments.
+    """
+    cdef FcnEqDiff F
+    cdef void *args
+    cdef int n
+
+    cdef int check(self) except -1:
+        # raise an error if the force function failed during an integration
+        return 0
+
+cdef class DirectForce(NBodyForce):
+    """
+    Direct summation of the gradients of the potentials of the particles (any
+    C-enabled potentials).
+    """
+    cdef ParticlePotentials potentials
+
+    def __cinit__(self, list particle_potentials):
+        self.potentials = ParticlePotentials(particle_potentials)
+        self.n = self.potentials.n
+        self.F = <FcnEqDiff> Fwrapper_direct_nbody
+        self.args = <void *>(self.potentials.ptrs)
+
+cdef class PairwiseForce(NBodyForce):
+    """
+    Direct summation of the forces between point masses and Plummer spheres
+    with masses ``m`` (times the gravitational constant) and scale radii
+    ``b``, where each pair of particles is visited once, in parallel over
+    ``n_threads`` threads.
+    """
+    cdef NBodyPairs pairs
+    cdef double[::1] m
+    cdef double[::1] b2
+
+    def __cinit__(self, m, b, n_threads=None):
+        self.m = np.array(m, dtype=np.float64)
+        self.b2 = np.square(np.array(b, dtype=np.float64))
+        self.n = len(self.m)
+        if len(self.b2) != self.n:
+            raise ValueError("The number of particle masses and scale radii "
+                             "must match.")
+
+        if pairs_init(&self.pairs, self.n, &self.m[0], &self.b2[0],
+                      _validate_n_threads(n_threads)) != 0:
+            raise MemoryError("Failed to allocate the force accumulators.")
+
+        self.F = <FcnEqDiff> Fwrapper_pairwise_nbody
+        self.args = <void *>(&self.pairs)
+
+    def __dealloc__(self):
+        pairs_free(&self.pairs)
+
+cdef class TreeForce(NBodyForce):
+    """
+    The forces between point masses and Plummer spheres with masses ``m``
+    (times the gravitational constant) and scale radii ``b``, computed with a
+    Barnes-Hut tree with opening angle ``theta``, in parallel over
+    ``n_threads`` threads.
+    """
+    cdef NBodyTree tree
+    cdef double[::1] m
+    cdef double[::1] b2
+
+    def __cinit__(self, m, b, double theta=0.5, n_threads=None):
+        self.m = np.array(m, dtype=np.float64)
+        self.b2 = np.square(np.array(b, dtype=np.float64))
+        self.n = len(self.m)
+        if len(self.b2) != self.n:
+            raise ValueError("The number of particle masses and scale radii "
+                             "must match.")
+
+        if theta < 0:
+            raise ValueError("The opening angle theta must be non-negative.")
+
+        if tree_init(&self.tree, self.n, &self.m[0], &self.b2[0], theta,
+                     _validate_n_threads(n_threads)) != 0:
+            raise MemoryError("Failed to allocate the tree.")
+
+        self.F = <FcnEqDiff> Fwrapper_tree_nbody
+        self.args = <void *>(&self.tree)
+
+    def __dealloc__(self):
+        tree_free(&self.tree)
+
+    cdef int check(self) except -1:
+        if self.tree.failed:
+            raise MemoryError("Failed to grow the tree.")
+        return 0
+
+cdef class ExtraForce(NBodyForce):
+    """
+    The forces of another ``NBodyForce`` ``force`` plus extra forces (e.g.,
+    dynamical friction) on the particles, which are added in C with
+    ``Fwrapper_forces()``. ``extra_forces`` has one entry per particle: a list
+    of ``CForceBase`` instances, or ``None`` for no extra forces.
+    """
+    cdef NBodyForce force
+    cdef list forces
+    cdef CForce **ptrs
+    cdef ForceArgs force_args
+
+    def __cinit__(self, NBodyForce force, list extra_forces):
+        cdef int i
+
+        if len(extra_forces) != force.n:
+            raise ValueError("The number of extra forces must match the "
+                             "number of particles of the N-body forces.")
+
+        self.force = force
+        self.n = force.n
+        self.forces = [CForceList(list(f)) if f else None
+                       for f in extra_forces]
+
+        self.ptrs = <CForce **>malloc(max(self.n, 1) * sizeof(CForce *))
+        if self.ptrs == NULL:
+            raise MemoryError("Failed to allocate the extra forces.")
+
+        for i in range(self.n):
+            if self.forces[i] is None:
+                self.ptrs[i] = NULL
+            else:
+                self.ptrs[i] = &(<CForceList>self.forces[i]).cforce
+
+        self.force_args.F = force.F
+        self.force_args.args = force.args
+        self.force_args.forces = self.ptrs
+        self.force_args.n_forces = self.n
+        self.force_args.shared = 0
+
+        self.F = <FcnEqDiff> Fwrapper_forces
+        self.args = <void *>(&self.force_args)
+
+    def __dealloc__(self):
+        free(self.ptrs)
+
+    cdef int check(self) except -1:
+        return self.force.check()
+
+def _with_extra_forces(NBodyForce force, hamiltonian):
+    # the extra forces of the Hamiltonian act on all particles
+    if hamiltonian.extra_forces:
+        return ExtraForce(force, [hamiltonian.extra_forces] * force.n)
+    return force
+
+def _validate_hamiltonian(hamiltonian):
+    if not isinstance(hamiltonian, Hamiltonian):
+        raise TypeError("Input must be a Hamiltonian object, not {}"
+                        .format(type(hamiltonian)))
+
+    if not hamiltonian.c_enabled:
+        raise TypeError("Input Hamiltonian object does not support C-level "
+                        "access.")
+
+def _validate_particles(double [:, ::1] w0, int n):
+    if n != w0.shape[0]:
+        raise ValueError("The number of particle initial conditions must match "
+                         "the number of particles of the N-body forces.")
+
+cpdef nbody_dop853(double [:, ::1] w0, double[::1] t, hamiltonian,
+                   NBodyForce force, save_all=True,
+                   double atol=1E-12, double rtol=1E-12, int nmax=0,
+                   int store_every=1):
+    """Integrate orbits from initial conditions ``w0`` over the time grid ``t``
+    in the external potential provided via the ``hamiltonian`` argument plus
+    the N-body forces ``force`` (a ``DirectForce``, ``PairwiseForce``,
+    ``TreeForce``, or ``ExtraForce``), with the adaptive DOPRI853 integrator.
+    The extra forces of the Hamiltonian are added to all particles. The error
+    of the steps is estimated over all particles with the tolerances ``atol``
+    and ``rtol``.
+
+    See ``direct_nbody_dop853()`` for ``save_all`` and ``store_every``.
+    """
+    cdef:
+        unsigned nparticles = w0.shape[0]
+        unsigned ndim = w0.shape[1]
+        unsigned ntimes = len(t)
+        CPotential cp = (<CPotentialWrapper>(hamiltonian.potential.c_instance)).cpotential
+        CFrame cf = (<CFrameWrapper>(hamiltonian.frame.c_instance)).cframe
+
+    _validate_hamiltonian(hamiltonian)
+    _validate_particles(w0, force.n)
+    force = <NBodyForce>_with_extra_forces(force, hamiltonian)
+
+    if save_all:
+        all_w = dop853_helper_save_all(&cp, &cf, force.F, w0, t,
+                                       ndim, nparticles, nparticles,
+                                       force.args, ntimes, atol, rtol, nmax,
+                                       store_every)
+    else:
+        all_w = dop853_helper(&cp, &cf, force.F, w0, t,
+                              ndim, nparticles, nparticles, force.args,
+                              ntimes, atol, rtol, nmax)
+        all_w = np.array(all_w).reshape(nparticles, ndim)
+
+    force.check()
+    return all_w
+
+cdef void _kick(double *w, double *f, int n, int ndim, double dt) nogil:
+    # update the velocities with the accelerations in the derivatives f
+    cdef int i, k
+    for i in range(n):
+        for k in range(ndim // 2, ndim):
+            w[i*ndim + k] = w[i*ndim + k] + f[i*ndim + k] * dt
+
+cdef void _drift(double *w, int n, int ndim, double dt) nogil:
+    cdef int i, k
+    for i in range(n):
+        for k in range(ndim // 2):
+            w[i*ndim + k] = w[i*ndim + k] + w[i*ndim + ndim//2 + k] * dt
+
+cpdef nbody_leapfrog(double [:, ::1] w0, double[::1] t, hamiltonian,
+                     NBodyForce force, save_all=True, int store_every=1):
+    """Integrate orbits from initial conditions ``w0`` over the time grid ``t``
+    in the external potential provided via the ``hamiltonian`` argument plus
+    the N-body forces ``force`` (a ``DirectForce``, ``PairwiseForce``,
+    ``TreeForce``, or ``ExtraForce``), with the kick-drift-kick Leapfrog
+    integrator. One step is taken between consecutive times, and the forces
+    are evaluated once per step. Only static frames are supported. The extra
+    forces of the Hamiltonian are added to all particles (the integration is
+    then no longer symplectic if they depend on the velocities).
+
+    See ``direct_nbody_dop853()`` for ``save_all`` and ``store_every``.
+    """
+    cdef:
+        int j, s = 0
+        int nparticles = w0.shape[0]
+        int ndim = w0.shape[1]
+        int ntimes = len(t)
+        double dt
+        double[::1] w = np.array(w0).ravel()
+        double[::1] f = np.zeros(nparticles * ndim)
+        CPotential cp = (<CPotentialWrapper>(hamiltonian.potential.c_instance)).cpotential
+        CFrame cf = (<CFrameWrapper>(hamiltonian.frame.c_instance)).cframe
+
+    _validate_hamiltonian(hamiltonian)
+    _validate_particles(w0, force.n)
+    force = <NBodyForce>_with_extra_forces(force, hamiltonian)
+
+    if save_all:
+        all_w_arr = np.empty((len(_store_indices(ntimes, store_every)),
+                              nparticles, ndim))
+        all_w_arr[0] = w0
+
+    with nogil:
+        force.F(nparticles * ndim, t[0], &w[0], &f[0], &cp, &cf,
+                nparticles, nparticles, force.args)
+
+    for j in range(1, ntimes):
+        dt = t[j] - t[j-1]
+        with nogil:
+            _kick(&w[0], &f[0], nparticles, ndim, dt / 2.)
+            _drift(&w[0], nparticles, ndim, dt)
+            force.F(nparticles * ndim, t[j], &w[0], &f[0], &cp, &cf,
+                    nparticles, nparticles, force.args)
+            _kick(&w[0], &f[0], nparticles, ndim, dt / 2.)
+
+        if save_all and ((j % store_every) == 0 or j == ntimes - 1):
+            s = s + 1
+            all_w_arr[s] = np.asarray(w).reshape(nparticles, ndim)
+        PyErr_CheckSignals()
+
+    force.check()
+
+    if save_all:
+        return all_w_arr
+    return np.array(w).reshape(nparticles, ndim)
+
+cpdef hermite_nbody(double [:, ::1] w0, double[::1] t, hamiltonian,
+                    double[::1] m, double[::1] b, double eta=0.02,
+                    n_threads=None, save_all=True, int store_every=1,
+                    dict info=None):
+    """Integrate orbits from initial conditions ``w0`` over the time grid ``t``
+    in the external potential provided via the ``hamiltonian`` argument, with
+    the 4th order Hermite integrator with individual block time steps.
+
+    The particles are Plummer spheres with masses ``m`` (times the
+    gravitational constant) and scale radii ``b`` (see
+    ``pairwise_nbody_dop853()``). The time step of each particle is the
+    interval between consecutive times divided by a power of 2, set by the
+    accuracy parameter ``eta``. The accelerations and jerks of the particles
+    in each block are computed in parallel over ``n_threads`` threads
+    (default: ``gala.conf.n_threads``). The jerk from the external potential
+    is computed from its Hessian (neglecting explicit time dependence). Only
+    static frames are supported.
+
+    If an ``info`` dictionary is passed, the total number of particle steps
+    and block steps are stored in it.
+
+    See ``direct_nbody_dop853()`` for ``save_all`` and ``store_every``.
+    """
+    cdef:
+        int j, s = 0
+        int nparticles = w0.shape[0]
+        int ndim = w0.shape[1]
+        int ntimes = len(t)
+        double dt0
+        NBodyHermite h
+        double[::1] b2 = np.square(b)
+        double[::1] w = np.array(w0).ravel()
+        CPotential cp = (<CPotentialWrapper>(hamiltonian.potential.c_instance)).cpotential
+        CFrame cf = (<CFrameWrapper>(hamiltonian.frame.c_instance)).cframe
+
+    _validate_hamiltonian(hamiltonian)
+
+    if hamiltonian.extra_forces:
+        raise ValueError("Hermite N-body integration does not support extra "
+                         "forces.")
+
+    if len(m) != nparticles or len(b) != nparticles:
+        raise ValueError("The number of particle initial conditions must match "
+                         "the number of particle masses and scale radii.")
+
+    if ndim != 6:
+        raise ValueError("Hermite N-body integration is only supported in 3D.")
+
+    if not eta > 0:
+        raise ValueError("The accuracy parameter eta must be positive.")
+
+    if hermite_init(&h, nparticles, &m[0], &b2[0], eta,
+                    _validate_n_threads(n_threads)) != 0:
+        raise MemoryError("Failed to allocate the Hermite integrator.")
+
+    try:
+        if save_all:
+            all_w_arr = np.empty((len(_store_indices(ntimes, store_every)),
+                                  nparticles, ndim))
+            all_w_arr[0] = w0
+
+        # the initial time steps are set relative to the first interval
+        dt0 = t[1] - t[0] if ntimes > 1 else 1.
+        with nogil:
+            hermite_start(&h, &cp, &cf, t[0], &w[0], ndim, dt0)
+
+        for j in range(1, ntimes):
+            with nogil:
+                hermite_evolve(&h, &cp, &cf, t[j-1], t[j], &w[0], ndim)
+
+            if save_all and ((j % store_every) == 0 or j == ntimes - 1):
+                s = s + 1
+                all_w_arr[s] = np.asarray(w).reshape(nparticles, ndim)
+            PyErr_CheckSignals()
+
+        if info is not None:
+            info['n_steps'] = h.n_steps
+            info['n_blocks'] = h.n_blocks
+
+    finally:
+        hermite_free(&h)
+
+    if save_all:
+        return all_w_arr
+    return np.array(w).reshape(nparticles, ndim)
+
 cpdef direct_nbody_dop853(double [:, ::1] w0, double[::1] t,
                           hamiltonian, list particle_potentials,
                           save_all=True,
-                          double atol=1E-10, double rtol=1E-10, int nmax=0):
+                          double atol=1E-12, double rtol=1E-12, int nmax=0,
+                          int store_every=1):
     """Integrate orbits from initial conditions ``w0`` over the time grid ``t``
     using direct N-body force calculation in the external potential provided via
     the ``hamiltonian`` argument.
@@ -51,53 +478,151 @@ cpdef direct_nbody_dop853(double [:, ::1] w0, double[::1] t,
     potential objects must equal the number of initial conditions.
 
     By default, this integration procedure stores the full time series of all
-    orbits, but this may use a lot of memory. If you just want to store the
-    final state of the orbits, pass ``save_all=False``.
+    orbits, but this may use a lot of memory. To only store the orbits at
+    every ``store_every``-th time in ``t`` (and at the final time), pass
+    ``store_every``. If you just want to store the final state of the orbits,
+    pass ``save_all=False``.
+    """
+    # Some input validation:
+    _validate_hamiltonian(hamiltonian)
+
+    if len(particle_potentials) != w0.shape[0]:
+        raise ValueError("The number of particle initial conditions must match "
+                         "the number of particle potentials passed in.")
+
+    # The CPotential objects of the particle potentials are passed to the force
+    # function as a void pointer for any other arguments
+    return nbody_dop853(w0, t, hamiltonian,
+                        DirectForce(list(particle_potentials)),
+                        save_all=save_all, atol=atol, rtol=rtol, nmax=nmax,
+                        store_every=store_every)
+
+cpdef pairwise_nbody_dop853(double [:, ::1] w0, double[::1] t,
+                            hamiltonian, double[::1] m, double[::1] b,
+                            n_threads=None, save_all=True,
+                            double atol=1E-12, double rtol=1E-12, int nmax=0,
+                            int store_every=1):
+    """Integrate orbits from initial conditions ``w0`` over the time grid ``t``
+    in the external potential provided via the ``hamiltonian`` argument, with
+    the forces between the particles computed by direct summation with a
+    specialized kernel for point masses and Plummer spheres.
+
+    The particles are Plummer spheres with masses ``m`` (times the
+    gravitational constant) and scale radii ``b``, where a scale radius of 0 is
+    a point mass and particles with zero mass are test particles. Each pair of
+    particles is only visited once, and the forces are computed in parallel
+    over ``n_threads`` threads (default: ``gala.conf.n_threads``). The results
+    are the same as with ``direct_nbody_dop853()`` for the corresponding
+    Kepler and Plummer particle potentials.
+
+    See ``direct_nbody_dop853()`` for ``save_all`` and ``store_every``.
+    """
+    _validate_hamiltonian(hamiltonian)
+
+    if len(m) != w0.shape[0] or len(b) != w0.shape[0]:
+        raise ValueError("The number of particle initial conditions must match "
+                         "the number of particle masses and scale radii.")
+
+    if w0.shape[1] != 6:
+        raise ValueError("Pairwise N-body integration is only supported in "
+                         "3D.")
+
+    return nbody_dop853(w0, t, hamiltonian,
+                        PairwiseForce(m, b, n_threads=n_threads),
+                        save_all=save_all, atol=atol, rtol=rtol, nmax=nmax,
+                        store_every=store_every)
+
+cpdef pairwise_nbody_acceleration(double [:, ::1] x, double[::1] m,
+                                  double[::1] b, n_threads=None):
+    """Compute the accelerations of the particles at positions ``x`` (with
+    shape ``(nparticles, 3)``) from each other by direct summation. See
+    ``pairwise_nbody_dop853()`` for the other arguments.
     """
     cdef:
-        unsigned nparticles = w0.shape[0]
-        unsigned ndim = w0.shape[1]
-        unsigned ntimes = len(t)
+        int nparticles = x.shape[0]
+        NBodyPairs pairs
+        double[::1] b2 = np.square(b)
+        double[:, ::1] acc = np.zeros((nparticles, 3))
 
-        int i
-        void *args
-        CPotential *c_particle_potentials[MAX_NBODY]
-        CPotential cp = (<CPotentialWrapper>(hamiltonian.potential.c_instance)).cpotential
-        CFrame cf = (<CFrameWrapper>(hamiltonian.frame.c_instance)).cframe
+    if x.shape[1] != 3:
+        raise ValueError("Pairwise N-body accelerations are only supported in "
+                         "3D.")
 
-    # Some input validation:
-    if not isinstance(hamiltonian, Hamiltonian):
-        raise TypeError("Input must be a Hamiltonian object, not {}"
-                        .format(type(hamiltonian)))
+    if pairs_init(&pairs, nparticles, &m[0], &b2[0],
+                  _validate_n_threads(n_threads)) != 0:
+        raise MemoryError("Failed to allocate the force accumulators.")
 
-    if not hamiltonian.c_enabled:
-        raise TypeError("Input Hamiltonian object does not support C-level "
-                        "access.")
+    try:
+        with nogil:
+            pairs_acceleration(&pairs, &x[0, 0], 3, &acc[0, 0], 3)
+    finally:
+        pairs_free(&pairs)
+
+    return np.asarray(acc)
+
+cpdef tree_nbody_dop853(double [:, ::1] w0, double[::1] t,
+                        hamiltonian, double[::1] m, double[::1] b,
+                        double theta=0.5, n_threads=None, save_all=True,
+                        double atol=1E-12, double rtol=1E-12, int nmax=0,
+                        int store_every=1):
+    """Integrate orbits from initial conditions ``w0`` over the time grid ``t``
+    in the external potential provided via the ``hamiltonian`` argument, with
+    the forces between the particles computed with a Barnes-Hut tree.
+
+    The particles are Plummer spheres with masses ``m`` (times the
+    gravitational constant) and scale radii ``b``, where a scale radius of 0 is
+    a point mass and particles with zero mass are test particles. The tree is
+    rebuilt at every force evaluation, and the force from a cell of the tree
+    is approximated by the monopole at its center of mass if the cell appears
+    smaller than the opening angle ``theta``. ``theta=0`` is equivalent to the
+    direct sum. The forces are computed in parallel over ``n_threads`` threads
+    (default: ``gala.conf.n_threads``).
 
-    if len(particle_potentials) != nparticles:
+    See ``direct_nbody_dop853()`` for ``save_all`` and ``store_every``.
+    """
+    _validate_hamiltonian(hamiltonian)
+
+    if len(m) != w0.shape[0] or len(b) != w0.shape[0]:
         raise ValueError("The number of particle initial conditions must match "
-                         "the number of particle potentials passed in.")
+                         "the number of particle masses and scale radii.")
 
-    # Extract the CPotential objects from the particle potentials.
-    for i in range(nparticles):
-        c_particle_potentials[i] = &(<CPotentialWrapper>(particle_potentials[i].c_instance)).cpotential
+    if w0.shape[1] != 6:
+        raise ValueError("Tree N-body integration is only supported in 3D.")
 
-    # We need a void pointer for any other arguments
-    args = <void *>(&c_particle_potentials[0])
+    return nbody_dop853(w0, t, hamiltonian,
+                        TreeForce(m, b, theta=theta, n_threads=n_threads),
+                        save_all=save_all, atol=atol, rtol=rtol, nmax=nmax,
+                        store_every=store_every)
 
-    # TODONOW: fix below - need to pass in how many massive particles, total number of orbits and
-    if save_all:
-        all_w = dop853_helper_save_all(&cp, &cf,
-                                       <FcnEqDiff> Fwrapper_direct_nbody,
-                                       w0, t,
-                                       ndim, nparticles, nparticles, args,
-                                       ntimes, atol, rtol, nmax)
-    else:
-        all_w = dop853_helper(&cp, &cf,
-                              <FcnEqDiff> Fwrapper_direct_nbody,
-                              w0, t,
-                              ndim, nparticles, nparticles, args, ntimes,
-                              atol, rtol, nmax)
-        all_w = np.array(all_w).reshape(nparticles, ndim)
+cpdef tree_nbody_acceleration(double [:, ::1] x, double[::1] m,
+                              double[::1] b, double theta=0.5):
+    """Compute the accelerations of the particles at positions ``x`` (with
+    shape ``(nparticles, 3)``) from each other with a Barnes-Hut tree. See
+    ``tree_nbody_dop853()`` for the other arguments.
+    """
+    cdef:
+        int i
+        int nparticles = x.shape[0]
+        NBodyTree tree
+        double[::1] b2 = np.square(b)
+        double[:, ::1] acc = np.zeros((nparticles, 3))
 
-    return all_w
+    if x.shape[1] != 3:
+        raise ValueError("Tree N-body accelerations are only supported in 3D.")
+
+    if not 0 <= theta <= 1:
+        raise ValueError("The opening angle theta must be between 0 and 1.")
+
+    if tree_init(&tree, nparticles, &m[0], &b2[0], theta, 1) != 0:
+        raise MemoryError("Failed to allocate the tree.")
+
+    try:
+        if tree_build(&tree, &x[0, 0], 3) != 0:
+            raise MemoryError("Failed to grow the tree.")
+
+        for i in range(nparticles):
+            tree_acceleration(&tree, &x[0, 0], 3, &x[i, 0], i, &acc[i, 0])
+    finally:
+        tree_free(&tree)
+
+    return np.asarray(acc)
@@ -1,4 +0,0 @@
-#ifndef MAX_NBODY_H
-    #define MAX_NBODY_H
-    #define MAX_NBODY 65536
-#endif
@@ -0,0 +1,333 @@
+#include <math.h>
+#include <stdlib.h>
+#include "potential/src/cpotential.h"
+#include "hamiltonian/src/chamiltonian.h"
+#include "hermite.h"
+
+/*
+    A 4th order Hermite predictor-corrector integrator with individual block
+    time steps (Makino & Aarseth 1992) for point masses (Kepler) and Plummer
+    spheres in an external potential.
+
+    Each particle has its own time step, which is the output interval divided
+    by a power of 2, so that the particles that are due at the same time form
+    a block and all particles are synchronized at the output times. At every
+    block step, the positions and velocities of all massive particles are
+    predicted to the current time with a Taylor expansion, the accelerations
+    and jerks (time derivatives of the accelerations) of the particles in the
+    block are computed from the predicted positions and velocities, and the
+    positions and velocities of the particles in the block are corrected with
+    a Hermite interpolation of the accelerations. The new time steps follow
+    the criterion of Aarseth (1985) with the accuracy parameter eta, and can
+    only grow by a factor of 2 per step, and only if the new step stays
+    commensurate with the block times.
+
+    The jerk from the external potential is computed from its Hessian, so
+    explicit time dependence of the external potential is neglected in the
+    jerk. Only static frames are supported.
+*/
+
+int hermite_init(NBodyHermite *h, int n_body, double *m, double *b2,
+                 double eta, int n_threads) {
+    int i, n = n_body + 1;
+
+    h->n_body = n_body;
+    h->m = m;
+    h->b2 = b2;
+    h->eta = eta;
+    h->eta_s = eta / 2.;
+    h->n_threads = n_threads > 0 ? n_threads : 1;
+    h->n_steps = 0;
+    h->n_blocks = 0;
+
+    h->n_massive = 0;
+    for (i=0; i < n_body; i++) {
+        if (m[i] != 0.)
+            h->n_massive++;
+    }
+
+    h->massive = (int *)malloc(n * sizeof(int));
+    h->active = (int *)malloc(n * sizeof(int));
+    h->x = (double *)malloc(3 * n * sizeof(double));
+    h->v = (double *)malloc(3 * n * sizeof(double));
+    h->a = (double *)malloc(3 * n * sizeof(double));
+    h->j = (double *)malloc(3 * n * sizeof(double));
+    h->xp = (double *)malloc(3 * n * sizeof(double));
+    h->vp = (double *)malloc(3 * n * sizeof(double));
+    h->a1 = (double *)malloc(3 * n * sizeof(double));
+    h->j1 = (double *)malloc(3 * n * sizeof(double));
+    h->tick = (long long *)malloc(n * sizeof(long long));
+    h->level = (int *)malloc(n * sizeof(int));
+
+    if ((h->massive == NULL) || (h->active == NULL) || (h->x == NULL) ||
+        (h->v == NULL) || (h->a == NULL) || (h->j == NULL) ||
+        (h->xp == NULL) || (h->vp == NULL) || (h->a1 == NULL) ||
+        (h->j1 == NULL) || (h->tick == NULL) || (h->level == NULL)) {
+        hermite_free(h);
+        return -1;
+    }
+
+    h->n_massive = 0;
+    for (i=0; i < n_body; i++) {
+        if (m[i] != 0.) {
+            h->massive[h->n_massive] = i;
+            h->n_massive++;
+        }
+    }
+
+    return 0;
+}
+
+void hermite_free(NBodyHermite *h) {
+    free(h->massive);
+    free(h->active);
+    free(h->x);
+    free(h->v);
+    free(h->a);
+    free(h->j);
+    free(h->xp);
+    free(h->vp);
+    free(h->a1);
+    free(h->j1);
+    free(h->tick);
+    free(h->level);
+    h->massive = NULL;
+    h->active = NULL;
+    h->x = NULL;
+    h->v = NULL;
+    h->a = NULL;
+    h->j = NULL;
+    h->xp = NULL;
+    h->vp = NULL;
+    h->a1 = NULL;
+    h->j1 = NULL;
+    h->tick = NULL;
+    h->level = NULL;
+}
+
+static double norm3(double *x) {
+    return sqrt(x[0]*x[0] + x[1]*x[1] + x[2]*x[2]);
+}
+
+static int step_level(double dt_out, double dt) {
+    /* The smallest level with a time step dt_out / 2^level <= dt */
+    int level;
+
+    if (!(dt > 0) || isinf(dt))
+        return 0;
+
+    level = (int)ceil(log2(fabs(dt_out) / dt));
+    if (level < 0)
+        level = 0;
+    if (level > HERMITE_MAX_LEVEL)
+        level = HERMITE_MAX_LEVEL;
+    return level;
+}
+
+static void forces(NBodyHermite *h, CPotential *p, CFrame *fr, double t,
+                   int n_active) {
+    /* Compute the accelerations and jerks of the particles in the block from
+       the predicted positions and velocities, and store them in a1 and j1.
+    */
+    int n;
+
+    #pragma omp parallel for schedule(dynamic, 16) num_threads(h->n_threads)
+    for (n=0; n < n_active; n++) {
+        int c, i, k, l, s;
+        double w[6], f[6], hess[9];
+        double dx[3], dv[3], r2, inv, rv;
+        double *a = &h->a1[3*h->active[n]];
+        double *jerk = &h->j1[3*h->active[n]];
+
+        i = h->active[n];
+
+        // the external potential: the jerk is -H . v, for the Hessian H
+        for (k=0; k < 3; k++) {
+            w[k] = h->xp[3*i + k];
+            w[3 + k] = h->vp[3*i + k];
+        }
+        hamiltonian_gradient(p, fr, t, w, f);
+        c_hessian(p, t, w, hess);
+        for (k=0; k < 3; k++) {
+            a[k] = f[3 + k];
+            jerk[k] = 0.;
+            for (l=0; l < 3; l++)
+                jerk[k] -= hess[3*k + l] * w[3 + l];
+        }
+
+        for (c=0; c < h->n_massive; c++) {
+            s = h->massive[c];
+            if (s == i)
+                continue;
+
+            r2 = h->b2[s];
+            rv = 0.;
+            for (k=0; k < 3; k++) {
+                dx[k] = h->xp[3*s + k] - h->xp[3*i + k];
+                dv[k] = h->vp[3*s + k] - h->vp[3*i + k];
+                r2 += dx[k] * dx[k];
+                rv += dx[k] * dv[k];
+            }
+
+            inv = h->m[s] / (r2 * sqrt(r2));
+            rv = 3. * rv / r2;
+            for (k=0; k < 3; k++) {
+                a[k] += inv * dx[k];
+                jerk[k] += inv * (dv[k] - rv * dx[k]);
+            }
+        }
+    }
+}
+
+static void predict(NBodyHermite *h, int i, double dt) {
+    int k;
+
+    for (k=0; k < 3; k++) {
+        h->xp[3*i + k] = h->x[3*i + k] + dt * (h->v[3*i + k] +
+            dt/2. * (h->a[3*i + k] + dt/3. * h->j[3*i + k]));
+        h->vp[3*i + k] = h->v[3*i + k] + dt * (h->a[3*i + k] +
+            dt/2. * h->j[3*i + k]);
+    }
+}
+
+void hermite_start(NBodyHermite *h, CPotential *p, CFrame *fr, double t,
+                   double *w, int ndim, double dt) {
+    /* Initialize the state from the phase-space positions w[i*ndim:(i+1)*ndim]
+       of the particles at time t, and the time steps for the output
+       interval dt.
+    */
+    int i, k;
+    double aa, jj;
+
+    for (i=0; i < h->n_body; i++) {
+        for (k=0; k < 3; k++) {
+            h->x[3*i + k] = w[i*ndim + k];
+            h->v[3*i + k] = w[i*ndim + ndim/2 + k];
+            h->xp[3*i + k] = h->x[3*i + k];
+            h->vp[3*i + k] = h->v[3*i + k];
+        }
+        h->active[i] = i;
+    }
+
+    forces(h, p, fr, t, h->n_body);
+
+    for (i=0; i < h->n_body; i++) {
+        for (k=0; k < 3; k++) {
+            h->a[3*i + k] = h->a1[3*i + k];
+            h->j[3*i + k] = h->j1[3*i + k];
+        }
+
+        aa = norm3(&h->a[3*i]);
+        jj = norm3(&h->j[3*i]);
+        if (jj > 0)
+            h->level[i] = step_level(dt, h->eta_s * aa / jj);
+        else
+            h->level[i] = 0;
+    }
+}
+
+void hermite_evolve(NBodyHermite *h, CPotential *p, CFrame *fr,
+                    double t1, double t2, double *w, int ndim) {
+    /* Integrate from t1 to t2, where all particles are synchronized, and
+       store the phase-space positions at t2 in w.
+    */
+    const long long T = 1LL << HERMITE_MAX_LEVEL;
+    double dt_out = t2 - t1;
+    long long next, step;
+    int i, k, n, n_active, level;
+    double dt, dt2, dt3, da, a2, a3, num, den;
+    double a2_1[3], a3_k[3];
+
+    for (i=0; i < h->n_body; i++)
+        h->tick[i] = 0;
+
+    while (1) {
+        // the particles with the earliest next step form the block
+        next = T + 1;
+        for (i=0; i < h->n_body; i++) {
+            step = T >> h->level[i];
+            if (h->tick[i] + step < next)
+                next = h->tick[i] + step;
+        }
+        if (next > T)
+            break;
+
+        n_active = 0;
+        for (i=0; i < h->n_body; i++) {
+            if (h->tick[i] + (T >> h->level[i]) == next) {
+                h->active[n_active] = i;
+                n_active++;
+            }
+        }
+
+        // predict the massive particles and the particles in the block
+        for (n=0; n < h->n_massive; n++) {
+            i = h->massive[n];
+            predict(h, i, dt_out * (double)(next - h->tick[i]) / (double)T);
+        }
+        for (n=0; n < n_active; n++) {
+            i = h->active[n];
+            if (h->m[i] == 0.)
+                predict(h, i, dt_out * (double)(next - h->tick[i]) / (double)T);
+        }
+
+        forces(h, p, fr, t1 + dt_out * (double)next / (double)T, n_active);
+
+        // correct the particles in the block and update their time steps
+        for (n=0; n < n_active; n++) {
+            i = h->active[n];
+            step = T >> h->level[i];
+            dt = dt_out * (double)step / (double)T;
+            dt2 = dt * dt;
+            dt3 = dt2 * dt;
+
+            for (k=0; k < 3; k++) {
+                da = h->a[3*i + k] - h->a1[3*i + k];
+                a2 = (-6. * da - dt * (4. * h->j[3*i + k] +
+                                       2. * h->j1[3*i + k])) / dt2;
+                a3 = (12. * da + 6. * dt * (h->j[3*i + k] +
+                                            h->j1[3*i + k])) / dt3;
+
+                h->x[3*i + k] = h->xp[3*i + k] +
+                    dt2 * dt2 * (a2 / 24. + dt * a3 / 120.);
+                h->v[3*i + k] = h->vp[3*i + k] +
+                    dt3 * (a2 / 6. + dt * a3 / 24.);
+                h->a[3*i + k] = h->a1[3*i + k];
+                h->j[3*i + k] = h->j1[3*i + k];
+
+                a2_1[k] = a2 + dt * a3;
+                a3_k[k] = a3;
+            }
+            h->tick[i] = next;
+
+            // the time step criterion of Aarseth (1985)
+            num = norm3(&h->a[3*i]) * norm3(a2_1) +
+                  norm3(&h->j[3*i]) * norm3(&h->j[3*i]);
+            den = norm3(&h->j[3*i]) * norm3(a3_k) +
+                  norm3(a2_1) * norm3(a2_1);
+            if (den > 0)
+                level = step_level(dt_out, sqrt(h->eta * num / den));
+            else
+                level = 0;
+
+            if (level > h->level[i]) {
+                h->level[i] = level;
+            } else if ((level < h->level[i]) && (h->level[i] > 0) &&
+                       (next % (T >> (h->level[i] - 1)) == 0)) {
+                // only grow the step by a factor of 2, and only if the new
+                // step is commensurate with the time of the particle
+                h->level[i] = h->level[i] - 1;
+            }
+        }
+
+        h->n_steps += n_active;
+        h->n_blocks++;
+    }
+
+    for (i=0; i < h->n_body; i++) {
+        for (k=0; k < 3; k++) {
+            w[i*ndim + k] = h->x[3*i + k];
+            w[i*ndim + ndim/2 + k] = h->v[3*i + k];
+        }
+    }
+}
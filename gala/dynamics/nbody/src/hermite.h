@@ -0,0 +1,48 @@
+#include "potential/src/cpotential.h"
+#include "frame/src/cframe.h"
+
+#ifndef _NBODY_HERMITE_H
+#define _NBODY_HERMITE_H
+
+    /* the smallest time step is the output interval divided by
+       2^HERMITE_MAX_LEVEL */
+    #define HERMITE_MAX_LEVEL 40
+
+    typedef struct {
+        int n_body;         // number of particles (massive and test)
+        int n_massive;      // number of particles with nonzero mass
+        double *m;          // G*mass of each particle
+        double *b2;         // squared softening length of each particle
+        double eta;         // accuracy parameter of the time steps
+        double eta_s;       // accuracy parameter of the initial time steps
+        int n_threads;
+
+        int *massive;       // indices of the massive particles
+        int *active;        // indices of the particles in the current block
+
+        // state of each particle at the time of its last step, (n_body, 3)
+        double *x, *v, *a, *j;
+
+        // predicted positions and velocities, and the new accelerations and
+        // jerks of the particles in the current block, (n_body, 3)
+        double *xp, *vp, *a1, *j1;
+
+        // time of the last step in units of the output interval divided by
+        // 2^HERMITE_MAX_LEVEL, and the level of the time step of each
+        // particle: the step is the output interval divided by 2^level
+        long long *tick;
+        int *level;
+
+        long n_steps;       // number of particle steps taken
+        long n_blocks;      // number of block steps taken
+    } NBodyHermite;
+
+    extern int hermite_init(NBodyHermite *h, int n_body, double *m,
+                            double *b2, double eta, int n_threads);
+    extern void hermite_free(NBodyHermite *h);
+    extern void hermite_start(NBodyHermite *h, CPotential *p, CFrame *fr,
+                              double t, double *w, int ndim, double dt);
+    extern void hermite_evolve(NBodyHermite *h, CPotential *p, CFrame *fr,
+                               double t1, double t2, double *w, int ndim);
+
+#endif
@@ -0,0 +1,180 @@
+#include <math.h>
+#include <stdlib.h>
+#include <string.h>
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+#include "hamiltonian/src/chamiltonian.h"
+#include "pairwise.h"
+
+/*
+    Direct summation of the softened gravitational forces between point
+    masses (Kepler) and Plummer spheres. The acceleration of particle i from
+    particle j is
+
+        m_j (x_j - x_i) / (|x_j - x_i|^2 + b_j^2)^(3/2)
+
+    where m_j is the G*mass and b_j the scale radius of particle j. Each pair
+    of massive particles is only visited once, and the separation (and, for
+    equal scale radii, the inverse distance) is used for the accelerations of
+    both particles. The outer loop over the massive particles is split over
+    OpenMP threads, so each thread accumulates the accelerations of the
+    massive particles in its own buffer, and these are summed at the end. The
+    accelerations of the test particles are computed separately, in parallel
+    over the test particles.
+
+    All state is kept in the NBodyPairs struct, so independent integrations
+    can run concurrently.
+*/
+
+int pairs_init(NBodyPairs *pairs, int n_body, double *m, double *b2,
+               int n_threads) {
+    int i, n_test = 0;
+
+    pairs->n_body = n_body;
+    pairs->m = m;
+    pairs->b2 = b2;
+    pairs->n_threads = n_threads > 0 ? n_threads : 1;
+
+    pairs->n_massive = 0;
+    for (i=0; i < n_body; i++) {
+        if (m[i] != 0.)
+            pairs->n_massive++;
+    }
+
+    pairs->massive = (int *)malloc((pairs->n_massive + 1) * sizeof(int));
+    pairs->test = (int *)malloc((n_body - pairs->n_massive + 1) * sizeof(int));
+    pairs->acc = (double *)malloc(
+        ((size_t)pairs->n_threads * pairs->n_massive * 3 + 1) * sizeof(double));
+
+    if ((pairs->massive == NULL) || (pairs->test == NULL) ||
+        (pairs->acc == NULL)) {
+        pairs_free(pairs);
+        return -1;
+    }
+
+    pairs->n_massive = 0;
+    for (i=0; i < n_body; i++) {
+        if (m[i] != 0.) {
+            pairs->massive[pairs->n_massive] = i;
+            pairs->n_massive++;
+        } else {
+            pairs->test[n_test] = i;
+            n_test++;
+        }
+    }
+
+    return 0;
+}
+
+void pairs_free(NBodyPairs *pairs) {
+    free(pairs->massive);
+    free(pairs->test);
+    free(pairs->acc);
+    pairs->massive = NULL;
+    pairs->test = NULL;
+    pairs->acc = NULL;
+}
+
+void pairs_acceleration(NBodyPairs *pairs, double *w, int ndim, double *acc,
+                        int stride) {
+    /* Add the accelerations of all particles, with positions w[i*ndim:i*ndim+3],
+       to acc[i*stride:i*stride+3].
+    */
+    int n_massive = pairs->n_massive;
+    int n_test = pairs->n_body - n_massive;
+    int *massive = pairs->massive;
+    int *test = pairs->test;
+    double *m = pairs->m;
+    double *b2 = pairs->b2;
+    double *buf = pairs->acc;
+    size_t n_buf = (size_t)n_massive * 3;
+
+    memset(buf, 0, pairs->n_threads * n_buf * sizeof(double));
+
+    #pragma omp parallel num_threads(pairs->n_threads)
+    {
+        int a, c, i, j, k, th, tid = 0;
+        double dx[3], r2, inv_i, inv_j;
+        double *my;
+
+        #ifdef _OPENMP
+        tid = omp_get_thread_num();
+        #endif
+        my = &buf[tid * n_buf];
+
+        // the pairs of massive particles, each visited once
+        #pragma omp for schedule(dynamic, 16)
+        for (a=0; a < n_massive; a++) {
+            i = massive[a];
+            for (c=a+1; c < n_massive; c++) {
+                j = massive[c];
+
+                r2 = 0.;
+                for (k=0; k < 3; k++) {
+                    dx[k] = w[j*ndim + k] - w[i*ndim + k];
+                    r2 += dx[k] * dx[k];
+                }
+
+                // the softening is that of the particle generating the force
+                inv_j = 1. / ((r2 + b2[j]) * sqrt(r2 + b2[j]));
+                if (b2[i] == b2[j])
+                    inv_i = inv_j;
+                else
+                    inv_i = 1. / ((r2 + b2[i]) * sqrt(r2 + b2[i]));
+
+                for (k=0; k < 3; k++) {
+                    my[a*3 + k] += m[j] * inv_j * dx[k];
+                    my[c*3 + k] -= m[i] * inv_i * dx[k];
+                }
+            }
+        }
+
+        // sum the accumulators of all threads (implicit barrier above)
+        #pragma omp for schedule(static)
+        for (a=0; a < n_massive; a++) {
+            i = massive[a];
+            for (th=0; th < pairs->n_threads; th++) {
+                for (k=0; k < 3; k++)
+                    acc[i*stride + k] += buf[th * n_buf + a*3 + k];
+            }
+        }
+
+        // the test particles only feel the forces from the massive particles
+        #pragma omp for schedule(dynamic, 16)
+        for (c=0; c < n_test; c++) {
+            j = test[c];
+            for (a=0; a < n_massive; a++) {
+                i = massive[a];
+
+                r2 = b2[i];
+                for (k=0; k < 3; k++) {
+                    dx[k] = w[i*ndim + k] - w[j*ndim + k];
+                    r2 += dx[k] * dx[k];
+                }
+
+                inv_i = m[i] / (r2 * sqrt(r2));
+                for (k=0; k < 3; k++)
+                    acc[j*stride + k] += inv_i * dx[k];
+            }
+        }
+    }
+}
+
+void Fwrapper_pairwise_nbody(unsigned full_ndim, double t, double *w,
+                             double *f, CPotential *p, CFrame *fr,
+                             unsigned norbits, unsigned nbody,
+                             void *args) {
+    /* The same as Fwrapper_direct_nbody(), but the forces between the
+       particles are computed with the pairwise kernel passed in as args.
+    */
+    NBodyPairs *pairs = (NBodyPairs *)args;
+    int i;
+    unsigned ndim = full_ndim / norbits; // phase-space dimensionality
+
+    for (i=0; i < norbits; i++) {
+        hamiltonian_gradient(p, fr, t, &w[i*ndim], &f[i*ndim]);
+    }
+
+    pairs_acceleration(pairs, w, ndim, &f[ndim/2], ndim);
+}
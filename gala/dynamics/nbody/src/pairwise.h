@@ -0,0 +1,30 @@
+#include "potential/src/cpotential.h"
+#include "frame/src/cframe.h"
+
+#ifndef _NBODY_PAIRWISE_H
+#define _NBODY_PAIRWISE_H
+
+    typedef struct {
+        int n_body;         // number of particles (massive and test)
+        int n_massive;      // number of particles with nonzero mass
+        double *m;          // G*mass of each particle
+        double *b2;         // squared softening length of each particle
+        int n_threads;
+
+        int *massive;       // indices of the massive particles
+        int *test;          // indices of the test particles
+        double *acc;        // per-thread accumulators, (n_threads, n_body, 3)
+    } NBodyPairs;
+
+    extern int pairs_init(NBodyPairs *pairs, int n_body, double *m,
+                          double *b2, int n_threads);
+    extern void pairs_free(NBodyPairs *pairs);
+    extern void pairs_acceleration(NBodyPairs *pairs, double *w, int ndim,
+                                   double *acc, int stride);
+
+    extern void Fwrapper_pairwise_nbody(unsigned full_ndim, double t,
+                                        double *w, double *f, CPotential *p,
+                                        CFrame *fr, unsigned norbits,
+                                        unsigned nbody, void *args);
+
+#endif
@@ -0,0 +1,307 @@
+#include <math.h>
+#include <stdlib.h>
+#include <string.h>
+#include "hamiltonian/src/chamiltonian.h"
+#include "tree.h"
+
+/*
+    A Barnes-Hut octree for the softened gravitational forces between point
+    masses (Kepler) and Plummer spheres. The tree is rebuilt from the current
+    positions at every force evaluation. Cells are split until they contain at
+    most TREE_LEAF_SIZE particles. The force from a cell is approximated by the
+    monopole at its center of mass if the target is far enough away, using the
+    opening criterion of Barnes (1994):
+
+        r > s / theta + delta
+
+    where s is the side length of the cell and delta is the distance between
+    its center of mass and geometric center. Otherwise, the children of the
+    cell are opened, or the forces from the particles of a leaf are summed
+    directly.
+*/
+
+int tree_init(NBodyTree *tree, int n_body, double *m, double *b2,
+              double theta, int n_threads) {
+    int i;
+
+    tree->n_body = n_body;
+    tree->m = m;
+    tree->b2 = b2;
+    tree->theta = theta;
+    tree->n_threads = n_threads;
+    tree->failed = 0;
+
+    tree->n_massive = 0;
+    for (i=0; i < n_body; i++) {
+        if (m[i] != 0.)
+            tree->n_massive++;
+    }
+
+    tree->n_nodes = 0;
+    tree->capacity = 2 * (tree->n_massive / TREE_LEAF_SIZE + 1) + 64;
+    tree->nodes = (TreeNode *)malloc(tree->capacity * sizeof(TreeNode));
+    tree->idx = (int *)malloc((tree->n_massive + 1) * sizeof(int));
+    tree->tmp = (int *)malloc((tree->n_massive + 1) * sizeof(int));
+
+    if ((tree->nodes == NULL) || (tree->idx == NULL) || (tree->tmp == NULL)) {
+        tree_free(tree);
+        return -1;
+    }
+    return 0;
+}
+
+void tree_free(NBodyTree *tree) {
+    free(tree->nodes);
+    free(tree->idx);
+    free(tree->tmp);
+    tree->nodes = NULL;
+    tree->idx = NULL;
+    tree->tmp = NULL;
+}
+
+static int new_node(NBodyTree *tree) {
+    TreeNode *nodes;
+
+    if (tree->n_nodes == tree->capacity) {
+        nodes = (TreeNode *)realloc(tree->nodes,
+                                    2 * tree->capacity * sizeof(TreeNode));
+        if (nodes == NULL)
+            return -1;
+        tree->nodes = nodes;
+        tree->capacity = 2 * tree->capacity;
+    }
+
+    tree->n_nodes++;
+    return tree->n_nodes - 1;
+}
+
+static int build_node(NBodyTree *tree, double *w, int ndim, int start,
+                      int count, double *center, double half, int depth) {
+    /* Build the cell with the given center and half side length for the
+       particles idx[start:start+count], and recursively its children.
+       Returns the index of the cell, or -1 if the tree could not be grown.
+    */
+    int n, i, j, k, o, child;
+    int cnt[8], offset[8];
+    double m, sub[3];
+    TreeNode *node;
+
+    n = new_node(tree);
+    if (n < 0)
+        return -1;
+
+    // the nodes may move when the tree is grown, so always index them
+    node = &(tree->nodes[n]);
+    for (k=0; k < 3; k++) {
+        node->center[k] = center[k];
+        node->com[k] = 0.;
+    }
+    node->half = half;
+    node->start = start;
+    node->count = count;
+    node->m = 0.;
+    node->b2 = 0.;
+    for (o=0; o < 8; o++)
+        node->child[o] = -1;
+
+    for (i=start; i < start+count; i++) {
+        j = tree->idx[i];
+        m = tree->m[j];
+        node->m += m;
+        node->b2 += m * tree->b2[j];
+        for (k=0; k < 3; k++)
+            node->com[k] += m * w[j*ndim + k];
+    }
+
+    node->delta = 0.;
+    for (k=0; k < 3; k++) {
+        node->com[k] /= node->m;
+        node->delta += (node->com[k] - center[k]) * (node->com[k] - center[k]);
+    }
+    node->delta = sqrt(node->delta);
+    node->b2 /= node->m;
+
+    node->leaf = (count <= TREE_LEAF_SIZE) || (depth >= TREE_MAX_DEPTH);
+    if (node->leaf)
+        return n;
+
+    // sort the particles by octant
+    for (o=0; o < 8; o++)
+        cnt[o] = 0;
+    for (i=start; i < start+count; i++) {
+        j = tree->idx[i];
+        o = (w[j*ndim] > center[0]) + 2*(w[j*ndim+1] > center[1]) +
+            4*(w[j*ndim+2] > center[2]);
+        cnt[o]++;
+    }
+
+    offset[0] = start;
+    for (o=1; o < 8; o++)
+        offset[o] = offset[o-1] + cnt[o-1];
+
+    for (i=start; i < start+count; i++) {
+        j = tree->idx[i];
+        o = (w[j*ndim] > center[0]) + 2*(w[j*ndim+1] > center[1]) +
+            4*(w[j*ndim+2] > center[2]);
+        tree->tmp[offset[o]] = j;
+        offset[o]++;
+    }
+    memcpy(&(tree->idx[start]), &(tree->tmp[start]), count * sizeof(int));
+
+    for (o=0; o < 8; o++) {
+        if (cnt[o] == 0)
+            continue;
+
+        for (k=0; k < 3; k++) {
+            if (o & (1 << k))
+                sub[k] = center[k] + half / 2.;
+            else
+                sub[k] = center[k] - half / 2.;
+        }
+
+        child = build_node(tree, w, ndim, offset[o] - cnt[o], cnt[o],
+                           sub, half / 2., depth + 1);
+        if (child < 0)
+            return -1;
+        tree->nodes[n].child[o] = child;
+    }
+
+    return n;
+}
+
+int tree_build(NBodyTree *tree, double *w, int ndim) {
+    /* Build the tree for the massive particles at the positions in w, where
+       the position of particle i is w[i*ndim:i*ndim+3]. Returns 0 on success
+       and -1 if the tree could not be allocated.
+    */
+    int i, j, k;
+    double lo[3], hi[3], center[3], half = 0.;
+
+    tree->n_nodes = 0;
+    if (tree->n_massive == 0)
+        return 0;
+
+    j = 0;
+    for (i=0; i < tree->n_body; i++) {
+        if (tree->m[i] != 0.) {
+            tree->idx[j] = i;
+            j++;
+        }
+    }
+
+    // bounding cube of the massive particles
+    for (k=0; k < 3; k++) {
+        lo[k] = INFINITY;
+        hi[k] = -INFINITY;
+    }
+    for (j=0; j < tree->n_massive; j++) {
+        i = tree->idx[j];
+        for (k=0; k < 3; k++) {
+            lo[k] = fmin(lo[k], w[i*ndim + k]);
+            hi[k] = fmax(hi[k], w[i*ndim + k]);
+        }
+    }
+    for (k=0; k < 3; k++) {
+        center[k] = (lo[k] + hi[k]) / 2.;
+        half = fmax(half, (hi[k] - lo[k]) / 2.);
+    }
+    // make sure that particles on the boundary are inside of the cube
+    half = half * (1 + 1E-10) + 1E-300;
+
+    if (build_node(tree, w, ndim, 0, tree->n_massive, center, half, 0) < 0)
+        return -1;
+    return 0;
+}
+
+void tree_acceleration(NBodyTree *tree, double *w, int ndim, double *x,
+                       int self, double *acc) {
+    /* Compute the acceleration at the position x from all massive particles
+       except the particle with index self (use -1 to include all particles).
+    */
+    int stack[8*TREE_MAX_DEPTH + 8];
+    int sp = 0, n, i, j, k, o;
+    double dx[3], r2, s, inv;
+    TreeNode *node;
+
+    for (k=0; k < 3; k++)
+        acc[k] = 0.;
+
+    if (tree->n_nodes == 0)
+        return;
+
+    stack[sp++] = 0;
+    while (sp > 0) {
+        node = &(tree->nodes[stack[--sp]]);
+
+        if (node->leaf) {
+            for (i=node->start; i < node->start + node->count; i++) {
+                j = tree->idx[i];
+                if (j == self)
+                    continue;
+
+                r2 = tree->b2[j];
+                for (k=0; k < 3; k++) {
+                    dx[k] = w[j*ndim + k] - x[k];
+                    r2 += dx[k] * dx[k];
+                }
+                inv = tree->m[j] / (r2 * sqrt(r2));
+                for (k=0; k < 3; k++)
+                    acc[k] += inv * dx[k];
+            }
+            continue;
+        }
+
+        r2 = 0.;
+        for (k=0; k < 3; k++) {
+            dx[k] = node->com[k] - x[k];
+            r2 += dx[k] * dx[k];
+        }
+
+        s = 2 * node->half / tree->theta + node->delta;
+        if ((tree->theta > 0) && (r2 > s*s)) {
+            // far enough away: use the monopole of the cell
+            r2 += node->b2;
+            inv = node->m / (r2 * sqrt(r2));
+            for (k=0; k < 3; k++)
+                acc[k] += inv * dx[k];
+        } else {
+            for (o=0; o < 8; o++) {
+                n = node->child[o];
+                if (n >= 0)
+                    stack[sp++] = n;
+            }
+        }
+    }
+}
+
+void Fwrapper_tree_nbody(unsigned full_ndim, double t, double *w, double *f,
+                         CPotential *p, CFrame *fr,
+                         unsigned norbits, unsigned nbody,
+                         void *args) {
+    /* The same as Fwrapper_direct_nbody(), but the forces between the
+       particles are computed with the tree passed in as args.
+    */
+    NBodyTree *tree = (NBodyTree *)args;
+    int i, k;
+    unsigned ndim = full_ndim / norbits; // phase-space dimensionality
+    double acc[3];
+
+    for (i=0; i < norbits; i++) {
+        hamiltonian_gradient(p, fr, t, &w[i*ndim], &f[i*ndim]);
+    }
+
+    if (tree->failed)
+        return;
+
+    if (tree_build(tree, w, ndim) != 0) {
+        tree->failed = 1;
+        return;
+    }
+
+    #pragma omp parallel for schedule(dynamic, 64) private(acc, k) num_threads(tree->n_threads)
+    for (i=0; i < norbits; i++) {
+        tree_acceleration(tree, w, ndim, &w[i*ndim], i, acc);
+        for (k=0; k < 3; k++)
+            f[i*ndim + ndim/2 + k] += acc[k];
+    }
+}
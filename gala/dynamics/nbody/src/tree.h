@@ -0,0 +1,54 @@
+#include "potential/src/cpotential.h"
+#include "frame/src/cframe.h"
+
+#ifndef _NBODY_TREE_H
+#define _NBODY_TREE_H
+
+    /* maximum number of particles in a leaf node, and maximum depth of the
+       tree (deeper nodes are leaves regardless of the number of particles,
+       e.g. for particles at identical positions) */
+    #define TREE_LEAF_SIZE 8
+    #define TREE_MAX_DEPTH 48
+
+    typedef struct {
+        double center[3];   // center of the (cubic) cell
+        double half;        // half of the side length of the cell
+        double com[3];      // center of mass
+        double m;           // total G*mass
+        double b2;          // mass-weighted mean squared softening length
+        double delta;       // distance between the center of mass and center
+        int start;          // first particle of the cell in the index array
+        int count;          // number of particles in the cell
+        int leaf;
+        int child[8];       // indices of the child cells, or -1
+    } TreeNode;
+
+    typedef struct {
+        int n_body;         // number of particles (massive and test)
+        int n_massive;      // number of particles with nonzero mass
+        double *m;          // G*mass of each particle
+        double *b2;         // squared softening length of each particle
+        double theta;       // opening angle
+        int n_threads;
+
+        int n_nodes;
+        int capacity;
+        TreeNode *nodes;
+        int *idx;           // indices of the massive particles, sorted by cell
+        int *tmp;
+        int failed;         // set if the tree could not be allocated
+    } NBodyTree;
+
+    extern int tree_init(NBodyTree *tree, int n_body, double *m, double *b2,
+                         double theta, int n_threads);
+    extern void tree_free(NBodyTree *tree);
+    extern int tree_build(NBodyTree *tree, double *w, int ndim);
+    extern void tree_acceleration(NBodyTree *tree, double *w, int ndim,
+                                  double *x, int self, double *acc);
+
+    extern void Fwrapper_tree_nbody(unsigned full_ndim, double t, double *w,
+                                    double *f, CPotential *p, CFrame *fr,
+                                    unsigned norbits, unsigned nbody,
+                                    void *args);
+
+#endif
@@ -1,3 +1,6 @@
+# Standard library
+import threading
+
 # Third-party
 import astropy.units as u
 import numpy as np
@@ -6,12 +9,22 @@ import pytest
 # Custom
 from ....potential import (NullPotential, NFWPotential,
                            HernquistPotential, KuzminPotential,
-                           ConstantRotatingFrame, StaticFrame)
+                           KeplerPotential, PlummerPotential,
+                           LogarithmicPotential,
+                           ConstantRotatingFrame, StaticFrame,
+                           Hamiltonian, ChandrasekharDynamicalFriction,
+                           from_equation)
+from ....potential.potential.util import _has_c_compiler
 from ....dynamics import PhaseSpacePosition, combine
 from ....units import UnitSystem, galactic
 
 # Project
-from ..core import DirectNBody
+from ..core import DirectNBody, HermiteIntegrator
+from ..nbody import (tree_nbody_acceleration, pairwise_nbody_acceleration,
+                     direct_nbody_dop853, nbody_leapfrog, hermite_nbody,
+                     DirectForce, nbody_dop853)
+from ....integrate import LeapfrogIntegrator, RK5Integrator
+from ....integrate.timespec import parse_time_specification
 
 class TestDirectNBody:
 
@@ -63,11 +76,6 @@ class TestDirectNBody:
             DirectNBody(self.w0,
                         particle_potentials=self.particle_potentials[:1])
 
-        # MAX_NBODY1 = 65536+1
-        # w0_max = combine([self.w0[0]]*MAX_NBODY1)
-        # with pytest.raises(NotImplementedError):
-        #     DirectNBody(w0_max, particle_potentials=[None]*MAX_NBODY1)
-
         with pytest.raises(ValueError):
             DirectNBody(self.w0, particle_potentials=[None, None])
 
@@ -76,6 +84,25 @@ class TestDirectNBody:
             DirectNBody(self.w0, particle_potentials=self.particle_potentials,
                         external_potential=py_ext_pot)
 
+        with pytest.raises(ValueError):
+            DirectNBody(self.w0, particle_potentials=self.particle_potentials,
+                        method='fmm')
+
+        for theta in [-1, 1.2]:
+            with pytest.raises(ValueError):
+                DirectNBody(self.w0,
+                            particle_potentials=self.particle_potentials,
+                            method='tree', theta=theta)
+
+        # the tree and softening only support point masses and Plummer spheres
+        with pytest.raises(ValueError):
+            DirectNBody(self.w0, particle_potentials=self.particle_potentials,
+                        method='tree')
+
+        with pytest.raises(ValueError):
+            DirectNBody(self.w0, particle_potentials=self.particle_potentials,
+                        softening=0.1*u.pc)
+
     def test_directnbody_integrate(self):
         # TODO: this is really a unit test, but we should have some functional tests
         # that check that the orbit integration is making sense!
@@ -95,7 +122,9 @@ class TestDirectNBody:
 
         dx0 = orbits1[:, 0].xyz - orbits2[:, 0].xyz
         dx1 = orbits1[:, 1].xyz - orbits2[:, 1].xyz
-        assert u.allclose(np.abs(dx1), 0*u.pc, atol=1e-13*u.pc)
+        # the step sizes follow the orbit of particle 0 too, so the orbits of
+        # particle 1 only agree to round-off at ~10 kpc
+        assert u.allclose(np.abs(dx1), 0*u.pc, atol=1e-10*u.pc)
         assert np.abs(dx0).max() > 50*u.pc
 
         # Now compare with/without mass with external potential:
@@ -115,9 +144,21 @@ class TestDirectNBody:
 
         dx0 = orbits1[:, 0].xyz - orbits2[:, 0].xyz
         dx1 = orbits1[:, 1].xyz - orbits2[:, 1].xyz
-        assert u.allclose(np.abs(dx1), 0*u.pc, atol=1e-13*u.pc)
+        assert u.allclose(np.abs(dx1), 0*u.pc, atol=1e-10*u.pc)
         assert np.abs(dx0).max() > 50*u.pc
 
+    def test_directnbody_particle_potentials_unchanged(self):
+        # the force function must not modify the particle potentials
+        nbody = DirectNBody(self.w0,
+                            particle_potentials=self.particle_potentials,
+                            units=self.usys,
+                            external_potential=self.ext_pot)
+        pot = nbody.particle_potentials[1]
+        xyz = [1., 2., 3.] * u.pc
+        E0 = pot.energy(xyz)
+        nbody.integrate_orbit(dt=1*self.usys['time'], t1=0, t2=0.1*u.Myr)
+        assert u.allclose(pot.energy(xyz), E0, rtol=0)
+
     def test_directnbody_integrate_dontsaveall(self):
         # If we set save_all = False, only return the final positions:
         nbody1 = DirectNBody(self.w0,
@@ -139,6 +180,23 @@ class TestDirectNBody:
         assert u.allclose(w1.xyz, w2.xyz)
         assert u.allclose(w1.v_xyz, w2.v_xyz)
 
+    def test_directnbody_integrate_store_every(self):
+        nbody = DirectNBody(self.w0,
+                            particle_potentials=self.particle_potentials,
+                            units=self.usys,
+                            external_potential=self.ext_pot)
+
+        orbits = nbody.integrate_orbit(dt=1*self.usys['time'],
+                                       t1=0, t2=1*u.Myr)
+        thin = nbody.integrate_orbit(dt=1*self.usys['time'],
+                                     t1=0, t2=1*u.Myr, store_every=7)
+
+        idx = np.append(np.arange(0, orbits.ntimes, 7), orbits.ntimes-1)
+        assert thin.ntimes == len(idx)
+        assert u.allclose(thin.t, orbits.t[idx])
+        assert u.allclose(thin.xyz, orbits.xyz[:, idx])
+        assert u.allclose(thin.v_xyz, orbits.v_xyz[:, idx])
+
     def test_directnbody_integrate_rotframe(self):
         # Now compare with/without mass with external potential:
         frame = ConstantRotatingFrame(Omega=[0,0,1]*self.w0[0].v_y/self.w0[0].x,
@@ -162,3 +220,384 @@ class TestDirectNBody:
 
         assert u.allclose(orbits_static.xyz, orbits_static.xyz)
         assert u.allclose(orbits2.v_xyz, orbits2.v_xyz)
+
+
+def _direct_acceleration(x, m, b):
+    dx = x[None] - x[:, None]
+    r2 = (dx**2).sum(axis=-1) + b[None]**2
+    np.fill_diagonal(r2, np.inf)
+    return (m[None, :, None] * dx / r2[..., None]**1.5).sum(axis=1)
+
+
+@pytest.mark.parametrize('n', [10, 1000])
+@pytest.mark.parametrize('n_threads', [1, 4])
+def test_pairwise_acceleration(n, n_threads):
+    rng = np.random.default_rng(42)
+    x = rng.normal(0, 1., size=(n, 3))
+    m = rng.uniform(0.5, 1.5, size=n)
+    m[::5] = 0.  # test particles
+    b = rng.uniform(0, 0.01, size=n)
+    b[::3] = 0.  # point masses
+
+    acc = pairwise_nbody_acceleration(x, m, b, n_threads=n_threads)
+    assert np.allclose(acc, _direct_acceleration(x, m, b), rtol=1e-12, atol=0)
+
+
+@pytest.mark.parametrize('n', [10, 1000])
+def test_tree_acceleration(n):
+    rng = np.random.default_rng(42)
+    x = rng.normal(0, 1., size=(n, 3))
+    m = rng.uniform(0.5, 1.5, size=n)
+    m[::5] = 0.  # test particles
+    b = rng.uniform(0, 0.01, size=n)
+
+    acc = _direct_acceleration(x, m, b)
+    assert np.allclose(tree_nbody_acceleration(x, m, b, theta=0.), acc,
+                       rtol=1e-12, atol=0)
+
+    acc_tree = tree_nbody_acceleration(x, m, b, theta=0.5)
+    err = (np.linalg.norm(acc_tree - acc, axis=1) /
+           np.linalg.norm(acc, axis=1))
+    assert np.median(err) < 5e-3
+    assert np.max(err) < 5e-2
+
+    with pytest.raises(ValueError):
+        tree_nbody_acceleration(x, m, b, theta=1.5)
+
+
+class PlummerInNFWBase:
+    """
+    A mix of test particles and Kepler and Plummer particles in an external
+    NFW potential.
+    """
+
+    def setup(self):
+        rng = np.random.default_rng(42)
+        n = 64
+        self.w0 = PhaseSpacePosition(
+            pos=rng.normal(0, 1., size=(3, n)) * u.kpc,
+            vel=rng.normal(0, 10., size=(3, n)) * u.km/u.s)
+
+        self.particle_potentials = []
+        for i in range(n):
+            if i % 4 == 0:
+                pot = None
+            elif i % 4 == 1:
+                pot = KeplerPotential(m=1e8*u.Msun, units=galactic)
+            else:
+                pot = PlummerPotential(m=1e8*u.Msun, b=0.1*u.kpc,
+                                       units=galactic)
+            self.particle_potentials.append(pot)
+
+        self.ext_pot = NFWPotential(m=1e11, r_s=10, units=galactic)
+
+
+class TestTreeNBody(PlummerInNFWBase):
+
+    def test_pairwise_vs_direct(self):
+        # Kepler and Plummer particles use the pairwise kernel: compare to
+        # the generic force function for any particle potentials
+        nbody = DirectNBody(self.w0, self.particle_potentials,
+                            external_potential=self.ext_pot)
+        orbits = nbody.integrate_orbit(dt=0.5*u.Myr, t1=0, t2=10*u.Myr)
+
+        t = parse_time_specification(galactic, dt=0.5*u.Myr, t1=0,
+                                     t2=10*u.Myr)
+        ws = direct_nbody_dop853(nbody._c_w0, t, nbody.H,
+                                 nbody.particle_potentials)
+        xyz = np.rollaxis(np.array(ws[..., :3]), axis=2)
+        assert u.allclose(orbits.xyz, xyz * u.kpc, atol=1e-8*u.kpc)
+
+    def test_concurrent(self):
+        # several integrations can run at the same time in threads
+        kw = dict(dt=0.5*u.Myr, t1=0, t2=5*u.Myr)
+        nbodies = [DirectNBody(self.w0, self.particle_potentials,
+                               external_potential=self.ext_pot),
+                   DirectNBody(self.w0, self.particle_potentials,
+                               external_potential=self.ext_pot,
+                               method='tree')]
+        expected = [nbody.integrate_orbit(**kw) for nbody in nbodies]
+
+        results = {}
+
+        def worker(i):
+            results[i] = nbodies[i % 2].integrate_orbit(**kw)
+
+        threads = [threading.Thread(target=worker, args=(i, ))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for i in range(4):
+            assert u.allclose(results[i].xyz, expected[i % 2].xyz, rtol=0)
+
+    def test_tree_vs_direct(self):
+        kw = dict(dt=0.5*u.Myr, t1=0, t2=10*u.Myr)
+
+        direct = DirectNBody(self.w0, self.particle_potentials,
+                             external_potential=self.ext_pot)
+        orbits = direct.integrate_orbit(**kw)
+
+        tree = DirectNBody(self.w0, self.particle_potentials,
+                           external_potential=self.ext_pot,
+                           method='tree', theta=0.)
+        orbits_tree = tree.integrate_orbit(**kw)
+        assert u.allclose(orbits_tree.xyz, orbits.xyz, atol=1e-8*u.kpc)
+
+        tree = DirectNBody(self.w0, self.particle_potentials,
+                           external_potential=self.ext_pot,
+                           method='tree', theta=0.5)
+        orbits_tree = tree.integrate_orbit(**kw)
+        assert u.allclose(orbits_tree.xyz, orbits.xyz, atol=1e-2*u.kpc)
+
+    def test_tree_softening(self):
+        kw = dict(dt=0.5*u.Myr, t1=0, t2=10*u.Myr)
+
+        # the softening is added in quadrature to the scale radii
+        soft = 0.05 * u.kpc
+        pots = []
+        for p in self.particle_potentials:
+            if isinstance(p, KeplerPotential):
+                p = PlummerPotential(m=p.parameters['m'], b=soft,
+                                     units=galactic)
+            elif isinstance(p, PlummerPotential):
+                p = PlummerPotential(m=p.parameters['m'],
+                                     b=np.sqrt(p.parameters['b']**2 + soft**2),
+                                     units=galactic)
+            pots.append(p)
+        direct = DirectNBody(self.w0, pots, external_potential=self.ext_pot)
+        orbits = direct.integrate_orbit(**kw)
+
+        tree = DirectNBody(self.w0, self.particle_potentials,
+                           external_potential=self.ext_pot,
+                           method='tree', theta=0., softening=soft)
+        orbits_tree = tree.integrate_orbit(**kw)
+        assert u.allclose(orbits_tree.xyz, orbits.xyz, atol=1e-8*u.kpc)
+
+    def test_tree_save_all(self):
+        kw = dict(dt=0.5*u.Myr, t1=0, t2=5*u.Myr)
+        tree = DirectNBody(self.w0, self.particle_potentials,
+                           external_potential=self.ext_pot, method='tree')
+        orbits = tree.integrate_orbit(**kw)
+
+        tree = DirectNBody(self.w0, self.particle_potentials,
+                           external_potential=self.ext_pot, method='tree',
+                           save_all=False)
+        w = tree.integrate_orbit(**kw)
+        assert u.allclose(w.xyz, orbits[-1].xyz)
+
+
+def _nbody_energy(nbody, w):
+    """
+    The total energy per unit G of the particles with the Kepler and Plummer
+    potentials of ``nbody`` at phase-space positions ``w`` (norbits, 6).
+    """
+    m = nbody._particle_m
+    b = nbody._particle_b
+    q = np.ascontiguousarray(w[:, :3])
+
+    E = np.sum(m * (0.5 * np.sum(w[:, 3:]**2, axis=1) +
+                    nbody.external_potential._energy(q, t=np.array([0.]))))
+
+    r2 = np.sum((q[:, None] - q[None]) ** 2, axis=-1)
+    pairs = m[:, None] * m[None] / np.sqrt(r2 + b[None]**2)
+    np.fill_diagonal(pairs, 0.)
+    return E - 0.5 * np.sum(pairs)
+
+
+class TestNBodyIntegrators(PlummerInNFWBase):
+
+    def setup(self):
+        super().setup()
+
+        # the forces between Plummer spheres with different scale radii are
+        # not symmetric, so only use one scale radius to conserve energy
+        self.particle_potentials = [
+            None if p is None else PlummerPotential(m=1e8*u.Msun,
+                                                    b=0.1*u.kpc,
+                                                    units=galactic)
+            for p in self.particle_potentials]
+
+    def _energy_error(self, nbody, orbits):
+        w = np.vstack((orbits.xyz[:, -1].decompose(galactic).value,
+                       orbits.v_xyz[:, -1].decompose(galactic).value)).T
+        E0 = _nbody_energy(nbody, nbody._c_w0)
+        return abs(_nbody_energy(nbody, w) / E0 - 1)
+
+    def test_leapfrog(self):
+        nbody = DirectNBody(self.w0, self.particle_potentials,
+                            external_potential=self.ext_pot)
+        orbits = nbody.integrate_orbit(dt=0.5*u.Myr, t1=0, t2=10*u.Myr)
+
+        orbits_lf = nbody.integrate_orbit(dt=0.01*u.Myr, t1=0, t2=10*u.Myr,
+                                          Integrator=LeapfrogIntegrator)
+        assert u.allclose(orbits_lf[:1000:50].xyz, orbits.xyz, atol=1e-3*u.kpc)
+        assert self._energy_error(nbody, orbits_lf) < 1e-6
+
+        # the same with the forces from the generic force function
+        t = parse_time_specification(galactic, dt=0.01*u.Myr, t1=0,
+                                     t2=10*u.Myr)
+        ws = nbody_leapfrog(nbody._c_w0, t, nbody.H,
+                            DirectForce(nbody.particle_potentials))
+        xyz = np.rollaxis(np.array(ws[..., :3]), axis=2)
+        assert u.allclose(orbits_lf.xyz, xyz * u.kpc, atol=1e-8*u.kpc)
+
+        # and with the tree
+        tree = DirectNBody(self.w0, self.particle_potentials,
+                           external_potential=self.ext_pot,
+                           method='tree', theta=0.)
+        orbits_tree = tree.integrate_orbit(dt=0.01*u.Myr, t1=0, t2=10*u.Myr,
+                                           Integrator=LeapfrogIntegrator)
+        assert u.allclose(orbits_tree.xyz, orbits_lf.xyz, atol=1e-8*u.kpc)
+
+    def test_hermite(self):
+        nbody = DirectNBody(self.w0, self.particle_potentials,
+                            external_potential=self.ext_pot)
+        orbits = nbody.integrate_orbit(dt=0.5*u.Myr, t1=0, t2=10*u.Myr)
+
+        orbits_h = nbody.integrate_orbit(
+            dt=0.5*u.Myr, t1=0, t2=10*u.Myr, Integrator=HermiteIntegrator,
+            Integrator_kwargs=dict(eta=0.01))
+        assert u.allclose(orbits_h.xyz, orbits.xyz, atol=1e-5*u.kpc)
+        assert self._energy_error(nbody, orbits_h) < 1e-7
+
+        # the number of steps is set by eta
+        t = parse_time_specification(galactic, dt=0.5*u.Myr, t1=0,
+                                     t2=10*u.Myr)
+        steps = []
+        for eta in [0.01, 0.04]:
+            info = dict()
+            hermite_nbody(nbody._c_w0, t, nbody.H, nbody._particle_m,
+                          nbody._particle_b, eta=eta, info=info)
+            assert 0 < info['n_blocks'] <= info['n_steps']
+            steps.append(info['n_steps'])
+        assert steps[1] < steps[0]
+
+    def test_save_all(self):
+        kw = dict(dt=0.5*u.Myr, t1=0, t2=5*u.Myr)
+        for Integrator in [LeapfrogIntegrator, HermiteIntegrator]:
+            nbody = DirectNBody(self.w0, self.particle_potentials,
+                                external_potential=self.ext_pot)
+            orbits = nbody.integrate_orbit(Integrator=Integrator, **kw)
+
+            orbits_every = nbody.integrate_orbit(Integrator=Integrator,
+                                                 store_every=4, **kw)
+            assert orbits_every.shape == (4, orbits.shape[1])
+            assert u.allclose(orbits_every.xyz, orbits[[0, 4, 8, 9]].xyz)
+
+            nbody = DirectNBody(self.w0, self.particle_potentials,
+                                external_potential=self.ext_pot,
+                                save_all=False)
+            w = nbody.integrate_orbit(Integrator=Integrator, **kw)
+            assert u.allclose(w.xyz, orbits[-1].xyz)
+
+    def test_invalid(self):
+        kw = dict(dt=0.5*u.Myr, t1=0, t2=5*u.Myr)
+        nbody = DirectNBody(self.w0, self.particle_potentials,
+                            external_potential=self.ext_pot)
+        with pytest.raises(ValueError):
+            nbody.integrate_orbit(Integrator=RK5Integrator, **kw)
+
+        with pytest.raises(TypeError, match="DirectNBody"):
+            HermiteIntegrator(lambda t, w: w).run(nbody.w0, **kw)
+
+        frame = ConstantRotatingFrame(Omega=[0, 0, 1]*u.rad/u.Gyr,
+                                      units=galactic)
+        nbody = DirectNBody(self.w0, self.particle_potentials,
+                            external_potential=self.ext_pot, frame=frame)
+        for Integrator in [LeapfrogIntegrator, HermiteIntegrator]:
+            with pytest.raises(ValueError):
+                nbody.integrate_orbit(Integrator=Integrator, **kw)
+
+        nbody = DirectNBody(self.w0, self.particle_potentials,
+                            external_potential=self.ext_pot, method='tree')
+        with pytest.raises(ValueError):
+            nbody.integrate_orbit(Integrator=HermiteIntegrator, **kw)
+
+        pots = [HernquistPotential(m=1e8, c=0.1, units=galactic)
+                for p in self.particle_potentials]
+        nbody = DirectNBody(self.w0, pots, external_potential=self.ext_pot)
+        with pytest.raises(ValueError):
+            nbody.integrate_orbit(Integrator=HermiteIntegrator, **kw)
+
+    def test_extra_forces(self):
+        kw = dict(dt=0.5*u.Myr, t1=0, t2=10*u.Myr)
+        df = ChandrasekharDynamicalFriction(m=1e8*u.Msun, units=galactic)
+        extra_forces = [df if i == 1 else None
+                        for i in range(len(self.particle_potentials))]
+
+        nbody = DirectNBody(self.w0, self.particle_potentials,
+                            external_potential=self.ext_pot)
+        orbits = nbody.integrate_orbit(**kw)
+
+        nbody_df = DirectNBody(self.w0, self.particle_potentials,
+                               external_potential=self.ext_pot,
+                               extra_forces=extra_forces)
+        orbits_df = nbody_df.integrate_orbit(**kw)
+
+        # the particle with the extra force loses energy
+        assert not u.allclose(orbits_df[:, 1].xyz, orbits[:, 1].xyz,
+                              atol=1e-8*u.kpc)
+        E = self.ext_pot.energy(orbits[1, 1]) + orbits[1, 1].kinetic_energy()
+        E_df = (self.ext_pot.energy(orbits_df[1, 1]) +
+                orbits_df[1, 1].kinetic_energy())
+        assert E_df < E
+
+        # the same with the Leapfrog integrator
+        orbits_lf = nbody_df.integrate_orbit(
+            dt=0.01*u.Myr, t1=0, t2=10*u.Myr, Integrator=LeapfrogIntegrator)
+        assert u.allclose(orbits_lf[:1000:50].xyz, orbits_df.xyz,
+                          atol=1e-3*u.kpc)
+
+        # the extra forces of the Hamiltonian act on all particles
+        t = parse_time_specification(galactic, **kw)
+        H = Hamiltonian(self.ext_pot, extra_forces=df)
+        ws = nbody_dop853(nbody._c_w0, t, H,
+                          DirectForce(nbody.particle_potentials))
+        nbody_all = DirectNBody(self.w0, self.particle_potentials,
+                                external_potential=self.ext_pot,
+                                extra_forces=[df] * len(extra_forces))
+        orbits_all = nbody_all.integrate_orbit(**kw)
+        xyz = np.rollaxis(np.array(ws[..., :3]), axis=2)
+        assert u.allclose(orbits_all.xyz, xyz * u.kpc, atol=1e-8*u.kpc)
+
+        with pytest.raises(ValueError):
+            nbody_df.integrate_orbit(Integrator=HermiteIntegrator, **kw)
+
+        with pytest.raises(ValueError):
+            DirectNBody(self.w0, self.particle_potentials,
+                        external_potential=self.ext_pot,
+                        extra_forces=extra_forces[1:])
+
+        with pytest.raises(ValueError):
+            DirectNBody(self.w0, self.particle_potentials,
+                        external_potential=self.ext_pot,
+                        extra_forces=[self.ext_pot] * len(extra_forces))
+
+        # dynamical friction needs the density of the external potential
+        log = LogarithmicPotential(v_c=200*u.km/u.s, r_h=1*u.kpc, q1=1,
+                                   q2=1, q3=1, units=galactic)
+        with pytest.raises(ValueError, match="finite density"):
+            DirectNBody(self.w0, self.particle_potentials,
+                        external_potential=log, extra_forces=extra_forces)
+
+    @pytest.mark.skipif(not _has_c_compiler(),
+                        reason="A C compiler is required to compile "
+                               "potentials.")
+    def test_hermite_no_hessian(self):
+        # compiled potentials from equations only have a Hessian with
+        # hessian=True, otherwise it is NaN
+        pytest.importorskip('sympy')
+        Potential = from_equation("-G*m/sqrt(x**2+y**2+z**2+b**2)",
+                                  vars=["x", "y", "z"], pars=["G", "m", "b"],
+                                  compile=True)
+
+        pot = Potential(G=galactic.get_constant('G'), m=1e11, b=10.,
+                        units=galactic)
+        nbody = DirectNBody(self.w0, self.particle_potentials,
+                            external_potential=pot)
+        with pytest.raises(ValueError, match="finite Hessian"):
+            nbody.integrate_orbit(dt=0.5*u.Myr, t1=0, t2=5*u.Myr,
+                                  Integrator=HermiteIntegrator)
@@ -11,7 +11,8 @@ __all__ = ['fast_lyapunov_max', 'lyapunov_max', 'surface_of_section']
 
 def fast_lyapunov_max(w0, hamiltonian, dt, n_steps, d0=1e-5,
                       n_steps_per_pullback=10, noffset_orbits=2, t1=0.,
-                      atol=1E-10, rtol=1E-10, nmax=0, return_orbit=True):
+                      atol=1E-10, rtol=1E-10, nmax=0, return_orbit=True,
+                      store_every=1):
     """
     Compute the maximum Lyapunov exponent using a C-implemented estimator
     that uses the DOPRI853 integrator.
@@ -35,6 +36,9 @@ def fast_lyapunov_max(w0, hamiltonian, dt, n_steps, d0=1e-5,
         Time of initial conditions. Assumed to be t=0.
     return_orbit : bool (optional)
         Store the full orbit for the parent and all offset orbits.
+    store_every : int (optional)
+        If ``return_orbit=True``, only store the orbits at every
+        ``store_every``-th timestep (and at the final time).
 
     Returns
     -------
@@ -69,7 +73,7 @@ def fast_lyapunov_max(w0, hamiltonian, dt, n_steps, d0=1e-5,
         t,w,l = dop853_lyapunov_max(hamiltonian, _w0,
                                     dt, n_steps+1, t1,
                                     d0, n_steps_per_pullback, noffset_orbits,
-                                    atol, rtol, nmax)
+                                    atol, rtol, nmax, store_every)
         w = np.rollaxis(w, -1)
 
         try:
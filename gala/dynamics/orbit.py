@@ -99,6 +99,11 @@ class Orbit(PhaseSpacePosition):
             self.potential = potential
             self.frame = frame
 
+        # the index of the last stored time of each orbit, set by
+        # Hamiltonian.integrate_orbit() if the orbits are integrated with
+        # stopping conditions
+        self.end_index = None
+
     def __getitem__(self, slice_):
 
         if isinstance(slice_, np.ndarray) or isinstance(slice_, list):
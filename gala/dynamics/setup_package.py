@@ -44,7 +44,6 @@ def get_extensions():
     cfg['include_dirs'].append('gala/integrate/cyintegrators')
     cfg['include_dirs'].append(mac_incl_path)
     cfg['include_dirs'].append('gala/potential')
-    cfg['include_dirs'].append('gala/dynamics/nbody')
     cfg['sources'].append('gala/potential/potential/src/cpotential.c')
     cfg['sources'].append('gala/potential/hamiltonian/src/chamiltonian.c')
     cfg['sources'].append('gala/dynamics/mockstream/mockstream.pyx')
@@ -59,7 +58,12 @@ def get_extensions():
     cfg['include_dirs'].append('gala/potential')
     cfg['sources'].append('gala/potential/potential/src/cpotential.c')
     cfg['sources'].append('gala/potential/hamiltonian/src/chamiltonian.c')
+    cfg['include_dirs'].append('gala/dynamics/nbody')
     cfg['sources'].append('gala/integrate/cyintegrators/dopri/dop853.c')
+    cfg['sources'].append('gala/dynamics/nbody/src/tree.c')
+    cfg['sources'].append('gala/dynamics/nbody/src/pairwise.c')
+    cfg['sources'].append('gala/dynamics/nbody/src/hermite.c')
+    cfg['sources'].append('gala/potential/force/src/cforce.c')
     cfg['sources'].append('gala/dynamics/nbody/nbody.pyx')
     cfg['extra_compile_args'].append('--std=gnu99')
     exts.append(Extension('gala.dynamics.nbody.nbody', **cfg))
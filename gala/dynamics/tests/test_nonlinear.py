@@ -299,6 +299,27 @@ class TestLogarithmic(object):
             # plt.show()
             # plt.close('all')
 
+def test_fast_lyapunov_max_store_every():
+    potential = gp.LogarithmicPotential(v_c=np.sqrt(2), r_h=0.1,
+                                        q1=1., q2=0.9, q3=1.,
+                                        units=galactic)
+    hamiltonian = Hamiltonian(potential)
+    w0 = [0.49, 0., 0., 1.3156, 0.4788, 0.]
+    kw = dict(dt=0.004, n_steps=1000, d0=1e-5, noffset_orbits=2,
+              n_steps_per_pullback=10)
+
+    np.random.seed(42)
+    lyap, orbit = fast_lyapunov_max(w0, hamiltonian, **kw)
+    np.random.seed(42)
+    lyap_thin, orbit_thin = fast_lyapunov_max(w0, hamiltonian,
+                                              store_every=75, **kw)
+
+    idx = np.append(np.arange(0, orbit.ntimes, 75), orbit.ntimes-1)
+    assert np.all(lyap == lyap_thin)
+    assert orbit_thin.ntimes == len(idx)
+    assert np.all(orbit_thin.xyz == orbit.xyz[:, idx])
+
+
 @pytest.mark.skipif(True, reason="too slow")
 def test_surface_of_section(tmpdir):
     # TODO: needs overhaul
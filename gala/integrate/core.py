@@ -9,6 +9,38 @@ from ..units import UnitSystem, DimensionlessUnitSystem
 __all__ = ["Integrator"]
 
 
+def _validate_output_array(arr, shape):
+    """
+    Check that a (possibly memory-mapped) array provided to store the orbits
+    in has the expected shape and is writable.
+    """
+    if arr.shape != tuple(shape):
+        raise ValueError("Shape of memory-mapped array doesn't match "
+                         "expected shape of return array ({} vs {})"
+                         .format(arr.shape, tuple(shape)))
+
+    if not arr.flags.writeable:
+        raise TypeError("Memory-mapped array must be a writable mode, "
+                        " not '{}'".format(getattr(arr, 'mode', 'r')))
+
+    return arr
+
+
+def _prepare_output(out, nstore, norbits, ndim):
+    """
+    Return the array to store the orbits in and the strides (in elements)
+    between consecutive stored times, orbits, and phase-space components. By
+    default, a new array with shape ``(nstore, norbits, ndim)`` is created. An
+    ``out`` array (e.g., a `numpy.memmap`) is instead filled in the final
+    layout of the orbits, with shape ``(ndim, nstore, norbits)``.
+    """
+    if out is None:
+        return np.empty((nstore, norbits, ndim)), (norbits*ndim, ndim, 1)
+
+    _validate_output_array(out, (ndim, nstore, norbits))
+    return out, (norbits, 1, nstore*norbits)
+
+
 class Integrator(object):
 
     def __init__(self, func, func_args=(), func_units=None, progress=False):
@@ -63,16 +95,7 @@ class Integrator(object):
             ws = np.zeros(return_shape, dtype=float)
 
         else:
-            if mmap.shape != return_shape:
-                raise ValueError("Shape of memory-mapped array doesn't match "
-                                 "expected shape of return array ({} vs {})"
-                                 .format(mmap.shape, return_shape))
-
-            if not mmap.flags.writeable:
-                raise TypeError("Memory-mapped array must be a writable mode, "
-                                " not '{}'".format(mmap.mode))
-
-            ws = mmap
+            ws = _validate_output_array(mmap, return_shape)
 
         return w0, arr_w0, ws
 
@@ -1,2 +1,4 @@
 from .dop853 import dop853_integrate_hamiltonian
-from .leapfrog import leapfrog_integrate_hamiltonian
+from .leapfrog import (leapfrog_integrate_hamiltonian,
+                       composition_integrate_hamiltonian)
+from .rk import rk_integrate_hamiltonian
@@ -1,5 +1,7 @@
 # cython: language_level=3
 
+from .events cimport EventBuffer, EventRecorder, StopSpec
+
 cdef extern from "frame/src/cframe.h":
     ctypedef struct CFrame:
         pass
@@ -13,6 +15,38 @@ cdef extern from "dopri/dop853.h":
                               CPotential *p, CFrame *fr, unsigned norbits,
                               unsigned nbody, void *args) nogil
 
+ctypedef struct DenseOutput:
+    double *t          # requested output times
+    int ntimes
+    int next           # index of the next output time to fill
+    int row            # row of the output buffer to fill next
+    int store_every    # only store every store_every-th time (and the last)
+    double direction   # sign of the direction of integration
+    double *out        # output buffer (NULL to not store the solution)
+    Py_ssize_t stride  # number of elements between consecutive output times
+    Py_ssize_t ostride # number of elements between consecutive orbits
+    Py_ssize_t kstride # number of elements between phase-space components
+    int ndim           # number of phase-space components per orbit
+    int check_signals  # check for interrupts (requires the GIL)
+    EventBuffer *events # buffer to record events in (or NULL)
+    StopSpec *stop     # conditions for stopping orbits (or NULL)
+    int *active        # indices of the orbits that are integrated (or NULL)
+    int n_stopped      # number of orbits stopped in the current step
+    long n_steps       # number of steps taken
+    double t_now       # time at the end of the current step
+    double h_now       # size of the current step
+
+cdef int dop853_step_nogil(CPotential *cp, CFrame *cf, FcnEqDiff F,
+                           double *w, double t1, double t2, double dt0,
+                           int ndim, int norbits, int nbody, void *args,
+                           double atol, double rtol, int nmax) nogil
+
+cdef int dop853_dense_nogil(CPotential *cp, CFrame *cf, FcnEqDiff F,
+                            double *w, double *t, int ntimes, double dt0,
+                            int ndim, int norbits, int nbody, void *args,
+                            double atol, double rtol, int nmax,
+                            DenseOutput *dense) nogil
+
 cdef void dop853_step(CPotential *cp, CFrame *cf, FcnEqDiff F,
                       double *w, double t1, double t2, double dt0,
                       int ndim, int norbits, int nbody, void *args,
@@ -26,7 +60,22 @@ cdef dop853_helper(CPotential *cp, CFrame *cf, FcnEqDiff F,
 cdef dop853_helper_save_all(CPotential *cp, CFrame *cf, FcnEqDiff F,
                             double[:,::1] w0, double[::1] t,
                             int ndim, int norbits, int nbody, void *args,
-                            int ntimes, double atol, double rtol, int nmax)
+                            int ntimes, double atol, double rtol, int nmax,
+                            int store_every=*, out=*, dict state=*,
+                            EventRecorder events=*, double[::1] stop=*,
+                            int[::1] end=*)
+
+cdef dop853_helper_per_orbit(CPotential *cp, CFrame *cf, FcnEqDiff F,
+                             double[:,::1] w0, double[::1] t,
+                             int ndim, int norbits, void *args, int ntimes,
+                             double atol, double rtol, int nmax,
+                             int save_all, int n_threads,
+                             int store_every=*, out=*, dict state=*,
+                             EventRecorder events=*, double[::1] stop=*,
+                             int[::1] end=*)
 
 # cpdef dop853_integrate_hamiltonian(hamiltonian, double[:,::1] w0, double[::1] t,
-#                                    double atol=?, double rtol=?, int nmax=?)
+#                                    double atol=?, double rtol=?, int nmax=?,
+#                                    independent_steps=?, n_threads=?,
+#                                    store_every=?, out=?, state=?,
+#                                    events=?, stop=?, end=?)
@@ -12,9 +12,17 @@ import numpy as np
 cimport numpy as np
 np.import_array()
 
-from cpython.exc cimport PyErr_CheckSignals
+from cython.parallel cimport prange
+from libc.stdlib cimport malloc, free
 from ...potential.potential.cpotential cimport CPotentialWrapper
 from ...potential.frame.cframe cimport CFrameWrapper
+from ...potential.force.cforce cimport (CForce, CForceList, ForceArgs,
+                                        Fwrapper_forces)
+from ...potential.potential.cpotential import _validate_n_threads
+from ..timespec import _store_indices
+from ..core import _prepare_output
+from .events cimport (EventBuffer, EventRecorder, events_start, events_step,
+                      StopSpec, stop_check, stop_init)
 
 cdef extern from "frame/src/cframe.h":
     ctypedef struct CFrame:
@@ -31,7 +39,7 @@ cdef extern from "dopri/dop853.h":
                               CPotential *p, CFrame *fr, unsigned norbits,
                               unsigned nbody, void *args) nogil
     ctypedef void (*SolTrait)(long nr, double xold, double x, double* y,
-                              unsigned n, int* irtrn)
+                              unsigned n, int* irtrn, void *solout_args) nogil
 
     # See dop853.h for full description of all input parameters
     int dop853 (unsigned n, FcnEqDiff fn,
@@ -39,9 +47,14 @@ cdef extern from "dopri/dop853.h":
                 void *args,
                 double x, double* y, double xend,
                 double* rtoler, double* atoler, int itoler, SolTrait solout,
+                void *solout_args,
                 int iout, FILE* fileout, double uround, double safe, double fac1,
                 double fac2, double beta, double hmax, double h, long nmax, int meth,
-                long nstiff, unsigned nrdens, unsigned* icont, unsigned licont)
+                long nstiff, unsigned nrdens, unsigned* icont, unsigned licont) nogil
+
+    double contd8 (unsigned ii, double x) nogil
+    double hRead () nogil
+    long nfcnRead () nogil
 
     void Fwrapper (unsigned ndim, double t, double *w, double *f,
                    CPotential *p, CFrame *fr, unsigned norbits)
@@ -50,22 +63,222 @@ cdef extern from "stdio.h":
     ctypedef struct FILE
     FILE *stdout
 
-cdef void solout(long nr, double xold, double x, double* y, unsigned n, int* irtrn):
-    # TODO: see here for example in FORTRAN: http://www.unige.ch/~hairer/prog/nonstiff/dr_dop853.f
-    pass
+cdef extern from "Python.h":
+    # no exception handling here: a pending exception is re-raised once the
+    # integrator returns (see _raise_pending())
+    int _check_signals "PyErr_CheckSignals" ()
+
+cdef int _default_nmax = 100000
+
+cdef inline void _advance(DenseOutput *d) nogil:
+    # move on to the next stored time: every store_every-th time, and the
+    # final time
+    d.row += 1
+    if d.next == d.ntimes - 1:
+        d.next = d.ntimes
+    else:
+        d.next = min(d.next + d.store_every, d.ntimes - 1)
+
+cdef inline void _store(DenseOutput *d, double *out, unsigned i,
+                        double val) nogil:
+    # store component i of the state vector, i.e. phase-space component
+    # i % ndim of orbit i / ndim (or of orbit active[i / ndim])
+    cdef int orbit = i / d.ndim
+    if d.active != NULL:
+        orbit = d.active[orbit]
+    out[orbit * d.ostride + (i % d.ndim) * d.kstride] = val
+
+cdef void _check_stop(DenseOutput *d, int nr, double x, double *y,
+                      unsigned n, int *irtrn) nogil:
+    # flag the orbits that meet a stopping condition at the end of the step by
+    # negating their index in d.active, and interrupt the integration
+    cdef:
+        unsigned a
 
-cdef void dop853_step(CPotential *cp, CFrame *cf, FcnEqDiff F,
-                      double *w, double t1, double t2, double dt0,
-                      int ndim, int norbits, int nbody, void *args,
-                      double atol, double rtol, int nmax) except *:
+    if nr > 1:
+        d.n_steps += 1
 
-    cdef int res
+    for a in range(n / d.ndim):
+        if stop_check(d.stop, d.ndim / 2, x, &y[a*d.ndim], d.n_steps):
+            d.stop.end[d.active[a]] = d.row - 1
+            d.active[a] = -1 - d.active[a]
+            d.n_stopped += 1
+
+    if d.n_stopped > 0:
+        irtrn[0] = -1
+
+cdef int _drop_stopped(DenseOutput *d, double *w, int norbits) nogil:
+    # remove the stopped orbits from the state vector and from d.active, and
+    # return the number of remaining orbits
+    cdef:
+        int a, k, n = 0
+
+    for a in range(norbits):
+        if d.active[a] >= 0:
+            if n != a:
+                d.active[n] = d.active[a]
+                for k in range(d.ndim):
+                    w[n*d.ndim + k] = w[a*d.ndim + k]
+            n += 1
+
+    d.n_stopped = 0
+    return n
+
+cdef void _dense_state(void *args, int i, double t, double *w) nogil:
+    # the phase-space position of orbit i from the dense output interpolant
+    cdef:
+        DenseOutput *d = <DenseOutput*>args
+        int k
+
+    for k in range(d.ndim):
+        w[k] = contd8(i*d.ndim + k, t)
 
-    res = dop853(ndim*norbits, F,
-                 cp, cf, norbits, nbody, args, t1, w, t2,
-                 &rtol, &atol, 0, solout, 0,
-                 NULL, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, dt0, nmax, 0, 1, 0, NULL, 0);
+cdef void solout(long nr, double xold, double x, double* y, unsigned n,
+                 int* irtrn, void *solout_args) nogil:
+    """
+    Called by ``dop853()`` after every accepted step: fills all requested
+    output times in the interval ``(xold, x]`` using the dense output
+    interpolant of the step (if there is an output buffer), and checks for
+    events over the step.
+    """
+    cdef:
+        DenseOutput *d = <DenseOutput*>solout_args
+        double *out
+        unsigned i
+        int filled = 0
+
+    d.t_now = x
+    if nr > 1:
+        d.h_now = x - xold
+
+    if d.events != NULL and nr > 1:
+        for i in range(d.events.norbits):
+            events_step(d.events, i, xold, x, &y[i*d.ndim], _dense_state, d)
+
+    while d.next < d.ntimes and (d.t[d.next] - x) * d.direction <= 0:
+        if d.out != NULL:
+            out = &d.out[d.row * d.stride]
+            if d.t[d.next] == x:
+                for i in range(n):
+                    _store(d, out, i, y[i])
+            else:
+                for i in range(n):
+                    _store(d, out, i, contd8(i, d.t[d.next]))
+        _advance(d)
+        filled = 1
+
+    if d.stop != NULL:
+        _check_stop(d, nr, x, y, n, irtrn)
+
+    if filled and d.check_signals and irtrn[0] >= 0:
+        with gil:
+            if _check_signals() != 0:
+                irtrn[0] = -1
+
+cdef int _raise_pending() except -1:
+    # returning -1 propagates the exception that is already set
+    return -1
+
+cdef int dop853_step_nogil(CPotential *cp, CFrame *cf, FcnEqDiff F,
+                           double *w, double t1, double t2, double dt0,
+                           int ndim, int norbits, int nbody, void *args,
+                           double atol, double rtol, int nmax) nogil:
+    """
+    Integrate from ``t1`` to ``t2`` without the GIL, and return the status
+    code from ``dop853()`` (negative values indicate a failure).
+    """
+    return dop853(ndim*norbits, F,
+                  cp, cf, norbits, nbody, args, t1, w, t2,
+                  &rtol, &atol, 0, solout, NULL, 0,
+                  NULL, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, dt0, nmax, 0, 1, 0, NULL, 0)
 
+cdef int dop853_dense_nogil(CPotential *cp, CFrame *cf, FcnEqDiff F,
+                            double *w, double *t, int ntimes, double dt0,
+                            int ndim, int norbits, int nbody, void *args,
+                            double atol, double rtol, int nmax,
+                            DenseOutput *dense) nogil:
+    """
+    Integrate continuously from ``t[0]`` to ``t[ntimes-1]`` with a single call
+    to ``dop853()``, so the step size control and workspace persist over the
+    whole integration. The step size is set by ``atol`` and ``rtol`` only, not
+    by the spacing of the times in ``t``, so the cost does not grow with the
+    number of output times. If ``dense`` is not NULL, ``solout()`` is called
+    after every step, and if ``dense.out`` is not NULL the solution at every
+    ``dense.store_every``-th time in ``t`` (and at the final time) is filled
+    in with the dense output interpolant, and events are recorded in
+    ``dense.events`` if it is not NULL. ``nmax`` is the maximum
+    number of steps per output interval (0 means 100000). Returns the status
+    code from ``dop853()``.
+
+    If ``dense.stop`` is not NULL, ``dense.active`` must hold the indices of
+    the ``norbits`` orbits. Orbits that meet a stopping condition at the end
+    of a step are then removed from the state vector ``w``, and the
+    integration of the remaining orbits is restarted from the end of the step.
+    """
+    cdef:
+        int res, iout = 0
+        unsigned i
+        long nmax_total
+        double t0 = t[0]
+
+    if nmax <= 0:
+        nmax = _default_nmax
+    nmax_total = <long>nmax * (ntimes - 1)
+
+    if dense != NULL:
+        iout = 1
+        if dense.out != NULL or dense.events != NULL:
+            iout = 2
+        dense.t = t
+        dense.ntimes = ntimes
+        dense.next = 0
+        dense.row = 0
+        dense.ndim = ndim
+        if dense.store_every < 1:
+            dense.store_every = 1
+        if t[ntimes-1] >= t[0]:
+            dense.direction = 1.
+        else:
+            dense.direction = -1.
+
+        if dense.events != NULL:
+            for i in range(norbits):
+                events_start(dense.events, i, &w[i*ndim])
+
+        dense.n_stopped = 0
+        dense.n_steps = 0
+        dense.h_now = 0.
+
+    while True:
+        res = dop853(ndim*norbits, F,
+                     cp, cf, norbits, nbody, args, t0, w, t[ntimes-1],
+                     &rtol, &atol, 0, solout, dense, iout,
+                     NULL, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, dt0, nmax_total, 0, 1,
+                     ndim*norbits if iout == 2 else 0, NULL, 0)
+
+        if res != 2 or dense == NULL or dense.n_stopped == 0:
+            break
+
+        # drop the stopped orbits and restart from the end of the step
+        norbits = _drop_stopped(dense, w, norbits)
+        if norbits == 0:
+            res = 1
+            break
+
+        t0 = dense.t_now
+        if dense.h_now != 0:
+            dt0 = dense.h_now
+
+    # the last step can end within round-off of the final time
+    if res == 1 and dense != NULL and dense.out != NULL:
+        while dense.next < ntimes:
+            for i in range(ndim*norbits):
+                _store(dense, &dense.out[dense.row * dense.stride], i, w[i])
+            _advance(dense)
+
+    return res
+
+cdef int _check_dop853_status(int res) except -1:
     if res == -1:
         raise RuntimeError("Input is not consistent.")
     elif res == -2:
@@ -74,6 +287,18 @@ cdef void dop853_step(CPotential *cp, CFrame *cf, FcnEqDiff F,
         raise RuntimeError("Step size becomes too small.")
     elif res == -4:
         raise RuntimeError("The problem is probably stiff (interrupted).")
+    return 0
+
+cdef void dop853_step(CPotential *cp, CFrame *cf, FcnEqDiff F,
+                      double *w, double t1, double t2, double dt0,
+                      int ndim, int norbits, int nbody, void *args,
+                      double atol, double rtol, int nmax) except *:
+
+    cdef int res
+
+    res = dop853_step_nogil(cp, cf, F, w, t1, t2, dt0,
+                            ndim, norbits, nbody, args, atol, rtol, nmax)
+    _check_dop853_status(res)
 
 cdef dop853_helper(CPotential *cp, CFrame *cf, FcnEqDiff F,
                    double[:,::1] w0, double[::1] t,
@@ -81,63 +306,259 @@ cdef dop853_helper(CPotential *cp, CFrame *cf, FcnEqDiff F,
                    double atol, double rtol, int nmax):
 
     cdef:
-        int i, j
+        int i, j, res
         double dt0 = t[1] - t[0]
 
         double[::1] w = np.empty(ndim*norbits)
+        DenseOutput dense
 
     # store initial conditions
     for i in range(norbits):
         for j in range(ndim):
             w[i*ndim + j] = w0[i, j]
 
-    for j in range(1, ntimes, 1):
-        dop853_step(cp, cf, F,
-                    &w[0], t[j-1], t[j], dt0,
-                    ndim, norbits, nbody, args,
-                    atol, rtol, nmax)
-
-        PyErr_CheckSignals()
+    # no output buffer: only check for interrupts at the output times
+    dense.out = NULL
+    dense.stride = 0
+    dense.store_every = 1
+    dense.check_signals = 1
+    dense.events = NULL
+    dense.stop = NULL
+
+    with nogil:
+        res = dop853_dense_nogil(cp, cf, F, &w[0], &t[0], ntimes, dt0,
+                                 ndim, norbits, nbody, args,
+                                 atol, rtol, nmax, &dense)
+    if res == 2: # interrupted
+        _raise_pending()
+    _check_dop853_status(res)
 
     return w
 
 cdef dop853_helper_save_all(CPotential *cp, CFrame *cf, FcnEqDiff F,
                             double[:,::1] w0, double[::1] t,
                             int ndim, int norbits, int nbody, void *args,
-                            int ntimes, double atol, double rtol, int nmax):
+                            int ntimes, double atol, double rtol, int nmax,
+                            int store_every=1, out=None, dict state=None,
+                            EventRecorder events=None, double[::1] stop=None,
+                            int[::1] end=None):
+    """
+    Integrate and store the orbits at every ``store_every``-th time in ``t``
+    and at the final time. Only the stored times are allocated. If ``out`` is
+    provided, the orbits are stored directly in it with shape
+    ``(ndim, ntimes, norbits)`` rather than in a new array with shape
+    ``(ntimes, norbits, ndim)``. If ``events`` is provided, the events of the
+    orbits are recorded in it.
+
+    If the stopping conditions ``stop`` (see ``stop_init()``) are provided,
+    orbits that meet them are no longer integrated, and the index of the last
+    stored time of each stopped orbit is stored in ``end``.
+
+    If a ``state`` dictionary is passed, the predicted step size at the end
+    of the integration is stored in it, and is used as the initial step size
+    when the same dictionary is passed to a subsequent call.
+    """
+    all_w_arr, strides = _prepare_output(
+        out, len(_store_indices(ntimes, store_every)), norbits, ndim)
 
     cdef:
-        int i, j, k
+        int i, k, res
         double dt0 = t[1] - t[0]
 
         double[::1] w = np.empty(ndim*norbits)
-        double[:,:,::1] all_w = np.empty((ntimes, norbits, ndim))
+        double[:,:,::1] all_w = all_w_arr
+        DenseOutput dense
+        StopSpec stop_spec
+        int[::1] active
 
     # store initial conditions
     for i in range(norbits):
         for k in range(ndim):
             w[i*ndim + k] = w0[i, k]
-            all_w[0, i, k] = w0[i, k]
 
-    for j in range(1, ntimes, 1):
-        dop853_step(cp, cf, F,
-                    &w[0], t[j-1], t[j], dt0, ndim, norbits, nbody, args,
-                    atol, rtol, nmax)
+    if state is not None and 'h' in state:
+        dt0 = state['h'][0]
+
+    dense.out = &all_w[0, 0, 0]
+    dense.stride = strides[0]
+    dense.ostride = strides[1]
+    dense.kstride = strides[2]
+    dense.store_every = store_every
+    dense.check_signals = 1
+    dense.events = NULL
+    dense.stop = NULL
+    dense.active = NULL
+
+    if events is not None:
+        events.allocate(norbits, norbits, ndim // 2)
+        dense.events = &events.buffers[0]
+
+    if stop is not None:
+        if events is not None:
+            raise ValueError("Stopping conditions and events can not be used "
+                             "together.")
+        active = np.arange(norbits, dtype=np.intc)
+        stop_init(&stop_spec, &stop[0], cp, cf, &end[0])
+        dense.stop = &stop_spec
+        dense.active = &active[0]
+
+    with nogil:
+        res = dop853_dense_nogil(cp, cf, F, &w[0], &t[0], ntimes, dt0,
+                                 ndim, norbits, nbody, args,
+                                 atol, rtol, nmax, &dense)
+    if res == 2: # interrupted
+        _raise_pending()
+    _check_dop853_status(res)
+
+    if state is not None:
+        state['h'] = np.array([hRead()])
+
+    return all_w_arr
+
+cdef dop853_helper_per_orbit(CPotential *cp, CFrame *cf, FcnEqDiff F,
+                             double[:,::1] w0, double[::1] t,
+                             int ndim, int norbits, void *args, int ntimes,
+                             double atol, double rtol, int nmax,
+                             int save_all, int n_threads,
+                             int store_every=1, out=None, dict state=None,
+                             EventRecorder events=None, double[::1] stop=None,
+                             int[::1] end=None):
+    """
+    Integrate each of the ``norbits`` test-particle orbits as an independent
+    ODE system, so that every orbit has its own adaptive step size and error
+    estimate. The force function ``F`` is called with the arguments ``args``
+    for each orbit on its own, so they can not depend on the orbit. The orbits
+    are distributed over ``n_threads`` OpenMP threads, and the result for each
+    orbit is identical to integrating it on its own. If
+    ``save_all``, the orbits are stored at every ``store_every``-th time and at
+    the final time, in ``out`` if provided. The step size of each orbit is
+    kept in ``state`` (see ``dop853_helper_save_all()``), the events of each
+    orbit are recorded in ``events`` if provided, and each orbit is stopped
+    when it meets the stopping conditions ``stop`` if provided.
+    """
 
-        for k in range(ndim):
-            for i in range(norbits):
-                all_w[j,i,k] = w[i*ndim + k]
+    cdef:
+        int i
+        double dt0 = t[1] - t[0]
+
+        double[:,::1] w = np.array(w0, copy=True)
+        double[:,:,::1] all_w
+        DenseOutput *dense = NULL
+        int[::1] status = np.zeros(norbits, dtype=np.intc)
+
+        # initial (and final predicted) step size of each orbit
+        double[::1] h = np.full(norbits, dt0)
+
+        StopSpec stop_spec
+        int[::1] active = np.arange(norbits, dtype=np.intc)
+
+    if state is not None and 'h' in state:
+        if len(state['h']) != norbits:
+            raise ValueError("The integrator state is for a different number "
+                             "of orbits.")
+        np.asarray(h)[:] = state['h']
+
+    if save_all:
+        all_w_arr, strides = _prepare_output(
+            out, len(_store_indices(ntimes, store_every)), norbits, ndim)
+        all_w = all_w_arr
+        dense = <DenseOutput*>malloc(norbits * sizeof(DenseOutput))
+        if dense == NULL:
+            raise MemoryError("Failed to allocate dense output buffers.")
+
+        if events is not None:
+            events.allocate(norbits, 1, ndim // 2)
+
+        if stop is not None:
+            if events is not None:
+                raise ValueError("Stopping conditions and events can not be "
+                                 "used together.")
+            stop_init(&stop_spec, &stop[0], cp, cf, &end[0])
+
+        for i in range(norbits):
+            dense[i].out = &all_w[0, 0, 0] + i * <Py_ssize_t>strides[1]
+            dense[i].stride = strides[0]
+            dense[i].ostride = strides[1]
+            dense[i].kstride = strides[2]
+            dense[i].store_every = store_every
+            dense[i].check_signals = 0
+            dense[i].events = NULL
+            if events is not None:
+                dense[i].events = &events.buffers[i]
+
+            dense[i].stop = NULL
+            dense[i].active = NULL
+            if stop is not None:
+                # the stopping conditions need the index of the orbit
+                dense[i].stop = &stop_spec
+                dense[i].active = &active[i]
+                dense[i].out = &all_w[0, 0, 0]
+
+    try:
+        for i in prange(norbits, nogil=True, schedule='dynamic',
+                        num_threads=n_threads):
+            if save_all:
+                status[i] = dop853_dense_nogil(cp, cf, F, &w[i, 0], &t[0],
+                                               ntimes, h[i], ndim, 1, 0, args,
+                                               atol, rtol, nmax, &dense[i])
+            else:
+                status[i] = dop853_dense_nogil(cp, cf, F, &w[i, 0], &t[0],
+                                               ntimes, h[i], ndim, 1, 0, args,
+                                               atol, rtol, nmax, NULL)
+            h[i] = hRead()
+    finally:
+        free(dense)
+
+    for i in range(norbits):
+        _check_dop853_status(status[i])
 
-        PyErr_CheckSignals()
+    if state is not None:
+        state['h'] = np.asarray(h)
 
-    return np.asarray(all_w)
+    if save_all:
+        return all_w_arr
+    else:
+        return np.asarray(w)
 
 cpdef dop853_integrate_hamiltonian(hamiltonian, double[:,::1] w0, double[::1] t,
-                                   double atol=1E-10, double rtol=1E-10, int nmax=0):
+                                   double atol=1E-12, double rtol=1E-12, int nmax=0,
+                                   independent_steps=False, n_threads=None,
+                                   int store_every=1, out=None, dict state=None,
+                                   EventRecorder events=None, stop=None):
     """
     CAUTION: Interpretation of axes is different here! We need the
     arrays to be C ordered and easy to iterate over, so here the
     axes are (norbits, ndim).
+
+    By default, all orbits are integrated together as a single ODE system
+    with a shared step size. If ``independent_steps=True``, each orbit is
+    instead integrated with its own adaptive step size and error estimate,
+    in parallel over ``n_threads`` threads (default: ``gala.conf.n_threads``).
+
+    Only every ``store_every``-th time in ``t`` (and the final time) is stored
+    and returned. The orbits are returned in an array with shape
+    ``(ntimes, norbits, ndim)``, unless an ``out`` array with shape
+    ``(ndim, ntimes, norbits)`` (e.g., a `numpy.memmap`) is passed, which is
+    filled directly and returned instead.
+
+    To integrate in several consecutive calls, pass the same (initially empty)
+    ``state`` dictionary to each call: the step size at the end of one call is
+    kept in ``state`` and used to start the next one.
+
+    If an ``EventRecorder`` is passed as ``events``, the zero crossings of its
+    event functions are found after every step, refined with the dense output
+    interpolant, and recorded in it.
+
+    If stopping conditions ``stop`` are passed as an array
+    ``(r_min, r_max, E_max, max_steps)`` (where an infinite ``E_max`` or a
+    ``max_steps`` of zero disable the respective condition), orbits are
+    checked after every step and no longer integrated once they meet any of
+    the conditions. The phase-space positions of a stopped orbit are then not
+    stored after it stopped, and a third array with the index of the last
+    stored time of each orbit is returned.
+
+    The extra forces of the Hamiltonian are added to the gravitational forces
+    in C, with ``Fwrapper_forces()``.
     """
 
     if not hamiltonian.c_enabled:
@@ -147,7 +568,13 @@ cpdef dop853_integrate_hamiltonian(hamiltonian, double[:,::1] w0, double[::1] t,
         int i, j, k
         unsigned norbits = w0.shape[0]
         unsigned ndim = w0.shape[1]
-        void *args
+        void *args = NULL
+        FcnEqDiff F = <FcnEqDiff> Fwrapper
+
+        # extra forces, which are the same for all orbits
+        CForceList forces
+        CForce *force_ptr
+        ForceArgs force_args
 
         # define full array of times
         int ntimes = len(t)
@@ -156,10 +583,48 @@ cpdef dop853_integrate_hamiltonian(hamiltonian, double[:,::1] w0, double[::1] t,
         CPotential cp = (<CPotentialWrapper>(hamiltonian.potential.c_instance)).cpotential
         CFrame cf = (<CFrameWrapper>(hamiltonian.frame.c_instance)).cframe
 
-    # 0 below is for nbody - we ignore that in this test particle integration
-    all_w = dop853_helper_save_all(&cp, &cf, <FcnEqDiff> Fwrapper,
-                                   w0, t,
-                                   ndim, norbits, 0, args, ntimes,
-                                   atol, rtol, nmax)
-
-    return np.asarray(t), np.asarray(all_w)
+    t_store = np.asarray(t)[_store_indices(ntimes, store_every)]
+
+    if hamiltonian.extra_forces:
+        forces = CForceList(list(hamiltonian.extra_forces))
+        force_ptr = &forces.cforce
+        force_args.F = <FcnEqDiff> Fwrapper
+        force_args.args = NULL
+        force_args.forces = &force_ptr
+        force_args.n_forces = 1
+        force_args.shared = 1
+        F = <FcnEqDiff> Fwrapper_forces
+        args = <void *> &force_args
+
+    end = None
+    if stop is not None:
+        stop = np.ascontiguousarray(stop, dtype=np.float64)
+        end = np.full(norbits, len(t_store) - 1, dtype=np.intc)
+
+    if independent_steps:
+        all_w = dop853_helper_per_orbit(&cp, &cf, F,
+                                        w0, t, ndim, norbits, args, ntimes,
+                                        atol, rtol, nmax, 1,
+                                        _validate_n_threads(n_threads),
+                                        store_every, out, state, events,
+                                        stop, end)
+
+    else:
+        # 0 below is for nbody - we ignore that in this test particle integration
+        all_w = dop853_helper_save_all(&cp, &cf, F,
+                                       w0, t,
+                                       ndim, norbits, 0, args, ntimes,
+                                       atol, rtol, nmax, store_every, out, state,
+                                       events, stop, end)
+
+    if stop is not None:
+        return t_store, all_w, np.asarray(end)
+    return t_store, all_w
+
+
+def _n_evaluations():
+    """
+    Return the number of evaluations of the equations of motion in the last
+    call to ``dop853()`` from this thread.
+    """
+    return nfcnRead()
@@ -14,6 +14,15 @@ static double    *yy1, *k1, *k2, *k3, *k4, *k5, *k6, *k7, *k8, *k9, *k10;
 static double    *rcont1, *rcont2, *rcont3, *rcont4;
 static double    *rcont5, *rcont6, *rcont7, *rcont8;
 
+/* ADDED: the solver state is kept per thread so that independent systems can
+   be integrated concurrently from within an OpenMP parallel region */
+#ifdef _OPENMP
+#pragma omp threadprivate(nfcn, nstep, naccpt, nrejct, hout, xold, xout, \
+                          nrds, indir, yy1, k1, k2, k3, k4, k5, k6, k7, k8, \
+                          k9, k10, rcont1, rcont2, rcont3, rcont4, rcont5, \
+                          rcont6, rcont7, rcont8)
+#endif
+
 
 long nfcnRead (void)
 {
@@ -158,11 +167,12 @@ static double hinit (unsigned n, FcnEqDiff fcn, CPotential *p, CFrame *fr, unsig
 static int dopcor (unsigned n, FcnEqDiff fcn, CPotential *p, CFrame *fr, unsigned norbits, unsigned nbody, void *args,
        double x, double* y, double xend,
 		   double hmax, double h, double* rtoler, double* atoler,
-		   int itoler, FILE* fileout, SolTrait solout, int iout,
+		   int itoler, FILE* fileout, SolTrait solout, void *solout_args, int iout,
 		   long nmax, double uround, int meth, long nstiff, double safe,
 		   double beta, double fac1, double fac2, unsigned* icont)
 {
   double   facold, expo1, fac, facc1, facc2, fac11, posneg, xph;
+  double   xcomp, hcomp, xnew;
   double   atoli, rtoli, hlamb, err, sk, hnew, yd0, ydiff, bspl;
   double   stnum, stden, sqr, err2, erri, deno;
   int      iasti, iord, irtrn, reject, last, nonsti;
@@ -378,13 +388,14 @@ static int dopcor (unsigned n, FcnEqDiff fcn, CPotential *p, CFrame *fr, unsigne
   nfcn += 2;
   reject = 0;
   xold = x;
+  xcomp = 0.0;
 
   if (iout)
   {
     irtrn = 1;
     hout = 1.0;
     xout = x;
-    solout (naccpt+1, xold, x, y, n, &irtrn);
+    solout (naccpt+1, xold, x, y, n, &irtrn, solout_args);
     if (irtrn < 0)
     {
       if (fileout)
@@ -647,13 +658,18 @@ static int dopcor (unsigned n, FcnEqDiff fcn, CPotential *p, CFrame *fr, unsigne
       memcpy (k1, k4, n * sizeof(double));
       memcpy (y, k5, n * sizeof(double));
       xold = x;
-      x = xph;
+      /* compensated summation of the steps, so that x does not drift away
+         from the integrated time over many steps of the same size */
+      hcomp = h - xcomp;
+      xnew = x + hcomp;
+      xcomp = (xnew - x) - hcomp;
+      x = xnew;
 
       if (iout)
       {
 	hout = h;
 	xout = x;
-	solout (naccpt+1, xold, x, y, n, &irtrn);
+	solout (naccpt+1, xold, x, y, n, &irtrn, solout_args);
 	if (irtrn < 0)
 	{
 	  if (fileout)
@@ -697,7 +713,7 @@ static int dopcor (unsigned n, FcnEqDiff fcn, CPotential *p, CFrame *fr, unsigne
 int dop853
  (unsigned n, FcnEqDiff fcn, CPotential *p, CFrame *fr, unsigned norbits, unsigned nbody, void *args,
   double x, double* y, double xend, double* rtoler,
-  double* atoler, int itoler, SolTrait solout, int iout, FILE* fileout, double uround,
+  double* atoler, int itoler, SolTrait solout, void *solout_args, int iout, FILE* fileout, double uround,
   double safe, double fac1, double fac2, double beta, double hmax, double h,
   long nmax, int meth, long nstiff, unsigned nrdens, unsigned* icont, unsigned licont)
 {
@@ -916,7 +932,7 @@ int dop853
   else
   {
     idid = dopcor (n, fcn, p, fr, norbits, nbody, args, x, y, xend, hmax, h, rtoler, atoler, itoler, fileout,
-		   solout, iout, nmax, uround, meth, nstiff, safe, beta, fac1, fac2, icont);
+		   solout, solout_args, iout, nmax, uround, meth, nstiff, safe, beta, fac1, fac2, icont);
     free (k10);
     free (k9);
     free (k8);
@@ -996,11 +1012,17 @@ void Fwrapper_direct_nbody (unsigned full_ndim, double t, double *w, double *f,
                             void *args) {
     /* Here, the extra args are actually the array of CPotential objects that
        represent the potentials of the individual particles.
+
+       The origin of the first component of each particle potential is moved
+       to the position of the particle. This is done on a local copy of the
+       potential struct with its own tables of origins and shift flags, so the
+       particle potentials themselves are never modified and several
+       integrations can use them concurrently.
     */
-    CPotential *pp;
+    CPotential *pp, local;
 
     // Note: only really works with a static frame! This should be enforced
-    int i, j, k;
+    int i, j, k, c;
     unsigned ndim = full_ndim / norbits; // phase-space dimensionality
     double f2[ndim/2];
 
@@ -1015,11 +1037,22 @@ void Fwrapper_direct_nbody (unsigned full_ndim, double t, double *w, double *f,
         if ((pp->null) == 1)
             continue;
 
-        (pp->q0)[0] = &w[j*ndim];
+        double *q0[pp->n_components];
+        int do_shift[pp->n_components];
+        for (c=0; c < pp->n_components; c++) {
+            q0[c] = (pp->q0)[c];
+            do_shift[c] = (pp->do_shift)[c];
+        }
+        q0[0] = &w[j*ndim];
+        do_shift[0] = 1;
+
+        local = *pp;
+        local.q0 = q0;
+        local.do_shift = do_shift;
 
         for (i=0; i < norbits; i++) {
             if (i != j) {
-                c_gradient(pp, t, &w[i*ndim], &f2[0]);
+                c_gradient(&local, t, &w[i*ndim], &f2[0]);
 
                 for (k=0; k<p->n_dim; k++)
                     // minus sign below because hamiltonian gradient computes
@@ -1031,7 +1064,6 @@ void Fwrapper_direct_nbody (unsigned full_ndim, double t, double *w, double *f,
 
 }
 
-/* Needed for Lyapunov */
 double six_norm (double *x) {
     double norm = 0;
     for (int i=0; i<6; i++) {
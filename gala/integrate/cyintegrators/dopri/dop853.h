@@ -72,11 +72,13 @@ solout   A pointer to the output function called during integration.
 	 pass a pointer equal to NULL. solout must must have the following
 	 prototype
 
-	   solout (long nr, double xold, double x, double* y, unsigned n, int* irtrn)
+	   solout (long nr, double xold, double x, double* y, unsigned n, int* irtrn,
+		   void *solout_args)
 
 	 where y is the solution the at nr-th grid point x, xold is the
 	 previous grid point and irtrn serves to interrupt the integration
-	 (if set to a negative value).
+	 (if set to a negative value). ADDED: solout_args is the pointer passed
+	 to dop853 and can be used to store the output.
 
 	 Continuous output : during the calls to solout, a continuous solution
 	 for the interval (xold,x) is available through the function
@@ -191,7 +193,8 @@ typedef void (*FcnEqDiff)(unsigned n, double x, double *y, double *f,
                           CPotential *p, CFrame *fr, unsigned norbits,
                           unsigned nbody, void *args);
 
-typedef void (*SolTrait)(long nr, double xold, double x, double* y, unsigned n, int* irtrn);
+typedef void (*SolTrait)(long nr, double xold, double x, double* y, unsigned n, int* irtrn,
+                         void *solout_args);
 
 extern int dop853
  (unsigned n,      /* dimension of the system <= UINT_MAX-1*/
@@ -208,6 +211,7 @@ extern int dop853
   double* atoler,  /* absolute error tolerance */
   int itoler,      /* switch for rtoler and atoler */
   SolTrait solout, /* function providing the numerical solution during integration */
+  void *solout_args, /* ADDED: a container passed through to solout */
   int iout,        /* switch for calling solout */
   FILE* fileout,   /* messages stream */
   double uround,   /* rounding unit */
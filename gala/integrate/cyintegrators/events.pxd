@@ -0,0 +1,108 @@
+# cython: language_level=3
+
+from libc.math cimport isfinite
+
+cdef extern from "frame/src/cframe.h":
+    ctypedef struct CFrame:
+        pass
+
+cdef extern from "potential/src/cpotential.h":
+    ctypedef struct CPotential:
+        pass
+
+cdef extern from "hamiltonian/src/chamiltonian.h":
+    double hamiltonian_value(CPotential *p, CFrame *fr, double t, double *qp) nogil
+
+ctypedef struct EventSpec:
+    int kind           # 0: x.v, 1: n.x - offset, 2: n.v - offset
+    int direction      # +1: increasing crossings, -1: decreasing, 0: both
+    double normal[3]
+    double offset
+
+ctypedef struct EventBuffer:
+    int n_specs
+    EventSpec *specs
+    int half_ndim
+    int norbits        # number of orbits handled by this buffer
+    int orbit0         # index of the first orbit handled by this buffer
+    double *g          # event functions at the start of the current step,
+                       # with shape (norbits, n_specs)
+    int n              # number of events found
+    int capacity
+    double *t          # times of the events
+    double *w          # phase-space positions at the events, (capacity, ndim)
+    int *orbit         # (global) orbit indices of the events
+    int *which         # indices of the event specifications
+    int failed         # set if the event arrays could not be grown
+
+# the phase-space position w of orbit i (of the buffer) at time t, given by an
+# interpolant over the current step
+ctypedef void (*StateFunc)(void *args, int i, double t, double *w) nogil
+
+cdef void events_start(EventBuffer *eb, int i, double *w) nogil
+cdef void events_step(EventBuffer *eb, int i, double t0, double t1,
+                      double *w1, StateFunc state, void *state_args) nogil
+cdef void events_step_soa(EventBuffer *eb, int half_ndim, int n,
+                          double t0, double t1,
+                          double *x0, double *v0, double *grad0,
+                          double *x1, double *v1, double *grad1) nogil
+
+cdef class EventRecorder:
+    cdef EventSpec *specs
+    cdef int n_specs
+    cdef EventBuffer *buffers
+    cdef int n_buffers
+    cdef int norbits
+
+    cdef void _free_buffers(self)
+    cdef int allocate(self, int norbits, int orbits_per_buffer,
+                      int half_ndim) except -1
+
+ctypedef struct StopSpec:
+    double r_min       # stop orbits inside this radius
+    double r_max       # stop orbits outside this radius
+    double E_max       # stop orbits with a larger energy (if check_energy)
+    int check_energy
+    long max_steps     # stop orbits after this many steps (if positive)
+    CPotential *p
+    CFrame *fr
+    int *end           # index of the last stored time of each orbit
+
+cdef inline int stop_check(StopSpec *spec, int half_ndim, double t, double *w,
+                           long n_steps) nogil:
+    """
+    Return 1 if an orbit with phase-space position ``w`` at time ``t``, after
+    ``n_steps`` steps, meets any of the stopping conditions.
+    """
+    cdef:
+        int k
+        double r2 = 0.
+
+    if spec.max_steps > 0 and n_steps >= spec.max_steps:
+        return 1
+
+    for k in range(half_ndim):
+        r2 = r2 + w[k]*w[k]
+    if r2 < spec.r_min*spec.r_min or r2 > spec.r_max*spec.r_max:
+        return 1
+
+    if spec.check_energy and hamiltonian_value(spec.p, spec.fr, t, w) > spec.E_max:
+        return 1
+
+    return 0
+
+cdef inline void stop_init(StopSpec *spec, double *stop, CPotential *p,
+                           CFrame *fr, int *end) nogil:
+    """
+    Initialize the stopping conditions from the array
+    ``(r_min, r_max, E_max, max_steps)``, where an infinite ``E_max`` and a
+    ``max_steps`` of zero disable the respective conditions.
+    """
+    spec.r_min = stop[0]
+    spec.r_max = stop[1]
+    spec.E_max = stop[2]
+    spec.check_energy = isfinite(stop[2])
+    spec.max_steps = <long>stop[3]
+    spec.p = p
+    spec.fr = fr
+    spec.end = end
@@ -0,0 +1,397 @@
+# cython: boundscheck=False
+# cython: nonecheck=False
+# cython: cdivision=True
+# cython: wraparound=False
+# cython: profile=False
+# cython: language_level=3
+
+""" Detection of events (zero crossings) during orbit integration. """
+
+# Third-party
+import numpy as np
+cimport numpy as np
+np.import_array()
+
+from libc.math cimport fabs
+from libc.stdlib cimport malloc, calloc, realloc, free
+from libc.string cimport memcpy
+
+# the number of events that fit in a buffer before it is grown
+cdef int _initial_capacity = 64
+
+# the maximum number of iterations of the root finder
+cdef int _max_iter = 100
+
+cdef inline double _event_function(EventSpec *spec, int half_ndim,
+                                   double *w) nogil:
+    cdef:
+        int k
+        double g = 0.
+
+    if spec.kind == 0:
+        for k in range(half_ndim):
+            g = g + w[k] * w[half_ndim+k]
+        return g
+
+    elif spec.kind == 1:
+        for k in range(half_ndim):
+            g = g + spec.normal[k] * w[k]
+
+    else:
+        for k in range(half_ndim):
+            g = g + spec.normal[k] * w[half_ndim+k]
+
+    return g - spec.offset
+
+cdef inline int _is_crossing(EventSpec *spec, double g0, double g1) nogil:
+    # a crossing ends at (but does not start at) a zero of the event function
+    if g0 < 0 and g1 >= 0:
+        return spec.direction >= 0
+    elif g0 > 0 and g1 <= 0:
+        return spec.direction <= 0
+    return 0
+
+cdef int _grow(EventBuffer *eb) nogil:
+    cdef:
+        int ndim = 2 * eb.half_ndim
+        int capacity = 2 * eb.capacity
+        double *t = <double*>realloc(eb.t, capacity * sizeof(double))
+        double *w
+        int *orbit
+        int *which
+
+    if t == NULL:
+        return -1
+    eb.t = t
+
+    w = <double*>realloc(eb.w, capacity * ndim * sizeof(double))
+    if w == NULL:
+        return -1
+    eb.w = w
+
+    orbit = <int*>realloc(eb.orbit, capacity * sizeof(int))
+    if orbit == NULL:
+        return -1
+    eb.orbit = orbit
+
+    which = <int*>realloc(eb.which, capacity * sizeof(int))
+    if which == NULL:
+        return -1
+    eb.which = which
+
+    eb.capacity = capacity
+    return 0
+
+cdef void _record(EventBuffer *eb, int i, int e, double t, double *w) nogil:
+    if eb.failed:
+        return
+
+    if eb.n == eb.capacity and _grow(eb) != 0:
+        eb.failed = 1
+        return
+
+    eb.t[eb.n] = t
+    memcpy(&eb.w[eb.n * 2 * eb.half_ndim], w, 2 * eb.half_ndim * sizeof(double))
+    eb.orbit[eb.n] = eb.orbit0 + i
+    eb.which[eb.n] = e
+    eb.n += 1
+
+cdef double _refine(EventSpec *spec, int half_ndim, int i,
+                    double a, double b, double ga, double gb,
+                    StateFunc state, void *state_args, double *w) nogil:
+    """
+    Find the time of the zero crossing of the event function in ``(a, b]``
+    with the Illinois variant of the regula falsi method, evaluating the
+    phase-space position with the interpolant ``state`` over the step. The
+    phase-space position at the returned time is left in ``w``.
+    """
+    cdef:
+        int it, side = 0
+        double c = b, gc
+        double tol = 1E-13 * fabs(b - a)
+
+    for it in range(_max_iter):
+        c = (a * gb - b * ga) / (gb - ga)
+        if not ((c - a) * (c - b) < 0):
+            c = 0.5 * (a + b)
+
+        state(state_args, i, c, w)
+        gc = _event_function(spec, half_ndim, w)
+
+        if gc == 0:
+            break
+
+        if (gc > 0) == (gb > 0):
+            b = c
+            gb = gc
+            if side == -1:
+                ga = 0.5 * ga
+            side = -1
+        else:
+            a = c
+            ga = gc
+            if side == 1:
+                gb = 0.5 * gb
+            side = 1
+
+        if fabs(b - a) <= tol:
+            break
+
+    return c
+
+cdef void events_start(EventBuffer *eb, int i, double *w) nogil:
+    """
+    Evaluate the event functions of orbit ``i`` at the initial phase-space
+    position ``w``.
+    """
+    cdef int e
+
+    for e in range(eb.n_specs):
+        eb.g[i*eb.n_specs + e] = _event_function(&eb.specs[e], eb.half_ndim, w)
+
+cdef void events_step(EventBuffer *eb, int i, double t0, double t1,
+                      double *w1, StateFunc state, void *state_args) nogil:
+    """
+    Check for events of orbit ``i`` over a step from ``t0`` to ``t1`` that
+    ends at the phase-space position ``w1``. The time of each event is
+    refined with the interpolant ``state`` over the step, and the event is
+    recorded in the buffer.
+    """
+    cdef:
+        int e
+        double g0, g1, te
+        double w[6]
+
+    for e in range(eb.n_specs):
+        g0 = eb.g[i*eb.n_specs + e]
+        g1 = _event_function(&eb.specs[e], eb.half_ndim, w1)
+
+        if _is_crossing(&eb.specs[e], g0, g1):
+            if g1 == 0:
+                _record(eb, i, e, t1, w1)
+            else:
+                te = _refine(&eb.specs[e], eb.half_ndim, i, t0, t1, g0, g1,
+                             state, state_args, w)
+                _record(eb, i, e, te, w)
+
+        eb.g[i*eb.n_specs + e] = g1
+
+ctypedef struct _SoAHermite:
+    int half_ndim
+    int n
+    double t0
+    double h
+    double *x0
+    double *v0
+    double *grad0
+    double *x1
+    double *v1
+    double *grad1
+
+cdef void _soa_hermite_state(void *args, int i, double t, double *w) nogil:
+    """
+    The quintic Hermite interpolant of the positions of orbit ``i`` over a
+    step, given the positions, velocities, and accelerations (minus the
+    gradients) at both ends, and its derivative for the velocities.
+    """
+    cdef:
+        _SoAHermite *a = <_SoAHermite*>args
+        int k, j
+        double s = (t - a.t0) / a.h
+        double s2 = s*s, s3 = s2*s, s4 = s3*s, s5 = s4*s
+        double h = a.h
+        double H0, H1, H2, H3, H4, H5, dH0, dH1, dH2, dH3, dH4, dH5
+
+    H0 = 1 - 10*s3 + 15*s4 - 6*s5
+    H1 = s - 6*s3 + 8*s4 - 3*s5
+    H2 = 0.5 * (s2 - 3*s3 + 3*s4 - s5)
+    H3 = 0.5 * (s3 - 2*s4 + s5)
+    H4 = -4*s3 + 7*s4 - 3*s5
+    H5 = 10*s3 - 15*s4 + 6*s5
+
+    dH0 = -30*s2 + 60*s3 - 30*s4
+    dH1 = 1 - 18*s2 + 32*s3 - 15*s4
+    dH2 = 0.5 * (2*s - 9*s2 + 12*s3 - 5*s4)
+    dH3 = 0.5 * (3*s2 - 8*s3 + 5*s4)
+    dH4 = -12*s2 + 28*s3 - 15*s4
+    dH5 = 30*s2 - 60*s3 + 30*s4
+
+    for k in range(a.half_ndim):
+        j = k*a.n + i
+        w[k] = (H0*a.x0[j] + H1*h*a.v0[j] - H2*h*h*a.grad0[j] +
+                H5*a.x1[j] + H4*h*a.v1[j] - H3*h*h*a.grad1[j])
+        w[a.half_ndim+k] = (dH0*a.x0[j] + dH1*h*a.v0[j] - dH2*h*h*a.grad0[j] +
+                            dH5*a.x1[j] + dH4*h*a.v1[j] - dH3*h*h*a.grad1[j]) / h
+
+cdef void events_step_soa(EventBuffer *eb, int half_ndim, int n,
+                          double t0, double t1,
+                          double *x0, double *v0, double *grad0,
+                          double *x1, double *v1, double *grad1) nogil:
+    """
+    Check for events over a step from ``t0`` to ``t1`` for ``n`` orbits whose
+    positions, velocities, and gradients at both ends of the step are stored
+    in structure-of-arrays order (see ``c_leapfrog_chunk()``). Event times are
+    refined with the quintic Hermite interpolant over the step.
+    """
+    cdef:
+        int i, k
+        double w1[6]
+        _SoAHermite args
+
+    args.half_ndim = half_ndim
+    args.n = n
+    args.t0 = t0
+    args.h = t1 - t0
+    args.x0 = x0
+    args.v0 = v0
+    args.grad0 = grad0
+    args.x1 = x1
+    args.v1 = v1
+    args.grad1 = grad1
+
+    for i in range(n):
+        for k in range(half_ndim):
+            w1[k] = x1[k*n + i]
+            w1[half_ndim+k] = v1[k*n + i]
+        events_step(eb, i, t0, t1, w1, _soa_hermite_state, &args)
+
+cdef class EventRecorder:
+    """
+    Holds the event specifications and collects the events found by the
+    Cython integrators.
+
+    Parameters
+    ----------
+    spec : array_like
+        The event specifications, with shape ``(n_events, 6)``. Each row is
+        ``(kind, direction, n_x, n_y, n_z, offset)``, where ``kind`` is 0 for
+        the event function ``x . v``, 1 for ``n . x - offset``, and 2 for
+        ``n . v - offset``, and ``direction`` selects increasing (+1),
+        decreasing (-1), or all (0) zero crossings.
+    """
+
+    def __cinit__(self, spec):
+        cdef:
+            int e, k
+            double[:,::1] _spec = np.ascontiguousarray(spec, dtype=np.float64)
+
+        if _spec.shape[1] != 6:
+            raise ValueError("Event specifications must have shape "
+                             "(n_events, 6).")
+
+        self.n_specs = _spec.shape[0]
+        self.specs = <EventSpec*>malloc(max(self.n_specs, 1) * sizeof(EventSpec))
+        if self.specs == NULL:
+            raise MemoryError("Failed to allocate event specifications.")
+
+        for e in range(self.n_specs):
+            self.specs[e].kind = <int>_spec[e, 0]
+            self.specs[e].direction = <int>_spec[e, 1]
+            for k in range(3):
+                self.specs[e].normal[k] = _spec[e, 2+k]
+            self.specs[e].offset = _spec[e, 5]
+
+        self.buffers = NULL
+        self.n_buffers = 0
+        self.norbits = 0
+
+    def __dealloc__(self):
+        self._free_buffers()
+        free(self.specs)
+
+    cdef void _free_buffers(self):
+        cdef int b
+
+        if self.buffers != NULL:
+            for b in range(self.n_buffers):
+                free(self.buffers[b].g)
+                free(self.buffers[b].t)
+                free(self.buffers[b].w)
+                free(self.buffers[b].orbit)
+                free(self.buffers[b].which)
+            free(self.buffers)
+
+        self.buffers = NULL
+        self.n_buffers = 0
+
+    cdef int allocate(self, int norbits, int orbits_per_buffer,
+                      int half_ndim) except -1:
+        """
+        Allocate buffers for ``norbits`` orbits, split into consecutive groups
+        of ``orbits_per_buffer`` orbits that are each handled by one buffer.
+        This discards any previously recorded events.
+        """
+        cdef:
+            int b
+            EventBuffer *eb
+
+        if half_ndim > 3:
+            raise ValueError("Event detection is only supported for up to 3 "
+                             "spatial dimensions.")
+
+        self._free_buffers()
+        self.norbits = norbits
+        self.n_buffers = (norbits + orbits_per_buffer - 1) // orbits_per_buffer
+        self.buffers = <EventBuffer*>calloc(max(self.n_buffers, 1),
+                                            sizeof(EventBuffer))
+        if self.buffers == NULL:
+            raise MemoryError("Failed to allocate event buffers.")
+
+        for b in range(self.n_buffers):
+            eb = &self.buffers[b]
+            eb.n_specs = self.n_specs
+            eb.specs = self.specs
+            eb.half_ndim = half_ndim
+            eb.orbit0 = b * orbits_per_buffer
+            eb.norbits = min(orbits_per_buffer, norbits - eb.orbit0)
+            eb.capacity = _initial_capacity
+            eb.g = <double*>malloc(max(eb.norbits * self.n_specs, 1) * sizeof(double))
+            eb.t = <double*>malloc(eb.capacity * sizeof(double))
+            eb.w = <double*>malloc(eb.capacity * 2 * half_ndim * sizeof(double))
+            eb.orbit = <int*>malloc(eb.capacity * sizeof(int))
+            eb.which = <int*>malloc(eb.capacity * sizeof(int))
+            if (eb.g == NULL or eb.t == NULL or eb.w == NULL or
+                    eb.orbit == NULL or eb.which == NULL):
+                raise MemoryError("Failed to allocate event buffers.")
+
+        return 0
+
+    def results(self):
+        """
+        Return the events found for each event specification, as a list of
+        tuples ``(orbit, t, w)`` of the orbit indices, times, and phase-space
+        positions (with shape ``(n, ndim)``) of the events, ordered by orbit
+        and then in the order they were crossed.
+        """
+        cdef:
+            int b, j, e, m, n_total = 0
+            int ndim
+            EventBuffer *eb
+
+        for b in range(self.n_buffers):
+            if self.buffers[b].failed:
+                raise MemoryError("Failed to allocate memory for the events.")
+            n_total += self.buffers[b].n
+
+        ndim = 2 * self.buffers[0].half_ndim if self.n_buffers > 0 else 0
+        orbit = np.empty(n_total, dtype=np.intp)
+        which = np.empty(n_total, dtype=np.intp)
+        t = np.empty(n_total)
+        w = np.empty((n_total, ndim))
+
+        m = 0
+        for b in range(self.n_buffers):
+            eb = &self.buffers[b]
+            for j in range(eb.n):
+                orbit[m] = eb.orbit[j]
+                which[m] = eb.which[j]
+                t[m] = eb.t[j]
+                w[m] = <double[:ndim]>&eb.w[j*ndim]
+                m += 1
+
+        results = []
+        for e in range(self.n_specs):
+            idx = np.where(which == e)[0]
+            idx = idx[np.argsort(orbit[idx], kind='stable')]
+            results.append((orbit[idx], t[idx], w[idx]))
+        return results
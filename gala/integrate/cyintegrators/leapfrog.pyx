@@ -12,9 +12,20 @@ import numpy as np
 cimport numpy as np
 np.import_array()
 
+from cython.parallel cimport prange, threadid
+
 # Project
 from ...potential.potential.cpotential cimport CPotentialWrapper
-from ...potential.frame import StaticFrame
+from ...potential.potential.cpotential import _validate_n_threads
+from ...potential.frame.cframe cimport CFrameWrapper
+from ...potential.frame import StaticFrame, ConstantRotatingFrame
+from ..timespec import _store_indices
+from ..core import _prepare_output
+from .events cimport (EventBuffer, EventRecorder, events_start,
+                      events_step_soa, StopSpec, stop_check, stop_init)
+
+# the number of orbits that are integrated together as one chunk
+_CHUNK_SIZE = 256
 
 cdef extern from "frame/src/cframe.h":
     ctypedef struct CFrame:
@@ -26,6 +37,8 @@ cdef extern from "potential/src/cpotential.h":
 
 cdef extern from "potential/src/cpotential.h":
     void c_gradient(CPotential *p, double t, double *q, double *grad) nogil
+    void c_gradient_batch(CPotential *p, double t, double *q, int n,
+                          double *grad) nogil
 
 cdef void c_init_velocity(CPotential *p, int half_ndim, double t, double dt,
                           double *x_jm1, double *v_jm1, double *v_jm1_2, double *grad) nogil:
@@ -52,60 +65,702 @@ cdef void c_leapfrog_step(CPotential *p, int half_ndim, double t, double dt,
         v_jm1[k] = v_jm1_2[k] - grad[k] * dt/2.
         v_jm1_2[k] = v_jm1_2[k] - grad[k] * dt
 
-cpdef leapfrog_integrate_hamiltonian(hamiltonian, double [:,::1] w0, double[::1] t):
+cdef void c_rotate_soa(double *R, int half_ndim, int n, double *x) nogil:
     """
-    CAUTION: Interpretation of axes is different here! We need the
-    arrays to be C ordered and easy to iterate over, so here the
-    axes are (norbits, ndim).
+    Rotate the ``n`` vectors stored in structure-of-arrays order in ``x`` by
+    the ``half_ndim`` by ``half_ndim`` rotation matrix ``R`` (at most 3D).
+    """
+    cdef:
+        int i, k, l
+        double tmp[3]
+
+    for i in range(n):
+        for k in range(half_ndim):
+            tmp[k] = 0.
+            for l in range(half_ndim):
+                tmp[k] = tmp[k] + R[k*half_ndim + l] * x[l*n + i]
+
+        for k in range(half_ndim):
+            x[k*n + i] = tmp[k]
+
+cdef void c_leapfrog_chunk(CPotential *p, int half_ndim, int n,
+                           double *t, int ntimes, double dt,
+                           double *w, Py_ssize_t s_stride, Py_ssize_t o_stride,
+                           Py_ssize_t k_stride,
+                           double *x, double *v_jm1_2, double *grad,
+                           double *R, int store_every, int resume,
+                           EventBuffer *eb, double *ev,
+                           StopSpec *stop, int *idx, int *end) nogil:
     """
+    Integrate a chunk of ``n`` orbits over all ``ntimes`` times. The initial
+    conditions are read from, and the orbits are stored in, ``w``, where the
+    ``k``-th phase-space component of orbit ``i`` at the ``s``-th stored time
+    is at ``w[s*s_stride + i*o_stride + k*k_stride]``. Only every
+    ``store_every``-th time and the final time are stored.
+
+    If ``R`` is not NULL, the orbits are integrated in a frame rotating with
+    constant angular velocity ``Omega``, and ``R`` is the rotation matrix
+    ``R(-Omega dt)``. The kinetic and rotational part of the Hamiltonian,
+    ``p^2/2 - Omega . (q x p)``, is then integrated exactly with the drift
+    ``q <- R(q + dt p)``, ``p <- R p``, so the scheme remains symplectic.
+
+    ``x``, ``v_jm1_2``, and ``grad`` are scratch buffers of length
+    ``n*half_ndim``: the positions, half-step velocities, and gradients of the
+    orbits in the chunk are stored as structure-of-arrays, i.e. the ``k``-th
+    component for orbit ``i`` is at ``[k*n + i]``, so that the gradient of all
+    orbits can be computed at once with ``c_gradient_batch()``. If ``resume``
+    is nonzero, the integration continues from the positions and half-step
+    velocities left in ``x`` and ``v_jm1_2`` by a previous call, instead of
+    starting from the initial conditions in ``w``.
+
+    If ``eb`` is not NULL, events are checked for after every step and
+    recorded in ``eb``. ``ev`` is then a scratch buffer of length
+    ``4*n*half_ndim`` for the positions, velocities, and gradients at the
+    start of the step, and the velocities at the end of the step.
+
+    If ``stop`` is not NULL, orbits that meet the stopping conditions are
+    removed from the scratch buffers, which then hold the remaining orbits
+    (see ``_stop_chunk()``), and the index of the last stored time of each
+    stopped orbit is stored in ``end``. ``idx`` is a scratch buffer of length
+    ``n`` for the indices of the remaining orbits.
+    """
+    cdef:
+        int i, j, k
+        int s = 0
+        double *w_j
+        double *x0 = ev
+        double *v0 = &ev[n*half_ndim]
+        double *grad0 = &ev[2*n*half_ndim]
+        double *v1 = &ev[3*n*half_ndim]
+
+    if not resume:
+        for k in range(half_ndim):
+            for i in range(n):
+                x[k*n + i] = w[i*o_stride + k*k_stride]
+
+        # first initialize the velocities so they are evolved by a
+        #   half step relative to the positions
+        c_gradient_batch(p, t[0], x, n, grad)
+        for k in range(half_ndim):
+            for i in range(n):
+                v_jm1_2[k*n + i] = (w[i*o_stride + (half_ndim+k)*k_stride] -
+                                    grad[k*n + i] * dt/2.)
+
+    if eb != NULL:
+        _start_events_soa(p, eb, half_ndim, n, t[0], w, o_stride, k_stride,
+                          x0, v0, grad0)
+
+    if stop != NULL:
+        for i in range(n):
+            idx[i] = i
+        n = _stop_chunk(stop, half_ndim, n, t[0], 0, x, v_jm1_2, grad,
+                        dt/2., idx, s, end)
+
+    for j in range(1, ntimes):
+        if n == 0:
+            break
+
+        # full step the positions
+        for k in range(n*half_ndim):
+            x[k] = x[k] + v_jm1_2[k] * dt
+
+        # rotate the positions and momenta with the frame
+        if R != NULL:
+            c_rotate_soa(R, half_ndim, n, x)
+            c_rotate_soa(R, half_ndim, n, v_jm1_2)
+
+        # compute gradient at new positions
+        c_gradient_batch(p, t[j], x, n, grad)
+
+        if eb != NULL:
+            for k in range(n*half_ndim):
+                v1[k] = v_jm1_2[k] - grad[k] * dt/2.
+            _step_events_soa(eb, half_ndim, n, t[j-1], t[j], x0, v0, grad0,
+                             x, v1, grad)
 
+        # step velocity forward by half step, aligned w/ position, and store
+        #   the state if needed
+        if (j % store_every) == 0 or j == ntimes-1:
+            s = s + 1
+            w_j = &w[s*s_stride]
+            for k in range(half_ndim):
+                for i in range(n):
+                    w_j[_orbit(idx, i)*o_stride + k*k_stride] = x[k*n + i]
+                    w_j[_orbit(idx, i)*o_stride + (half_ndim+k)*k_stride] = (
+                        v_jm1_2[k*n + i] - grad[k*n + i] * dt/2.)
+
+        # finish the full step to leapfrog over position
+        for k in range(n*half_ndim):
+            v_jm1_2[k] = v_jm1_2[k] - grad[k] * dt
+
+        if stop != NULL:
+            n = _stop_chunk(stop, half_ndim, n, t[j], j, x, v_jm1_2, grad,
+                            dt/2., idx, s, end)
+
+cdef inline int _orbit(int *idx, int i) nogil:
+    # the index in the chunk of the i-th remaining orbit
+    if idx == NULL:
+        return i
+    return idx[i]
+
+cdef void _compact_soa(double *arr, int half_ndim, int n, int n_new,
+                       int *idx) nogil:
+    # remove the orbits with a negative index in idx from the
+    # structure-of-arrays buffer arr in place (keeping the order, so no
+    # element is overwritten before it is moved)
+    cdef int i, k, m
+
+    for k in range(half_ndim):
+        m = 0
+        for i in range(n):
+            if idx[i] >= 0:
+                arr[k*n_new + m] = arr[k*n + i]
+                m = m + 1
+
+cdef int _stop_chunk(StopSpec *stop, int half_ndim, int n, double t, long j,
+                     double *x, double *v, double *grad, double kick,
+                     int *idx, int s, int *end) nogil:
+    """
+    Check the stopping conditions for the ``n`` remaining orbits of a chunk
+    after ``j`` steps, at time ``t``, where the velocities are
+    ``v + kick * grad``. Stopped orbits are removed from the scratch buffers
+    ``x``, ``v``, and ``grad`` and from ``idx``, their last stored time ``s``
+    is stored in ``end``, and the number of remaining orbits is returned.
+    """
+    cdef:
+        int i, k, n_new = 0
+        double w[6]
+
+    for i in range(n):
+        for k in range(half_ndim):
+            w[k] = x[k*n + i]
+            w[half_ndim+k] = v[k*n + i] + kick * grad[k*n + i]
+
+        if stop_check(stop, half_ndim, t, w, j):
+            end[idx[i]] = s
+            idx[i] = -1 - idx[i]
+        else:
+            n_new = n_new + 1
+
+    if n_new < n:
+        _compact_soa(x, half_ndim, n, n_new, idx)
+        _compact_soa(v, half_ndim, n, n_new, idx)
+        _compact_soa(grad, half_ndim, n, n_new, idx)
+
+        n_new = 0
+        for i in range(n):
+            if idx[i] >= 0:
+                idx[n_new] = idx[i]
+                n_new = n_new + 1
+
+    return n_new
+
+cdef void _start_events_soa(CPotential *p, EventBuffer *eb, int half_ndim,
+                            int n, double t0, double *w, Py_ssize_t o_stride,
+                            Py_ssize_t k_stride, double *x0, double *v0,
+                            double *grad0) nogil:
+    """
+    Evaluate the event functions of a chunk of orbits at the phase-space
+    positions in ``w`` (with the layout of ``c_leapfrog_chunk()``), and store
+    the positions, velocities, and gradients in structure-of-arrays order as
+    the start of the first step.
+    """
+    cdef:
+        int i, k
+        double tmp[6]
+
+    for k in range(half_ndim):
+        for i in range(n):
+            x0[k*n + i] = w[i*o_stride + k*k_stride]
+            v0[k*n + i] = w[i*o_stride + (half_ndim+k)*k_stride]
+    c_gradient_batch(p, t0, x0, n, grad0)
+
+    for i in range(n):
+        for k in range(2*half_ndim):
+            tmp[k] = w[i*o_stride + k*k_stride]
+        events_start(eb, i, tmp)
+
+cdef void _step_events_soa(EventBuffer *eb, int half_ndim, int n,
+                           double t0, double t1,
+                           double *x0, double *v0, double *grad0,
+                           double *x1, double *v1, double *grad1) nogil:
+    """
+    Check for events over a step, and keep the state at the end of the step as
+    the start of the next step.
+    """
+    cdef int k
+
+    events_step_soa(eb, half_ndim, n, t0, t1, x0, v0, grad0, x1, v1, grad1)
+    for k in range(n*half_ndim):
+        x0[k] = x1[k]
+        v0[k] = v1[k]
+        grad0[k] = grad1[k]
+
+def _rotation_matrix(Omega, t):
+    """
+    The matrix that rotates vectors by an angle ``|Omega| t`` around the axis
+    ``Omega`` (or, for a scalar ``Omega``, in the plane), i.e. ``exp(t [Omega]_x)``.
+    """
+    if len(Omega) == 1:
+        theta = Omega[0] * t
+        return np.array([[np.cos(theta), -np.sin(theta)],
+                         [np.sin(theta), np.cos(theta)]])
+
+    Omega_norm = np.linalg.norm(Omega)
+    if Omega_norm == 0:
+        return np.eye(3)
+
+    n = Omega / Omega_norm
+    theta = Omega_norm * t
+    K = np.array([[0., -n[2], n[1]],
+                  [n[2], 0., -n[0]],
+                  [-n[1], n[0], 0.]])
+    return (np.cos(theta) * np.eye(3) + np.sin(theta) * K +
+            (1 - np.cos(theta)) * np.outer(n, n))
+
+def _validate_hamiltonian(hamiltonian):
     if not hamiltonian.c_enabled:
         raise TypeError("Input Hamiltonian object does not support C-level access.")
 
-    if not isinstance(hamiltonian.frame, StaticFrame):
+    if not isinstance(hamiltonian.frame, (StaticFrame, ConstantRotatingFrame)):
         raise TypeError("Leapfrog integration is currently only supported "
-                        "for StaticFrame, not {}."
+                        "for StaticFrame and ConstantRotatingFrame, not {}."
                         .format(hamiltonian.frame.__class__.__name__))
 
+def _n_chunks(norbits):
+    return (norbits + _CHUNK_SIZE - 1) // _CHUNK_SIZE
+
+def _validate_events(hamiltonian, EventRecorder events, norbits, ndim):
+    # returns the number of scratch rows needed for event detection
+    if events is None:
+        return 0
+
+    if not isinstance(hamiltonian.frame, StaticFrame):
+        raise NotImplementedError("Event detection with the symplectic "
+                                  "integrators is only supported in a "
+                                  "StaticFrame.")
+
+    events.allocate(norbits, _CHUNK_SIZE, ndim // 2)
+    return 4
+
+def _store_initial_conditions(all_w, w0, default_layout):
+    if default_layout:
+        all_w[0] = w0
+    else:
+        all_w[:, 0] = np.asarray(w0).T
+
+def _prepare_stop(stop, norbits, nstore, state=None, events=None):
+    """
+    Return the stopping conditions as an array ``(r_min, r_max, E_max,
+    max_steps)`` and the array for the index of the last stored time of each
+    orbit, or None for both if there are no stopping conditions.
+    """
+    if stop is None:
+        return None, None
+
+    if state is not None or events is not None:
+        raise ValueError("Stopping conditions can not be used together with "
+                         "events or an integrator state.")
+
+    stop = np.ascontiguousarray(stop, dtype=np.float64)
+    if stop.shape != (4, ):
+        raise ValueError("Stopping conditions must be an array "
+                         "(r_min, r_max, E_max, max_steps).")
+
+    return stop, np.full(norbits, nstore - 1, dtype=np.intc)
+
+def _drift_rotation_matrices(hamiltonian, drift_dt):
+    """
+    For a rotating frame, return the rotation matrices ``R(-Omega dt)`` of the
+    drift steps with the timesteps ``drift_dt``, with shape
+    ``(len(drift_dt), ndim, ndim)``. Returns None for a static frame.
+    """
+    if not isinstance(hamiltonian.frame, ConstantRotatingFrame):
+        return None
+
+    Omega = np.asarray((<CFrameWrapper>(hamiltonian.frame.c_instance))._params)
+    return np.ascontiguousarray([_rotation_matrix(Omega, -dt)
+                                 for dt in drift_dt])
+
+cpdef leapfrog_integrate_hamiltonian(hamiltonian, double [:,::1] w0, double[::1] t,
+                                     n_threads=None, int store_every=1,
+                                     out=None, dict state=None,
+                                     EventRecorder events=None, stop=None):
+    """
+    CAUTION: Interpretation of axes is different here! We need the
+    arrays to be C ordered and easy to iterate over, so here the
+    axes are (norbits, ndim).
+
+    The orbits are split into chunks of (at most) ``_CHUNK_SIZE`` orbits that
+    are integrated independently, and the chunks are distributed over
+    ``n_threads`` OpenMP threads (default: ``gala.conf.n_threads``). The
+    result does not depend on the number of threads.
+
+    Integration is supported in a `~gala.potential.frame.StaticFrame` or a
+    `~gala.potential.frame.ConstantRotatingFrame`. In a rotating frame, the
+    Coriolis and centrifugal terms are integrated exactly in the drift step.
+
+    Only every ``store_every``-th time in ``t`` (and the final time) is stored
+    and returned. The orbits are returned in an array with shape
+    ``(ntimes, norbits, ndim)``, unless an ``out`` array with shape
+    ``(ndim, ntimes, norbits)`` (e.g., a `numpy.memmap`) is passed, which is
+    filled directly and returned instead.
+
+    To integrate in several consecutive calls, pass the same (initially empty)
+    ``state`` dictionary to each call. The positions and half-step velocities
+    at the end of each call are kept in ``state``, and the next call continues
+    from them rather than from ``w0`` (which should be the final phase-space
+    positions of the previous call, which are stored as the first time).
+
+    If an ``EventRecorder`` is passed as ``events``, the zero crossings of its
+    event functions are found after every step, refined with the quintic
+    Hermite interpolant of the positions, velocities, and accelerations at
+    both ends of the step, and recorded in it. This is only supported in a
+    static frame.
+
+    If stopping conditions ``stop`` are passed as an array
+    ``(r_min, r_max, E_max, max_steps)`` (where an infinite ``E_max`` or a
+    ``max_steps`` of zero disable the respective condition), orbits are
+    checked after every step and no longer integrated once they meet any of
+    the conditions. The phase-space positions of a stopped orbit are then not
+    stored after it stopped, and a third array with the index of the last
+    stored time of each orbit is returned.
+    """
+
+    _validate_hamiltonian(hamiltonian)
+    n_event_rows = _validate_events(hamiltonian, events,
+                                    w0.shape[0], w0.shape[1])
+    store_idx = _store_indices(len(t), store_every)
+    all_w_arr, strides = _prepare_output(out, len(store_idx),
+                                         w0.shape[0], w0.shape[1])
+    stop, end_arr = _prepare_stop(stop, w0.shape[0], len(store_idx),
+                                  state, events)
+
+    resume = False
+    if state is not None:
+        resume = 'x_v' in state
+        if not resume:
+            state['x_v'] = np.empty((_n_chunks(w0.shape[0]), 2,
+                                     (w0.shape[1] // 2) * _CHUNK_SIZE))
+        elif state['x_v'].shape[0] != _n_chunks(w0.shape[0]):
+            raise ValueError("The integrator state is for a different number "
+                             "of orbits.")
+
     cdef:
         # temporary scalars
-        int i,j,k
+        int c, i0, size
         int n = w0.shape[0]
         int ndim = w0.shape[1]
         int half_ndim = ndim // 2
+        int chunk = _CHUNK_SIZE
+        int n_chunks = (n + chunk - 1) // chunk
+        int _n_threads = _validate_n_threads(n_threads)
 
         int ntimes = len(t)
         double dt = t[1]-t[0]
 
-        # temporary array containers
-        double[::1] grad = np.zeros(half_ndim)
-        double[:,::1] v_jm1_2 = np.zeros((n,half_ndim))
+        # per-thread scratch buffers for the positions, half-step velocities,
+        # and gradients of one chunk of orbits (and for event detection)
+        double[:,:,::1] work = np.zeros((_n_threads, 3 + n_event_rows,
+                                         half_ndim*chunk))
+        int ev_row = 3 if n_event_rows > 0 else 0
+        EventBuffer *eb_all = NULL
+        EventBuffer *eb
 
-        # return arrays
-        double[:,:,::1] all_w = np.zeros((ntimes,n,ndim))
+        # persistent positions and half-step velocities of all chunks
+        double[:,:,::1] x_v
+        double *x_v_ptr = NULL
+        int _resume = resume
+
+        # return array, and the strides between stored times, orbits, and
+        # phase-space components
+        double[:,:,::1] all_w = all_w_arr
+        Py_ssize_t s_stride = strides[0]
+        Py_ssize_t o_stride = strides[1]
+        Py_ssize_t k_stride = strides[2]
+        double *w_ptr = &all_w[0,0,0]
 
         # whoa, so many dots
         CPotential cp = (<CPotentialWrapper>(hamiltonian.potential.c_instance)).cpotential
 
+        # stopping conditions, the indices of the remaining orbits of a chunk
+        # for each thread, and the index of the last stored time of each orbit
+        StopSpec stop_spec
+        StopSpec *stop_ptr = NULL
+        double[::1] stop_arr
+        int[:,::1] idx = np.zeros((_n_threads, chunk), dtype=np.intc)
+        int[::1] end
+        int *end_ptr = NULL
+        int *end_c
+        int *idx_c
+        CFrame cf = (<CFrameWrapper>(hamiltonian.frame.c_instance)).cframe
+
+        # rotation matrix of the drift step in a rotating frame
+        double[::1] R_drift
+        double *R = NULL
+
+    R_drift_arr = _drift_rotation_matrices(hamiltonian, np.array([dt]))
+    if R_drift_arr is not None:
+        R_drift = R_drift_arr.ravel()
+        R = &R_drift[0]
+
+    if state is not None:
+        x_v = state['x_v']
+        x_v_ptr = &x_v[0,0,0]
+
+    if events is not None:
+        eb_all = events.buffers
+
+    if stop is not None:
+        stop_arr = stop
+        end = end_arr
+        end_ptr = &end[0]
+        stop_init(&stop_spec, &stop_arr[0], &cp, &cf, end_ptr)
+        stop_ptr = &stop_spec
+
     # save initial conditions
-    all_w[0,:,:] = w0.copy()
+    _store_initial_conditions(all_w_arr, w0, out is None)
 
-    with nogil:
-        # first initialize the velocities so they are evolved by a
-        #   half step relative to the positions
+    for c in prange(n_chunks, nogil=True, num_threads=_n_threads,
+                    schedule='dynamic'):
+        i0 = c * chunk
+        size = min(chunk, n - i0)
+        eb = NULL
+        if eb_all != NULL:
+            eb = &eb_all[c]
+        end_c = NULL
+        idx_c = NULL
+        if end_ptr != NULL:
+            end_c = &end_ptr[i0]
+            idx_c = &idx[threadid(),0]
+
+        if x_v_ptr != NULL:
+            c_leapfrog_chunk(&cp, half_ndim, size, &t[0], ntimes, dt,
+                             &w_ptr[i0*o_stride], s_stride, o_stride, k_stride,
+                             &x_v_ptr[<Py_ssize_t>(2*c) * half_ndim*chunk],
+                             &x_v_ptr[<Py_ssize_t>(2*c+1) * half_ndim*chunk],
+                             &work[threadid(),2,0], R, store_every, _resume,
+                             eb, &work[threadid(),ev_row,0],
+                             stop_ptr, idx_c, end_c)
+        else:
+            c_leapfrog_chunk(&cp, half_ndim, size, &t[0], ntimes, dt,
+                             &w_ptr[i0*o_stride], s_stride, o_stride, k_stride,
+                             &work[threadid(),0,0], &work[threadid(),1,0],
+                             &work[threadid(),2,0], R, store_every, 0,
+                             eb, &work[threadid(),ev_row,0],
+                             stop_ptr, idx_c, end_c)
+
+    if stop is not None:
+        return np.asarray(t)[store_idx], all_w_arr, end_arr
+    return np.asarray(t)[store_idx], all_w_arr
+
+cdef void c_composition_chunk(CPotential *p, int half_ndim, int n,
+                              double *t, int ntimes, double dt,
+                              double *w, Py_ssize_t s_stride,
+                              Py_ssize_t o_stride, Py_ssize_t k_stride,
+                              double *x, double *v, double *grad,
+                              int n_stages, double *drift, double *kick,
+                              double *R, int store_every,
+                              EventBuffer *eb, double *ev,
+                              StopSpec *stop, int *idx, int *end) nogil:
+    """
+    Integrate a chunk of ``n`` orbits over all ``ntimes`` times with a
+    symmetric composition of ``n_stages`` Leapfrog steps. Each step is the
+    sequence of kicks and drifts::
+
+        K(kick[0] dt) D(drift[0] dt) K(kick[1] dt) ... D(drift[s-1] dt) K(kick[s] dt)
+
+    where the kicks of adjacent Leapfrog steps have been merged. The layout of
+    ``w`` and of the scratch buffers is the same as for ``c_leapfrog_chunk()``,
+    but ``v`` holds the velocities at the same time as the positions. If ``R``
+    is not NULL, it holds the ``n_stages`` rotation matrices of the drift steps
+    in a rotating frame. Events are recorded in ``eb`` if it is not NULL, and
+    orbits are stopped if ``stop`` is not NULL, as in ``c_leapfrog_chunk()``.
+    """
+    cdef:
+        int i, j, k, m
+        int s = 0
+        double tj
+        double *w_j
+        double *x0 = ev
+        double *v0 = &ev[n*half_ndim]
+        double *grad0 = &ev[2*n*half_ndim]
+
+    for k in range(half_ndim):
         for i in range(n):
-            c_init_velocity(&cp, half_ndim, t[0], dt,
-                            &all_w[0,i,0], &all_w[0,i,half_ndim], &v_jm1_2[i,0], &grad[0])
+            x[k*n + i] = w[i*o_stride + k*k_stride]
+            v[k*n + i] = w[i*o_stride + (half_ndim+k)*k_stride]
 
-        for j in range(1,ntimes,1):
-            for i in range(n):
-                for k in range(half_ndim):
-                    all_w[j,i,k] = all_w[j-1,i,k]
+    c_gradient_batch(p, t[0], x, n, grad)
+
+    if eb != NULL:
+        _start_events_soa(p, eb, half_ndim, n, t[0], w, o_stride, k_stride,
+                          x0, v0, grad0)
+
+    if stop != NULL:
+        for i in range(n):
+            idx[i] = i
+        n = _stop_chunk(stop, half_ndim, n, t[0], 0, x, v, grad, 0.,
+                        idx, s, end)
+
+    for j in range(1, ntimes):
+        if n == 0:
+            break
+
+        tj = t[j-1]
+        for m in range(n_stages):
+            for k in range(n*half_ndim):
+                v[k] = v[k] - grad[k] * kick[m] * dt
+                x[k] = x[k] + v[k] * drift[m] * dt
+
+            if R != NULL:
+                c_rotate_soa(&R[m*half_ndim*half_ndim], half_ndim, n, x)
+                c_rotate_soa(&R[m*half_ndim*half_ndim], half_ndim, n, v)
+
+            if m == n_stages - 1:
+                tj = t[j]
+            else:
+                tj = tj + drift[m] * dt
+            c_gradient_batch(p, tj, x, n, grad)
+
+        for k in range(n*half_ndim):
+            v[k] = v[k] - grad[k] * kick[n_stages] * dt
+
+        if eb != NULL:
+            _step_events_soa(eb, half_ndim, n, t[j-1], t[j], x0, v0, grad0,
+                             x, v, grad)
+
+        if (j % store_every) == 0 or j == ntimes-1:
+            s = s + 1
+            w_j = &w[s*s_stride]
+            for k in range(half_ndim):
+                for i in range(n):
+                    w_j[_orbit(idx, i)*o_stride + k*k_stride] = x[k*n + i]
+                    w_j[_orbit(idx, i)*o_stride + (half_ndim+k)*k_stride] = v[k*n + i]
+
+        if stop != NULL:
+            n = _stop_chunk(stop, half_ndim, n, t[j], j, x, v, grad, 0.,
+                            idx, s, end)
+
+cpdef composition_integrate_hamiltonian(hamiltonian, double [:,::1] w0,
+                                        double[::1] t, double[::1] drift,
+                                        double[::1] kick, n_threads=None,
+                                        int store_every=1, out=None,
+                                        EventRecorder events=None, stop=None):
+    """
+    CAUTION: Interpretation of axes is different here! We need the
+    arrays to be C ordered and easy to iterate over, so here the
+    axes are (norbits, ndim).
+
+    Integrate orbits with a symplectic integrator constructed as a symmetric
+    composition of Leapfrog steps, given the coefficients of the drift steps
+    (of length ``s``) and of the merged kick steps (of length ``s+1``) in
+    units of the timestep. See ``leapfrog_integrate_hamiltonian()`` for the
+    parallelization, supported frames, ``store_every``, ``out``, ``events``,
+    and ``stop``.
+    """
+
+    _validate_hamiltonian(hamiltonian)
+    store_idx = _store_indices(len(t), store_every)
+    all_w_arr, strides = _prepare_output(out, len(store_idx),
+                                         w0.shape[0], w0.shape[1])
+
+    if len(kick) != len(drift) + 1:
+        raise ValueError("There must be one more kick coefficient than drift "
+                         "coefficients.")
+
+    n_event_rows = _validate_events(hamiltonian, events,
+                                    w0.shape[0], w0.shape[1])
+    stop, end_arr = _prepare_stop(stop, w0.shape[0], len(store_idx),
+                                  None, events)
+
+    cdef:
+        # temporary scalars
+        int c, i0, size
+        int n = w0.shape[0]
+        int ndim = w0.shape[1]
+        int half_ndim = ndim // 2
+        int n_stages = len(drift)
+        int chunk = _CHUNK_SIZE
+        int n_chunks = (n + chunk - 1) // chunk
+        int _n_threads = _validate_n_threads(n_threads)
+
+        int ntimes = len(t)
+        double dt = t[1]-t[0]
+
+        # per-thread scratch buffers for the positions, velocities, and
+        # gradients of one chunk of orbits (and for event detection)
+        double[:,:,::1] work = np.zeros((_n_threads, 3 + n_event_rows,
+                                         half_ndim*chunk))
+        int ev_row = 3 if n_event_rows > 0 else 0
+        EventBuffer *eb_all = NULL
+        EventBuffer *eb
+
+        # return array, and the strides between stored times, orbits, and
+        # phase-space components
+        double[:,:,::1] all_w = all_w_arr
+        Py_ssize_t s_stride = strides[0]
+        Py_ssize_t o_stride = strides[1]
+        Py_ssize_t k_stride = strides[2]
+        double *w_ptr = &all_w[0,0,0]
+
+        CPotential cp = (<CPotentialWrapper>(hamiltonian.potential.c_instance)).cpotential
+
+        # stopping conditions, the indices of the remaining orbits of a chunk
+        # for each thread, and the index of the last stored time of each orbit
+        StopSpec stop_spec
+        StopSpec *stop_ptr = NULL
+        double[::1] stop_arr
+        int[:,::1] idx = np.zeros((_n_threads, chunk), dtype=np.intc)
+        int[::1] end
+        int *end_ptr = NULL
+        int *end_c
+        int *idx_c
+        CFrame cf = (<CFrameWrapper>(hamiltonian.frame.c_instance)).cframe
+
+        # rotation matrices of the drift steps in a rotating frame
+        double[::1] R_drift
+        double *R = NULL
+
+    R_drift_arr = _drift_rotation_matrices(hamiltonian, np.asarray(drift) * dt)
+    if R_drift_arr is not None:
+        R_drift = R_drift_arr.ravel()
+        R = &R_drift[0]
+
+    if events is not None:
+        eb_all = events.buffers
+
+    if stop is not None:
+        stop_arr = stop
+        end = end_arr
+        end_ptr = &end[0]
+        stop_init(&stop_spec, &stop_arr[0], &cp, &cf, end_ptr)
+        stop_ptr = &stop_spec
+
+    # save initial conditions
+    _store_initial_conditions(all_w_arr, w0, out is None)
 
-                for k in range(half_ndim):
-                    grad[k] = 0.
+    for c in prange(n_chunks, nogil=True, num_threads=_n_threads,
+                    schedule='dynamic'):
+        i0 = c * chunk
+        size = min(chunk, n - i0)
+        eb = NULL
+        if eb_all != NULL:
+            eb = &eb_all[c]
+        end_c = NULL
+        idx_c = NULL
+        if end_ptr != NULL:
+            end_c = &end_ptr[i0]
+            idx_c = &idx[threadid(),0]
 
-                c_leapfrog_step(&cp, half_ndim, t[j], dt,
-                                &all_w[j,i,0], &all_w[j,i,half_ndim], &v_jm1_2[i,0], &grad[0])
+        c_composition_chunk(&cp, half_ndim, size, &t[0], ntimes, dt,
+                            &w_ptr[i0*o_stride], s_stride, o_stride, k_stride,
+                            &work[threadid(),0,0], &work[threadid(),1,0],
+                            &work[threadid(),2,0],
+                            n_stages, &drift[0], &kick[0], R, store_every,
+                            eb, &work[threadid(),ev_row,0],
+                            stop_ptr, idx_c, end_c)
 
-    return np.asarray(t), np.asarray(all_w)
+    if stop is not None:
+        return np.asarray(t)[store_idx], all_w_arr, end_arr
+    return np.asarray(t)[store_idx], all_w_arr
@@ -0,0 +1,294 @@
+# cython: boundscheck=False
+# cython: nonecheck=False
+# cython: cdivision=True
+# cython: wraparound=False
+# cython: profile=False
+# cython: language_level=3
+
+""" Explicit Runge-Kutta integration in Cython. """
+
+# Third-party
+import numpy as np
+cimport numpy as np
+np.import_array()
+
+from cython.parallel cimport prange, threadid
+from libc.math cimport fabs, fmax, fmin, sqrt, pow
+
+# Project
+from ...potential.potential.cpotential cimport CPotentialWrapper
+from ...potential.potential.cpotential import _validate_n_threads
+from ...potential.frame.cframe cimport CFrameWrapper
+from ..timespec import _store_indices
+from ..core import _prepare_output
+
+cdef extern from "frame/src/cframe.h":
+    ctypedef struct CFrame:
+        pass
+
+cdef extern from "potential/src/cpotential.h":
+    ctypedef struct CPotential:
+        pass
+
+cdef extern from "hamiltonian/src/chamiltonian.h":
+    void hamiltonian_gradient(CPotential *p, CFrame *fr, double t, double *qp,
+                              double *dH) nogil
+
+ctypedef struct RKTableau:
+    int n_stages
+    double *a          # nodes, (n_stages, )
+    double *b          # Runge-Kutta matrix, (n_stages, n_stages)
+    double *c          # weights of the solution, (n_stages, )
+    double *d          # weights of the embedded solution, or NULL
+    int fsal           # the last stage is evaluated at the new position
+    double order
+
+cdef void _rk_stages(CPotential *p, CFrame *fr, int ndim, double t,
+                     double *w, double h, RKTableau *tab, double *K,
+                     double *w_tmp, int first) nogil:
+    # evaluate the derivatives K of the stages, starting at stage first (the
+    # first stage is already known if the previous step can be reused)
+    cdef:
+        int i, j, k
+        int s = tab.n_stages
+
+    for i in range(first, s):
+        for k in range(ndim):
+            w_tmp[k] = w[k]
+        for j in range(i):
+            if tab.b[i*s + j] != 0.:
+                for k in range(ndim):
+                    w_tmp[k] = w_tmp[k] + h * tab.b[i*s + j] * K[j*ndim + k]
+        hamiltonian_gradient(p, fr, t + tab.a[i]*h, w_tmp, &K[i*ndim])
+
+cdef inline void _rk_store(double *out, Py_ssize_t s_stride,
+                           Py_ssize_t k_stride, int row, int ndim,
+                           double *w) nogil:
+    cdef int k
+    for k in range(ndim):
+        out[row*s_stride + k*k_stride] = w[k]
+
+cdef int c_rk_orbit(CPotential *p, CFrame *fr, int ndim, double *t,
+                    int ntimes, double *w, double *out, Py_ssize_t s_stride,
+                    Py_ssize_t k_stride, int store_every, RKTableau *tab,
+                    int adaptive, double atol, double rtol, long nmax,
+                    double *h, double *work) nogil:
+    """
+    Integrate a single orbit with initial conditions ``w`` over all
+    ``ntimes`` times ``t``, and store it in ``out`` at every
+    ``store_every``-th time and at the final time, where ``s_stride`` and
+    ``k_stride`` are the strides between stored times and phase-space
+    components. ``w`` is updated in place.
+
+    Without ``adaptive``, one step is taken between consecutive times.
+    Otherwise, as many steps as needed are taken, starting with the step size
+    ``h``, which is updated to the proposed size of the next step. ``work`` is
+    a scratch buffer of length ``(n_stages + 2) * ndim``. Returns 0 on
+    success, -2 if more than ``nmax`` steps are needed, and -3 if the step
+    size becomes too small.
+    """
+    cdef:
+        int i, j, k, row = 0
+        int s = tab.n_stages
+        double *K = work
+        double *w_tmp = &work[s*ndim]
+        double *w_new = &work[(s+1)*ndim]
+
+        # whether the first stage of the next step is known
+        int k0 = 0
+
+        double tt, t_end, h_step, h_next = h[0]
+        double dw, e, err, sc, fac
+        int clipped
+        long n_steps = 0
+
+    _rk_store(out, s_stride, k_stride, row, ndim, w)
+
+    for j in range(1, ntimes):
+        if not adaptive:
+            h_step = t[j] - t[j-1]
+            _rk_stages(p, fr, ndim, t[j-1], w, h_step, tab, K, w_tmp, k0)
+            for k in range(ndim):
+                dw = 0.
+                for i in range(s):
+                    dw = dw + tab.c[i] * K[i*ndim + k]
+                w[k] = w[k] + h_step * dw
+
+            if tab.fsal:
+                for k in range(ndim):
+                    K[k] = K[(s-1)*ndim + k]
+            k0 = tab.fsal
+
+        else:
+            tt = t[j-1]
+            t_end = t[j]
+            while (t_end - tt) * h_next > 0:
+                if n_steps >= nmax:
+                    return -2
+
+                # don't step past the end of the interval
+                h_step = h_next
+                clipped = fabs(h_step) >= fabs(t_end - tt)
+                if clipped:
+                    h_step = t_end - tt
+
+                _rk_stages(p, fr, ndim, tt, w, h_step, tab, K, w_tmp, k0)
+                k0 = 1  # the first stage is kept if the step is rejected
+
+                # RMS error norm relative to the tolerances
+                err = 0.
+                for k in range(ndim):
+                    dw = 0.
+                    e = 0.
+                    for i in range(s):
+                        dw = dw + tab.c[i] * K[i*ndim + k]
+                        e = e + (tab.c[i] - tab.d[i]) * K[i*ndim + k]
+                    w_new[k] = w[k] + h_step * dw
+                    sc = atol + rtol * fmax(fabs(w[k]), fabs(w_new[k]))
+                    err = err + (h_step * e / sc) * (h_step * e / sc)
+                err = sqrt(err / ndim)
+
+                if err == 0.:
+                    fac = 5.
+                else:
+                    fac = fmin(5., fmax(0.2, 0.9 * pow(err, -1. / tab.order)))
+
+                n_steps = n_steps + 1
+                if err <= 1.:
+                    if clipped:
+                        tt = t_end
+                    else:
+                        tt = tt + h_step
+                    for k in range(ndim):
+                        w[k] = w_new[k]
+
+                    if tab.fsal:
+                        for k in range(ndim):
+                            K[k] = K[(s-1)*ndim + k]
+                    k0 = tab.fsal
+
+                    if not clipped or fabs(h_step * fac) > fabs(h_next):
+                        h_next = h_step * fac
+
+                else:
+                    h_next = h_step * fmin(1., fac)
+                    if fabs(h_next) <= 1E-14 * fmax(fabs(tt), 1.):
+                        return -3
+
+        if j % store_every == 0 or j == ntimes - 1:
+            row = row + 1
+            _rk_store(out, s_stride, k_stride, row, ndim, w)
+
+    h[0] = h_next
+    return 0
+
+cdef int _check_rk_status(int res) except -1:
+    if res == -2:
+        raise RuntimeError("Larger nmax is needed.")
+    elif res == -3:
+        raise RuntimeError("Step size becomes too small.")
+    return 0
+
+cpdef rk_integrate_hamiltonian(hamiltonian, double[:,::1] w0, double[::1] t,
+                               double[::1] a, double[:,::1] b, double[::1] c,
+                               d=None, int order=5, adaptive=False,
+                               double atol=1E-10, double rtol=1E-10,
+                               long nmax=100000, n_threads=None,
+                               int store_every=1, out=None, dict state=None):
+    """
+    CAUTION: Interpretation of axes is different here! We need the
+    arrays to be C ordered and easy to iterate over, so here the
+    axes are (norbits, ndim).
+
+    Integrate with an explicit Runge-Kutta method given by the Butcher
+    tableau: the nodes ``a``, the (lower-triangular) Runge-Kutta matrix ``b``,
+    the weights ``c`` of the solution, and the weights ``d`` of the embedded
+    solution of an embedded method with the given ``order``. If the last stage
+    of the method is evaluated at the new phase-space position, it is reused
+    as the first stage of the next step.
+
+    By default, one step is taken between consecutive times. If ``adaptive``
+    (only supported for embedded methods), the step size of each orbit is
+    adapted to keep the estimated error of each step within the tolerances
+    ``atol`` and ``rtol``, with at most ``nmax`` steps. The orbits are
+    integrated independently, in parallel over ``n_threads`` threads (default:
+    ``gala.conf.n_threads``). Any reference frame is supported.
+
+    See ``dop853_integrate_hamiltonian()`` for ``store_every``, ``out``, and
+    ``state``, which keeps the step size of each orbit for ``adaptive``.
+    """
+
+    if not hamiltonian.c_enabled:
+        raise TypeError("Input Hamiltonian object does not support C-level access.")
+
+    if adaptive and d is None:
+        raise ValueError("Adaptive step sizes need an embedded Runge-Kutta "
+                         "method.")
+
+    cdef:
+        int i
+        int norbits = w0.shape[0]
+        int ndim = w0.shape[1]
+        int ntimes = len(t)
+        int s = len(a)
+        int _n_threads = _validate_n_threads(n_threads)
+        int _adaptive = bool(adaptive)
+
+        RKTableau tab
+        double[::1] d_arr
+        double[:,::1] w = np.array(w0, copy=True)
+        double[:,:,::1] all_w
+        double[:,::1] work
+        double[::1] h = np.full(norbits, t[1] - t[0])
+        int[::1] status = np.zeros(norbits, dtype=np.intc)
+        Py_ssize_t s_stride, o_stride, k_stride
+
+        CPotential cp = (<CPotentialWrapper>(hamiltonian.potential.c_instance)).cpotential
+        CFrame cf = (<CFrameWrapper>(hamiltonian.frame.c_instance)).cframe
+
+    if b.shape[0] != s or b.shape[1] != s or len(c) != s:
+        raise ValueError("Inconsistent shapes of the Butcher tableau.")
+
+    tab.n_stages = s
+    tab.a = &a[0]
+    tab.b = &b[0, 0]
+    tab.c = &c[0]
+    tab.d = NULL
+    tab.order = order
+    if d is not None:
+        d_arr = np.ascontiguousarray(d, dtype=np.float64)
+        if len(d_arr) != s:
+            raise ValueError("Inconsistent shapes of the Butcher tableau.")
+        tab.d = &d_arr[0]
+
+    # first same as last: the last stage is evaluated at the new position
+    tab.fsal = (a[s-1] == 1. and c[s-1] == 0. and
+                np.array_equal(np.asarray(b)[s-1, :s-1], np.asarray(c)[:s-1]))
+
+    if state is not None and 'h' in state:
+        if len(state['h']) != norbits:
+            raise ValueError("The integrator state is for a different number "
+                             "of orbits.")
+        np.asarray(h)[:] = state['h']
+
+    all_w_arr, strides = _prepare_output(
+        out, len(_store_indices(ntimes, store_every)), norbits, ndim)
+    all_w = all_w_arr
+    s_stride, o_stride, k_stride = strides
+    work = np.zeros((_n_threads, (s + 2) * ndim))
+
+    for i in prange(norbits, nogil=True, schedule='dynamic',
+                    num_threads=_n_threads):
+        status[i] = c_rk_orbit(&cp, &cf, ndim, &t[0], ntimes, &w[i, 0],
+                               &all_w[0, 0, 0] + i * o_stride,
+                               s_stride, k_stride, store_every, &tab,
+                               _adaptive, atol, rtol, nmax, &h[i],
+                               &work[threadid(), 0])
+
+    for i in range(norbits):
+        _check_rk_status(status[i])
+
+    if state is not None:
+        state['h'] = np.asarray(h)
+
+    return np.asarray(t)[_store_indices(ntimes, store_every)], all_w_arr
@@ -0,0 +1,206 @@
+""" Specifications of events that are detected during orbit integration, and
+    of conditions for stopping the integration of orbits.
+"""
+
+# Third-party
+import numpy as np
+
+__all__ = ['Event', 'Pericenter', 'Apocenter', 'PlaneCrossing',
+           'TurningPoint', 'StopConditions']
+
+
+class Event(object):
+    """
+    Base class for events that are detected during orbit integration as the
+    zero crossings of an event function of the phase-space position. See
+    `~gala.potential.Hamiltonian.find_events`.
+
+    Parameters
+    ----------
+    direction : int (optional)
+        Only detect crossings where the event function is increasing (+1),
+        decreasing (-1), or both (0, the default).
+    """
+
+    #: The kind of event function in C: 0 for ``x . v``, 1 for
+    #: ``n . x - offset``, and 2 for ``n . v - offset``.
+    _kind = None
+
+    def __init__(self, direction=0):
+        if direction not in (-1, 0, 1):
+            raise ValueError("direction must be -1, 0, or 1.")
+        self.direction = int(direction)
+
+    def _normal_offset(self, units, half_ndim):
+        return np.zeros(3), 0.
+
+    def _spec(self, units, half_ndim):
+        """
+        Return the specification of the event for the Cython integrators,
+        ``(kind, direction, n_x, n_y, n_z, offset)``, in the unit system
+        ``units``.
+        """
+        normal, offset = self._normal_offset(units, half_ndim)
+        return np.concatenate(([self._kind, self.direction], normal, [offset]))
+
+    def __repr__(self):
+        return "<{}>".format(self.__class__.__name__)
+
+
+class Pericenter(Event):
+    """
+    Pericenter passages relative to the origin, where ``x . v`` crosses zero
+    from below.
+    """
+    _kind = 0
+
+    def __init__(self):
+        super().__init__(direction=1)
+
+
+class Apocenter(Event):
+    """
+    Apocenter passages relative to the origin, where ``x . v`` crosses zero
+    from above.
+    """
+    _kind = 0
+
+    def __init__(self):
+        super().__init__(direction=-1)
+
+
+def _validate_normal(normal, half_ndim):
+    if normal is None:
+        normal = np.zeros(half_ndim)
+        normal[-1] = 1.
+
+    normal = np.array(normal, dtype=float)
+    if normal.shape != (half_ndim, ):
+        raise ValueError("The normal vector must have {} components, not {}."
+                         .format(half_ndim, normal.shape))
+
+    norm = np.linalg.norm(normal)
+    if norm == 0:
+        raise ValueError("The normal vector must be nonzero.")
+
+    return np.concatenate((normal / norm, np.zeros(3 - half_ndim)))
+
+
+class PlaneCrossing(Event):
+    """
+    Crossings of the plane ``n . x = offset``. By default, this is the
+    ``z = 0`` plane.
+
+    Parameters
+    ----------
+    normal : array_like (optional)
+        The normal vector of the plane. Defaults to the last axis, e.g.,
+        ``(0, 0, 1)`` in 3D.
+    offset : `~astropy.units.Quantity`, numeric (optional)
+        The distance of the plane from the origin along the normal vector. If
+        not a Quantity, this is assumed to be in the length unit of the
+        Hamiltonian.
+    direction : int (optional)
+        Only detect crossings in the direction of the normal vector (+1),
+        against it (-1), or both (0, the default).
+    """
+    _kind = 1
+
+    def __init__(self, normal=None, offset=0., direction=0):
+        super().__init__(direction=direction)
+        self.normal = normal
+        self.offset = offset
+
+    def _normal_offset(self, units, half_ndim):
+        offset = self.offset
+        if hasattr(offset, 'unit'):
+            offset = offset.decompose(units).value
+        return _validate_normal(self.normal, half_ndim), float(offset)
+
+
+class TurningPoint(Event):
+    """
+    Turning points of the motion along the direction ``n``, where the
+    velocity component ``n . v`` crosses zero. By default, these are the
+    turning points in ``z``, i.e. ``v_z = 0``.
+
+    Parameters
+    ----------
+    normal : array_like (optional)
+        The direction of motion. Defaults to the last axis, e.g.,
+        ``(0, 0, 1)`` in 3D.
+    direction : int (optional)
+        Only detect the maxima (-1) or the minima (+1) of ``n . x``, or both
+        (0, the default).
+    """
+    _kind = 2
+
+    def __init__(self, normal=None, direction=0):
+        super().__init__(direction=direction)
+        self.normal = normal
+
+    def _normal_offset(self, units, half_ndim):
+        return _validate_normal(self.normal, half_ndim), 0.
+
+
+class StopConditions(object):
+    """
+    Conditions for stopping the integration of individual orbits, e.g. to not
+    spend any more time on orbits that escape or that are captured by a
+    central object. The conditions are checked after every timestep, and an
+    orbit is no longer integrated once it meets any of them. See
+    `~gala.potential.Hamiltonian.integrate_orbit`.
+
+    Parameters
+    ----------
+    r_min : `~astropy.units.Quantity`, numeric (optional)
+        Stop orbits at radii smaller than this (e.g., a capture radius).
+    r_max : `~astropy.units.Quantity`, numeric (optional)
+        Stop orbits at radii larger than this.
+    E_max : `~astropy.units.Quantity`, numeric (optional)
+        Stop orbits with an energy (per unit mass, the value of the
+        Hamiltonian) larger than this, e.g. 0 for unbound orbits in a
+        potential that vanishes at infinity.
+    max_steps : int (optional)
+        Stop orbits after this many integration steps. For the DOPRI853
+        integrator, this counts the adaptive steps taken.
+
+    Quantities without units are assumed to be in the unit system of the
+    Hamiltonian.
+    """
+
+    def __init__(self, r_min=None, r_max=None, E_max=None, max_steps=None):
+        if max_steps is not None and int(max_steps) < 1:
+            raise ValueError("max_steps must be a positive integer.")
+
+        if r_min is None and r_max is None and E_max is None and max_steps is None:
+            raise ValueError("At least one stopping condition must be given.")
+
+        self.r_min = r_min
+        self.r_max = r_max
+        self.E_max = E_max
+        self.max_steps = max_steps
+
+    def _spec(self, units):
+        """
+        Return the stopping conditions for the Cython integrators,
+        ``(r_min, r_max, E_max, max_steps)``, in the unit system ``units``.
+        Disabled conditions are 0, infinity, infinity, and 0.
+        """
+        spec = [0., np.inf, np.inf, 0]
+        for i, val in enumerate([self.r_min, self.r_max, self.E_max]):
+            if val is not None:
+                if hasattr(val, 'unit'):
+                    val = val.decompose(units).value
+                spec[i] = float(val)
+
+        if self.max_steps is not None:
+            spec[3] = int(self.max_steps)
+
+        return np.array(spec, dtype=float)
+
+    def __repr__(self):
+        conds = ["{}={}".format(name, getattr(self, name))
+                 for name in ['r_min', 'r_max', 'E_max', 'max_steps']
+                 if getattr(self, name) is not None]
+        return "<StopConditions {}>".format(", ".join(conds))
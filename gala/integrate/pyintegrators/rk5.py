@@ -1,4 +1,4 @@
-""" 5th order Runge-Kutta integration. """
+""" Explicit Runge-Kutta integration. """
 
 # Third-party
 import numpy as np
@@ -7,9 +7,9 @@ import numpy as np
 from ..core import Integrator
 from ..timespec import parse_time_specification
 
-__all__ = ["RK5Integrator"]
+__all__ = ["RK4Integrator", "RK5Integrator", "RK45Integrator"]
 
-# These are the Dormand-Prince parameters for embedded Runge-Kutta methods
+# These are the Cash-Karp parameters for embedded Runge-Kutta methods
 A = np.array([0.0, 0.2, 0.3, 0.6, 1.0, 0.875])
 B = np.array([[0.0, 0.0, 0.0, 0.0, 0.0],
               [1./5., 0.0, 0.0, 0.0, 0.0],
@@ -23,20 +23,13 @@ D = np.array([2825./27648., 0., 18575./48384., 13525./55296.,
               277./14336., 1./4.])
 
 
-class RK5Integrator(Integrator):
+class _RungeKuttaIntegrator(Integrator):
     r"""
-    Initialize a 5th order Runge-Kutta integrator given a function for
-    computing derivatives with respect to the independent variables. The
-    function should, at minimum, take the independent variable as the
-    first argument, and the coordinates as a single vector as the second
-    argument. For notation and variable names, we assume this independent
-    variable is time, t, and the coordinate vector is named x, though it
-    could contain a mixture of coordinates and momenta for solving
-    Hamilton's equations, for example.
-
-    .. seealso::
-
-        - http://en.wikipedia.org/wiki/Runge%E2%80%93Kutta_methods
+    Base class for explicit Runge-Kutta integrators, defined by the Butcher
+    tableau set by the subclass: the nodes ``A``, the Runge-Kutta matrix
+    ``B``, the weights ``C`` of the solution, and (for embedded methods) the
+    weights ``D`` of the lower-order solution that is used to estimate the
+    error of a step.
 
     Parameters
     ----------
@@ -49,36 +42,153 @@ class RK5Integrator(Integrator):
     func_units : `~gala.units.UnitSystem` (optional)
         If using units, this is the unit system assumed by the
         integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+    adaptive : bool (optional)
+        Adapt the step size to keep the estimated error of each step within
+        the tolerances, taking as many steps as needed between the output
+        times. Only supported by embedded methods. All orbits share the same
+        step size (the Cython implementation used by
+        `~gala.potential.Hamiltonian.integrate_orbit` adapts the step size of
+        each orbit independently).
+    atol : numeric (optional)
+        The absolute tolerance for ``adaptive=True``.
+    rtol : numeric (optional)
+        The relative tolerance for ``adaptive=True``.
+    nmax : int (optional)
+        The maximum number of steps for ``adaptive=True``.
 
     """
 
+    #: The nodes of the Butcher tableau
+    A = None
+
+    #: The Runge-Kutta matrix of the Butcher tableau
+    B = None
+
+    #: The weights of the solution
+    C = None
+
+    #: The weights of the embedded lower-order solution (if any)
+    D = None
+
+    #: The order of the integrator
+    order = None
+
+    def __init__(self, func, func_args=(), func_units=None, progress=False,
+                 adaptive=False, atol=1E-10, rtol=1E-10, nmax=100000):
+        super().__init__(func, func_args=func_args, func_units=func_units,
+                         progress=progress)
+
+        if adaptive and self.D is None:
+            raise ValueError("{} does not support adaptive step sizes."
+                             .format(self.__class__.__name__))
+
+        self.adaptive = bool(adaptive)
+        self.atol = float(atol)
+        self.rtol = float(rtol)
+        self.nmax = int(nmax)
+
+    @classmethod
+    def _tableau(cls):
+        """
+        Return the Butcher tableau as arrays of the nodes (of length ``s``),
+        the full (lower-triangular) Runge-Kutta matrix with shape ``(s, s)``,
+        the weights of the solution, and the weights of the embedded solution
+        (or None), for a method with ``s`` stages.
+        """
+        a = np.array(cls.A, dtype=float)
+        s = len(a)
+        b = np.zeros((s, s))
+        for i, row in enumerate(cls.B):
+            b[i, :len(row)] = row
+
+        d = None
+        if cls.D is not None:
+            d = np.array(cls.D, dtype=float)
+        return a, b, np.array(cls.C, dtype=float), d
+
+    def _stages(self, t, w, dt):
+        F = lambda t, w: self.F(t, w, *self._func_args)
+
+        K = np.zeros((len(self.A),)+w.shape)
+        for i in range(len(self.A)):
+            dw = np.zeros_like(w)
+            for j in range(i):
+                dw = dw + self.B[i][j]*K[j]
+            K[i] = dt * F(t + self.A[i]*dt, w + dw)
+        return K
+
     def step(self, t, w, dt):
         """ Step forward the vector w by the given timestep.
 
             Parameters
             ----------
+            t : numeric
+                The time at the start of the step.
+            w : array_like
+                The phase-space position(s) at time ``t``.
             dt : numeric
                 The timestep to move forward.
         """
-
-        # Runge-Kutta Fehlberg formulas (see: Numerical Recipes)
-        F = lambda t, w: self.F(t, w, *self._func_args)
-
-        K = np.zeros((6,)+w.shape)
-        K[0] = dt * F(t, w)
-        K[1] = dt * F(t + A[1]*dt, w + B[1][0]*K[0])
-        K[2] = dt * F(t + A[2]*dt, w + B[2][0]*K[0] + B[2][1]*K[1])
-        K[3] = dt * F(t + A[3]*dt, w + B[3][0]*K[0] + B[3][1]*K[1] + B[3][2]*K[2])
-        K[4] = dt * F(t + A[4]*dt, w + B[4][0]*K[0] + B[4][1]*K[1] + B[4][2]*K[2] + B[4][3]*K[3])
-        K[5] = dt * F(t + A[5]*dt, w + B[5][0]*K[0] + B[5][1]*K[1] + B[5][2]*K[2] + B[5][3]*K[3] + B[5][4]*K[4])
+        K = self._stages(t, w, dt)
 
         # shift
         dw = np.zeros_like(w)
-        for i in range(6):
-            dw = dw + C[i]*K[i]
+        for i in range(len(self.C)):
+            dw = dw + self.C[i]*K[i]
 
         return w + dw
 
+    def _adaptive_step(self, t, w, t_end, h):
+        """
+        Step forward the vector w from time ``t`` to ``t_end`` with as many
+        adaptive steps as needed, starting with a step size ``h``. Returns
+        the phase-space position at ``t_end``, the proposed step size for the
+        next step, and the number of steps taken.
+        """
+        n_steps = 0
+        h_next = h
+        while (t_end - t) * np.sign(h) > 0:
+            if n_steps >= self.nmax:
+                raise RuntimeError("Larger nmax is needed.")
+
+            # don't step past the end of the interval
+            h_step = h_next
+            clipped = abs(h_step) >= abs(t_end - t)
+            if clipped:
+                h_step = t_end - t
+
+            K = self._stages(t, w, h_step)
+            dw = np.zeros_like(w)
+            err = np.zeros_like(w)
+            for i in range(len(self.C)):
+                dw = dw + self.C[i]*K[i]
+                err = err + (self.C[i] - self.D[i])*K[i]
+            w_new = w + dw
+
+            # RMS error norm of each orbit, relative to the tolerances
+            scale = self.atol + self.rtol * np.maximum(np.abs(w), np.abs(w_new))
+            err = np.max(np.sqrt(np.mean((err / scale)**2, axis=0)))
+
+            if err == 0.:
+                fac = 5.
+            else:
+                fac = min(5., max(0.2, 0.9 * err**(-1. / self.order)))
+
+            n_steps += 1
+            if err <= 1.:
+                t = t_end if clipped else t + h_step
+                w = w_new
+                if not clipped or abs(h_step * fac) > abs(h_next):
+                    h_next = h_step * fac
+            else:
+                h_next = h_step * min(1., fac)
+                if abs(h_next) <= 1E-14 * max(abs(t), 1.):
+                    raise RuntimeError("Step size becomes too small.")
+
+        return w, h_next, n_steps
+
     def run(self, w0, mmap=None, **time_spec):
 
         # generate the array of times
@@ -91,9 +201,149 @@ class RK5Integrator(Integrator):
         # Set first step to the initial conditions
         ws[:, 0] = w0
         w = w0.copy()
+        h = dt
+        n_total = 0
         range_ = self._get_range_func()
         for ii in range_(1, n_steps+1):
-            w = self.step(times[ii], w, dt)
+            if self.adaptive:
+                w, h, n = self._adaptive_step(times[ii-1], w, times[ii], h)
+                n_total += n
+                if n_total > self.nmax:
+                    raise RuntimeError("Larger nmax is needed.")
+            else:
+                w = self.step(times[ii-1], w, times[ii]-times[ii-1])
             ws[:, ii] = w
 
         return self._handle_output(w0_obj, times, ws)
+
+
+class RK4Integrator(_RungeKuttaIntegrator):
+    r"""
+    The classical 4th order Runge-Kutta integrator, with a fixed step size.
+
+    .. seealso::
+
+        - http://en.wikipedia.org/wiki/Runge%E2%80%93Kutta_methods
+
+    Parameters
+    ----------
+    func : func
+        A callable object that computes the phase-space coordinate
+        derivatives with respect to the independent variable at a point
+        in phase space.
+    func_args : tuple (optional)
+        Any extra arguments for the function.
+    func_units : `~gala.units.UnitSystem` (optional)
+        If using units, this is the unit system assumed by the
+        integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+
+    """
+    order = 4
+    A = np.array([0., 0.5, 0.5, 1.])
+    B = [[], [0.5], [0., 0.5], [0., 0., 1.]]
+    C = np.array([1./6., 1./3., 1./3., 1./6.])
+
+
+class RK5Integrator(_RungeKuttaIntegrator):
+    r"""
+    Initialize a 5th order Runge-Kutta integrator given a function for
+    computing derivatives with respect to the independent variables. The
+    function should, at minimum, take the independent variable as the
+    first argument, and the coordinates as a single vector as the second
+    argument. For notation and variable names, we assume this independent
+    variable is time, t, and the coordinate vector is named x, though it
+    could contain a mixture of coordinates and momenta for solving
+    Hamilton's equations, for example.
+
+    This uses the Cash-Karp coefficients, with an embedded 4th order solution
+    to estimate the error for ``adaptive=True``.
+
+    .. seealso::
+
+        - http://en.wikipedia.org/wiki/Runge%E2%80%93Kutta_methods
+
+    Parameters
+    ----------
+    func : func
+        A callable object that computes the phase-space coordinate
+        derivatives with respect to the independent variable at a point
+        in phase space.
+    func_args : tuple (optional)
+        Any extra arguments for the function.
+    func_units : `~gala.units.UnitSystem` (optional)
+        If using units, this is the unit system assumed by the
+        integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+    adaptive : bool (optional)
+        Adapt the step size to keep the estimated error of each step within
+        the tolerances ``atol`` and ``rtol``, with at most ``nmax`` steps. See
+        `~gala.integrate.RK45Integrator`.
+    atol : numeric (optional)
+    rtol : numeric (optional)
+    nmax : int (optional)
+
+    """
+    order = 5
+    A = A
+    B = B
+    C = C
+    D = D
+
+
+class RK45Integrator(_RungeKuttaIntegrator):
+    r"""
+    The Dormand-Prince 5(4) Runge-Kutta integrator, which advances the 5th
+    order solution and estimates the error of each step with an embedded 4th
+    order solution. The last stage of a step is evaluated at the new
+    phase-space position, so it is reused as the first stage of the next step
+    in the Cython implementation.
+
+    By default, this takes fixed steps. With ``adaptive=True``, the step size
+    is adapted to keep the estimated error of each step within the tolerances
+    ``atol`` and ``rtol``, and as many steps as needed are taken between the
+    output times.
+
+    .. seealso::
+
+        - Dormand, J. R. & Prince, P. J. (1980), Journal of Computational
+          and Applied Mathematics, 6, 19
+
+    Parameters
+    ----------
+    func : func
+        A callable object that computes the phase-space coordinate
+        derivatives with respect to the independent variable at a point
+        in phase space.
+    func_args : tuple (optional)
+        Any extra arguments for the function.
+    func_units : `~gala.units.UnitSystem` (optional)
+        If using units, this is the unit system assumed by the
+        integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+    adaptive : bool (optional)
+        Adapt the step size to the tolerances.
+    atol : numeric (optional)
+        The absolute tolerance for ``adaptive=True``.
+    rtol : numeric (optional)
+        The relative tolerance for ``adaptive=True``.
+    nmax : int (optional)
+        The maximum number of steps for ``adaptive=True``.
+
+    """
+    order = 5
+    A = np.array([0., 1./5., 3./10., 4./5., 8./9., 1., 1.])
+    B = [[],
+         [1./5.],
+         [3./40., 9./40.],
+         [44./45., -56./15., 32./9.],
+         [19372./6561., -25360./2187., 64448./6561., -212./729.],
+         [9017./3168., -355./33., 46732./5247., 49./176., -5103./18656.],
+         [35./384., 0., 500./1113., 125./192., -2187./6784., 11./84.]]
+    C = np.array([35./384., 0., 500./1113., 125./192., -2187./6784., 11./84.,
+                  0.])
+    D = np.array([5179./57600., 0., 7571./16695., 393./640., -92097./339200.,
+                  187./2100., 1./40.])
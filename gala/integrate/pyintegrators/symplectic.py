@@ -0,0 +1,192 @@
+""" Higher-order symplectic integration by composition of Leapfrog steps. """
+
+# Third-party
+import numpy as np
+
+# Project
+from ..core import Integrator
+from ..timespec import parse_time_specification
+
+__all__ = ["ForestRuth4Integrator", "Suzuki4Integrator",
+           "Yoshida6Integrator", "Yoshida8Integrator"]
+
+
+class _CompositionIntegrator(Integrator):
+    r"""
+    Base class for symplectic integrators that are constructed as a symmetric
+    composition of Leapfrog (kick-drift-kick) steps with sizes ``w_i * dt``
+    for the weights ``w_i`` set by the subclass. Adjacent kicks of consecutive
+    Leapfrog steps are merged, so a step requires one force evaluation per
+    weight.
+
+    Parameters
+    ----------
+    func : func
+        A callable object that computes the phase-space time derivatives
+        at a time and point in phase space.
+    func_args : tuple (optional)
+        Any extra arguments for the derivative function.
+    func_units : `~gala.units.UnitSystem` (optional)
+        If using units, this is the unit system assumed by the
+        integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+
+    """
+
+    #: The weights of the Leapfrog steps in the composition
+    weights = None
+
+    #: The order of the integrator
+    order = None
+
+    @classmethod
+    def _drift_kick_coefficients(cls):
+        """
+        Return the coefficients of the drift steps (of length ``s``) and of
+        the kick steps (of length ``s+1``) for a composition of ``s`` Leapfrog
+        steps, in units of the timestep.
+        """
+        w = np.array(cls.weights, dtype=float)
+        drift = w.copy()
+        kick = np.zeros(len(w) + 1)
+        kick[:-1] += w / 2.
+        kick[1:] += w / 2.
+        return drift, kick
+
+    def run(self, w0, mmap=None, **time_spec):
+
+        # generate the array of times
+        times = parse_time_specification(self._func_units, **time_spec)
+        n_steps = len(times) - 1
+        dt = times[1] - times[0]
+
+        w0_obj, w0, ws = self._prepare_ws(w0, mmap, n_steps)
+        drift, kick = self._drift_kick_coefficients()
+
+        x = w0[:self.ndim].copy()
+        v = w0[self.ndim:].copy()
+        a = self.F(times[0], w0, *self._func_args)[self.ndim:]
+
+        ws[:, 0] = w0
+        range_ = self._get_range_func()
+        for ii in range_(1, n_steps+1):
+            t = times[ii-1]
+            for k in range(len(drift)):
+                v = v + kick[k] * dt * a
+                x = x + drift[k] * dt * v
+                t = t + drift[k] * dt
+                a = self.F(t, np.vstack((x, v)), *self._func_args)[self.ndim:]
+            v = v + kick[-1] * dt * a
+
+            ws[:self.ndim, ii, :] = x
+            ws[self.ndim:, ii, :] = v
+
+        return self._handle_output(w0_obj, times, ws)
+
+
+class ForestRuth4Integrator(_CompositionIntegrator):
+    r"""
+    A fourth-order symplectic integrator (Forest & Ruth 1990, Yoshida 1990)
+    constructed as a composition of three Leapfrog steps.
+
+    This is the "triple jump" composition with weights
+    :math:`w_1 = w_3 = 1/(2 - 2^{1/3})` and
+    :math:`w_2 = -2^{1/3}/(2 - 2^{1/3})`.
+
+    Parameters
+    ----------
+    func : func
+        A callable object that computes the phase-space time derivatives
+        at a time and point in phase space.
+    func_args : tuple (optional)
+        Any extra arguments for the derivative function.
+    func_units : `~gala.units.UnitSystem` (optional)
+        If using units, this is the unit system assumed by the
+        integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+
+    """
+    order = 4
+    _x = 2**(1/3)
+    weights = (1 / (2 - _x), -_x / (2 - _x), 1 / (2 - _x))
+
+
+class Suzuki4Integrator(_CompositionIntegrator):
+    r"""
+    A fourth-order symplectic integrator (Suzuki 1990) constructed as a
+    composition of five Leapfrog steps.
+
+    The weights are :math:`w_1 = w_2 = w_4 = w_5 = 1/(4 - 4^{1/3})` and
+    :math:`w_3 = 1 - 4 w_1`. This uses more force evaluations per step than
+    `~gala.integrate.ForestRuth4Integrator`, but has a much smaller error
+    constant because all of the steps are small.
+
+    Parameters
+    ----------
+    func : func
+        A callable object that computes the phase-space time derivatives
+        at a time and point in phase space.
+    func_args : tuple (optional)
+        Any extra arguments for the derivative function.
+    func_units : `~gala.units.UnitSystem` (optional)
+        If using units, this is the unit system assumed by the
+        integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+
+    """
+    order = 4
+    _x = 1 / (4 - 4**(1/3))
+    weights = (_x, _x, 1 - 4*_x, _x, _x)
+
+
+class Yoshida6Integrator(_CompositionIntegrator):
+    r"""
+    A sixth-order symplectic integrator (Yoshida 1990, solution A)
+    constructed as a composition of seven Leapfrog steps.
+
+    Parameters
+    ----------
+    func : func
+        A callable object that computes the phase-space time derivatives
+        at a time and point in phase space.
+    func_args : tuple (optional)
+        Any extra arguments for the derivative function.
+    func_units : `~gala.units.UnitSystem` (optional)
+        If using units, this is the unit system assumed by the
+        integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+
+    """
+    order = 6
+    _w = (-1.17767998417887, 0.235573213359357, 0.784513610477560)
+    weights = _w[::-1] + (1 - 2*sum(_w),) + _w
+
+
+class Yoshida8Integrator(_CompositionIntegrator):
+    r"""
+    An eighth-order symplectic integrator (Yoshida 1990, solution D)
+    constructed as a composition of fifteen Leapfrog steps.
+
+    Parameters
+    ----------
+    func : func
+        A callable object that computes the phase-space time derivatives
+        at a time and point in phase space.
+    func_args : tuple (optional)
+        Any extra arguments for the derivative function.
+    func_units : `~gala.units.UnitSystem` (optional)
+        If using units, this is the unit system assumed by the
+        integrand function.
+    progress : bool (optional)
+        Display a progress bar during integration.
+
+    """
+    order = 8
+    _w = (0.102799849391985, -1.96061023297549, 1.93813913762276,
+          -0.158240635368243, -1.44485223686048, 0.253693336566229,
+          0.914844246229740)
+    weights = _w[::-1] + (1 - 2*sum(_w),) + _w
@@ -17,6 +17,7 @@ def get_extensions():
     cfg['extra_compile_args'].append('--std=gnu99')
     cfg['sources'].append('gala/integrate/cyintegrators/leapfrog.pyx')
     cfg['sources'].append('gala/potential/potential/src/cpotential.c')
+    cfg['sources'].append('gala/potential/hamiltonian/src/chamiltonian.c')
     exts.append(Extension('gala.integrate.cyintegrators.leapfrog', **cfg))
 
     cfg = defaultdict(list)
@@ -28,6 +29,27 @@ def get_extensions():
     cfg['sources'].append('gala/potential/potential/src/cpotential.c')
     cfg['sources'].append('gala/integrate/cyintegrators/dop853.pyx')
     cfg['sources'].append('gala/integrate/cyintegrators/dopri/dop853.c')
+    cfg['sources'].append('gala/potential/force/src/cforce.c')
     exts.append(Extension('gala.integrate.cyintegrators.dop853', **cfg))
 
+    cfg = defaultdict(list)
+    cfg['include_dirs'].append(np.get_include())
+    cfg['include_dirs'].append(mac_incl_path)
+    cfg['include_dirs'].append('gala/potential')
+    cfg['extra_compile_args'].append('--std=gnu99')
+    cfg['sources'].append('gala/integrate/cyintegrators/events.pyx')
+    cfg['sources'].append('gala/potential/hamiltonian/src/chamiltonian.c')
+    cfg['sources'].append('gala/potential/potential/src/cpotential.c')
+    exts.append(Extension('gala.integrate.cyintegrators.events', **cfg))
+
+    cfg = defaultdict(list)
+    cfg['include_dirs'].append(np.get_include())
+    cfg['include_dirs'].append(mac_incl_path)
+    cfg['include_dirs'].append('gala/potential')
+    cfg['extra_compile_args'].append('--std=gnu99')
+    cfg['sources'].append('gala/integrate/cyintegrators/rk.pyx')
+    cfg['sources'].append('gala/potential/hamiltonian/src/chamiltonian.c')
+    cfg['sources'].append('gala/potential/potential/src/cpotential.c')
+    exts.append(Extension('gala.integrate.cyintegrators.rk', **cfg))
+
     return exts
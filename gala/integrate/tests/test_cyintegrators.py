@@ -6,6 +6,7 @@
 import time
 
 # Third-party
+import astropy.units as u
 import numpy as np
 import pytest
 
@@ -13,9 +14,16 @@ import pytest
 from ..pyintegrators.leapfrog import LeapfrogIntegrator
 from ..cyintegrators.leapfrog import leapfrog_integrate_hamiltonian
 from ..pyintegrators.dopri853 import DOPRI853Integrator
-from ..cyintegrators.dop853 import dop853_integrate_hamiltonian
-from ...potential import Hamiltonian, HernquistPotential
-from ...units import galactic
+from ..pyintegrators.rk5 import RK4Integrator, RK5Integrator, RK45Integrator
+from ..pyintegrators.symplectic import (ForestRuth4Integrator,
+                                        Suzuki4Integrator,
+                                        Yoshida6Integrator,
+                                        Yoshida8Integrator)
+from ..cyintegrators.dop853 import (dop853_integrate_hamiltonian,
+                                    _n_evaluations)
+from ...potential import (Hamiltonian, HernquistPotential, KeplerPotential,
+                          MilkyWayPotential, ConstantRotatingFrame)
+from ...units import galactic, dimensionless
 
 integrator_list = [LeapfrogIntegrator, DOPRI853Integrator]
 func_list = [leapfrog_integrate_hamiltonian, dop853_integrate_hamiltonian]
@@ -54,6 +62,376 @@ def test_compare_to_py(Integrator, integrate_func):
     assert np.allclose(cy_t, py_t)
 
 
+@pytest.mark.parametrize("n_threads", [1, 4])
+def test_dop853_independent_steps(n_threads):
+    p = HernquistPotential(m=1E11, c=0.5, units=galactic)
+    H = Hamiltonian(potential=p)
+
+    # the first orbit passes close to the center and needs much smaller steps
+    w0 = np.array([[0.05, 0., 0., 0., 0.05, 0.],
+                   [0., 10., 0., 0.2, 0., 0.],
+                   [10., 0., 0., 0., 0.2, 0.],
+                   [0., 10., 0., 0., 0., 0.2]])
+    t = np.linspace(0, 1000., 257)
+
+    _, w = dop853_integrate_hamiltonian(H, w0, t, independent_steps=True,
+                                        n_threads=n_threads)
+    assert w.shape == (len(t), w0.shape[0], 6)
+
+    # each orbit should be identical to integrating it on its own
+    for i in range(w0.shape[0]):
+        _, w_i = dop853_integrate_hamiltonian(H, w0[i:i+1].copy(), t)
+        assert np.all(w[:, i] == w_i[:, 0])
+
+    # unit conversions perturb the initial conditions at the level of round-off,
+    # so only compare the well-behaved orbits here
+    orbit = H.integrate_orbit(w0[1:].T, t=t, Integrator=DOPRI853Integrator,
+                              Integrator_kwargs=dict(independent_steps=True))
+    assert np.allclose(orbit.w(galactic), np.rollaxis(w[:, 1:], -1))
+
+    # the Cython-only options are ignored by the Python integrator
+    py_orbit = H.integrate_orbit(w0[1:].T, t=t, Integrator=DOPRI853Integrator,
+                                 Integrator_kwargs=dict(independent_steps=True,
+                                                        n_threads=n_threads),
+                                 cython_if_possible=False)
+    assert np.allclose(py_orbit.w(galactic), orbit.w(galactic), rtol=1e-6)
+
+
+@pytest.mark.parametrize("n_threads", [1, 4])
+def test_leapfrog_threads(n_threads):
+    H = Hamiltonian(MilkyWayPotential())
+
+    # more orbits than fit in one chunk
+    rnd = np.random.RandomState(42)
+    n = 600
+    w0 = np.hstack((rnd.normal(0, 10., size=(n, 3)),
+                    rnd.normal(0, 0.1, size=(n, 3))))
+    t = np.linspace(0, 100., 129)
+
+    _, w = leapfrog_integrate_hamiltonian(H, w0, t, n_threads=n_threads)
+    assert w.shape == (len(t), n, 6)
+    assert np.all(w[0] == w0)
+
+    # each orbit should be identical to integrating it on its own, and the
+    # result should not depend on the number of threads
+    for i in [0, 255, 256, n-1]:
+        _, w_i = leapfrog_integrate_hamiltonian(H, w0[i:i+1].copy(), t)
+        assert np.allclose(w[:, i], w_i[:, 0], rtol=1e-12, atol=1e-12)
+
+    _, w_serial = leapfrog_integrate_hamiltonian(H, w0, t, n_threads=1)
+    assert np.all(w == w_serial)
+
+
+@pytest.mark.parametrize("Integrator", [LeapfrogIntegrator,
+                                        Yoshida6Integrator])
+def test_n_threads_python(Integrator):
+    # n_threads is only used by the Cython integrators, and is ignored by the
+    # Python integrators
+    H = Hamiltonian(HernquistPotential(m=1E11, c=0.5, units=galactic))
+    w0 = np.array([[10., 0., 0., 0., 0.2, 0.],
+                   [0., 10., 0., 0.2, 0., 0.]])
+
+    orbit = H.integrate_orbit(w0.T, dt=1., n_steps=100, Integrator=Integrator,
+                              Integrator_kwargs=dict(n_threads=2))
+    orbit_py = H.integrate_orbit(w0.T, dt=1., n_steps=100,
+                                 Integrator=Integrator,
+                                 Integrator_kwargs=dict(n_threads=2),
+                                 cython_if_possible=False)
+    assert np.allclose(orbit.w(galactic), orbit_py.w(galactic),
+                       rtol=1E-12, atol=1E-12)
+
+
+composition_list = [ForestRuth4Integrator, Suzuki4Integrator,
+                    Yoshida6Integrator, Yoshida8Integrator]
+
+
+@pytest.mark.parametrize("Integrator", composition_list)
+def test_composition_order(Integrator):
+    H = Hamiltonian(KeplerPotential(m=1., units=dimensionless))
+    w0 = np.array([1., 0, 0, 0, 1.2, 0])
+    T = 10.
+
+    orbit = H.integrate_orbit(w0, t=np.array([0, T]),
+                              Integrator=DOPRI853Integrator,
+                              Integrator_kwargs=dict(atol=1E-15, rtol=1E-15))
+    w_ref = orbit.w()[:, -1]
+
+    # the error should scale as dt^order (use steps where the error is well
+    # above round-off)
+    n_steps = {4: [200, 400], 6: [100, 200], 8: [50, 100]}[Integrator.order]
+    errs = []
+    for n in n_steps:
+        orbit = H.integrate_orbit(w0, dt=T/n, n_steps=n, Integrator=Integrator)
+        errs.append(np.abs(orbit.w()[:, -1] - w_ref).max())
+    assert abs(np.log2(errs[0] / errs[1]) - Integrator.order) < 0.3
+
+    # compare to the Python implementation
+    orbit_py = H.integrate_orbit(w0, dt=T/n, n_steps=n, Integrator=Integrator,
+                                 cython_if_possible=False)
+    assert np.allclose(orbit.w(), orbit_py.w(), rtol=1E-12, atol=1E-12)
+
+
+@pytest.mark.parametrize("Integrator", composition_list)
+def test_composition_rot_frame(Integrator):
+    frame = ConstantRotatingFrame(Omega=[0.3, 0.2, 0.9], units=dimensionless)
+    H = Hamiltonian(HernquistPotential(m=1., c=0.2, units=dimensionless),
+                    frame)
+    w0 = np.array([[1., 0.1, 0.2, 0, 0.8, 0.1],
+                   [0.8, -0.5, 0., 0.4, 0.7, 0.3]])
+    t = np.linspace(0, 20., 801)
+
+    _, w_dop = dop853_integrate_hamiltonian(H, w0, t, 1E-13, 1E-13)
+    orbit = H.integrate_orbit(w0.T, t=t, Integrator=Integrator)
+    assert np.allclose(orbit.w(), np.rollaxis(w_dop, -1), atol=1E-5)
+
+
+@pytest.mark.parametrize("Integrator, Integrator_kwargs", [
+    (LeapfrogIntegrator, dict()),
+    (Yoshida6Integrator, dict()),
+    (DOPRI853Integrator, dict()),
+    (DOPRI853Integrator, dict(independent_steps=True))
+])
+@pytest.mark.parametrize("store_every", [1, 7, 10, 200])
+def test_store_every(Integrator, Integrator_kwargs, store_every):
+    H = Hamiltonian(HernquistPotential(m=1E11, c=1., units=galactic))
+    w0 = np.array([[10., 0, 0, 0, 0.15, 0.01],
+                   [8., 1., 0, 0.02, 0.18, 0.]]).T
+
+    orbit = H.integrate_orbit(w0, dt=0.5, n_steps=100,
+                              Integrator=Integrator,
+                              Integrator_kwargs=Integrator_kwargs)
+    thin = H.integrate_orbit(w0, dt=0.5, n_steps=100,
+                             Integrator=Integrator,
+                             Integrator_kwargs=Integrator_kwargs,
+                             store_every=store_every)
+
+    idx = list(range(0, 101, store_every))
+    if idx[-1] != 100:  # the final state is always stored
+        idx.append(100)
+
+    assert thin.ntimes == len(idx)
+    assert np.all(thin.t == orbit.t[idx])
+    assert np.all(thin.xyz == orbit.xyz[:, idx])
+    assert np.all(thin.v_xyz == orbit.v_xyz[:, idx])
+
+    # the Python integrators thin the output after integrating
+    thin_py = H.integrate_orbit(w0, dt=0.5, n_steps=100,
+                                Integrator=Integrator,
+                                store_every=store_every,
+                                cython_if_possible=False)
+    assert thin_py.ntimes == len(idx)
+
+    with pytest.raises(ValueError):
+        H.integrate_orbit(w0, dt=0.5, n_steps=100, Integrator=Integrator,
+                          store_every=0)
+
+
+@pytest.mark.parametrize("Integrator, Integrator_kwargs", [
+    (LeapfrogIntegrator, dict()),
+    (Yoshida6Integrator, dict()),
+    (DOPRI853Integrator, dict()),
+    (DOPRI853Integrator, dict(independent_steps=True))
+])
+def test_integrate_out(tmpdir, Integrator, Integrator_kwargs):
+    H = Hamiltonian(HernquistPotential(m=1E11, c=1., units=galactic))
+    w0 = np.array([[10., 0, 0, 0, 0.15, 0.01],
+                   [8., 1., 0, 0.02, 0.18, 0.]]).T
+    kw = dict(dt=0.5, n_steps=100, Integrator=Integrator,
+              Integrator_kwargs=Integrator_kwargs, store_every=7)
+
+    orbit = H.integrate_orbit(w0, **kw)
+
+    # the orbits are written directly to the memory-mapped array
+    filename = str(tmpdir.join('orbits.dat'))
+    mmap = np.memmap(filename, mode='w+', dtype=np.float64,
+                     shape=(6, orbit.ntimes, 2))
+    orbit_mmap = H.integrate_orbit(w0, out=mmap, **kw)
+    assert np.all(orbit_mmap.xyz == orbit.xyz)
+    assert np.all(orbit_mmap.v_xyz == orbit.v_xyz)
+    assert np.all(orbit_mmap.t == orbit.t)
+    assert np.shares_memory(orbit_mmap.pos.x, mmap)
+    del orbit_mmap, mmap
+
+    mmap = np.memmap(filename, mode='r', dtype=np.float64,
+                     shape=(6, orbit.ntimes, 2))
+    assert np.all(mmap[:3] == orbit.xyz.value)
+
+    # writing to a read-only array fails
+    with pytest.raises(TypeError):
+        H.integrate_orbit(w0, out=mmap, **kw)
+
+    # a path to a file to create
+    filename = str(tmpdir.join('orbits2.dat'))
+    orbit_path = H.integrate_orbit(w0, out=filename, **kw)
+    assert np.all(orbit_path.xyz == orbit.xyz)
+
+    # a single orbit
+    out = np.zeros((6, orbit.ntimes, 1))
+    orbit1 = H.integrate_orbit(w0[:, 1], out=out, **kw)
+    assert orbit1.xyz.shape == (3, orbit.ntimes)
+    assert np.allclose(orbit1.xyz, orbit.xyz[..., 1], atol=1e-12*u.kpc)
+
+    with pytest.raises(ValueError):
+        H.integrate_orbit(w0, out=np.zeros((6, orbit.ntimes+1, 2)), **kw)
+
+
+@pytest.mark.parametrize("Integrator, Integrator_kwargs", [
+    (LeapfrogIntegrator, dict()),
+    (Yoshida6Integrator, dict()),
+    (DOPRI853Integrator, dict()),
+    (DOPRI853Integrator, dict(independent_steps=True))
+])
+@pytest.mark.parametrize("cython_if_possible", [True, False])
+def test_iter_integrate(Integrator, Integrator_kwargs, cython_if_possible):
+    if not cython_if_possible and Integrator_kwargs:
+        pytest.skip("Option only supported by the Cython integrator")
+
+    H = Hamiltonian(HernquistPotential(m=1E11, c=1., units=galactic))
+    w0 = np.array([[10., 0, 0, 0, 0.15, 0.01],
+                   [8., 1., 0, 0.02, 0.18, 0.]]).T
+    kw = dict(dt=0.5, n_steps=1000, Integrator=Integrator,
+              Integrator_kwargs=Integrator_kwargs, store_every=5,
+              cython_if_possible=cython_if_possible)
+
+    orbit = H.integrate_orbit(w0, **kw)
+    chunks = list(H.iter_integrate(w0, chunk_steps=150, **kw))
+    assert len(chunks) == 7
+    assert chunks[0].ntimes == 31
+    assert all(chunk.ntimes == 30 for chunk in chunks[1:-1])
+
+    t = np.concatenate([chunk.t.value for chunk in chunks])
+    xyz = np.concatenate([chunk.xyz.value for chunk in chunks], axis=1)
+    v_xyz = np.concatenate([chunk.v_xyz.value for chunk in chunks], axis=1)
+    assert np.all(t == orbit.t.value)
+
+    if Integrator == DOPRI853Integrator:
+        # the integrator stops at the end of each chunk
+        assert np.allclose(xyz, orbit.xyz.value, atol=1E-6)
+        assert np.allclose(v_xyz, orbit.v_xyz.value, atol=1E-6)
+    else:
+        # the integrator state is kept, so the orbits are identical
+        assert np.all(xyz == orbit.xyz.value)
+        assert np.all(v_xyz == orbit.v_xyz.value)
+
+    # raw arrays, a single orbit
+    chunks = list(H.iter_integrate(w0[:, 0], chunk_steps=150, raw=True, **kw))
+    t = np.concatenate([chunk_t for chunk_t, _ in chunks])
+    w = np.concatenate([chunk_w for _, chunk_w in chunks], axis=1)
+    assert w.shape == (6, orbit.ntimes)
+    assert np.allclose(w[:3], orbit.xyz.value[..., 0], atol=1E-6)
+
+    with pytest.raises(ValueError):
+        next(H.iter_integrate(w0, chunk_steps=151, **kw))
+
+
+@pytest.mark.parametrize("Integrator, Integrator_kwargs", [
+    (LeapfrogIntegrator, dict()),
+    (Yoshida6Integrator, dict()),
+    (DOPRI853Integrator, dict()),
+    (DOPRI853Integrator, dict(independent_steps=True))
+])
+def test_find_events(Integrator, Integrator_kwargs):
+    from .. import Pericenter, Apocenter, PlaneCrossing, TurningPoint
+
+    H = Hamiltonian(KeplerPotential(m=1E11, units=galactic))
+    GM = H.potential.parameters['m'].value * H.potential.G
+
+    # start the orbits at apocenter, inclined to the z=0 plane
+    r0 = np.array([10., 12.])
+    vt = np.array([0.18, 0.16])
+    w0 = np.zeros((6, 2))
+    w0[0] = r0
+    w0[4] = vt * np.cos(0.3)
+    w0[5] = vt * np.sin(0.3)
+
+    a = 1 / (2/r0 - vt**2/GM)
+    e = r0 / a - 1
+    T = 2*np.pi * np.sqrt(a**3 / GM)
+
+    events = [Pericenter(), Apocenter(), PlaneCrossing(), TurningPoint()]
+    (peri, apo, plane, turn) = H.find_events(w0, events, dt=0.1, n_steps=10000,
+                                             Integrator=Integrator,
+                                             Integrator_kwargs=Integrator_kwargs)
+
+    for i in range(2):
+        # pericenters at T/2, 3T/2, ..., and apocenters at T, 2T, ...
+        orbit, t, w = peri
+        n_peri = int(1000 / T[i] + 0.5)
+        assert np.sum(orbit == i) == n_peri
+        assert np.allclose(t[orbit == i].value, T[i] * (np.arange(n_peri) + 0.5),
+                           rtol=1E-5)
+        r = np.sqrt(np.sum(w.xyz.value[:, orbit == i]**2, axis=0))
+        assert np.allclose(r, a[i] * (1 - e[i]), rtol=1E-5)
+
+        orbit, t, w = apo
+        n_apo = int(1000 / T[i])
+        assert np.sum(orbit == i) == n_apo
+        assert np.allclose(t[orbit == i].value, T[i] * (np.arange(n_apo) + 1),
+                           rtol=1E-5)
+        r = np.sqrt(np.sum(w.xyz.value[:, orbit == i]**2, axis=0))
+        assert np.allclose(r, a[i] * (1 + e[i]), rtol=1E-5)
+
+        # the orbits start in the plane, so they cross it twice per period
+        orbit, t, w = plane
+        assert abs(np.sum(orbit == i) - 2000 / T[i]) <= 1
+        assert np.allclose(w.z.value[orbit == i], 0, atol=1E-10)
+
+        orbit, t, w = turn
+        assert abs(np.sum(orbit == i) - 2000 / T[i]) <= 1
+        assert np.allclose(w.v_z.value[orbit == i], 0, atol=1E-10)
+
+    # a single orbit, and events in a given direction
+    (plane, ) = H.find_events(w0[:, 0], PlaneCrossing(direction=1),
+                              dt=0.1, n_steps=10000, Integrator=Integrator,
+                              Integrator_kwargs=Integrator_kwargs)
+    assert np.all(plane[0] == 0)
+    assert np.all(plane[2].v_z > 0)
+    assert len(plane[1]) == int(1000 / T[0])
+
+    with pytest.raises(TypeError):
+        H.find_events(w0, "pericenter", dt=0.1, n_steps=10)
+
+
+def test_dop853_dense_output():
+    p = HernquistPotential(m=1E11, c=0.5, units=galactic)
+    H = Hamiltonian(potential=p)
+
+    w0 = np.array([[0., 10., 0., 0.2, 0., 0.],
+                   [10., 0., 0., 0., 0.2, 0.]])
+
+    # the solution at the output times should not depend on how densely the
+    # orbit is sampled
+    t_coarse = np.linspace(0, 2000., 5)
+    t_fine = np.linspace(0, 2000., 4097)
+    _, w_coarse = dop853_integrate_hamiltonian(H, w0, t_coarse)
+    _, w_fine = dop853_integrate_hamiltonian(H, w0, t_fine)
+    assert np.all(w_coarse[0] == w0)
+    assert np.allclose(w_fine[::1024], w_coarse, rtol=1E-8, atol=1E-8)
+
+    # integrating backwards recovers the initial conditions
+    _, w_back = dop853_integrate_hamiltonian(H, w_fine[-1].copy(),
+                                             t_fine[::-1].copy())
+    assert np.allclose(w_back[-1], w0, rtol=1E-6, atol=1E-6)
+    assert np.allclose(w_back[::-1], w_fine, rtol=1E-6, atol=1E-6)
+
+
+def test_dop853_evaluations_independent_of_sampling():
+    p = HernquistPotential(m=1E11, c=0.5, units=galactic)
+    H = Hamiltonian(potential=p)
+    w0 = np.array([[0., 10., 0., 0.2, 0., 0.]])
+
+    # the step size is set by the tolerances, so the number of evaluations of
+    # the equations of motion should barely change with the number of outputs
+    n_eval = []
+    for ntimes in [11, 1001, 100001]:
+        t = np.linspace(0, 5000., ntimes)
+        dop853_integrate_hamiltonian(H, w0, t)
+        n_eval.append(_n_evaluations())
+
+    assert n_eval[0] > 0
+    assert max(n_eval) < 1.5 * min(n_eval)
+
+
 # TODO: move this to only run if a flag like --remote-data is passed, like
 # --speed-scaling or something?
 @pytest.mark.skipif(True, reason="Slow test - mainly for plotting locally")
@@ -105,3 +483,111 @@ def test_scaling(tmpdir, Integrator, integrate_func):
     # pl.tight_layout()
     # # pl.show()
     # pl.savefig(os.path.join(tmpdir, "integrate-scaling.png"), dpi=300)
+
+
+@pytest.mark.parametrize("Integrator, Integrator_kwargs", [
+    (LeapfrogIntegrator, dict()),
+    (Yoshida6Integrator, dict()),
+    (DOPRI853Integrator, dict()),
+    (DOPRI853Integrator, dict(independent_steps=True))
+])
+def test_stop_conditions(Integrator, Integrator_kwargs):
+    from .. import StopConditions
+
+    H = Hamiltonian(HernquistPotential(m=1E11, c=5., units=galactic))
+
+    # bound orbits, and orbits that escape past 40 kpc
+    w0 = np.zeros((6, 4))
+    w0[0] = 10.
+    w0[4] = [0.1, 0.3, 0.15, 0.4]
+    kw = dict(dt=0.5, n_steps=1000, Integrator=Integrator,
+              Integrator_kwargs=Integrator_kwargs)
+
+    orbit = H.integrate_orbit(w0, **kw)
+    r = np.sqrt(np.sum(orbit.xyz.value**2, axis=0))
+    escaped = np.any(r > 40., axis=0)
+    assert np.all(escaped == [False, True, False, True])
+
+    stop_orbit = H.integrate_orbit(w0, stop=StopConditions(r_max=40*u.kpc),
+                                   **kw)
+    end = stop_orbit.end_index
+    assert end.shape == (4, )
+    assert np.all(end[~escaped] == 1000)
+    assert orbit.end_index is None
+    for i in np.where(escaped)[0]:
+        # stopped at the first stored time outside of r_max, or at the end of
+        # the adaptive step that crossed it
+        if Integrator == DOPRI853Integrator:
+            assert end[i] >= np.argmax(r[:, i] > 40.) - 1
+            assert r[end[i]+1, i] > 40.
+        else:
+            assert end[i] == np.argmax(r[:, i] > 40.)
+        assert np.all(np.isnan(stop_orbit.xyz.value[:, end[i]+1:, i]))
+        assert np.allclose(stop_orbit.xyz.value[:, :end[i]+1, i],
+                           orbit.xyz.value[:, :end[i]+1, i], atol=1E-5)
+    assert np.allclose(stop_orbit.xyz.value[..., ~escaped],
+                       orbit.xyz.value[..., ~escaped], atol=1E-5)
+
+    # unbound orbits stop immediately
+    end = H.integrate_orbit(w0, stop=StopConditions(E_max=0.), **kw).end_index
+    assert np.all((end == 0) == escaped)
+
+    # a single orbit (DOPRI853 counts its adaptive steps)
+    stop_orbit = H.integrate_orbit(w0[:, 0], store_every=10,
+                                   stop=StopConditions(max_steps=100), **kw)
+    assert stop_orbit.end_index.shape == (1, )
+    end = stop_orbit.end_index[0]
+    if Integrator != DOPRI853Integrator:
+        assert end == 10
+    assert np.all(np.isfinite(stop_orbit.xyz.value[:, :end+1]))
+    assert np.all(np.isnan(stop_orbit.xyz.value[:, end+1:]))
+
+    with pytest.raises(ValueError):
+        H.integrate_orbit(w0, stop=StopConditions(r_max=40.), **kw,
+                          cython_if_possible=False)
+
+    with pytest.raises(ValueError):
+        StopConditions()
+
+
+@pytest.mark.parametrize("Integrator, Integrator_kwargs", [
+    (RK4Integrator, dict()),
+    (RK5Integrator, dict()),
+    (RK45Integrator, dict()),
+    (RK5Integrator, dict(adaptive=True, atol=1E-11, rtol=1E-11)),
+    (RK45Integrator, dict(adaptive=True, atol=1E-11, rtol=1E-11)),
+    (RK45Integrator, dict(adaptive=True, atol=1E-11, rtol=1E-11, n_threads=2))
+])
+def test_runge_kutta(Integrator, Integrator_kwargs):
+    H = Hamiltonian(HernquistPotential(m=1E11, c=5., units=galactic))
+    w0 = np.array([[10., 0., 0., 0., 0.1, 0.02],
+                   [5., 0., 0., 0., 0.2, 0.02],
+                   [20., 0., 0., 0., 0.15, 0.02]]).T
+
+    # compare to the Python implementation, which takes the same steps
+    kw = dict(dt=5., n_steps=400, Integrator=Integrator)
+    py_kwargs = {k: v for k, v in Integrator_kwargs.items() if k != 'n_threads'}
+    cy_orbit = H.integrate_orbit(w0, Integrator_kwargs=Integrator_kwargs, **kw)
+    for i in range(w0.shape[1]):
+        py_orbit = H.integrate_orbit(w0[:, i], Integrator_kwargs=py_kwargs,
+                                     cython_if_possible=False, **kw)
+        assert np.allclose(cy_orbit.xyz.value[..., i], py_orbit.xyz.value,
+                           atol=1E-8)
+
+    if Integrator_kwargs.get('adaptive', False):
+        # the orbits are accurate even though the output spacing is large
+        dop_orbit = H.integrate_orbit(w0, Integrator=DOPRI853Integrator,
+                                      dt=5., n_steps=400)
+        assert np.allclose(cy_orbit.xyz.value, dop_orbit.xyz.value, atol=1E-6)
+
+    # any reference frame is supported
+    frame = ConstantRotatingFrame([0, 0, -40.] * u.km/u.s/u.kpc,
+                                  units=galactic)
+    H = Hamiltonian(H.potential, frame=frame)
+    cy_orbit = H.integrate_orbit(w0, Integrator_kwargs=Integrator_kwargs,
+                                 store_every=10, **kw)
+    py_orbit = H.integrate_orbit(w0, Integrator_kwargs=py_kwargs,
+                                 cython_if_possible=False, **kw)
+    assert cy_orbit.ntimes == 41
+    assert np.allclose(cy_orbit.xyz.value, py_orbit.xyz.value[:, ::10],
+                       atol=1E-8)
@@ -12,10 +12,15 @@ except ImportError:
     HAS_TQDM = False
 
 # Project
-from .. import LeapfrogIntegrator, RK5Integrator, DOPRI853Integrator
+from .. import (LeapfrogIntegrator, RK4Integrator, RK5Integrator,
+                RK45Integrator, DOPRI853Integrator, ForestRuth4Integrator,
+                Suzuki4Integrator, Yoshida6Integrator, Yoshida8Integrator)
 
 # Integrators to test
-integrator_list = [RK5Integrator, DOPRI853Integrator, LeapfrogIntegrator]
+integrator_list = [RK4Integrator, RK5Integrator, RK45Integrator,
+                   DOPRI853Integrator, LeapfrogIntegrator,
+                   ForestRuth4Integrator, Suzuki4Integrator,
+                   Yoshida6Integrator, Yoshida8Integrator]
 
 # Gradient functions:
 def sho_F(t, w, T): # noqa
@@ -65,6 +70,9 @@ def test_sho_forward_backward(Integrator):
     if Integrator == LeapfrogIntegrator:
         dt = 1E-4
         n_steps = int(1E4)
+    elif Integrator == ForestRuth4Integrator:
+        dt = 1E-3
+        n_steps = int(1E3)
 
     forw = integrator.run([0., 1.], dt=dt, n_steps=n_steps)
     back = integrator.run([0., 1.], dt=-dt, n_steps=n_steps)
@@ -131,3 +139,18 @@ def test_memmap(tmpdir, Integrator):
     integrator = Integrator(sho_F, func_args=(1.,))
 
     _ = integrator.run(w0, dt=dt, n_steps=n_steps, mmap=mmap)
+
+
+@pytest.mark.parametrize("Integrator", [RK5Integrator, RK45Integrator])
+def test_runge_kutta_adaptive(Integrator):
+    # the adaptive steps are much smaller than the output spacing
+    integrator = Integrator(ptmass_F, adaptive=True, atol=1E-12, rtol=1E-12)
+    orbit = integrator.run([1., 0., 0., 1.], t1=0., t2=2*np.pi, n_steps=8)
+    assert np.allclose(orbit.w()[:, 0], orbit.w()[:, -1], atol=1E-9)
+
+    with pytest.raises(RuntimeError):
+        integrator = Integrator(ptmass_F, adaptive=True, nmax=10)
+        integrator.run([1., 0., 0., 1.], t1=0., t2=2*np.pi, n_steps=8)
+
+    with pytest.raises(ValueError):
+        RK4Integrator(ptmass_F, adaptive=True)
@@ -108,3 +108,20 @@ def parse_time_specification(units, dt=None, n_steps=None, nsteps=None, t1=None,
             raise ValueError("Invalid options. See docstring.")
 
         return times
+
+
+def _store_indices(ntimes, store_every=1):
+    """
+    Return the indices of the times at which the orbits are stored when only
+    every ``store_every``-th step is kept out of ``ntimes`` times. The initial
+    and final times are always stored.
+    """
+    if int(store_every) != store_every or store_every < 1:
+        raise ValueError("store_every must be a positive integer, not {}."
+                         .format(store_every))
+    store_every = int(store_every)
+
+    idx = np.arange(0, ntimes, store_every)
+    if (ntimes - 1) % store_every != 0:
+        idx = np.append(idx, ntimes - 1)
+    return idx
@@ -1,4 +1,7 @@
 from .potential import *
 from .hamiltonian import *
 from .frame import *
+from .force import *
 from .scf import SCFPotential
+from .spline import (InterpolatedPotential, MultipolePotential,
+                     CylSplinePotential)
@@ -40,6 +40,8 @@ class CommonBase(object):
                 # HACK TODO: remove when fix potentials that ask for scale velocity
                 if ptypes[k] == 'speed':
                     pars[k] = v * units['length']/units['time']
+                elif ptypes[k] == 'specific energy':
+                    pars[k] = v * (units['length']/units['time'])**2
                 else:
                     pars[k] = v * units[ptypes[k]]
 
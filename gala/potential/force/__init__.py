@@ -0,0 +1,2 @@
+from .cforce import CForceBase
+from .builtin import *
@@ -0,0 +1 @@
+from .forces import ChandrasekharDynamicalFriction
@@ -0,0 +1,58 @@
+#include <math.h>
+#include "potential/src/cpotential.h"
+#include "builtin_forces.h"
+
+/* ---------------------------------------------------------------------------
+    Chandrasekhar dynamical friction
+*/
+void chandrasekhar_acceleration(CPotential *p, double t, double *pars,
+                                double *qp, int n_dim, double *acc) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass of the satellite)
+            - ln_Lambda (Coulomb logarithm)
+            - sigma (velocity dispersion of the host, or 0 to estimate it
+              from the circular velocity)
+
+        The density of the host is the density of the potential p, and the
+        host is assumed to have a Maxwellian velocity distribution.
+    */
+    int k;
+    double v, X, rho, sigma, vc2, fac;
+    double grad[n_dim];
+    double *vel = &qp[n_dim];
+
+    v = 0.;
+    for (k=0; k < n_dim; k++)
+        v += vel[k] * vel[k];
+    v = sqrt(v);
+
+    if (v == 0.)
+        return;
+
+    rho = c_density(p, t, qp);
+
+    sigma = pars[3];
+    if (!(sigma > 0)) {
+        // isothermal sphere with the local circular velocity: v_c = sqrt(2) sigma
+        c_gradient(p, t, qp, grad);
+
+        vc2 = 0.;
+        for (k=0; k < n_dim; k++)
+            vc2 += qp[k] * grad[k];
+        sigma = sqrt(fmax(vc2, 0.) / 2.);
+    }
+
+    if (sigma > 0) {
+        X = v / (sqrt(2.) * sigma);
+        fac = erf(X) - 2. * X / sqrt(M_PI) * exp(-X*X);
+    } else {
+        // a cold host: all of its particles are slower than the satellite
+        fac = 1.;
+    }
+
+    fac = -4. * M_PI * pars[0] * pars[0] * pars[1] * rho * pars[2] * fac /
+          (v * v * v);
+    for (k=0; k < n_dim; k++)
+        acc[k] = acc[k] + fac * vel[k];
+}
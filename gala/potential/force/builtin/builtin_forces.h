@@ -0,0 +1,4 @@
+#include "potential/src/cpotential.h"
+
+extern void chandrasekhar_acceleration(CPotential *p, double t, double *pars,
+                                       double *qp, int n_dim, double *acc);
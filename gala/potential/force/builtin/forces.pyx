@@ -0,0 +1,86 @@
+# cython: boundscheck=False
+# cython: nonecheck=False
+# cython: cdivision=True
+# cython: wraparound=False
+# cython: profile=False
+# cython: language_level=3
+
+# Standard library
+from collections import OrderedDict
+
+# Third-party
+import numpy as np
+cimport numpy as np
+np.import_array()
+
+# Project
+from ..cforce import CForceBase
+from ..cforce cimport CForceWrapper, forcefunc
+from ...potential.cpotential cimport CPotential
+
+cdef extern from "force/builtin/builtin_forces.h":
+    void chandrasekhar_acceleration(CPotential *p, double t, double *pars,
+                                    double *qp, int n_dim, double *acc) nogil
+
+__all__ = ['ChandrasekharDynamicalFriction']
+
+cdef class ChandrasekharWrapper(CForceWrapper):
+
+    def __init__(self, double G, double m, double ln_Lambda, double sigma):
+        self._params = np.array([G, m, ln_Lambda, sigma], dtype=np.float64)
+        self.func = <forcefunc>(chandrasekhar_acceleration)
+
+
+class ChandrasekharDynamicalFriction(CForceBase):
+    r"""
+    Chandrasekhar dynamical friction on a satellite of mass ``m`` that moves
+    through a host with the density of the potential that the orbit is
+    integrated in.
+
+    The acceleration is (Binney & Tremaine 2008, Eq. 8.7)
+
+    .. math::
+
+        \boldsymbol{a} = -\frac{4\pi G^2 m \rho \ln\Lambda}{v^3}
+            \left[{\rm erf}(X) - \frac{2X}{\sqrt{\pi}} e^{-X^2}\right]
+            \boldsymbol{v}, \quad X = \frac{v}{\sqrt{2}\sigma}
+
+    where :math:`\rho` is the density of the host at the position of the
+    satellite, which is assumed to have a Maxwellian velocity distribution
+    with dispersion :math:`\sigma`. If the velocity dispersion is not
+    specified, it is estimated from the local circular velocity of the host as
+    :math:`\sigma = v_c / \sqrt{2}`, as for a singular isothermal sphere.
+
+    The potential must implement a density, and the velocities are assumed to
+    be in an inertial frame in which the host is at rest.
+
+    Parameters
+    ----------
+    m : :class:`~astropy.units.Quantity`, numeric [mass]
+        Mass of the satellite.
+    ln_Lambda : numeric (optional)
+        The Coulomb logarithm.
+    sigma : :class:`~astropy.units.Quantity`, numeric [speed] (optional)
+        The (constant) one-dimensional velocity dispersion of the host.
+    units : `~gala.units.UnitSystem` (optional)
+        Set of non-reducable units that specify (at minimum) the
+        length, mass, time, and angle units.
+
+    """
+    _physical_types = {'m': 'mass',
+                       'ln_Lambda': '',
+                       'sigma': 'speed'}
+    _uses_density = True
+
+    def __init__(self, m, ln_Lambda=3., sigma=None, units=None):
+        if sigma is None:
+            sigma = 0.
+
+        parameters = OrderedDict()
+        parameters['m'] = m
+        parameters['ln_Lambda'] = ln_Lambda
+        parameters['sigma'] = sigma
+        super().__init__(ChandrasekharWrapper, parameters, units, ndim=3)
+
+        if self.parameters['m'].value < 0:
+            raise ValueError("The mass of the satellite must be positive.")
@@ -0,0 +1,37 @@
+# cython: language_level=3
+
+from ..potential.cpotential cimport CPotential
+from ..frame.cframe cimport CFrame
+
+cdef extern from "force/src/cforce.h":
+    ctypedef void (*forcefunc)(CPotential *p, double t, double *pars,
+                               double *qp, int n_dim, double *acc) nogil
+
+    ctypedef struct CForce:
+        int n_forces
+        forcefunc *acceleration
+        double **parameters
+
+    ctypedef struct ForceArgs:
+        void (*F)(unsigned full_ndim, double t, double *w, double *f,
+                  CPotential *p, CFrame *fr, unsigned norbits, unsigned nbody,
+                  void *args) nogil
+        void *args
+        CForce **forces
+        int n_forces
+        int shared
+
+    void c_force_acceleration(CForce *f, CPotential *p, double t, double *qp,
+                              int n_dim, double *acc) nogil
+    void Fwrapper_forces(unsigned full_ndim, double t, double *w, double *f,
+                         CPotential *p, CFrame *fr, unsigned norbits,
+                         unsigned nbody, void *args) nogil
+
+cdef class CForceWrapper:
+    cdef forcefunc func
+    cdef double[::1] _params
+    cpdef acceleration(self, potential, double[:,::1] w, double[::1] t)
+
+cdef class CForceList:
+    cdef CForce cforce
+    cdef list forces
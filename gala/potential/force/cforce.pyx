@@ -0,0 +1,181 @@
+# cython: boundscheck=False
+# cython: nonecheck=False
+# cython: cdivision=True
+# cython: wraparound=False
+# cython: profile=False
+# cython: language_level=3
+
+__all__ = ['CForceBase']
+
+# Third-party
+from astropy.constants import G
+import astropy.units as u
+import numpy as np
+cimport numpy as np
+np.import_array()
+
+from libc.stdlib cimport malloc, free
+
+from ..common import CommonBase
+from ..potential.cpotential import _validate_pos_arr
+from ..potential.cpotential cimport CPotentialWrapper
+
+
+cdef class CForceWrapper:
+    """ Wrapper class for C implementation of extra forces. """
+
+    cpdef acceleration(self, potential, double[:,::1] w, double[::1] t):
+        """
+        w should have shape (n, ndim). The force is evaluated for orbits in the
+        C potential wrapper ``potential``.
+        """
+        cdef:
+            int n, ndim, i
+            CForce cf
+            CPotentialWrapper pw = <CPotentialWrapper?>potential
+        n, ndim = _validate_pos_arr(w)
+
+        cf.n_forces = 1
+        cf.acceleration = &self.func
+        cf.parameters = <double **>malloc(sizeof(double *))
+        if cf.parameters == NULL:
+            raise MemoryError("Failed to allocate the force parameters.")
+        cf.parameters[0] = &self._params[0]
+
+        cdef double[:,::1] acc = np.zeros((n, ndim // 2))
+        try:
+            if len(t) == 1:
+                for i in range(n):
+                    c_force_acceleration(&cf, &pw.cpotential, t[0], &w[i,0],
+                                         ndim // 2, &acc[i,0])
+            else:
+                for i in range(n):
+                    c_force_acceleration(&cf, &pw.cpotential, t[i], &w[i,0],
+                                         ndim // 2, &acc[i,0])
+        finally:
+            free(cf.parameters)
+
+        return np.array(acc)
+
+
+cdef class CForceList:
+    """
+    The sum of a list of C forces, as a ``CForce`` struct that can be passed
+    to the C integrators. The force objects are referenced for the lifetime
+    of this object.
+    """
+
+    def __cinit__(self, list forces):
+        cdef:
+            int i
+            CForceWrapper fw
+
+        self.forces = forces
+        self.cforce.n_forces = len(forces)
+        self.cforce.acceleration = <forcefunc *>malloc(
+            max(len(forces), 1) * sizeof(forcefunc))
+        self.cforce.parameters = <double **>malloc(
+            max(len(forces), 1) * sizeof(double *))
+        if (self.cforce.acceleration == NULL or
+                self.cforce.parameters == NULL):
+            raise MemoryError("Failed to allocate the forces.")
+
+        for i in range(len(forces)):
+            fw = <CForceWrapper?>(forces[i].c_instance)
+            self.cforce.acceleration[i] = fw.func
+            self.cforce.parameters[i] = &fw._params[0]
+
+    def __dealloc__(self):
+        free(self.cforce.acceleration)
+        free(self.cforce.parameters)
+
+
+class CForceBase(CommonBase):
+    """
+    A baseclass for additional forces implemented in C, such as dynamical
+    friction, which are added to the gravitational forces of a potential
+    during orbit integration. The forces may depend on the time, the
+    phase-space position, and the potential that the orbits are integrated
+    in, and do not have to be conservative.
+    """
+
+    # Whether the force uses the density of the potential, which must then be
+    # finite (some potentials only implement the density as NaN)
+    _uses_density = False
+
+    def __init__(self, Wrapper, parameters, units, ndim=3):
+        self.units = self._validate_units(units)
+        self.parameters = self._prepare_parameters(parameters, self.units)
+
+        try:
+            self.G = G.decompose(self.units).value
+        except u.UnitConversionError:
+            self.G = 1.
+
+        self.c_parameters = np.array([self.G] +
+                                     [v.value for v in self.parameters.values()],
+                                     dtype=np.float64)
+        self.c_instance = Wrapper(*self.c_parameters)
+
+        self.ndim = ndim
+
+    def __str__(self):
+        return self.__class__.__name__
+
+    def __repr__(self):
+        pars = ', '.join('{}={}'.format(k, v)
+                         for k, v in self.parameters.items())
+        return '<{}: {}>'.format(self.__class__.__name__, pars)
+
+    def _validate_potential(self, potential):
+        """
+        Check that this force can be evaluated in the (C-enabled) potential
+        ``potential``, so that an integration does not silently produce NaNs.
+        """
+        if not self._uses_density:
+            return
+
+        q = np.full((1, potential.ndim), 0.5)
+        rho = potential._density(q, t=np.array([0.]))
+        if not np.all(np.isfinite(rho)):
+            raise ValueError("{} requires a potential with a finite density, "
+                             "but {} does not implement a density."
+                             .format(self.__class__.__name__,
+                                     potential.__class__.__name__))
+
+    def _acceleration(self, w, potential, t):
+        return self.c_instance.acceleration(potential.c_instance, w, t=t)
+
+    def acceleration(self, w, potential, t=0.):
+        """
+        Compute the acceleration from this force at the given phase-space
+        position(s).
+
+        Parameters
+        ----------
+        w : `~gala.dynamics.PhaseSpacePosition`, array_like
+            The phase-space position(s) to compute the acceleration at. If the
+            input object has no units (i.e. is an `~numpy.ndarray`), it is
+            assumed to be in the same unit system as the force.
+        potential : `~gala.potential.CPotentialBase`
+            The potential that the orbits are integrated in.
+        t : numeric, `~astropy.units.Quantity` (optional)
+            The time at which to compute the acceleration.
+
+        Returns
+        -------
+        acc : `~astropy.units.Quantity`
+            The acceleration. Will have the same shape as the positions of the
+            input phase-space position(s).
+        """
+        if potential.units != self.units:
+            raise ValueError("The force and potential must have the same "
+                             "unit system ({} vs {})".format(self.units,
+                                                            potential.units))
+
+        w = self._remove_units_prepare_shape(w)
+        orig_shape, w = self._get_c_valid_arr(w)
+        t = self._validate_prepare_time(t, w)
+        acc = self._acceleration(w, potential, t=t).T
+        return (acc.reshape((orig_shape[0] // 2,) + orig_shape[1:]) *
+                self.units['length'] / self.units['time']**2)
@@ -0,0 +1,40 @@
+from distutils.core import Extension
+from collections import defaultdict
+
+
+def get_extensions():
+    import numpy as np
+
+    exts = []
+
+    # malloc
+    mac_incl_path = "/usr/include/malloc"
+
+    cfg = defaultdict(list)
+    cfg['include_dirs'].append(np.get_include())
+    cfg['include_dirs'].append(mac_incl_path)
+    cfg['include_dirs'].append('gala/potential')
+    cfg['extra_compile_args'].append('--std=gnu99')
+    cfg['sources'].append('gala/potential/force/cforce.pyx')
+    cfg['sources'].append('gala/potential/force/src/cforce.c')
+    cfg['sources'].append('gala/potential/potential/src/cpotential.c')
+    exts.append(Extension('gala.potential.force.cforce', **cfg))
+
+    cfg = defaultdict(list)
+    cfg['include_dirs'].append(np.get_include())
+    cfg['include_dirs'].append(mac_incl_path)
+    cfg['include_dirs'].append('gala/potential')
+    cfg['extra_compile_args'].append('--std=gnu99')
+    cfg['sources'].append('gala/potential/force/builtin/forces.pyx')
+    cfg['sources'].append('gala/potential/force/builtin/builtin_forces.c')
+    cfg['sources'].append('gala/potential/potential/src/cpotential.c')
+    exts.append(Extension('gala.potential.force.builtin.forces', **cfg))
+
+    return exts
+
+
+def get_package_data():
+    return {'gala.potential.force':
+            ['*.h', '*.pyx', '*.pxd', '*/*.pyx', '*/*.pxd',
+             'builtin/*.h', 'src/*.h',
+             'builtin/builtin_forces.c', 'src/*.c']}
@@ -0,0 +1,38 @@
+#include <stdlib.h>
+#include "force/src/cforce.h"
+
+void c_force_acceleration(CForce *f, CPotential *p, double t, double *qp,
+                          int n_dim, double *acc) {
+    int i;
+
+    for (i=0; i < f->n_forces; i++) {
+        (f->acceleration)[i](p, t, (f->parameters)[i], qp, n_dim, acc);
+    }
+}
+
+void Fwrapper_forces(unsigned full_ndim, double t, double *w, double *f,
+                     CPotential *p, CFrame *fr, unsigned norbits,
+                     unsigned nbody, void *args) {
+    /* Compute the derivatives with the force function in args, and add the
+       accelerations of the extra forces to the derivatives of the velocities.
+    */
+    ForceArgs *fa = (ForceArgs *)args;
+    CForce *forces;
+    int i;
+    unsigned ndim = full_ndim / norbits; // phase-space dimensionality
+
+    (fa->F)(full_ndim, t, w, f, p, fr, norbits, nbody, fa->args);
+
+    for (i=0; i < norbits; i++) {
+        if (fa->shared)
+            forces = fa->forces[0];
+        else if (i < fa->n_forces)
+            forces = fa->forces[i];
+        else
+            forces = NULL;
+
+        if (forces != NULL)
+            c_force_acceleration(forces, p, t, &w[i*ndim], ndim/2,
+                                 &f[i*ndim + ndim/2]);
+    }
+}
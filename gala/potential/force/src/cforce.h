@@ -0,0 +1,43 @@
+#include "potential/src/cpotential.h"
+#include "frame/src/cframe.h"
+
+#ifndef _CFORCE_H
+#define _CFORCE_H
+    /* An additional (e.g., velocity-dependent or dissipative) force: adds the
+       acceleration at the phase-space position qp (with 2*n_dim components)
+       and time t to acc. The potential p is the potential that the orbit is
+       integrated in, for forces that depend on it (e.g., dynamical friction
+       on its density). */
+    typedef void (*forcefunc)(CPotential *p, double t, double *pars,
+                              double *qp, int n_dim, double *acc);
+
+    typedef struct {
+        // the number of forces that are summed
+        int n_forces;
+
+        // arrays of the function and parameter array of each force
+        forcefunc *acceleration;
+        double **parameters;
+    } CForce;
+
+    /* The arguments of Fwrapper_forces(): the force function F (with the
+       signature of Fwrapper() in dopri/dop853.h) and its arguments, and the
+       forces to add to the orbits. If shared is nonzero, forces[0] is added
+       to all orbits, else forces[i] is added to orbit i for i < n_forces (a
+       NULL pointer means no extra forces). */
+    typedef struct {
+        void (*F)(unsigned full_ndim, double t, double *w, double *f,
+                  CPotential *p, CFrame *fr, unsigned norbits, unsigned nbody,
+                  void *args);
+        void *args;
+        CForce **forces;
+        int n_forces;
+        int shared;
+    } ForceArgs;
+#endif
+
+extern void c_force_acceleration(CForce *f, CPotential *p, double t,
+                                 double *qp, int n_dim, double *acc);
+extern void Fwrapper_forces(unsigned full_ndim, double t, double *w, double *f,
+                            CPotential *p, CFrame *fr, unsigned norbits,
+                            unsigned nbody, void *args);
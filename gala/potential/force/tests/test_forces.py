@@ -0,0 +1,106 @@
+# Third-party
+import astropy.units as u
+import numpy as np
+import pytest
+from scipy.special import erf
+
+# Project
+from .. import ChandrasekharDynamicalFriction
+from ...potential.builtin import (HernquistPotential, KeplerPotential,
+                                  LogarithmicPotential)
+from ...frame.builtin import ConstantRotatingFrame
+from ...hamiltonian import Hamiltonian
+from ....dynamics import PhaseSpacePosition
+from ....integrate import DOPRI853Integrator, LeapfrogIntegrator
+from ....units import galactic, solarsystem
+
+
+class TestChandrasekharDynamicalFriction:
+
+    def setup(self):
+        self.potential = HernquistPotential(m=1e12, c=20., units=galactic)
+        self.force = ChandrasekharDynamicalFriction(m=1e10*u.Msun,
+                                                    ln_Lambda=3.,
+                                                    units=galactic)
+        self.w0 = PhaseSpacePosition(pos=[50., 0, 0] * u.kpc,
+                                     vel=[0, 150., 0] * u.km/u.s)
+
+    def test_init(self):
+        assert self.force.parameters['m'].unit == u.Msun
+        assert self.force.parameters['sigma'] == 0.
+
+        ChandrasekharDynamicalFriction(m=1e10*u.Msun, sigma=100*u.km/u.s,
+                                       units=galactic)
+
+        with pytest.raises(ValueError):
+            ChandrasekharDynamicalFriction(m=-1e10*u.Msun, units=galactic)
+
+        with pytest.raises(ValueError):
+            self.force.acceleration(self.w0,
+                                    KeplerPotential(m=1., units=solarsystem))
+
+    def test_acceleration(self):
+        a = self.force.acceleration(self.w0, self.potential)
+        assert a.unit.is_equivalent(u.kpc / u.Myr**2)
+        assert a.shape == (3, 1)
+
+        # compare to the formula evaluated with numpy
+        w = self.w0.w(galactic)
+        x, v = w[:3, 0], w[3:, 0]
+        G = self.potential.G
+        rho = self.potential.density(x).value[0]
+        grad = self.potential._gradient(x[None], t=np.array([0.]))[0]
+        sigma = np.sqrt(x @ grad / 2)
+        vnorm = np.linalg.norm(v)
+        X = vnorm / (np.sqrt(2) * sigma)
+        a_np = (-4*np.pi * G**2 * 1e10 * rho * 3. *
+                (erf(X) - 2*X/np.sqrt(np.pi) * np.exp(-X**2)) / vnorm**3 * v)
+        assert u.allclose(a[:, 0], a_np * u.kpc/u.Myr**2, rtol=1e-10)
+
+        # friction opposes the velocity
+        assert np.all(np.sign(a.value[:, 0]) * np.sign(v) <= 0)
+
+        # no force at zero velocity
+        w0 = PhaseSpacePosition(pos=[50., 0, 0] * u.kpc,
+                                vel=[0, 0, 0.] * u.km/u.s)
+        assert np.all(self.force.acceleration(w0, self.potential).value == 0)
+
+    def test_hamiltonian(self):
+        H = Hamiltonian(self.potential, extra_forces=self.force)
+        assert H.extra_forces == [self.force]
+        assert Hamiltonian(H).extra_forces == [self.force]
+        assert H != Hamiltonian(self.potential)
+
+        orbit = H.integrate_orbit(self.w0, dt=1., n_steps=1000)
+        orbit_py = H.integrate_orbit(self.w0, dt=1., n_steps=1000,
+                                     Integrator=DOPRI853Integrator,
+                                     cython_if_possible=False)
+        assert u.allclose(orbit.xyz, orbit_py.xyz, atol=1e-6*u.kpc)
+
+        # the orbit decays
+        no_df = Hamiltonian(self.potential).integrate_orbit(self.w0, dt=1.,
+                                                            n_steps=1000)
+        r = np.sqrt(np.sum(orbit.xyz[:, -1]**2))
+        r_no_df = np.sqrt(np.sum(no_df.xyz[:, -1]**2))
+        assert r < r_no_df
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            Hamiltonian(self.potential, extra_forces=self.potential)
+
+        with pytest.raises(ValueError):
+            Hamiltonian(self.potential,
+                        frame=ConstantRotatingFrame(Omega=[0, 0, 1.]/u.Myr,
+                                                    units=galactic),
+                        extra_forces=self.force)
+
+        H = Hamiltonian(self.potential, extra_forces=self.force)
+        with pytest.raises(ValueError):
+            H.integrate_orbit(self.w0, dt=1., n_steps=10,
+                              Integrator=LeapfrogIntegrator)
+
+        # the logarithmic potential does not implement a density
+        log = LogarithmicPotential(v_c=200*u.km/u.s, r_h=1*u.kpc, q1=1,
+                                   q2=1, q3=1, units=galactic)
+        with pytest.raises(ValueError, match="finite density"):
+            Hamiltonian(log, extra_forces=self.force)
@@ -1,6 +1,7 @@
 # cython: language_level=3
 
 # Standard-library
+import os
 import warnings
 
 # Third-party
@@ -10,12 +11,33 @@ import astropy.units as u
 # Project
 from ..common import CommonBase
 from ..potential import PotentialBase, CPotentialBase
-from ..frame import FrameBase, CFrameBase, StaticFrame
+from ..frame import (FrameBase, CFrameBase, StaticFrame,
+                     ConstantRotatingFrame)
+from ..force import CForceBase
 from ...integrate import LeapfrogIntegrator, DOPRI853Integrator
+from ...integrate.pyintegrators.symplectic import _CompositionIntegrator
+from ...integrate.pyintegrators.rk5 import _RungeKuttaIntegrator
+from ...integrate.core import _validate_output_array
+from ...integrate.timespec import parse_time_specification, _store_indices
+from ...integrate.events import Event, StopConditions
 from ...dynamics import PhaseSpacePosition, Orbit
 
 __all__ = ["Hamiltonian"]
 
+# Integrator_kwargs that are only understood by the Cython integrators
+_CYTHON_ONLY_KWARGS = ('independent_steps', 'n_threads')
+
+
+def _is_composition(Integrator):
+    return (isinstance(Integrator, type) and
+            issubclass(Integrator, _CompositionIntegrator))
+
+
+def _is_runge_kutta(Integrator):
+    return (isinstance(Integrator, type) and
+            issubclass(Integrator, _RungeKuttaIntegrator))
+
+
 class Hamiltonian(CommonBase):
     """
     Represents a composition of a gravitational potential and a reference frame.
@@ -33,11 +55,20 @@ class Hamiltonian(CommonBase):
         The gravitational potential.
     frame : :class:`~gala.potential.frame.FrameBase` subclass (optional)
         The reference frame.
+    extra_forces : :class:`~gala.potential.force.CForceBase`, list (optional)
+        Additional forces, such as
+        `~gala.potential.force.ChandrasekharDynamicalFriction`, that are added
+        to the gravitational force of the potential. These can depend on the
+        velocity and do not have to be conservative, so they are only
+        supported with a C-enabled potential in a static frame, and orbits are
+        integrated with the `~gala.integrate.DOPRI853Integrator` by default.
 
     """
-    def __init__(self, potential, frame=None):
+    def __init__(self, potential, frame=None, extra_forces=None):
         if isinstance(potential, Hamiltonian):
             frame = potential.frame
+            if extra_forces is None:
+                extra_forces = potential.extra_forces
             potential = potential.potential
 
         if frame is None:
@@ -63,6 +94,41 @@ class Hamiltonian(CommonBase):
                 raise ValueError("Potential and Frame must have compatible phase-space "
                                  "dimensionality ({} vs {})".format(potential.ndim, frame.ndim))
 
+        if extra_forces is None:
+            extra_forces = []
+        elif isinstance(extra_forces, CForceBase):
+            extra_forces = [extra_forces]
+
+        if (not isinstance(extra_forces, (list, tuple)) or
+                not all(isinstance(f, CForceBase) for f in extra_forces)):
+            raise ValueError("Invalid input for extra forces. Must be "
+                             "CForceBase subclasses.")
+        self.extra_forces = list(extra_forces)
+
+        for force in self.extra_forces:
+            if force.units != potential.units:
+                raise ValueError("Potential and extra forces must have "
+                                 "compatible unit systems ({} vs {})"
+                                 .format(potential.units, force.units))
+
+            if force.ndim is not None and force.ndim != potential.ndim:
+                raise ValueError("Potential and extra forces must have "
+                                 "compatible phase-space dimensionality "
+                                 "({} vs {})".format(potential.ndim,
+                                                     force.ndim))
+
+        if self.extra_forces:
+            if not isinstance(self.potential, CPotentialBase):
+                raise ValueError("Extra forces are only supported for "
+                                 "C-enabled potentials.")
+
+            if not isinstance(self.frame, StaticFrame):
+                raise ValueError("Extra forces are only supported in static "
+                                 "frames.")
+
+            for force in self.extra_forces:
+                force._validate_potential(self.potential)
+
         # TODO: document this attribute
         if isinstance(self.potential, CPotentialBase) and isinstance(self.frame, CFrameBase):
             self.c_enabled = True
@@ -90,6 +156,11 @@ class Hamiltonian(CommonBase):
         for i in range(self._pot_ndim):
             dH[:,self._pot_ndim+i] = -dH[:,self._pot_ndim+i]
 
+        # the extra forces are added to the accelerations
+        for force in self.extra_forces:
+            dH[:,self._pot_ndim:] += force._acceleration(w, self.potential,
+                                                         t=t)
+
         return dH
 
     def _hessian(self, w, t):
@@ -235,14 +306,16 @@ class Hamiltonian(CommonBase):
         return self.__class__.__name__
 
     def __eq__(self, other):
-        return (self.potential == other.potential) and (self.frame == other.frame)
+        return ((self.potential == other.potential) and
+                (self.frame == other.frame) and
+                (self.extra_forces == other.extra_forces))
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def integrate_orbit(self, w0, Integrator=None,
                         Integrator_kwargs=dict(), cython_if_possible=True,
-                        **time_spec):
+                        store_every=1, out=None, stop=None, **time_spec):
         """
         Integrate an orbit in the current potential using the integrator class
         provided. Uses same time specification as `Integrator.run()` -- see
@@ -254,15 +327,50 @@ class Hamiltonian(CommonBase):
             Initial conditions.
         Integrator : `~gala.integrate.Integrator` (optional)
             Integrator class to use. By default, uses
-            `~gala.integrate.LeapfrogIntegrator` if the frame is static and
-            `~gala.integrate.DOPRI853Integrator` else.
+            `~gala.integrate.LeapfrogIntegrator` if the frame is static, or if
+            the frame is a `~gala.potential.frame.ConstantRotatingFrame` and
+            the integration is done in C (the C leapfrog integrator handles
+            the rotation exactly), and `~gala.integrate.DOPRI853Integrator`
+            else, or if there are extra forces (which only the Cython
+            DOPRI853 integrator and the Python integrators support).
         Integrator_kwargs : dict (optional)
             Any extra keyword argumets to pass to the integrator class
-            when initializing. Only works in non-Cython mode.
+            when initializing. Only works in non-Cython mode, except for the
+            ``atol``, ``rtol``, ``nmax``, ``independent_steps``, and
+            ``n_threads`` options of the Cython DOPRI853 integrator, and the
+            ``n_threads`` option of the Cython Leapfrog and composition
+            integrators (e.g., `~gala.integrate.Yoshida6Integrator`). With
+            ``independent_steps=True``, each orbit is integrated with its own
+            adaptive step size, in parallel over ``n_threads`` threads. The
+            Leapfrog integrator always distributes orbits over ``n_threads``
+            threads (default: ``gala.conf.n_threads``).
         cython_if_possible : bool (optional)
             If there is a Cython version of the integrator implemented,
             and the potential object has a C instance, using Cython
             will be *much* faster.
+        store_every : int (optional)
+            Only store the orbit at every ``store_every``-th timestep. The
+            final state of the orbits is always stored. With the Cython
+            integrators, only the stored timesteps are allocated, so this can
+            be used to integrate with a small timestep while keeping the
+            memory usage low.
+        out : `numpy.memmap`, `numpy.ndarray`, str (optional)
+            A writable array, or the path of a file to create a
+            `numpy.memmap` at, to store the orbits in. The array must have the
+            shape of the returned orbit array, ``(ndim, ntimes, norbits)``
+            (including a last axis of length 1 for a single orbit), and must be
+            a C-contiguous array of doubles for the Cython integrators, which
+            write the orbits directly into it. The returned orbit then
+            references this array rather than a copy, so results larger than
+            the available memory can be written to a memory-mapped file.
+        stop : `~gala.integrate.StopConditions` (optional)
+            Conditions for stopping the integration of individual orbits
+            (e.g., when they escape past a maximum radius, fall inside a
+            capture radius, or become unbound). Stopped orbits are no longer
+            integrated, and their phase-space positions at all stored times
+            after they stopped are NaN. The index of the last stored time of
+            each orbit is stored in the ``end_index`` attribute of the
+            returned orbit. Only supported by the Cython integrators.
         **time_spec
             Specification of how long to integrate. Most commonly, this is a
             timestep ``dt`` and number of steps ``n_steps``, or a timestep
@@ -273,10 +381,281 @@ class Hamiltonian(CommonBase):
         Returns
         -------
         orbit : `~gala.dynamics.Orbit`
+            If ``stop`` is specified, ``orbit.end_index`` is an integer array
+            with the index of the last stored time of each orbit (before it
+            stopped, or the last time), with one element per orbit (even for
+            a single orbit).
+
+        """
+
+        use_c = self.c_enabled and cython_if_possible
+        Integrator = self._get_integrator(Integrator, use_c)
+        arr_w0 = self._prepare_integrate_w0(w0)
+
+        if stop is not None:
+            if not isinstance(stop, StopConditions):
+                raise TypeError("stop must be a gala.integrate.StopConditions "
+                                "instance.")
+            if not use_c:
+                raise ValueError("Stopping conditions are only supported by "
+                                 "the Cython integrators.")
+            stop = stop._spec(self.units)
+
+        # array of times
+        t = np.ascontiguousarray(parse_time_specification(self.units, **time_spec))
+
+        if isinstance(out, (str, os.PathLike)):
+            out = np.memmap(out, dtype=np.float64, mode='w+',
+                            shape=(arr_w0.shape[1],
+                                   len(_store_indices(len(t), store_every)),
+                                   arr_w0.shape[0]))
+
+        if use_c:
+            res = self._c_integrate(Integrator, arr_w0, t, Integrator_kwargs,
+                                    store_every, out, stop=stop)
+            t, w = res[:2]
+
+            # because shape is different from normal integrator return (an
+            # output array is already filled in the final layout)
+            if out is None:
+                w = np.rollaxis(w, -1)
+
+            # the orbits are not stored after they stopped
+            if stop is not None:
+                end = res[2]
+                w[:, np.arange(len(t))[:, None] > end[None]] = np.nan
+
+            if w.shape[-1] == 1:
+                w = w[...,0]
+
+        else:
+            orbit = self._py_integrate(Integrator, arr_w0, Integrator_kwargs,
+                                       **time_spec)
+            if store_every != 1:
+                orbit = orbit[_store_indices(orbit.ntimes, store_every)]
+
+            if out is None:
+                orbit.potential = self.potential
+                orbit.frame = self.frame
+                return orbit
+
+            _validate_output_array(out, (arr_w0.shape[1], orbit.ntimes,
+                                         arr_w0.shape[0]))
+            out[...] = orbit.w(self.units).reshape(out.shape)
+            t = orbit.t.value
+            w = out[..., 0] if out.shape[-1] == 1 else out
+
+        orbit = Orbit.from_w(w=w, units=self.units, t=t*self._time_unit(),
+                             hamiltonian=self, copy=out is None)
+
+        if stop is not None:
+            orbit.end_index = end
+        return orbit
+
+    def iter_integrate(self, w0, Integrator=None, Integrator_kwargs=dict(),
+                       cython_if_possible=True, chunk_steps=1000,
+                       store_every=1, raw=False, **time_spec):
+        """
+        Integrate an orbit in consecutive chunks of timesteps, and yield the
+        orbit over each chunk as soon as it has been computed. This is useful
+        for processing long orbit integrations without storing the full orbit
+        in memory, as only one chunk is stored at a time.
+
+        With the Cython integrators, the state of the integrator (e.g., the
+        half-step velocities of the Leapfrog integrator, or the step size of
+        the DOPRI853 integrator) is carried over from one chunk to the next.
+        For the symplectic integrators, the result is therefore identical to
+        the orbit returned by `~gala.potential.Hamiltonian.integrate_orbit`.
+
+        Parameters
+        ----------
+        w0 : `~gala.dynamics.PhaseSpacePosition`, array_like
+            Initial conditions.
+        Integrator : `~gala.integrate.Integrator` (optional)
+            Integrator class to use. See
+            `~gala.potential.Hamiltonian.integrate_orbit`.
+        Integrator_kwargs : dict (optional)
+            Any extra keyword argumets to pass to the integrator. See
+            `~gala.potential.Hamiltonian.integrate_orbit`.
+        cython_if_possible : bool (optional)
+            If there is a Cython version of the integrator implemented,
+            and the potential object has a C instance, use Cython.
+        chunk_steps : int (optional)
+            The number of timesteps in each chunk. Must be a multiple of
+            ``store_every``.
+        store_every : int (optional)
+            Only store the orbit at every ``store_every``-th timestep. The
+            final state of the orbits is always stored.
+        raw : bool (optional)
+            If True, yield the array of times and the array of phase-space
+            positions (with shape ``(ndim, ntimes[, norbits])``) in the unit
+            system of the Hamiltonian for each chunk, instead of an
+            `~gala.dynamics.Orbit`.
+        **time_spec
+            Specification of how long to integrate. See
+            `~gala.integrate.parse_time_specification`.
+
+        Yields
+        ------
+        orbit : `~gala.dynamics.Orbit`
+            The orbit over a chunk of timesteps. The first chunk starts at
+            the initial conditions, and each following chunk starts at the
+            first timestep after the end of the previous chunk. If
+            ``raw=True``, a tuple ``(t, w)`` of arrays is yielded instead.
+
+        """
+
+        chunk_steps = int(chunk_steps)
+        if chunk_steps < 1 or chunk_steps % store_every != 0:
+            raise ValueError("chunk_steps must be a positive multiple of "
+                             "store_every.")
+
+        use_c = self.c_enabled and cython_if_possible
+        Integrator = self._get_integrator(Integrator, use_c)
+        arr_w0 = self._prepare_integrate_w0(w0)
+        t = np.ascontiguousarray(parse_time_specification(self.units, **time_spec))
+        _store_indices(len(t), store_every)  # validate store_every
+
+        # the state of the integrator that is carried over between chunks
+        state = dict()
+
+        for j0 in range(0, len(t)-1, chunk_steps):
+            t_chunk = t[j0:min(j0 + chunk_steps, len(t)-1) + 1]
+
+            if use_c:
+                t_chunk, w = self._c_integrate(Integrator, arr_w0, t_chunk,
+                                               Integrator_kwargs, store_every,
+                                               state=state)
+                arr_w0 = np.ascontiguousarray(w[-1])
+                w = np.rollaxis(w, -1)
+
+            else:
+                orbit = self._py_integrate(Integrator, arr_w0,
+                                           Integrator_kwargs, t=t_chunk)
+                orbit = orbit[_store_indices(orbit.ntimes, store_every)]
+                t_chunk = orbit.t.value
+                w = orbit.w(self.units).reshape(arr_w0.shape[1], -1,
+                                                arr_w0.shape[0])
+                arr_w0 = np.ascontiguousarray(w[:, -1].T)
+
+            # the first time is the last time of the previous chunk
+            if j0 > 0:
+                t_chunk = t_chunk[1:]
+                w = w[:, 1:]
+
+            if w.shape[-1] == 1:
+                w = w[..., 0]
+
+            if raw:
+                yield t_chunk, w
+            else:
+                yield Orbit.from_w(w=w, units=self.units,
+                                   t=t_chunk*self._time_unit(),
+                                   hamiltonian=self)
 
+    def find_events(self, w0, events, Integrator=None, Integrator_kwargs=dict(),
+                    **time_spec):
         """
+        Integrate orbits and find the times and phase-space positions of
+        events, such as pericenter and apocenter passages or crossings of a
+        plane, without storing the orbits.
+
+        The events are detected by the Cython integrators as zero crossings of
+        an event function of the phase-space position over each timestep, and
+        the time of each event is then refined with the interpolant of the
+        integrator over the step: the dense output of the DOPRI853 integrator,
+        or the quintic Hermite interpolant of the positions, velocities, and
+        accelerations at both ends of the step for the Leapfrog and
+        composition integrators. The events are therefore much more precise
+        than the timestep, and than the extrema of a stored orbit (e.g., with
+        `~gala.dynamics.Orbit.pericenter`).
 
-        if Integrator is None and isinstance(self.frame, StaticFrame):
+        Parameters
+        ----------
+        w0 : `~gala.dynamics.PhaseSpacePosition`, array_like
+            Initial conditions.
+        events : `~gala.integrate.Event`, iterable
+            The event or events to find, e.g.,
+            `~gala.integrate.Pericenter`, `~gala.integrate.Apocenter`,
+            `~gala.integrate.PlaneCrossing`, or
+            `~gala.integrate.TurningPoint`.
+        Integrator : `~gala.integrate.Integrator` (optional)
+            Integrator class to use. Only the Cython integrators are
+            supported. By default, uses `~gala.integrate.LeapfrogIntegrator`
+            if the frame is static, and `~gala.integrate.DOPRI853Integrator`
+            else, as the Leapfrog and composition integrators only support
+            event detection in a static frame.
+        Integrator_kwargs : dict (optional)
+            Any extra keyword argumets to pass to the integrator. See
+            `~gala.potential.Hamiltonian.integrate_orbit`.
+        **time_spec
+            Specification of how long to integrate. See
+            `~gala.integrate.parse_time_specification`.
+
+        Returns
+        -------
+        found : list
+            For each event, a tuple ``(orbit, t, w)``, where ``orbit`` is an
+            array of the indices of the orbits with an event, ``t`` are the
+            times of the events, and ``w`` is a
+            `~gala.dynamics.PhaseSpacePosition` with the phase-space positions
+            at the events. The events are ordered by orbit, and then by time.
+
+        """
+        from ...integrate.cyintegrators.events import EventRecorder
+
+        if isinstance(events, Event):
+            events = [events]
+        events = list(events)
+        if not all(isinstance(e, Event) for e in events):
+            raise TypeError("Events must be instances of gala.integrate.Event.")
+
+        if not self.c_enabled:
+            raise ValueError("Event detection is only supported for "
+                             "C-enabled Hamiltonians.")
+
+        if Integrator is None and not isinstance(self.frame, StaticFrame):
+            Integrator = DOPRI853Integrator
+        Integrator = self._get_integrator(Integrator, True)
+        arr_w0 = self._prepare_integrate_w0(w0)
+        half_ndim = arr_w0.shape[1] // 2
+        t = np.ascontiguousarray(parse_time_specification(self.units, **time_spec))
+
+        recorder = EventRecorder(np.array([e._spec(self.units, half_ndim)
+                                           for e in events]))
+
+        # only the initial and final phase-space positions are stored
+        self._c_integrate(Integrator, arr_w0, t, Integrator_kwargs,
+                          store_every=len(t)-1, events=recorder)
+
+        found = []
+        for orbit, t_e, w_e in recorder.results():
+            found.append((orbit, t_e * self._time_unit(),
+                          PhaseSpacePosition.from_w(w_e.T, units=self.units)))
+        return found
+
+    def _time_unit(self):
+        try:
+            return self.units['time']
+        except (TypeError, AttributeError):
+            return u.dimensionless_unscaled
+
+    def _get_integrator(self, Integrator, use_c):
+        """
+        Return the integrator class to use for orbit integration, and warn if
+        a Leapfrog-type integrator is used in a frame it doesn't support.
+        """
+
+        # the C leapfrog integrator supports constantly rotating frames
+        if use_c:
+            leapfrog_frames = (StaticFrame, ConstantRotatingFrame)
+        else:
+            leapfrog_frames = StaticFrame
+
+        # velocity-dependent forces break the symplectic integrators
+        if Integrator is None and self.extra_forces:
+            Integrator = DOPRI853Integrator
+        elif Integrator is None and isinstance(self.frame, leapfrog_frames):
             Integrator = LeapfrogIntegrator
         elif Integrator is None:
             Integrator = DOPRI853Integrator
@@ -284,62 +663,103 @@ class Hamiltonian(CommonBase):
             # use the Integrator provided
             pass
 
-        if (Integrator == LeapfrogIntegrator and
-                not isinstance(self.frame, StaticFrame)):
+        if ((Integrator == LeapfrogIntegrator or
+                _is_composition(Integrator)) and
+                not isinstance(self.frame, leapfrog_frames)):
             warnings.warn("Using leapfrog integration with non-static frames "
                           "can lead to wildly incorrect orbits. It is "
                           "recommended that you use DOPRI853Integrator "
                           "instead.", RuntimeWarning)
 
+        return Integrator
+
+    def _prepare_integrate_w0(self, w0):
+        """
+        Return the initial conditions as a C-contiguous array with shape
+        ``(norbits, ndim)``.
+        """
         if not isinstance(w0, PhaseSpacePosition):
             w0 = np.asarray(w0)
             ndim = w0.shape[0]//2
             w0 = PhaseSpacePosition(pos=w0[:ndim], vel=w0[ndim:])
 
-        ndim = w0.ndim
         arr_w0 = w0.w(self.units)
         arr_w0 = self._remove_units_prepare_shape(arr_w0)
         orig_shape,arr_w0 = self._get_c_valid_arr(arr_w0)
+        return arr_w0
 
-        if self.c_enabled and cython_if_possible:
-            # array of times
-            from ...integrate.timespec import parse_time_specification
-            t = np.ascontiguousarray(parse_time_specification(self.units, **time_spec))
-
-            if Integrator == LeapfrogIntegrator:
-                from ...integrate.cyintegrators import leapfrog_integrate_hamiltonian
-                t,w = leapfrog_integrate_hamiltonian(self, arr_w0, t)
-
-            elif Integrator == DOPRI853Integrator:
-                from ...integrate.cyintegrators import dop853_integrate_hamiltonian
-                t,w = dop853_integrate_hamiltonian(self, arr_w0, t,
-                                                   Integrator_kwargs.get('atol', 1E-10),
-                                                   Integrator_kwargs.get('rtol', 1E-10),
-                                                   Integrator_kwargs.get('nmax', 0))
-            else:
-                raise ValueError("Cython integration not supported for '{}'".format(Integrator))
-
-            # because shape is different from normal integrator return
-            w = np.rollaxis(w, -1)
-            if w.shape[-1] == 1:
-                w = w[...,0]
+    def _c_integrate(self, Integrator, arr_w0, t, Integrator_kwargs,
+                     store_every=1, out=None, state=None, events=None,
+                     stop=None):
+        """
+        Integrate with the Cython integrators. Returns the stored times and
+        the orbits, with shape ``(ntimes, norbits, ndim)`` (or ``out``). Events
+        are recorded in the ``EventRecorder`` ``events`` if provided. If the
+        stopping conditions ``stop`` are provided, the index of the last stored
+        time of each orbit is returned as well.
+        """
 
+        if self.extra_forces and Integrator != DOPRI853Integrator:
+            raise ValueError("Cython integration with extra forces is only "
+                             "supported by DOPRI853Integrator.")
+
+        if Integrator == LeapfrogIntegrator:
+            from ...integrate.cyintegrators import leapfrog_integrate_hamiltonian
+            return leapfrog_integrate_hamiltonian(self, arr_w0, t,
+                                                  Integrator_kwargs.get('n_threads', None),
+                                                  store_every, out, state, events,
+                                                  stop)
+
+        elif _is_composition(Integrator):
+            # restarting is exact for these, so there is no state to keep
+            from ...integrate.cyintegrators import composition_integrate_hamiltonian
+            drift, kick = Integrator._drift_kick_coefficients()
+            return composition_integrate_hamiltonian(self, arr_w0, t, drift, kick,
+                                                     Integrator_kwargs.get('n_threads', None),
+                                                     store_every, out, events, stop)
+
+        elif Integrator == DOPRI853Integrator:
+            from ...integrate.cyintegrators import dop853_integrate_hamiltonian
+            return dop853_integrate_hamiltonian(self, arr_w0, t,
+                                                Integrator_kwargs.get('atol', 1E-12),
+                                                Integrator_kwargs.get('rtol', 1E-12),
+                                                Integrator_kwargs.get('nmax', 0),
+                                                Integrator_kwargs.get('independent_steps', False),
+                                                Integrator_kwargs.get('n_threads', None),
+                                                store_every, out, state, events,
+                                                stop)
+        elif _is_runge_kutta(Integrator):
+            if events is not None or stop is not None:
+                raise ValueError("Events and stopping conditions are not "
+                                 "supported by {}.".format(Integrator.__name__))
+
+            from ...integrate.cyintegrators import rk_integrate_hamiltonian
+            a, b, c, d = Integrator._tableau()
+            return rk_integrate_hamiltonian(self, arr_w0, t, a, b, c, d,
+                                            Integrator.order,
+                                            Integrator_kwargs.get('adaptive', False),
+                                            Integrator_kwargs.get('atol', 1E-10),
+                                            Integrator_kwargs.get('rtol', 1E-10),
+                                            Integrator_kwargs.get('nmax', 100000),
+                                            Integrator_kwargs.get('n_threads', None),
+                                            store_every, out, state)
         else:
-            def F(t, w):
-                # TODO: these Transposes are shitty and probably make it much slower?
-                w_T = np.ascontiguousarray(w.T)
-                return self._gradient(w_T, t=np.array([t])).T
-            integrator = Integrator(F, func_units=self.units, **Integrator_kwargs)
-            orbit = integrator.run(arr_w0.T, **time_spec)
-            orbit.potential = self.potential
-            orbit.frame = self.frame
-            return orbit
+            raise ValueError("Cython integration not supported for '{}'".format(Integrator))
 
-        try:
-            tunit = self.units['time']
-        except (TypeError, AttributeError):
-            tunit = u.dimensionless_unscaled
-        return Orbit.from_w(w=w, units=self.units, t=t*tunit, hamiltonian=self)
+    def _py_integrate(self, Integrator, arr_w0, Integrator_kwargs,
+                      **time_spec):
+        """
+        Integrate with the Python integrators and return an
+        `~gala.dynamics.Orbit`.
+        """
+        def F(t, w):
+            # TODO: these Transposes are shitty and probably make it much slower?
+            w_T = np.ascontiguousarray(w.T)
+            return self._gradient(w_T, t=np.array([t])).T
+        kwargs = {k: v for k, v in Integrator_kwargs.items()
+                  if k not in _CYTHON_ONLY_KWARGS}
+        integrator = Integrator(F, func_units=self.units, **kwargs)
+        return integrator.run(arr_w0.T, **time_spec)
 
     # def save(self, f):
     #     """
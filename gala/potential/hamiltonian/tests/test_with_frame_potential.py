@@ -10,7 +10,7 @@ from ...potential.builtin import NFWPotential, KeplerPotential, HernquistPotenti
 from ...frame.builtin import StaticFrame, ConstantRotatingFrame
 from ....units import galactic, dimensionless
 from ....dynamics import PhaseSpacePosition, Orbit
-from ....integrate import DOPRI853Integrator
+from ....integrate import DOPRI853Integrator, LeapfrogIntegrator
 
 # ----------------------------------------------------------------------------
 
@@ -174,8 +174,12 @@ def test_velocity_rot_frame(name, Omega, tol):
     H_r = Hamiltonian(potential, ConstantRotatingFrame(Omega=Omega, units=dimensionless))
     H = Hamiltonian(potential, StaticFrame(units=dimensionless))
 
-    orbit_i = H.integrate_orbit(w0, dt=0.1, n_steps=1000, Integrator=DOPRI853Integrator)
-    orbit_r = H_r.integrate_orbit(w0, dt=0.1, n_steps=1000, Integrator=DOPRI853Integrator)
+    # the orbits are compared at the 1E-12 level, so the integration has to
+    # be more accurate than with the default tolerances
+    kw = dict(Integrator=DOPRI853Integrator,
+              Integrator_kwargs=dict(atol=1E-14, rtol=1E-14))
+    orbit_i = H.integrate_orbit(w0, dt=0.1, n_steps=1000, **kw)
+    orbit_r = H_r.integrate_orbit(w0, dt=0.1, n_steps=1000, **kw)
 
     orbit_i2r = orbit_i.to_frame(ConstantRotatingFrame(Omega=Omega, units=dimensionless))
     orbit_r2i = orbit_r.to_frame(StaticFrame(units=dimensionless))
@@ -185,3 +189,51 @@ def test_velocity_rot_frame(name, Omega, tol):
 
     assert u.allclose(orbit_r.xyz, orbit_i2r.xyz, atol=tol)
     assert u.allclose(orbit_r.v_xyz, orbit_i2r.v_xyz, atol=tol)
+
+
+@pytest.mark.parametrize("Omega", [
+    [0, 0, 1.]*u.one,
+    [0.3, 0.2, 0.9]*u.one,
+])
+def test_leapfrog_rot_frame(Omega):
+    potential = HernquistPotential(m=1., c=0.2, units=dimensionless)
+    H = Hamiltonian(potential,
+                    ConstantRotatingFrame(Omega=Omega, units=dimensionless))
+    w0 = PhaseSpacePosition(pos=[1., 0.1, 0.2], vel=[0, 0.8, 0.1])
+
+    orbit_dop = H.integrate_orbit(w0, dt=0.01, n_steps=2000,
+                                  Integrator=DOPRI853Integrator)
+
+    # second-order convergence to the DOP853 orbit
+    errs = []
+    for dt in [0.02, 0.01, 0.005]:
+        orbit = H.integrate_orbit(w0, dt=dt, n_steps=int(round(20 / dt)),
+                                  Integrator=LeapfrogIntegrator)
+        dw = orbit.w()[:, -1] - orbit_dop.w()[:, -1]
+        errs.append(np.abs(dw).max())
+    assert errs[-1] < 1E-4
+    assert np.allclose(np.log2(errs[:-1]) - np.log2(errs[1:]), 2., atol=0.1)
+
+    # leapfrog is the default for rotating frames with C potentials
+    orbit = H.integrate_orbit(w0, dt=0.005, n_steps=4000)
+    assert u.allclose(orbit.xyz[:, ::2], orbit_dop.xyz, atol=1E-4)
+
+
+def test_leapfrog_rot_frame_jacobi_energy():
+    potential = HernquistPotential(m=1., c=0.2, units=dimensionless)
+    H = Hamiltonian(potential,
+                    ConstantRotatingFrame(Omega=[0.3, 0.2, 0.9]*u.one,
+                                          units=dimensionless))
+    w0 = PhaseSpacePosition(pos=np.array([[1., 0.1, 0.2], [0.8, -0.5, 0.]]).T,
+                            vel=np.array([[0, 0.8, 0.1], [0.4, 0.7, 0.3]]).T)
+
+    # ~3000 orbital periods
+    n_steps = 200000
+    orbit = H.integrate_orbit(w0, dt=0.05, n_steps=n_steps)
+    EJ = H.energy(orbit).value
+    dEJ = np.abs((EJ[1:] - EJ[0]) / EJ[0])
+
+    # the error in the Jacobi energy is small and does not grow with time
+    n = n_steps // 10
+    assert np.all(dEJ < 1E-4)
+    assert np.all(dEJ[-n:].max(axis=0) < 1.1 * dEJ[:n].max(axis=0))
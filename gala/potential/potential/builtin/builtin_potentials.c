@@ -9,13 +9,74 @@
 double nan_density(double t, double *pars, double *q, int n_dim) { return NAN; }
 double nan_value(double t, double *pars, double *q, int n_dim) { return NAN; }
 void nan_gradient(double t, double *pars, double *q, int n_dim, double *grad) {}
-void nan_hessian(double t, double *pars, double *q, int n_dim, double *hess) {}
+void nan_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    int i;
+    for (i=0; i < n_dim*n_dim; i++) hess[i] = NAN;
+}
 
 double null_density(double t, double *pars, double *q, int n_dim) { return 0; }
 double null_value(double t, double *pars, double *q, int n_dim) { return 0; }
 void null_gradient(double t, double *pars, double *q, int n_dim, double *grad){}
 void null_hessian(double t, double *pars, double *q, int n_dim, double *hess) {}
 
+/* ---------------------------------------------------------------------------
+    Helper functions for computing Hessians
+*/
+static void ellipsoidal_hessian(double *q, double *inv_a2, double fac,
+                                double dfac, double *hess) {
+    /*
+        Add the Hessian of a potential that depends on the position only
+        through s = sum_i q_i^2 / a_i^2, for which the gradient can be written
+        grad_i = fac(s) * q_i / a_i^2. Here, dfac = 2 * d(fac)/ds.
+    */
+    int i, j;
+    double g[3];
+
+    for (i=0; i < 3; i++)
+        g[i] = q[i] * inv_a2[i];
+
+    for (i=0; i < 3; i++) {
+        for (j=0; j < 3; j++) {
+            hess[3*i + j] = hess[3*i + j] + dfac*g[i]*g[j];
+        }
+        hess[3*i + i] = hess[3*i + i] + fac*inv_a2[i];
+    }
+}
+
+static void spherical_hessian(double *q, double r, double dphi_dr,
+                              double d2phi_dr2, double *hess) {
+    /*
+        Add the Hessian of a spherical potential given the first and second
+        radial derivatives of the potential at radius r.
+    */
+    double inv_a2[3] = {1., 1., 1.};
+    ellipsoidal_hessian(q, &inv_a2[0], dphi_dr / r,
+                        (d2phi_dr2 - dphi_dr / r) / (r*r), hess);
+}
+
+static void rotate_z_hessian(double *hess_rot, double cos_a, double sin_a,
+                             double *hess) {
+    /*
+        Add a Hessian computed in a frame rotated about the z axis, i.e. with
+        x' = cos(a) x + sin(a) y and y' = -sin(a) x + cos(a) y, back to the
+        input frame: H = M^T H' M.
+    */
+    int i, j, k, l;
+    double M[9] = {cos_a, sin_a, 0.,
+                   -sin_a, cos_a, 0.,
+                   0., 0., 1.};
+
+    for (i=0; i < 3; i++) {
+        for (j=0; j < 3; j++) {
+            for (k=0; k < 3; k++) {
+                for (l=0; l < 3; l++) {
+                    hess[3*i + j] = hess[3*i + j] + M[3*k + i] * hess_rot[3*k + l] * M[3*l + j];
+                }
+            }
+        }
+    }
+}
+
 /* ---------------------------------------------------------------------------
     Henon-Heiles potential
 */
@@ -30,6 +91,14 @@ void henon_heiles_gradient(double t, double *pars, double *q, int n_dim, double
     grad[1] = grad[1] + q[1] + q[0]*q[0] - q[1]*q[1];
 }
 
+void henon_heiles_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /*  no parameters... */
+    hess[0] = hess[0] + 1 + 2*q[1];
+    hess[1] = hess[1] + 2*q[0];
+    hess[2] = hess[2] + 2*q[0];
+    hess[3] = hess[3] + 1 - 2*q[1];
+}
+
 /* ---------------------------------------------------------------------------
     Kepler potential
 */
@@ -57,6 +126,43 @@ void kepler_gradient(double t, double *pars, double *q, int n_dim, double *grad)
     grad[2] = grad[2] + fac*q[2];
 }
 
+double kepler_value_and_gradient(double t, double *pars, double *q, int n_dim,
+                                 double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+    */
+    double R, fac;
+    R = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+    fac = pars[0] * pars[1] / (R*R*R);
+
+    grad[0] = grad[0] + fac*q[0];
+    grad[1] = grad[1] + fac*q[1];
+    grad[2] = grad[2] + fac*q[2];
+
+    return -pars[0] * pars[1] / R;
+}
+
+void kepler_gradient_batch(double t, double *pars, double *q, int n_dim,
+                           int n, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+    */
+    int i;
+    double *x = q, *y = q + n, *z = q + 2*n;
+    double GM = pars[0] * pars[1];
+
+    #pragma omp simd
+    for (i=0; i < n; i++) {
+        double R = sqrt(x[i]*x[i] + y[i]*y[i] + z[i]*z[i]);
+        double fac = GM / (R*R*R);
+        grad[i] = grad[i] + fac*x[i];
+        grad[n+i] = grad[n+i] + fac*y[i];
+        grad[2*n+i] = grad[2*n+i] + fac*z[i];
+    }
+}
+
 double kepler_density(double t, double *pars, double *q, int n_dim) {
     /*  pars:
             - G (Gravitational constant)
@@ -135,6 +241,49 @@ void isochrone_gradient(double t, double *pars, double *q, int n_dim, double *gr
     grad[2] = grad[2] + fac*q[2];
 }
 
+double isochrone_value_and_gradient(double t, double *pars, double *q,
+                                    int n_dim, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - b (core scale)
+    */
+    double sqrt_r2_b2, fac, denom;
+    sqrt_r2_b2 = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2] + pars[2]*pars[2]);
+    denom = sqrt_r2_b2 * (sqrt_r2_b2 + pars[2])*(sqrt_r2_b2 + pars[2]);
+    fac = pars[0] * pars[1] / denom;
+
+    grad[0] = grad[0] + fac*q[0];
+    grad[1] = grad[1] + fac*q[1];
+    grad[2] = grad[2] + fac*q[2];
+
+    return -pars[0] * pars[1] / (sqrt_r2_b2 + pars[2]);
+}
+
+void isochrone_gradient_batch(double t, double *pars, double *q, int n_dim,
+                              int n, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - b (core scale)
+    */
+    int i;
+    double *x = q, *y = q + n, *z = q + 2*n;
+    double GM = pars[0] * pars[1];
+    double b = pars[2];
+    double b2 = b*b;
+
+    #pragma omp simd
+    for (i=0; i < n; i++) {
+        double sqrt_r2_b2 = sqrt(x[i]*x[i] + y[i]*y[i] + z[i]*z[i] + b2);
+        double denom = sqrt_r2_b2 * (sqrt_r2_b2 + b)*(sqrt_r2_b2 + b);
+        double fac = GM / denom;
+        grad[i] = grad[i] + fac*x[i];
+        grad[n+i] = grad[n+i] + fac*y[i];
+        grad[2*n+i] = grad[2*n+i] + fac*z[i];
+    }
+}
+
 double isochrone_density(double t, double *pars, double *q, int n_dim) {
     /*  pars:
             - G (Gravitational constant)
@@ -220,6 +369,46 @@ void hernquist_gradient(double t, double *pars, double *q, int n_dim, double *gr
     grad[2] = grad[2] + fac*q[2];
 }
 
+double hernquist_value_and_gradient(double t, double *pars, double *q,
+                                    int n_dim, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - c (length scale)
+    */
+    double R, fac;
+    R = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+    fac = pars[0] * pars[1] / ((R + pars[2]) * (R + pars[2]) * R);
+
+    grad[0] = grad[0] + fac*q[0];
+    grad[1] = grad[1] + fac*q[1];
+    grad[2] = grad[2] + fac*q[2];
+
+    return -pars[0] * pars[1] / (R + pars[2]);
+}
+
+void hernquist_gradient_batch(double t, double *pars, double *q, int n_dim,
+                              int n, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - c (length scale)
+    */
+    int i;
+    double *x = q, *y = q + n, *z = q + 2*n;
+    double GM = pars[0] * pars[1];
+    double c = pars[2];
+
+    #pragma omp simd
+    for (i=0; i < n; i++) {
+        double R = sqrt(x[i]*x[i] + y[i]*y[i] + z[i]*z[i]);
+        double fac = GM / ((R + c) * (R + c) * R);
+        grad[i] = grad[i] + fac*x[i];
+        grad[n+i] = grad[n+i] + fac*y[i];
+        grad[2*n+i] = grad[2*n+i] + fac*z[i];
+    }
+}
+
 double hernquist_density(double t, double *pars, double *q, int n_dim) {
     /*  pars:
             - G (Gravitational constant)
@@ -304,6 +493,47 @@ void plummer_gradient(double t, double *pars, double *q, int n_dim, double *grad
     grad[2] = grad[2] + fac*q[2];
 }
 
+double plummer_value_and_gradient(double t, double *pars, double *q, int n_dim,
+                                  double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - b (length scale)
+    */
+    double R2b, sqrt_R2b, fac;
+    R2b = q[0]*q[0] + q[1]*q[1] + q[2]*q[2] + pars[2]*pars[2];
+    sqrt_R2b = sqrt(R2b);
+    fac = pars[0] * pars[1] / sqrt_R2b / R2b;
+
+    grad[0] = grad[0] + fac*q[0];
+    grad[1] = grad[1] + fac*q[1];
+    grad[2] = grad[2] + fac*q[2];
+
+    return -pars[0] * pars[1] / sqrt_R2b;
+}
+
+void plummer_gradient_batch(double t, double *pars, double *q, int n_dim,
+                            int n, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - b (length scale)
+    */
+    int i;
+    double *x = q, *y = q + n, *z = q + 2*n;
+    double GM = pars[0] * pars[1];
+    double b2 = pars[2]*pars[2];
+
+    #pragma omp simd
+    for (i=0; i < n; i++) {
+        double R2b = x[i]*x[i] + y[i]*y[i] + z[i]*z[i] + b2;
+        double fac = GM / sqrt(R2b) / R2b;
+        grad[i] = grad[i] + fac*x[i];
+        grad[n+i] = grad[n+i] + fac*y[i];
+        grad[2*n+i] = grad[2*n+i] + fac*z[i];
+    }
+}
+
 double plummer_density(double t, double *pars, double *q, int n_dim) {
     /*  pars:
             - G (Gravitational constant)
@@ -380,6 +610,24 @@ void jaffe_gradient(double t, double *pars, double *q, int n_dim, double *grad){
     grad[2] = grad[2] + fac*q[2]/R;
 }
 
+double jaffe_value_and_gradient(double t, double *pars, double *q, int n_dim,
+                                double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - c (length scale)
+    */
+    double R, fac;
+    R = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+    fac = pars[0] * pars[1] / pars[2] * (pars[2] / (R * (pars[2] + R)));
+
+    grad[0] = grad[0] + fac*q[0]/R;
+    grad[1] = grad[1] + fac*q[1]/R;
+    grad[2] = grad[2] + fac*q[2]/R;
+
+    return -pars[0] * pars[1] / pars[2] * log(1 + pars[2]/R);
+}
+
 double jaffe_density(double t, double *pars, double *q, int n_dim) {
     /*  pars:
             - G (Gravitational constant)
@@ -392,6 +640,22 @@ double jaffe_density(double t, double *pars, double *q, int n_dim) {
     return rho0 / (pow(r/pars[2],2) * pow(1+r/pars[2],2));
 }
 
+void jaffe_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - c (length scale)
+    */
+    double GM = pars[0] * pars[1];
+    double c = pars[2];
+    double r = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+
+    double dphi_dr = GM / (r * (c + r));
+    double d2phi_dr2 = -GM * (c + 2*r) / (r*r * (c + r)*(c + r));
+
+    spherical_hessian(q, r, dphi_dr, d2phi_dr2, hess);
+}
+
 /* ---------------------------------------------------------------------------
     Power-law potential with exponential cutoff
 */
@@ -444,6 +708,27 @@ void powerlawcutoff_gradient(double t, double *pars, double *q, int n_dim, doubl
     grad[1] = grad[1] + dPhi_dr * q[1]/r;
     grad[2] = grad[2] + dPhi_dr * q[2]/r;
 }
+
+void powerlawcutoff_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /*  pars:
+            0 - G (Gravitational constant)
+            1 - m (total mass)
+            2 - a (power-law index)
+            3 - c (cutoff radius)
+    */
+    double r, s, X, GM, dPhi_dr, d2Phi_dr2;
+    r = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+    s = 0.5 * (3-pars[2]);
+    X = r*r / (pars[3]*pars[3]);
+    GM = pars[0] * pars[1];
+
+    dPhi_dr = GM / (r*r) * gsl_sf_gamma_inc_P(s, X);
+    d2Phi_dr2 = (-2 * dPhi_dr / r +
+                 GM / (r*r) * pow(X, s-1) * exp(-X) / gsl_sf_gamma(s) *
+                 2 * r / (pars[3]*pars[3]));
+
+    spherical_hessian(q, r, dPhi_dr, d2Phi_dr2, hess);
+}
 #endif
 
 /* ---------------------------------------------------------------------------
@@ -489,6 +774,33 @@ void stone_gradient(double t, double *pars, double *q, int n_dim, double *grad)
     grad[2] = grad[2] + dphi_dr*q[2]/r;
 }
 
+double stone_value_and_gradient(double t, double *pars, double *q, int n_dim,
+                                double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - M (total mass)
+            - r_c (core radius)
+            - r_h (halo radius)
+    */
+    double r, u_c, u_h, atan_c, atan_h, fac, dphi_dr;
+
+    r = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+    u_c = r / pars[2];
+    u_h = r / pars[3];
+    atan_c = atan(u_c);
+    atan_h = atan(u_h);
+
+    fac = 2*pars[0]*pars[1] / M_PI / (pars[3] - pars[2]);
+    dphi_dr = -fac / (r*r) * (pars[2]*atan_c - pars[3]*atan_h);
+
+    grad[0] = grad[0] + dphi_dr*q[0]/r;
+    grad[1] = grad[1] + dphi_dr*q[1]/r;
+    grad[2] = grad[2] + dphi_dr*q[2]/r;
+
+    return -fac * (atan_h/u_h - atan_c/u_c +
+                   0.5*log((r*r + pars[3]*pars[3])/(r*r + pars[2]*pars[2])));
+}
+
 double stone_density(double t, double *pars, double *q, int n_dim) {
     /*  pars:
             - G (Gravitational constant)
@@ -506,6 +818,28 @@ double stone_density(double t, double *pars, double *q, int n_dim) {
     return rho / ((1 + u_c*u_c)*(1 + u_t*u_t));
 }
 
+void stone_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /*  pars:
+            - G (Gravitational constant)
+            - M (total mass)
+            - r_c (core radius)
+            - r_h (halo radius)
+    */
+    double r, A, dA_dr, fac, dphi_dr, d2phi_dr2;
+
+    r = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+
+    fac = 2*pars[0]*pars[1] / M_PI / (pars[2] - pars[3]);
+    A = pars[2]*atan(r / pars[2]) - pars[3]*atan(r / pars[3]);
+    dA_dr = (pars[2]*pars[2] / (pars[2]*pars[2] + r*r) -
+             pars[3]*pars[3] / (pars[3]*pars[3] + r*r));
+
+    dphi_dr = fac * A / (r*r);
+    d2phi_dr2 = fac * (dA_dr / (r*r) - 2*A / (r*r*r));
+
+    spherical_hessian(q, r, dphi_dr, d2phi_dr2, hess);
+}
+
 /* ---------------------------------------------------------------------------
     Spherical NFW
 */
@@ -540,6 +874,49 @@ void sphericalnfw_gradient(double t, double *pars, double *q, int n_dim, double
     grad[2] = grad[2] + fac*q[2];
 }
 
+double sphericalnfw_value_and_gradient(double t, double *pars, double *q,
+                                       int n_dim, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - r_s (scale radius)
+    */
+    double fac, u, v_h2, log_1pu;
+    v_h2 = pars[0] * pars[1] / pars[2];
+
+    u = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]) / pars[2];
+    log_1pu = log(1 + u);
+    fac = v_h2 / (u*u*u) / (pars[2]*pars[2]) * (log_1pu - u/(1+u));
+
+    grad[0] = grad[0] + fac*q[0];
+    grad[1] = grad[1] + fac*q[1];
+    grad[2] = grad[2] + fac*q[2];
+
+    return -v_h2 * log_1pu / u;
+}
+
+void sphericalnfw_gradient_batch(double t, double *pars, double *q, int n_dim,
+                                 int n, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - r_s (scale radius)
+    */
+    int i;
+    double *x = q, *y = q + n, *z = q + 2*n;
+    double v_h2 = pars[0] * pars[1] / pars[2];
+    double inv_rs = 1. / pars[2];
+
+    #pragma omp simd
+    for (i=0; i < n; i++) {
+        double u = sqrt(x[i]*x[i] + y[i]*y[i] + z[i]*z[i]) * inv_rs;
+        double fac = v_h2 / (u*u*u) * (inv_rs*inv_rs) * (log(1+u) - u/(1+u));
+        grad[i] = grad[i] + fac*x[i];
+        grad[n+i] = grad[n+i] + fac*y[i];
+        grad[2*n+i] = grad[2*n+i] + fac*z[i];
+    }
+}
+
 double sphericalnfw_density(double t, double *pars, double *q, int n_dim) {
     /*  pars:
             - G (Gravitational constant)
@@ -555,14 +932,14 @@ double sphericalnfw_density(double t, double *pars, double *q, int n_dim) {
     return rho0 / ((r/pars[2]) * pow(1+r/pars[2],2));
 }
 
-double sphericalnfw_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+void sphericalnfw_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
   /*  pars:
         - G (Gravitational constant)
         - m (mass scale)
         - r_s (scale radius)
   */
   // double v_h2 = pars[1]*pars[1] / (log(2.) - 0.5);
-  double v_h2 = -pars[0] * pars[1] / pars[2];
+  double v_h2 = pars[0] * pars[1] / pars[2];
   double rs = pars[2];
 
   double x = q[0];
@@ -624,6 +1001,51 @@ void flattenednfw_gradient(double t, double *pars, double *q, int n_dim, double
     grad[2] = grad[2] + fac*q[2]/(pars[3]*pars[3]);
 }
 
+double flattenednfw_value_and_gradient(double t, double *pars, double *q,
+                                       int n_dim, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (scale mass)
+            - r_s (scale radius)
+            - qz (flattening)
+    */
+    double fac, u, v_h2, log_1pu;
+    v_h2 = pars[0] * pars[1] / pars[2];
+    u = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]/(pars[3]*pars[3])) / pars[2];
+    log_1pu = log(1 + u);
+
+    fac = v_h2 / (u*u*u) / (pars[2]*pars[2]) * (log_1pu - u/(1+u));
+
+    grad[0] = grad[0] + fac*q[0];
+    grad[1] = grad[1] + fac*q[1];
+    grad[2] = grad[2] + fac*q[2]/(pars[3]*pars[3]);
+
+    return -v_h2 * log_1pu / u;
+}
+
+void flattenednfw_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (scale mass)
+            - r_s (scale radius)
+            - qz (flattening)
+    */
+    double inv_a2[3] = {1., 1., 1. / (pars[3]*pars[3])};
+    double u, u2, h, dh_du, v_h2, fac, dfac, rs2;
+    v_h2 = pars[0] * pars[1] / pars[2];
+    rs2 = pars[2]*pars[2];
+    u = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]*inv_a2[2]) / pars[2];
+    u2 = u*u;
+
+    h = log(1+u) - u/(1+u);
+    dh_du = u / ((1+u)*(1+u));
+
+    fac = v_h2 / (u2*u) / rs2 * h;
+    dfac = v_h2 / (rs2*rs2) * (dh_du / (u2*u2) - 3*h / (u2*u2*u));
+
+    ellipsoidal_hessian(q, &inv_a2[0], fac, dfac, hess);
+}
+
 /* ---------------------------------------------------------------------------
     Triaxial NFW - triaxiality in potential!
 */
@@ -666,6 +1088,59 @@ void triaxialnfw_gradient(double t, double *pars, double *q, int n_dim, double *
     grad[2] = grad[2] + fac*q[2]/(pars[5]*pars[5]);
 }
 
+double triaxialnfw_value_and_gradient(double t, double *pars, double *q,
+                                      int n_dim, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (scale mass)
+            - r_s (scale radius)
+            - a (major axis)
+            - b (intermediate axis)
+            - c (minor axis)
+    */
+    double fac, u, v_h2, log_1pu;
+    v_h2 = pars[0] * pars[1] / pars[2];
+    u = sqrt(q[0]*q[0]/(pars[3]*pars[3])
+           + q[1]*q[1]/(pars[4]*pars[4])
+           + q[2]*q[2]/(pars[5]*pars[5])) / pars[2];
+    log_1pu = log(1 + u);
+
+    fac = v_h2 / (u*u*u) / (pars[2]*pars[2]) * (log_1pu - u/(1+u));
+
+    grad[0] = grad[0] + fac*q[0]/(pars[3]*pars[3]);
+    grad[1] = grad[1] + fac*q[1]/(pars[4]*pars[4]);
+    grad[2] = grad[2] + fac*q[2]/(pars[5]*pars[5]);
+
+    return -v_h2 * log_1pu / u;
+}
+
+void triaxialnfw_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (scale mass)
+            - r_s (scale radius)
+            - a (major axis)
+            - b (intermediate axis)
+            - c (minor axis)
+    */
+    double inv_a2[3] = {1. / (pars[3]*pars[3]),
+                        1. / (pars[4]*pars[4]),
+                        1. / (pars[5]*pars[5])};
+    double u, u2, h, dh_du, v_h2, fac, dfac, rs2;
+    v_h2 = pars[0] * pars[1] / pars[2];
+    rs2 = pars[2]*pars[2];
+    u = sqrt(q[0]*q[0]*inv_a2[0] + q[1]*q[1]*inv_a2[1] + q[2]*q[2]*inv_a2[2]) / pars[2];
+    u2 = u*u;
+
+    h = log(1+u) - u/(1+u);
+    dh_du = u / ((1+u)*(1+u));
+
+    fac = v_h2 / (u2*u) / rs2 * h;
+    dfac = v_h2 / (rs2*rs2) * (dh_du / (u2*u2) - 3*h / (u2*u2*u));
+
+    ellipsoidal_hessian(q, &inv_a2[0], fac, dfac, hess);
+}
+
 /* ---------------------------------------------------------------------------
     Satoh potential
 */
@@ -697,6 +1172,26 @@ void satoh_gradient(double t, double *pars, double *q, int n_dim, double *grad)
     grad[2] = grad[2] + dPhi_dS/sqrt(S2) * q[2]*(1 + pars[2] / sqrt(q[2]*q[2] + pars[3]*pars[3]));
 }
 
+double satoh_value_and_gradient(double t, double *pars, double *q, int n_dim,
+                                double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - a (scale length)
+            - b (scale height)
+    */
+    double sqrt_z2b2 = sqrt(q[2]*q[2] + pars[3]*pars[3]);
+    double S2 = q[0]*q[0] + q[1]*q[1] + q[2]*q[2] + pars[2]*(pars[2] + 2*sqrt_z2b2);
+    double S = sqrt(S2);
+    double dPhi_dS = pars[0] * pars[1] / S2;
+
+    grad[0] = grad[0] + dPhi_dS*q[0]/S;
+    grad[1] = grad[1] + dPhi_dS*q[1]/S;
+    grad[2] = grad[2] + dPhi_dS/S * q[2]*(1 + pars[2] / sqrt_z2b2);
+
+    return -pars[0] * pars[1] / S;
+}
+
 double satoh_density(double t, double *pars, double *q, int n_dim) {
     /*  pars:
             - G (Gravitational constant)
@@ -711,6 +1206,51 @@ double satoh_density(double t, double *pars, double *q, int n_dim) {
     return A * (1/sqrt(z2b2) + 3/pars[2]*(1 - xyz2/S2));
 }
 
+void satoh_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /*  Generated by sympy...
+
+        pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - a (scale length)
+            - b (scale height)
+    */
+    double GM = pars[0] * pars[1];
+    double a = pars[2];
+    double b = pars[3];
+    double x = q[0];
+    double y = q[1];
+    double z = q[2];
+
+    double tmp0 = pow(x, 2);
+    double tmp1 = pow(y, 2);
+    double tmp2 = pow(z, 2);
+    double tmp3 = pow(b, 2) + tmp2;
+    double tmp4 = sqrt(tmp3);
+    double tmp5 = a*(a + 2*tmp4) + tmp0 + tmp1 + tmp2;
+    double tmp6 = 3/tmp5;
+    double tmp7 = GM/pow(tmp5, 3.0/2.0);
+    double tmp8 = pow(tmp5, -5.0/2.0);
+    double tmp9 = 3*GM*tmp8*x;
+    double tmp10 = a/tmp4;
+    double tmp11 = tmp10 + 1;
+    double tmp12 = tmp11*z;
+    double tmp13 = -tmp9*y;
+    double tmp14 = -tmp12*tmp9;
+    double tmp15 = -3*GM*tmp12*tmp8*y;
+
+    hess[0] = hess[0] + -tmp7*(tmp0*tmp6 - 1);
+    hess[1] = hess[1] + tmp13;
+    hess[2] = hess[2] + tmp14;
+    hess[3] = hess[3] + tmp13;
+    hess[4] = hess[4] + -tmp7*(tmp1*tmp6 - 1);
+    hess[5] = hess[5] + tmp15;
+    hess[6] = hess[6] + tmp14;
+    hess[7] = hess[7] + tmp15;
+    hess[8] = hess[8] + -tmp7*(a*tmp2/pow(tmp3, 3.0/2.0) - tmp10 + pow(tmp11, 2)*tmp2*tmp6 - 1);
+
+}
+
 /* ---------------------------------------------------------------------------
     Miyamoto-Nagai flattened potential
 */
@@ -744,6 +1284,55 @@ void miyamotonagai_gradient(double t, double *pars, double *q, int n_dim, double
     grad[2] = grad[2] + fac*q[2] * (1. + pars[2] / sqrtz);
 }
 
+double miyamotonagai_value_and_gradient(double t, double *pars, double *q,
+                                        int n_dim, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - a (scale length)
+            - b (scale height)
+    */
+    double sqrtz, zd, S, fac;
+
+    sqrtz = sqrt(q[2]*q[2] + pars[3]*pars[3]);
+    zd = pars[2] + sqrtz;
+    S = sqrt(q[0]*q[0] + q[1]*q[1] + zd*zd);
+    fac = pars[0]*pars[1] / (S*S*S);
+
+    grad[0] = grad[0] + fac*q[0];
+    grad[1] = grad[1] + fac*q[1];
+    grad[2] = grad[2] + fac*q[2] * (1. + pars[2] / sqrtz);
+
+    return -pars[0] * pars[1] / S;
+}
+
+void miyamotonagai_gradient_batch(double t, double *pars, double *q, int n_dim,
+                                  int n, double *grad) {
+    /*  pars:
+            - G (Gravitational constant)
+            - m (mass scale)
+            - a (length scale 1)
+            - b (length scale 2)
+    */
+    int i;
+    double *x = q, *y = q + n, *z = q + 2*n;
+    double GM = pars[0] * pars[1];
+    double a = pars[2];
+    double b2 = pars[3]*pars[3];
+
+    #pragma omp simd
+    for (i=0; i < n; i++) {
+        double sqrtz = sqrt(z[i]*z[i] + b2);
+        double zd = a + sqrtz;
+        double S2 = x[i]*x[i] + y[i]*y[i] + zd*zd;
+        double fac = GM / (S2 * sqrt(S2));
+
+        grad[i] = grad[i] + fac*x[i];
+        grad[n+i] = grad[n+i] + fac*y[i];
+        grad[2*n+i] = grad[2*n+i] + fac*z[i] * (1. + a / sqrtz);
+    }
+}
+
 double miyamotonagai_density(double t, double *pars, double *q, int n_dim) {
     /*  pars:
             - G (Gravitational constant)
@@ -922,6 +1511,156 @@ double leesuto_density(double t, double *pars, double *q, int n_dim) {
     return v_h2 / (u * (1+u)*(1+u)) / (4.*M_PI*pars[2]*pars[2]*pars[0]);
 }
 
+void leesuto_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /*  Generated by sympy...
+
+        pars: (alpha = 1)
+            0 - G
+            1 - v_c
+            2 - r_s
+            3 - a
+            4 - b
+            5 - c
+    */
+    double e_b2 = 1-pow(pars[4]/pars[3],2);
+    double e_c2 = 1-pow(pars[5]/pars[3],2);
+    double phi0 = pars[1]*pars[1] / (log(2.) - 0.5 + (log(2.)-0.75)*e_b2 + (log(2.)-0.75)*e_c2);
+    double r_s = pars[2];
+    double x = q[0];
+    double y = q[1];
+    double z = q[2];
+
+    double tmp0 = 1.0/r_s;
+    double tmp1 = 4*tmp0;
+    double tmp2 = pow(x, 2);
+    double tmp3 = pow(y, 2);
+    double tmp4 = pow(z, 2);
+    double tmp5 = tmp2 + tmp3 + tmp4;
+    double tmp6 = sqrt(tmp5);
+    double tmp7 = 3/tmp6;
+    double tmp8 = -tmp7;
+    double tmp9 = pow(tmp5, -3.0/2.0);
+    double tmp10 = 3*tmp2;
+    double tmp11 = tmp10*tmp9 + tmp8;
+    double tmp12 = 1.0/tmp5;
+    double tmp13 = r_s*tmp12;
+    double tmp14 = pow(r_s, 2);
+    double tmp15 = pow(tmp5, -2);
+    double tmp16 = tmp14*tmp15;
+    double tmp17 = 15*tmp16;
+    double tmp18 = tmp12*tmp14;
+    double tmp19 = 3*tmp18;
+    double tmp20 = 1 - tmp19;
+    double tmp21 = tmp0*tmp6;
+    double tmp22 = tmp21 + 1;
+    double tmp23 = log(tmp22);
+    double tmp24 = r_s*tmp9;
+    double tmp25 = tmp23*tmp24;
+    double tmp26 = 6*tmp25;
+    double tmp27 = r_s*tmp15;
+    double tmp28 = 4*tmp27*(-tmp1 + tmp7);
+    double tmp29 = 1.0/tmp22;
+    double tmp30 = tmp15*tmp29;
+    double tmp31 = 6*tmp18 - 6;
+    double tmp32 = tmp30*tmp31;
+    double tmp33 = tmp5/tmp14;
+    double tmp34 = 3*tmp21;
+    double tmp35 = 2*tmp33 - tmp34 + 6;
+    double tmp36 = pow(tmp5, -3);
+    double tmp37 = tmp14*tmp36;
+    double tmp38 = 8*tmp37;
+    double tmp39 = tmp35*tmp38;
+    double tmp40 = 12*tmp30*(tmp19 - 1);
+    double tmp41 = pow(tmp22, -2);
+    double tmp42 = tmp41*tmp9;
+    double tmp43 = tmp0*tmp42;
+    double tmp44 = tmp2*tmp43;
+    double tmp45 = tmp12*tmp29;
+    double tmp46 = 2*tmp16;
+    double tmp47 = -tmp31*tmp45 - tmp35*tmp46;
+    double tmp48 = (1.0/12.0)*e_b2 + (1.0/12.0)*e_c2;
+    double tmp49 = 2*tmp0;
+    double tmp50 = r_s*tmp45;
+    double tmp51 = 42*tmp29*tmp37;
+    double tmp52 = pow(tmp5, -5.0/2.0);
+    double tmp53 = r_s*tmp52;
+    double tmp54 = tmp41*tmp53;
+    double tmp55 = 6*tmp54;
+    double tmp56 = -tmp33 + tmp34 + 6;
+    double tmp57 = 2*tmp56;
+    double tmp58 = tmp15/pow(tmp22, 3);
+    double tmp59 = tmp57*tmp58;
+    double tmp60 = -tmp49 + tmp7;
+    double tmp61 = 2*tmp42*tmp60;
+    double tmp62 = pow(r_s, 3)*tmp23;
+    double tmp63 = 90*tmp62/pow(tmp5, 7.0/2.0);
+    double tmp64 = tmp29*tmp38;
+    double tmp65 = tmp56*tmp64;
+    double tmp66 = tmp41*tmp56;
+    double tmp67 = 5*tmp53*tmp66;
+    double tmp68 = r_s*tmp30;
+    double tmp69 = 4*tmp60*tmp68;
+    double tmp70 = 18*tmp52;
+    double tmp71 = 6*tmp30;
+    double tmp72 = tmp30*tmp57;
+    double tmp73 = tmp14*tmp71 + tmp14*tmp72 + tmp24*tmp66 - tmp62*tmp70;
+    double tmp74 = e_b2*tmp3;
+    double tmp75 = e_c2*tmp4;
+    double tmp76 = tmp74 + tmp75;
+    double tmp77 = (1.0/4.0)*tmp12*tmp76;
+    double tmp78 = tmp23*tmp53;
+    double tmp79 = r_s*tmp71;
+    double tmp80 = tmp14*tmp23*tmp70;
+    double tmp81 = r_s*tmp72 + tmp42*tmp56 - tmp45*tmp60 + tmp79 - tmp80;
+    double tmp82 = tmp27*tmp76;
+    double tmp83 = tmp81*tmp82;
+    double tmp84 = tmp26 - tmp45*tmp56;
+    double tmp85 = 2*tmp37*tmp76*tmp84;
+    double tmp86 = tmp16*tmp84;
+    double tmp87 = tmp25 - tmp45 - 1.0/2.0*tmp76*tmp86;
+    double tmp88 = e_b2*tmp86;
+    double tmp89 = (1.0/2.0)*e_b2;
+    double tmp90 = -tmp81;
+    double tmp91 = tmp13*tmp90;
+    double tmp92 = 3*tmp30;
+    double tmp93 = 3*tmp53;
+    double tmp94 = tmp48*(tmp28 + tmp31*tmp43 + tmp32 + tmp39 + tmp40 - 18*tmp78*(5*tmp18 - 1) + tmp93);
+    double tmp95 = tmp23*tmp93;
+    double tmp96 = tmp29*tmp93;
+    double tmp97 = tmp43 - tmp77*(tmp51 + tmp55 + tmp59 - tmp61 - tmp63 + tmp65 + tmp67 - tmp69 - tmp96) + tmp82*tmp90 + tmp85 + tmp92 + tmp94 - tmp95;
+    double tmp98 = phi0*x;
+    double tmp99 = e_c2*tmp86;
+    double tmp100 = (1.0/2.0)*e_c2;
+    double tmp101 = 3*tmp3;
+    double tmp102 = tmp101*tmp9 + tmp8;
+    double tmp103 = tmp3*tmp43;
+    double tmp104 = tmp18*tmp84;
+    double tmp105 = tmp13*tmp81;
+    double tmp106 = tmp46*tmp84;
+    double tmp107 = -tmp60;
+    double tmp108 = -tmp56;
+    double tmp109 = 2*tmp108;
+    double tmp110 = -tmp107*tmp45 + tmp108*tmp42 + tmp109*tmp68 - tmp79 + tmp80;
+    double tmp111 = tmp110*tmp13;
+    double tmp112 = 3*tmp4;
+    double tmp113 = tmp112*tmp9 + tmp8;
+    double tmp114 = tmp4*tmp43;
+    double tmp115 = tmp98*y*(-tmp88 - tmp89*tmp91 + tmp97);
+    double tmp116 = tmp98*z*(-tmp100*tmp91 + tmp97 - tmp99);
+    double tmp117 = -phi0*y*z*(tmp100*tmp111 - tmp110*tmp82 + tmp111*tmp89 - tmp43 + tmp77*(4*r_s*tmp107*tmp15*tmp29 + 6*r_s*tmp41*tmp52 + 2*tmp107*tmp41*tmp9 - 5*tmp108*tmp54 - tmp108*tmp64 - tmp109*tmp58 + 42*tmp14*tmp29*tmp36 - tmp63 - tmp96) - tmp85 + tmp88 - tmp92 - tmp94 + tmp95 + tmp99);
+
+    hess[0] = hess[0] + phi0*(tmp10*tmp30 - tmp10*tmp78 - tmp2*tmp83 + tmp2*tmp85 + tmp44 + tmp48*(tmp13*(tmp1 + tmp11) + tmp2*tmp28 + tmp2*tmp32 + tmp2*tmp39 + tmp2*tmp40 - tmp26*(-tmp10*tmp12 + tmp17*tmp2 + tmp20) + tmp31*tmp44 + tmp47) + tmp77*(-tmp2*tmp51 - tmp2*tmp55 - tmp2*tmp59 + tmp2*tmp61 + tmp2*tmp63 - tmp2*tmp65 - tmp2*tmp67 + tmp2*tmp69 + tmp50*(tmp11 + tmp49) + tmp73) + tmp87);
+    hess[1] = hess[1] + tmp115;
+    hess[2] = hess[2] + tmp116;
+    hess[3] = hess[3] + tmp115;
+    hess[4] = hess[4] + phi0*(tmp103 + tmp104*tmp89 + tmp105*tmp74 - tmp106*tmp74 - tmp3*tmp83 + tmp3*tmp85 + tmp3*tmp92 - tmp3*tmp95 + tmp48*(tmp103*tmp31 + tmp13*(tmp1 + tmp102) - tmp26*(-tmp101*tmp12 + tmp17*tmp3 + tmp20) + tmp28*tmp3 + tmp3*tmp32 + tmp3*tmp39 + tmp3*tmp40 + tmp47) + tmp77*(-tmp3*tmp51 - tmp3*tmp55 - tmp3*tmp59 + tmp3*tmp61 + tmp3*tmp63 - tmp3*tmp65 - tmp3*tmp67 + tmp3*tmp69 + tmp50*(tmp102 + tmp49) + tmp73) + tmp87);
+    hess[5] = hess[5] + tmp117;
+    hess[6] = hess[6] + tmp116;
+    hess[7] = hess[7] + tmp117;
+    hess[8] = hess[8] + phi0*(tmp100*tmp104 + tmp105*tmp75 - tmp106*tmp75 + tmp114 - tmp4*tmp83 + tmp4*tmp85 + tmp4*tmp92 - tmp4*tmp95 + tmp48*(tmp114*tmp31 + tmp13*(tmp1 + tmp113) - tmp26*(-tmp112*tmp12 + tmp17*tmp4 + tmp20) + tmp28*tmp4 + tmp32*tmp4 + tmp39*tmp4 + tmp4*tmp40 + tmp47) + tmp77*(-tmp4*tmp51 - tmp4*tmp55 - tmp4*tmp59 + tmp4*tmp61 + tmp4*tmp63 - tmp4*tmp65 - tmp4*tmp67 + tmp4*tmp69 + tmp50*(tmp113 + tmp49) + tmp73) + tmp87);
+
+}
+
 /* ---------------------------------------------------------------------------
     Logarithmic (triaxial)
 */
@@ -957,6 +1696,54 @@ void logarithmic_gradient(double t, double *pars, double *q, int n_dim, double *
     grad[2] = grad[2] + az;
 }
 
+double logarithmic_value_and_gradient(double t, double *pars, double *q,
+                                      int n_dim, double *grad) {
+    /* pars[0] is G -- unused here */
+    double x, y, z, ax, ay, az, denom, fac;
+    double cos_phi = cos(pars[6]);
+    double sin_phi = sin(pars[6]);
+
+    x = q[0]*cos_phi + q[1]*sin_phi;
+    y = -q[0]*sin_phi + q[1]*cos_phi;
+    z = q[2];
+
+    denom = (pars[2]*pars[2] + x*x/(pars[3]*pars[3]) + y*y/(pars[4]*pars[4]) +
+             z*z/(pars[5]*pars[5]));
+    fac = pars[1]*pars[1] / denom;
+    ax = fac*x/(pars[3]*pars[3]);
+    ay = fac*y/(pars[4]*pars[4]);
+    az = fac*z/(pars[5]*pars[5]);
+
+    grad[0] = grad[0] + (ax*cos_phi - ay*sin_phi);
+    grad[1] = grad[1] + (ax*sin_phi + ay*cos_phi);
+    grad[2] = grad[2] + az;
+
+    return 0.5*pars[1]*pars[1] * log(denom);
+}
+
+void logarithmic_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /* pars[0] is G -- unused here */
+    double q_rot[3], hess_rot[9] = {0.};
+    double denom, v2;
+    double cos_phi = cos(pars[6]);
+    double sin_phi = sin(pars[6]);
+    double inv_a2[3] = {1. / (pars[3]*pars[3]),
+                        1. / (pars[4]*pars[4]),
+                        1. / (pars[5]*pars[5])};
+
+    q_rot[0] = q[0]*cos_phi + q[1]*sin_phi;
+    q_rot[1] = -q[0]*sin_phi + q[1]*cos_phi;
+    q_rot[2] = q[2];
+
+    v2 = pars[1]*pars[1];
+    denom = (pars[2]*pars[2] + q_rot[0]*q_rot[0]*inv_a2[0] +
+             q_rot[1]*q_rot[1]*inv_a2[1] + q_rot[2]*q_rot[2]*inv_a2[2]);
+
+    ellipsoidal_hessian(&q_rot[0], &inv_a2[0], v2 / denom,
+                        -2 * v2 / (denom*denom), &hess_rot[0]);
+    rotate_z_hessian(&hess_rot[0], cos_phi, sin_phi, hess);
+}
+
 /* ---------------------------------------------------------------------------
     Logarithmic (triaxial)
 */
@@ -1100,3 +1887,93 @@ double longmuralibar_density(double t, double *pars, double *q, int n_dim) {
         tmp20*tmp33 - 2*tmp25*tmp27*tmp36 - tmp28*tmp38 - tmp29*(-tmp22*tmp31 +
         1) - tmp29 - tmp35*tmp40 - tmp35*(-2*tmp0*tmp13 + 2))/(M_PI*a);
 }
+
+void longmuralibar_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    /*
+        Generated by sympy...
+
+        pars:
+        - G (Gravitational constant)
+        - m (mass scale)
+        - a
+        - b
+        - c
+        - alpha
+    */
+    double GM = pars[0] * pars[1];
+    double a = pars[2];
+    double b = pars[3];
+    double c = pars[4];
+    double cos_alpha = cos(pars[5]);
+    double sin_alpha = sin(pars[5]);
+    double hess_rot[9];
+
+    double x = q[0]*cos_alpha + q[1]*sin_alpha;
+    double y = -q[0]*sin_alpha + q[1]*cos_alpha;
+    double z = q[2];
+
+    double tmp0 = a - x;
+    double tmp1 = pow(tmp0, 2);
+    double tmp2 = pow(y, 2);
+    double tmp3 = pow(z, 2);
+    double tmp4 = pow(c, 2) + tmp3;
+    double tmp5 = sqrt(tmp4);
+    double tmp6 = b + tmp5;
+    double tmp7 = pow(tmp6, 2);
+    double tmp8 = tmp2 + tmp7;
+    double tmp9 = tmp1 + tmp8;
+    double tmp10 = sqrt(tmp9);
+    double tmp11 = 1.0/tmp10;
+    double tmp12 = a + x;
+    double tmp13 = pow(tmp12, 2);
+    double tmp14 = tmp13 + tmp8;
+    double tmp15 = sqrt(tmp14);
+    double tmp16 = 1.0/tmp15;
+    double tmp17 = tmp12*tmp16 + 1;
+    double tmp18 = -a + tmp10 + x;
+    double tmp19 = tmp12 + tmp15;
+    double tmp20 = pow(tmp19, -2);
+    double tmp21 = 2*tmp18*tmp20;
+    double tmp22 = tmp0*tmp11 - 1;
+    double tmp23 = 1.0/tmp19;
+    double tmp24 = tmp17*tmp23;
+    double tmp25 = 1.0/tmp14;
+    double tmp26 = tmp16*tmp23;
+    double tmp27 = tmp18*tmp26;
+    double tmp28 = tmp18*tmp24 + tmp22;
+    double tmp29 = 1.0/tmp18;
+    double tmp30 = (1.0/2.0)*GM*tmp29/a;
+    double tmp31 = pow(tmp9, -3.0/2.0);
+    double tmp32 = pow(tmp14, -3.0/2.0);
+    double tmp33 = tmp18*tmp23*tmp32;
+    double tmp34 = tmp30*(tmp0*tmp31 - tmp11*tmp24 + tmp11*tmp28*tmp29 + tmp12*tmp33 + tmp16*tmp17*tmp21 + tmp22*tmp26 - tmp26*tmp28);
+    double tmp35 = 1.0/tmp5;
+    double tmp36 = tmp35*tmp6*z;
+    double tmp37 = -tmp11 + tmp27;
+    double tmp38 = tmp26*tmp37;
+    double tmp39 = tmp11*tmp29*tmp37;
+    double tmp40 = tmp21*tmp25;
+    double tmp41 = 2*tmp26;
+    double tmp42 = tmp11*tmp41;
+    double tmp43 = tmp3/tmp4;
+    double tmp44 = tmp11*tmp43;
+    double tmp45 = tmp11*tmp6;
+    double tmp46 = tmp3/pow(tmp4, 3.0/2.0);
+    double tmp47 = tmp43*tmp7;
+    double tmp48 = tmp27*tmp6;
+    double tmp49 = tmp34*y;
+    double tmp50 = tmp34*tmp36;
+    double tmp51 = tmp30*tmp36*y*(tmp11*tmp29*tmp37 + 2*tmp18*tmp20*tmp25 + tmp18*tmp23*tmp32 - tmp31 - tmp38 - tmp42);
+
+    hess_rot[0] = -tmp30*(tmp11*(tmp1/tmp9 - 1) - pow(tmp17, 2)*tmp21 + tmp17*tmp23*tmp28 - 2*tmp22*tmp24 + tmp22*tmp28*tmp29 - tmp27*(tmp13*tmp25 - 1));
+    hess_rot[1] = tmp49;
+    hess_rot[2] = tmp50;
+    hess_rot[3] = tmp49;
+    hess_rot[4] = -tmp30*(tmp2*tmp31 - tmp2*tmp33 + tmp2*tmp38 - tmp2*tmp39 - tmp2*tmp40 + tmp2*tmp42 + tmp37);
+    hess_rot[5] = tmp51;
+    hess_rot[6] = tmp50;
+    hess_rot[7] = tmp51;
+    hess_rot[8] = -tmp30*(tmp27*tmp43 + tmp31*tmp47 - tmp33*tmp47 - tmp35*tmp45 + tmp35*tmp48 + tmp38*tmp47 - tmp39*tmp47 - tmp40*tmp47 + tmp41*tmp44*tmp7 - tmp44 + tmp45*tmp46 - tmp46*tmp48);
+
+    rotate_z_hessian(&hess_rot[0], cos_alpha, sin_alpha, hess);
+}
@@ -23,7 +23,8 @@ from ..core import CompositePotential, _potential_docstring
 from ..util import format_doc
 from ..cpotential import CPotentialBase
 from ..cpotential cimport CPotential, CPotentialWrapper
-from ..cpotential cimport densityfunc, energyfunc, gradientfunc, hessianfunc
+from ..cpotential cimport (densityfunc, energyfunc, gradientfunc, hessianfunc,
+                          valuegradientfunc, gradientbatchfunc)
 from ...frame.cframe cimport CFrameWrapper
 from ....units import dimensionless, DimensionlessUnitSystem
 
@@ -38,69 +39,97 @@ cdef extern from "potential/potential/builtin/builtin_potentials.h":
 
     double henon_heiles_value(double t, double *pars, double *q, int n_dim) nogil
     void henon_heiles_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void henon_heiles_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double kepler_value(double t, double *pars, double *q, int n_dim) nogil
     void kepler_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double kepler_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void kepler_gradient_batch(double t, double *pars, double *q, int n_dim, int n, double *grad) nogil
     double kepler_density(double t, double *pars, double *q, int n_dim) nogil
     void kepler_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double isochrone_value(double t, double *pars, double *q, int n_dim) nogil
     void isochrone_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double isochrone_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void isochrone_gradient_batch(double t, double *pars, double *q, int n_dim, int n, double *grad) nogil
     double isochrone_density(double t, double *pars, double *q, int n_dim) nogil
     void isochrone_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double hernquist_value(double t, double *pars, double *q, int n_dim) nogil
     void hernquist_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double hernquist_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void hernquist_gradient_batch(double t, double *pars, double *q, int n_dim, int n, double *grad) nogil
     double hernquist_density(double t, double *pars, double *q, int n_dim) nogil
     void hernquist_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double plummer_value(double t, double *pars, double *q, int n_dim) nogil
     void plummer_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double plummer_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void plummer_gradient_batch(double t, double *pars, double *q, int n_dim, int n, double *grad) nogil
     double plummer_density(double t, double *pars, double *q, int n_dim) nogil
     void plummer_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double jaffe_value(double t, double *pars, double *q, int n_dim) nogil
     void jaffe_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double jaffe_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
     double jaffe_density(double t, double *pars, double *q, int n_dim) nogil
+    void jaffe_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double powerlawcutoff_value(double t, double *pars, double *q, int n_dim) nogil
     void powerlawcutoff_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
     double powerlawcutoff_density(double t, double *pars, double *q, int n_dim) nogil
+    void powerlawcutoff_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double stone_value(double t, double *pars, double *q, int n_dim) nogil
     void stone_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double stone_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
     double stone_density(double t, double *pars, double *q, int n_dim) nogil
+    void stone_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double sphericalnfw_value(double t, double *pars, double *q, int n_dim) nogil
     void sphericalnfw_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double sphericalnfw_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void sphericalnfw_gradient_batch(double t, double *pars, double *q, int n_dim, int n, double *grad) nogil
     double sphericalnfw_density(double t, double *pars, double *q, int n_dim) nogil
     void sphericalnfw_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double flattenednfw_value(double t, double *pars, double *q, int n_dim) nogil
     void flattenednfw_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double flattenednfw_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void flattenednfw_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double triaxialnfw_value(double t, double *pars, double *q, int n_dim) nogil
     void triaxialnfw_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double triaxialnfw_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void triaxialnfw_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double satoh_value(double t, double *pars, double *q, int n_dim) nogil
     void satoh_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double satoh_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
     double satoh_density(double t, double *pars, double *q, int n_dim) nogil
+    void satoh_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double miyamotonagai_value(double t, double *pars, double *q, int n_dim) nogil
     void miyamotonagai_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double miyamotonagai_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void miyamotonagai_gradient_batch(double t, double *pars, double *q, int n_dim, int n, double *grad) nogil
     void miyamotonagai_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
     double miyamotonagai_density(double t, double *pars, double *q, int n_dim) nogil
 
     double leesuto_value(double t, double *pars, double *q, int n_dim) nogil
     void leesuto_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
     double leesuto_density(double t, double *pars, double *q, int n_dim) nogil
+    void leesuto_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double logarithmic_value(double t, double *pars, double *q, int n_dim) nogil
     void logarithmic_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double logarithmic_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void logarithmic_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
     double longmuralibar_value(double t, double *pars, double *q, int n_dim) nogil
     void longmuralibar_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
     double longmuralibar_density(double t, double *pars, double *q, int n_dim) nogil
+    void longmuralibar_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
 
 __all__ = ['NullPotential', 'HenonHeilesPotential', # Misc. potentials
            'KeplerPotential', 'HernquistPotential', 'IsochronePotential', 'PlummerPotential',
@@ -121,6 +150,7 @@ cdef class HenonHeilesWrapper(CPotentialWrapper):
                   n_dim=2)
         self.cpotential.value[0] = <energyfunc>(henon_heiles_value)
         self.cpotential.gradient[0] = <gradientfunc>(henon_heiles_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(henon_heiles_hessian)
 
 @format_doc(common_doc=_potential_docstring)
 class HenonHeilesPotential(CPotentialBase):
@@ -157,6 +187,8 @@ cdef class KeplerWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(kepler_value)
         self.cpotential.density[0] = <densityfunc>(kepler_density)
         self.cpotential.gradient[0] = <gradientfunc>(kepler_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(kepler_value_and_gradient)
+        self.cpotential.gradient_batch[0] = <gradientbatchfunc>(kepler_gradient_batch)
         self.cpotential.hessian[0] = <hessianfunc>(kepler_hessian)
 
 @format_doc(common_doc=_potential_docstring)
@@ -195,6 +227,8 @@ cdef class IsochroneWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(isochrone_value)
         self.cpotential.density[0] = <densityfunc>(isochrone_density)
         self.cpotential.gradient[0] = <gradientfunc>(isochrone_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(isochrone_value_and_gradient)
+        self.cpotential.gradient_batch[0] = <gradientbatchfunc>(isochrone_gradient_batch)
         self.cpotential.hessian[0] = <hessianfunc>(isochrone_hessian)
 
 @format_doc(common_doc=_potential_docstring)
@@ -275,6 +309,8 @@ cdef class HernquistWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(hernquist_value)
         self.cpotential.density[0] = <densityfunc>(hernquist_density)
         self.cpotential.gradient[0] = <gradientfunc>(hernquist_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(hernquist_value_and_gradient)
+        self.cpotential.gradient_batch[0] = <gradientbatchfunc>(hernquist_gradient_batch)
         self.cpotential.hessian[0] = <hessianfunc>(hernquist_hessian)
 
 @format_doc(common_doc=_potential_docstring)
@@ -314,6 +350,8 @@ cdef class PlummerWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(plummer_value)
         self.cpotential.density[0] = <densityfunc>(plummer_density)
         self.cpotential.gradient[0] = <gradientfunc>(plummer_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(plummer_value_and_gradient)
+        self.cpotential.gradient_batch[0] = <gradientbatchfunc>(plummer_gradient_batch)
         self.cpotential.hessian[0] = <hessianfunc>(plummer_hessian)
 
 @format_doc(common_doc=_potential_docstring)
@@ -355,6 +393,8 @@ cdef class JaffeWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(jaffe_value)
         self.cpotential.density[0] = <densityfunc>(jaffe_density)
         self.cpotential.gradient[0] = <gradientfunc>(jaffe_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(jaffe_value_and_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(jaffe_hessian)
 
 @format_doc(common_doc=_potential_docstring)
 class JaffePotential(CPotentialBase):
@@ -396,6 +436,8 @@ cdef class StoneWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(stone_value)
         self.cpotential.density[0] = <densityfunc>(stone_density)
         self.cpotential.gradient[0] = <gradientfunc>(stone_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(stone_value_and_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(stone_hessian)
 
 @format_doc(common_doc=_potential_docstring)
 class StonePotential(CPotentialBase):
@@ -443,6 +485,7 @@ cdef class PowerLawCutoffWrapper(CPotentialWrapper):
             self.cpotential.value[0] = <energyfunc>(powerlawcutoff_value)
             self.cpotential.density[0] = <densityfunc>(powerlawcutoff_density)
             self.cpotential.gradient[0] = <gradientfunc>(powerlawcutoff_gradient)
+            self.cpotential.hessian[0] = <hessianfunc>(powerlawcutoff_hessian)
 
 @format_doc(common_doc=_potential_docstring)
 class PowerLawCutoffPotential(CPotentialBase):
@@ -506,6 +549,8 @@ cdef class SatohWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(satoh_value)
         self.cpotential.density[0] = <densityfunc>(satoh_density)
         self.cpotential.gradient[0] = <gradientfunc>(satoh_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(satoh_value_and_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(satoh_hessian)
 
 @format_doc(common_doc=_potential_docstring)
 class SatohPotential(CPotentialBase):
@@ -551,6 +596,8 @@ cdef class MiyamotoNagaiWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(miyamotonagai_value)
         self.cpotential.density[0] = <densityfunc>(miyamotonagai_density)
         self.cpotential.gradient[0] = <gradientfunc>(miyamotonagai_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(miyamotonagai_value_and_gradient)
+        self.cpotential.gradient_batch[0] = <gradientbatchfunc>(miyamotonagai_gradient_batch)
         self.cpotential.hessian[0] = <hessianfunc>(miyamotonagai_hessian)
 
 @format_doc(common_doc=_potential_docstring)
@@ -601,6 +648,8 @@ cdef class SphericalNFWWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(sphericalnfw_value)
         self.cpotential.density[0] = <densityfunc>(sphericalnfw_density)
         self.cpotential.gradient[0] = <gradientfunc>(sphericalnfw_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(sphericalnfw_value_and_gradient)
+        self.cpotential.gradient_batch[0] = <gradientbatchfunc>(sphericalnfw_gradient_batch)
         self.cpotential.hessian[0] = <hessianfunc>(sphericalnfw_hessian)
 
 cdef class FlattenedNFWWrapper(CPotentialWrapper):
@@ -611,6 +660,8 @@ cdef class FlattenedNFWWrapper(CPotentialWrapper):
                   np.ascontiguousarray(R))
         self.cpotential.value[0] = <energyfunc>(flattenednfw_value)
         self.cpotential.gradient[0] = <gradientfunc>(flattenednfw_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(flattenednfw_value_and_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(flattenednfw_hessian)
 
 cdef class TriaxialNFWWrapper(CPotentialWrapper):
 
@@ -620,6 +671,8 @@ cdef class TriaxialNFWWrapper(CPotentialWrapper):
                   np.ascontiguousarray(R))
         self.cpotential.value[0] = <energyfunc>(triaxialnfw_value)
         self.cpotential.gradient[0] = <gradientfunc>(triaxialnfw_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(triaxialnfw_value_and_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(triaxialnfw_hessian)
 
 @format_doc(common_doc=_potential_docstring)
 class NFWPotential(CPotentialBase):
@@ -746,6 +799,8 @@ cdef class LogarithmicWrapper(CPotentialWrapper):
                   np.ascontiguousarray(R))
         self.cpotential.value[0] = <energyfunc>(logarithmic_value)
         self.cpotential.gradient[0] = <gradientfunc>(logarithmic_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(logarithmic_value_and_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(logarithmic_hessian)
 
 @format_doc(common_doc=_potential_docstring)
 class LogarithmicPotential(CPotentialBase):
@@ -807,6 +862,7 @@ cdef class LeeSutoTriaxialNFWWrapper(CPotentialWrapper):
         self.cpotential.value[0] = <energyfunc>(leesuto_value)
         self.cpotential.density[0] = <densityfunc>(leesuto_density)
         self.cpotential.gradient[0] = <gradientfunc>(leesuto_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(leesuto_hessian)
 
 @format_doc(common_doc=_potential_docstring)
 class LeeSutoTriaxialNFWPotential(CPotentialBase):
@@ -858,6 +914,7 @@ cdef class LongMuraliBarWrapper(CPotentialWrapper):
                   np.ascontiguousarray(R))
         self.cpotential.value[0] = <energyfunc>(longmuralibar_value)
         self.cpotential.gradient[0] = <gradientfunc>(longmuralibar_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(longmuralibar_hessian)
         self.cpotential.density[0] = <densityfunc>(longmuralibar_density)
 
 @format_doc(common_doc=_potential_docstring)
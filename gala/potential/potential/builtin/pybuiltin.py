@@ -43,7 +43,7 @@ class HarmonicOscillatorPotential(PotentialBase):
 
     def _hessian(self, q, t=0.):
         om = np.atleast_1d(self.parameters['omega'].value)
-        return np.tile(np.diag(om)[:,:,None], reps=(1,1,q.shape[0]))
+        return np.tile(np.diag(om**2)[None], reps=(q.shape[0], 1, 1))
 
     def action_angle(self, w):
         """
@@ -28,9 +28,8 @@ cdef class CCompositePotentialWrapper(CPotentialWrapper):
 
     def __init__(self, list potentials):
         cdef:
-            CPotential cp
             CPotential tmp_cp
-            int i
+            int i, n_components
             CPotentialWrapper[::1] _cpotential_arr
 
         self._potentials = potentials
@@ -41,27 +40,33 @@ cdef class CCompositePotentialWrapper(CPotentialWrapper):
         for i in range(n_components):
             self._n_params[i] = _cpotential_arr[i]._n_params[0]
 
-        cp.n_components = n_components
-        cp.n_params = &(self._n_params[0])
-        cp.n_dim = 0
+        # the component tables are owned by this wrapper, but the parameter,
+        # origin, and rotation arrays are owned by the component wrappers,
+        # which are kept alive through self._potentials
+        self._alloc_components(n_components)
+        self.cpotential.n_params = &(self._n_params[0])
+        self.cpotential.n_dim = 0
+        self.cpotential.null = 0
 
         for i in range(n_components):
             tmp_cp = _cpotential_arr[i].cpotential
-            cp.parameters[i] = &(_cpotential_arr[i]._params[0])
-            cp.q0[i] = &(_cpotential_arr[i]._q0[0])
-            cp.R[i] = &(_cpotential_arr[i]._R[0])
-            cp.value[i] = tmp_cp.value[0]
-            cp.density[i] = tmp_cp.density[0]
-            cp.gradient[i] = tmp_cp.gradient[0]
-            cp.hessian[i] = tmp_cp.hessian[0]
-
-            if cp.n_dim == 0:
-                cp.n_dim = tmp_cp.n_dim
-            elif cp.n_dim != tmp_cp.n_dim:
+            self.cpotential.parameters[i] = &(_cpotential_arr[i]._params[0])
+            self.cpotential.q0[i] = &(_cpotential_arr[i]._q0[0])
+            self.cpotential.R[i] = &(_cpotential_arr[i]._R[0])
+            self.cpotential.do_shift[i] = tmp_cp.do_shift[0]
+            self.cpotential.do_rotate[i] = tmp_cp.do_rotate[0]
+            self.cpotential.value[i] = tmp_cp.value[0]
+            self.cpotential.density[i] = tmp_cp.density[0]
+            self.cpotential.gradient[i] = tmp_cp.gradient[0]
+            self.cpotential.hessian[i] = tmp_cp.hessian[0]
+            self.cpotential.value_and_gradient[i] = tmp_cp.value_and_gradient[0]
+            self.cpotential.gradient_batch[i] = tmp_cp.gradient_batch[0]
+
+            if self.cpotential.n_dim == 0:
+                self.cpotential.n_dim = tmp_cp.n_dim
+            elif self.cpotential.n_dim != tmp_cp.n_dim:
                 raise ValueError("Input potentials must have same number of coordinate dimensions")
 
-        self.cpotential = cp
-
     def __reduce__(self):
         return (self.__class__, (list(self._potentials),))
 
@@ -78,6 +83,20 @@ class CCompositePotential(CompositePotential, CPotentialBase):
         self.G = p.G
         self.c_instance = CCompositePotentialWrapper(self._potential_list)
 
+    # Use the C implementation of the composite potential rather than summing
+    # over the components in Python
+    def _energy(self, q, t, n_threads=None):
+        return CPotentialBase._energy(self, q, t, n_threads=n_threads)
+
+    def _gradient(self, q, t, n_threads=None):
+        return CPotentialBase._gradient(self, q, t, n_threads=n_threads)
+
+    def _density(self, q, t, n_threads=None):
+        return CPotentialBase._density(self, q, t, n_threads=n_threads)
+
+    def _hessian(self, q, t, n_threads=None):
+        return CPotentialBase._hessian(self, q, t, n_threads=n_threads)
+
     def __setitem__(self, *args, **kwargs):
         CompositePotential.__setitem__(self, *args, **kwargs)
         self._reset_c_instance()
@@ -90,6 +90,11 @@ class PotentialBase(CommonBase, metaclass=abc.ABCMeta):
     def _hessian(self, q, t=0.):
         raise NotImplementedError("This Potential has no implemented Hessian.")
 
+    def _energy_and_gradient(self, q, t=0.):
+        # Subclasses can override this to compute the energy and gradient at
+        # the same time
+        return self._energy(q, t=t), self._gradient(q, t=t)
+
     # ========================================================================
     # Utility methods
     #
@@ -169,6 +174,37 @@ class PotentialBase(CommonBase, metaclass=abc.ABCMeta):
         ret_unit = self.units['length'] / self.units['time']**2
         return (self._gradient(q, t=t).T.reshape(orig_shape) * ret_unit).to(self.units['acceleration'])
 
+    def energy_and_gradient(self, q, t=0.):
+        """
+        Compute the potential energy and the gradient of the potential at the
+        given position(s).
+
+        Parameters
+        ----------
+        q : `~gala.dynamics.PhaseSpacePosition`, `~astropy.units.Quantity`, array_like
+            The position to compute the value of the potential. If the
+            input position object has no units (i.e. is an `~numpy.ndarray`),
+            it is assumed to be in the same unit system as the potential.
+
+        Returns
+        -------
+        E : `~astropy.units.Quantity`
+            The potential energy per unit mass or value of the potential.
+        grad : `~astropy.units.Quantity`
+            The gradient of the potential. Will have the same shape as
+            the input position.
+        """
+        q = self._remove_units_prepare_shape(q)
+        orig_shape, q = self._get_c_valid_arr(q)
+        t = self._validate_prepare_time(t, q)
+        E_unit = self.units['energy'] / self.units['mass']
+        grad_unit = self.units['length'] / self.units['time']**2
+
+        pot, grad = self._energy_and_gradient(q, t=t)
+        return (pot.T.reshape(orig_shape[1:]) * E_unit,
+                (grad.T.reshape(orig_shape) * grad_unit)
+                .to(self.units['acceleration']))
+
     def density(self, q, t=0.):
         """
         Compute the density value at the given position(s).
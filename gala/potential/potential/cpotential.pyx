@@ -8,6 +8,7 @@
 # Standard library
 from collections import OrderedDict
 import copy as pycopy
+import os
 import sys
 import warnings
 import uuid
@@ -20,6 +21,9 @@ import cython
 cimport cython
 
 from libc.stdio cimport printf
+from libc.stdlib cimport calloc, free
+from libc.stdint cimport uintptr_t
+from cython.parallel cimport prange, threadid
 
 # Project
 from .core import PotentialBase, CompositePotential
@@ -32,6 +36,10 @@ cdef extern from "math.h":
 
 __all__ = ['CPotentialBase']
 
+# Number of positions per call to the batch gradient functions: large enough to
+# amortize the per-call overhead, small enough that the block stays in cache
+_BATCH_SIZE = 256
+
 cdef extern from "potential/builtin/builtin_potentials.h":
     double nan_density(double t, double *pars, double *q, int n_dim) nogil
     double nan_value(double t, double *pars, double *q, int n_dim) nogil
@@ -43,6 +51,26 @@ cpdef _validate_pos_arr(double[:,::1] arr):
         raise ValueError("Phase-space coordinate array must have 2 dimensions")
     return arr.shape[0], arr.shape[1]
 
+cpdef int _validate_n_threads(n_threads) except -1:
+    """
+    Convert a user-specified number of threads into the number of OpenMP
+    threads to use. If ``None``, the global default ``gala.conf.n_threads``
+    is used. A value of 0 means to use all available CPU cores.
+    """
+    if n_threads is None:
+        from ... import conf
+        n_threads = conf.n_threads
+
+    n_threads = int(n_threads)
+    if n_threads < 0:
+        raise ValueError("The number of threads, n_threads, must be >= 0 "
+                         "(got {}).".format(n_threads))
+
+    elif n_threads == 0:
+        n_threads = os.cpu_count() or 1
+
+    return n_threads
+
 cdef class CPotentialWrapper:
     """
     Wrapper class for C implementation of potentials. At the C layer, potentials
@@ -50,9 +78,103 @@ cdef class CPotentialWrapper:
     given potential. This provides a Cython wrapper around this C implementation.
     """
 
+    def __cinit__(self):
+        self.cpotential.n_components = 0
+        self.cpotential.density = NULL
+        self.cpotential.value = NULL
+        self.cpotential.gradient = NULL
+        self.cpotential.hessian = NULL
+        self.cpotential.value_and_gradient = NULL
+        self.cpotential.gradient_batch = NULL
+        self.cpotential.parameters = NULL
+        self.cpotential.q0 = NULL
+        self.cpotential.R = NULL
+        self.cpotential.do_shift = NULL
+        self.cpotential.do_rotate = NULL
+
+    def __dealloc__(self):
+        self._free_components()
+
+    cdef int _alloc_components(self, int n_components) except -1:
+        """
+        Allocate the per-component tables (function pointers, parameter
+        arrays, origins, and rotation matrices) of the underlying C struct.
+        The memory is owned by this wrapper and freed when it is deallocated.
+        Note that the number of parameters per component, ``n_params``, is
+        managed separately through the ``_n_params`` array.
+        """
+        cdef size_t n = n_components
+
+        if n_components < 1:
+            raise ValueError("A potential must have at least one component.")
+
+        self._free_components()
+
+        self.cpotential.density = <densityfunc*>calloc(n, sizeof(densityfunc))
+        self.cpotential.value = <energyfunc*>calloc(n, sizeof(energyfunc))
+        self.cpotential.gradient = <gradientfunc*>calloc(n, sizeof(gradientfunc))
+        self.cpotential.hessian = <hessianfunc*>calloc(n, sizeof(hessianfunc))
+        self.cpotential.value_and_gradient = <valuegradientfunc*>calloc(
+            n, sizeof(valuegradientfunc))
+        self.cpotential.gradient_batch = <gradientbatchfunc*>calloc(
+            n, sizeof(gradientbatchfunc))
+        self.cpotential.parameters = <double**>calloc(n, sizeof(double*))
+        self.cpotential.q0 = <double**>calloc(n, sizeof(double*))
+        self.cpotential.R = <double**>calloc(n, sizeof(double*))
+        self.cpotential.do_shift = <int*>calloc(n, sizeof(int))
+        self.cpotential.do_rotate = <int*>calloc(n, sizeof(int))
+
+        if (self.cpotential.density == NULL or
+                self.cpotential.value == NULL or
+                self.cpotential.gradient == NULL or
+                self.cpotential.hessian == NULL or
+                self.cpotential.value_and_gradient == NULL or
+                self.cpotential.gradient_batch == NULL or
+                self.cpotential.parameters == NULL or
+                self.cpotential.q0 == NULL or
+                self.cpotential.R == NULL or
+                self.cpotential.do_shift == NULL or
+                self.cpotential.do_rotate == NULL):
+            self._free_components()
+            raise MemoryError("Failed to allocate memory for {} potential "
+                              "components.".format(n_components))
+
+        self.cpotential.n_components = n_components
+        return 0
+
+    cdef void _free_components(self):
+        free(self.cpotential.density)
+        free(self.cpotential.value)
+        free(self.cpotential.gradient)
+        free(self.cpotential.hessian)
+        free(self.cpotential.value_and_gradient)
+        free(self.cpotential.gradient_batch)
+        free(self.cpotential.parameters)
+        free(self.cpotential.q0)
+        free(self.cpotential.R)
+        free(self.cpotential.do_shift)
+        free(self.cpotential.do_rotate)
+
+        self.cpotential.n_components = 0
+        self.cpotential.density = NULL
+        self.cpotential.value = NULL
+        self.cpotential.gradient = NULL
+        self.cpotential.hessian = NULL
+        self.cpotential.value_and_gradient = NULL
+        self.cpotential.gradient_batch = NULL
+        self.cpotential.parameters = NULL
+        self.cpotential.q0 = NULL
+        self.cpotential.R = NULL
+        self.cpotential.do_shift = NULL
+        self.cpotential.do_rotate = NULL
+
     cpdef init(self, list parameters, double[::1] q0, double[:, ::1] R,
                int n_dim=3):
 
+        # number of components in the potential. for a simple potential, this is
+        #   always one - composite potentials allocate more components.
+        self._alloc_components(1)
+
         # save the array of parameters so it doesn't get garbage-collected
         self._params = np.array(parameters, dtype=np.float64)
 
@@ -66,10 +188,6 @@ cdef class CPotentialWrapper:
         # phase-space half-dimensionality of the potential
         self.cpotential.n_dim = n_dim
 
-        # number of components in the potential. for a simple potential, this is
-        #   always one - composite potentials override this.
-        self.cpotential.n_components = 1
-
         # by default, don't skip this potential!
         self.cpotential.null = 0
 
@@ -79,6 +197,14 @@ cdef class CPotentialWrapper:
         self.cpotential.gradient[0] = <gradientfunc>(nan_gradient)
         self.cpotential.hessian[0] = <hessianfunc>(nan_hessian)
 
+        # by default, there is no fused energy and gradient function, so
+        # c_value_and_gradient() falls back to the separate functions above
+        self.cpotential.value_and_gradient[0] = NULL
+
+        # by default, there is no batch gradient function, so
+        # c_gradient_batch() evaluates c_gradient() at each position
+        self.cpotential.gradient_batch[0] = NULL
+
         # set the origin of the potentials
         self._q0 = np.array(q0)
         assert len(self._q0) == n_dim
@@ -88,7 +214,14 @@ cdef class CPotentialWrapper:
         self._R = np.ascontiguousarray(np.array(R).ravel())
         self.cpotential.R[0] = &(self._R[0])
 
-    cpdef energy(self, double[:,::1] q, double[::1] t):
+        # flag whether we need to transform coordinates into the frame of the
+        # potential, so that the (common) case of no shift and no rotation can
+        # skip the transformation
+        self.cpotential.do_shift[0] = int(np.any(np.array(q0) != 0.))
+        self.cpotential.do_rotate[0] = int(
+            np.any(np.array(R) != np.eye(n_dim)))
+
+    cpdef energy(self, double[:,::1] q, double[::1] t, int n_threads=1):
         """
         CAUTION: Interpretation of axes is different here! We need the
         arrays to be C ordered and easy to iterate over, so here the
@@ -100,15 +233,17 @@ cdef class CPotentialWrapper:
         cdef double [::1] pot = np.zeros(n)
 
         if len(t) == 1:
-            for i in range(n):
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
                 pot[i] = c_potential(&(self.cpotential), t[0], &q[i,0])
         else:
-            for i in range(n):
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
                 pot[i] = c_potential(&(self.cpotential), t[i], &q[i,0])
 
         return np.array(pot)
 
-    cpdef density(self, double[:,::1] q, double[::1] t):
+    cpdef density(self, double[:,::1] q, double[::1] t, int n_threads=1):
         """
         CAUTION: Interpretation of axes is different here! We need the
         arrays to be C ordered and easy to iterate over, so here the
@@ -120,15 +255,17 @@ cdef class CPotentialWrapper:
         cdef double [::1] dens = np.zeros(n)
 
         if len(t) == 1:
-            for i in range(n):
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
                 dens[i] = c_density(&(self.cpotential), t[0], &q[i,0])
         else:
-            for i in range(n):
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
                 dens[i] = c_density(&(self.cpotential), t[i], &q[i,0])
 
         return np.array(dens)
 
-    cpdef gradient(self, double[:,::1] q, double[::1] t):
+    cpdef gradient(self, double[:,::1] q, double[::1] t, int n_threads=1):
         """
         CAUTION: Interpretation of axes is different here! We need the
         arrays to be C ordered and easy to iterate over, so here the
@@ -137,18 +274,61 @@ cdef class CPotentialWrapper:
         cdef int n, ndim, i
         n,ndim = _validate_pos_arr(q)
 
+        if len(t) == 1 and c_has_gradient_batch(&(self.cpotential)):
+            return self._gradient_batch(q, t[0], n_threads)
+
         cdef double[:,::1] grad = np.zeros((n, ndim))
 
         if len(t) == 1:
-            for i in range(n):
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
                 c_gradient(&(self.cpotential), t[0], &q[i,0], &grad[i,0])
         else:
-            for i in range(n):
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
                 c_gradient(&(self.cpotential), t[i], &q[i,0], &grad[i,0])
 
         return np.array(grad)
 
-    cpdef hessian(self, double[:,::1] q, double[::1] t):
+    def _gradient_batch(self, double[:,::1] q, double t, int n_threads=1):
+        """
+        Evaluate the gradient at many positions (at a single time) using the
+        batch gradient functions of the components. The positions are split
+        into blocks of (at most) ``_BATCH_SIZE`` that are transposed to
+        structure-of-arrays order in per-thread buffers, and the blocks are
+        distributed over threads.
+        """
+        cdef int n, ndim, b, i, k, i0, size, n_blocks
+        cdef int block = _BATCH_SIZE
+        n, ndim = _validate_pos_arr(q)
+        n_blocks = (n + block - 1) // block
+
+        # every element is set below
+        cdef double[:,::1] grad = np.empty((n, ndim))
+        cdef double[:,:,::1] work = np.zeros((n_threads, 2, ndim * block))
+        cdef double *q_soa
+        cdef double *grad_soa
+
+        for b in prange(n_blocks, nogil=True, num_threads=n_threads,
+                        schedule='static'):
+            q_soa = &work[threadid(), 0, 0]
+            grad_soa = &work[threadid(), 1, 0]
+            i0 = b * block
+            size = min(block, n - i0)
+
+            for i in range(size):
+                for k in range(ndim):
+                    q_soa[k*size + i] = q[i0 + i, k]
+
+            c_gradient_batch(&(self.cpotential), t, q_soa, size, grad_soa)
+
+            for i in range(size):
+                for k in range(ndim):
+                    grad[i0 + i, k] = grad_soa[k*size + i]
+
+        return np.asarray(grad)
+
+    cpdef hessian(self, double[:,::1] q, double[::1] t, int n_threads=1):
         """
         CAUTION: Interpretation of axes is different here! We need the
         arrays to be C ordered and easy to iterate over, so here the
@@ -160,18 +340,50 @@ cdef class CPotentialWrapper:
         cdef double[:,:,::1] hess = np.zeros((n, ndim, ndim))
 
         if len(t) == 1:
-            for i in range(n):
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
                 c_hessian(&(self.cpotential), t[0], &q[i,0], &hess[i,0,0])
         else:
-            for i in range(n):
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
                 c_hessian(&(self.cpotential), t[i], &q[i,0], &hess[i,0,0])
 
         return np.array(hess)
 
+    cpdef energy_and_gradient(self, double[:,::1] q, double[::1] t,
+                              int n_threads=1):
+        """
+        CAUTION: Interpretation of axes is different here! We need the
+        arrays to be C ordered and easy to iterate over, so here the
+        axes are (norbits, ndim).
+        """
+        cdef int n, ndim, i
+        n,ndim = _validate_pos_arr(q)
+
+        cdef double [::1] pot = np.zeros(n)
+        cdef double[:,::1] grad = np.zeros((n, ndim))
+
+        if len(t) == 1:
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
+                pot[i] = c_value_and_gradient(&(self.cpotential), t[0],
+                                              &q[i,0], &grad[i,0])
+        else:
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
+                pot[i] = c_value_and_gradient(&(self.cpotential), t[i],
+                                              &q[i,0], &grad[i,0])
+
+        return np.array(pot), np.array(grad)
+
     # ------------------------------------------------------------------------
     # Other functionality
     #
-    cpdef d_dr(self, double[:,::1] q, double G, double[::1] t):
+    # Note: the finite-difference functions below need a scratch array to
+    # store the step vector, so we allocate one row per thread.
+    #
+    cpdef d_dr(self, double[:,::1] q, double G, double[::1] t,
+               int n_threads=1):
         """
         CAUTION: Interpretation of axes is different here! We need the
         arrays to be C ordered and easy to iterate over, so here the
@@ -181,18 +393,24 @@ cdef class CPotentialWrapper:
         n,ndim = _validate_pos_arr(q)
 
         cdef double [::1] dr = np.zeros(n, dtype=np.float64)
-        cdef double [::1] epsilon = np.zeros(ndim, dtype=np.float64)
+        cdef double [:,::1] epsilon = np.zeros((n_threads, ndim),
+                                               dtype=np.float64)
 
         if len(t) == 1:
-            for i in range(n):
-                dr[i] = c_d_dr(&(self.cpotential), t[0], &q[i,0], &epsilon[0])
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
+                dr[i] = c_d_dr(&(self.cpotential), t[0], &q[i,0],
+                               &epsilon[threadid(), 0])
         else:
-            for i in range(n):
-                dr[i] = c_d_dr(&(self.cpotential), t[i], &q[i,0], &epsilon[0])
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
+                dr[i] = c_d_dr(&(self.cpotential), t[i], &q[i,0],
+                               &epsilon[threadid(), 0])
 
         return np.array(dr)
 
-    cpdef d2_dr2(self, double[:,::1] q, double G, double[::1] t):
+    cpdef d2_dr2(self, double[:,::1] q, double G, double[::1] t,
+                 int n_threads=1):
         """
         CAUTION: Interpretation of axes is different here! We need the
         arrays to be C ordered and easy to iterate over, so here the
@@ -202,18 +420,24 @@ cdef class CPotentialWrapper:
         n,ndim = _validate_pos_arr(q)
 
         cdef double [::1] dr2 = np.zeros(n, dtype=np.float64)
-        cdef double [::1] epsilon = np.zeros(ndim, dtype=np.float64)
+        cdef double [:,::1] epsilon = np.zeros((n_threads, ndim),
+                                               dtype=np.float64)
 
         if len(t) == 1:
-            for i in range(n):
-                dr2[i] = c_d2_dr2(&(self.cpotential), t[0], &q[i,0], &epsilon[0])
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
+                dr2[i] = c_d2_dr2(&(self.cpotential), t[0], &q[i,0],
+                                  &epsilon[threadid(), 0])
         else:
-            for i in range(n):
-                dr2[i] = c_d2_dr2(&(self.cpotential), t[i], &q[i,0], &epsilon[0])
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
+                dr2[i] = c_d2_dr2(&(self.cpotential), t[i], &q[i,0],
+                                  &epsilon[threadid(), 0])
 
         return np.array(dr2)
 
-    cpdef mass_enclosed(self, double[:,::1] q, double G, double[::1] t):
+    cpdef mass_enclosed(self, double[:,::1] q, double G, double[::1] t,
+                        int n_threads=1):
         """
         CAUTION: Interpretation of axes is different here! We need the
         arrays to be C ordered and easy to iterate over, so here the
@@ -223,14 +447,19 @@ cdef class CPotentialWrapper:
         n,ndim = _validate_pos_arr(q)
 
         cdef double [::1] mass = np.zeros(n, dtype=np.float64)
-        cdef double [::1] epsilon = np.zeros(ndim, dtype=np.float64)
+        cdef double [:,::1] epsilon = np.zeros((n_threads, ndim),
+                                               dtype=np.float64)
 
         if len(t) == 1:
-            for i in range(n):
-                mass[i] = c_mass_enclosed(&(self.cpotential), t[0], &q[i,0], G, &epsilon[0])
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
+                mass[i] = c_mass_enclosed(&(self.cpotential), t[0], &q[i,0],
+                                          G, &epsilon[threadid(), 0])
         else:
-            for i in range(n):
-                mass[i] = c_mass_enclosed(&(self.cpotential), t[i], &q[i,0], G, &epsilon[0])
+            for i in prange(n, nogil=True, num_threads=n_threads,
+                            schedule='static'):
+                mass[i] = c_mass_enclosed(&(self.cpotential), t[i], &q[i,0],
+                                          G, &epsilon[threadid(), 0])
 
         return np.array(mass)
 
@@ -242,6 +471,40 @@ cdef class CPotentialWrapper:
                  np.array(self._R).reshape(self.cpotential.n_dim,
                                            self.cpotential.n_dim)))
 
+
+cdef class CFunctionWrapper(CPotentialWrapper):
+    """
+    A wrapper for potentials whose C functions are loaded at runtime, e.g.,
+    from a shared library compiled by ``from_equation(..., compile=True)``.
+
+    Subclasses must define a ``c_functions`` attribute: a dictionary that maps
+    the names of the CPotential function slots (``'value'``, ``'gradient'``,
+    ``'density'``, ``'hessian'``, ``'value_and_gradient'``) to the addresses
+    of the C functions, and an ``n_dim`` attribute.
+    """
+
+    def __init__(self, G, parameters, q0, R):
+        self.init([G] + list(parameters),
+                  np.ascontiguousarray(q0),
+                  np.ascontiguousarray(R),
+                  n_dim=self.n_dim)
+
+        funcs = self.c_functions
+        if funcs.get('value'):
+            self.cpotential.value[0] = <energyfunc><uintptr_t>funcs['value']
+        if funcs.get('density'):
+            self.cpotential.density[0] = \
+                <densityfunc><uintptr_t>funcs['density']
+        if funcs.get('gradient'):
+            self.cpotential.gradient[0] = \
+                <gradientfunc><uintptr_t>funcs['gradient']
+        if funcs.get('hessian'):
+            self.cpotential.hessian[0] = \
+                <hessianfunc><uintptr_t>funcs['hessian']
+        if funcs.get('value_and_gradient'):
+            self.cpotential.value_and_gradient[0] = \
+                <valuegradientfunc><uintptr_t>funcs['value_and_gradient']
+
 # ----------------------------------------------------------------------------
 
 # TODO: docstrings are now fucked for energy, gradient, etc.
@@ -290,21 +553,186 @@ class CPotentialBase(PotentialBase):
                 if name in self.parameters:
                     del self.parameters[name]
 
-    def _energy(self, q, t):
-        return self.c_instance.energy(q, t=t)
+    def _energy(self, q, t, n_threads=None):
+        return self.c_instance.energy(
+            q, t=t, n_threads=_validate_n_threads(n_threads))
+
+    def _gradient(self, q, t, n_threads=None):
+        return self.c_instance.gradient(
+            q, t=t, n_threads=_validate_n_threads(n_threads))
 
-    def _gradient(self, q, t):
-        return self.c_instance.gradient(q, t=t)
+    def _density(self, q, t, n_threads=None):
+        return self.c_instance.density(
+            q, t=t, n_threads=_validate_n_threads(n_threads))
 
-    def _density(self, q, t):
-        return self.c_instance.density(q, t=t)
+    def _hessian(self, q, t, n_threads=None):
+        return self.c_instance.hessian(
+            q, t=t, n_threads=_validate_n_threads(n_threads))
 
-    def _hessian(self, q, t):
-        return self.c_instance.hessian(q, t=t)
+    def _energy_and_gradient(self, q, t, n_threads=None):
+        return self.c_instance.energy_and_gradient(
+            q, t=t, n_threads=_validate_n_threads(n_threads))
 
     # ----------------------------------------------------------
-    # Overwrite the Python potential method to use Cython method
-    def mass_enclosed(self, q, t=0.):
+    # Overwrite the Python potential methods to support evaluating the
+    # potential with multiple threads
+    def energy(self, q, t=0., n_threads=None):
+        """
+        Compute the potential energy at the given position(s).
+
+        Parameters
+        ----------
+        q : `~gala.dynamics.PhaseSpacePosition`, `~astropy.units.Quantity`, array_like
+            The position to compute the value of the potential. If the
+            input position object has no units (i.e. is an `~numpy.ndarray`),
+            it is assumed to be in the same unit system as the potential.
+        n_threads : int (optional)
+            The number of OpenMP threads to use. If not specified, the default
+            set by ``gala.conf.n_threads`` is used. Set to 0 to use all
+            available CPU cores.
+
+        Returns
+        -------
+        E : `~astropy.units.Quantity`
+            The potential energy per unit mass or value of the potential.
+        """
+        q = self._remove_units_prepare_shape(q)
+        orig_shape, q = self._get_c_valid_arr(q)
+        t = self._validate_prepare_time(t, q)
+        ret_unit = self.units['energy'] / self.units['mass']
+
+        pot = self._energy(q, t=t, n_threads=n_threads)
+        return pot.T.reshape(orig_shape[1:]) * ret_unit
+
+    def gradient(self, q, t=0., n_threads=None):
+        """
+        Compute the gradient of the potential at the given position(s).
+
+        Parameters
+        ----------
+        q : `~gala.dynamics.PhaseSpacePosition`, `~astropy.units.Quantity`, array_like
+            The position to compute the value of the potential. If the
+            input position object has no units (i.e. is an `~numpy.ndarray`),
+            it is assumed to be in the same unit system as the potential.
+        n_threads : int (optional)
+            The number of OpenMP threads to use. If not specified, the default
+            set by ``gala.conf.n_threads`` is used. Set to 0 to use all
+            available CPU cores.
+
+        Returns
+        -------
+        grad : `~astropy.units.Quantity`
+            The gradient of the potential. Will have the same shape as
+            the input position.
+        """
+        q = self._remove_units_prepare_shape(q)
+        orig_shape, q = self._get_c_valid_arr(q)
+        t = self._validate_prepare_time(t, q)
+        ret_unit = self.units['length'] / self.units['time']**2
+
+        grad = self._gradient(q, t=t, n_threads=n_threads)
+        return ((grad.T.reshape(orig_shape) * ret_unit)
+                .to(self.units['acceleration']))
+
+    def energy_and_gradient(self, q, t=0., n_threads=None):
+        """
+        Compute the potential energy and the gradient of the potential at the
+        given position(s). For most of the built-in potentials, this is faster
+        than calling ``energy()`` and ``gradient()`` separately because
+        quantities that are shared between the two are only computed once.
+
+        Parameters
+        ----------
+        q : `~gala.dynamics.PhaseSpacePosition`, `~astropy.units.Quantity`, array_like
+            The position to compute the value of the potential. If the
+            input position object has no units (i.e. is an `~numpy.ndarray`),
+            it is assumed to be in the same unit system as the potential.
+        n_threads : int (optional)
+            The number of OpenMP threads to use. If not specified, the default
+            set by ``gala.conf.n_threads`` is used. Set to 0 to use all
+            available CPU cores.
+
+        Returns
+        -------
+        E : `~astropy.units.Quantity`
+            The potential energy per unit mass or value of the potential.
+        grad : `~astropy.units.Quantity`
+            The gradient of the potential. Will have the same shape as
+            the input position.
+        """
+        q = self._remove_units_prepare_shape(q)
+        orig_shape, q = self._get_c_valid_arr(q)
+        t = self._validate_prepare_time(t, q)
+        E_unit = self.units['energy'] / self.units['mass']
+        grad_unit = self.units['length'] / self.units['time']**2
+
+        pot, grad = self._energy_and_gradient(q, t=t, n_threads=n_threads)
+        return (pot.T.reshape(orig_shape[1:]) * E_unit,
+                (grad.T.reshape(orig_shape) * grad_unit)
+                .to(self.units['acceleration']))
+
+    def density(self, q, t=0., n_threads=None):
+        """
+        Compute the density value at the given position(s).
+
+        Parameters
+        ----------
+        q : `~gala.dynamics.PhaseSpacePosition`, `~astropy.units.Quantity`, array_like
+            The position to compute the value of the potential. If the
+            input position object has no units (i.e. is an `~numpy.ndarray`),
+            it is assumed to be in the same unit system as the potential.
+        n_threads : int (optional)
+            The number of OpenMP threads to use. If not specified, the default
+            set by ``gala.conf.n_threads`` is used. Set to 0 to use all
+            available CPU cores.
+
+        Returns
+        -------
+        dens : `~astropy.units.Quantity`
+            The potential energy or value of the potential. If the input
+            position has shape ``q.shape``, the output energy will have
+            shape ``q.shape[1:]``.
+        """
+        q = self._remove_units_prepare_shape(q)
+        orig_shape, q = self._get_c_valid_arr(q)
+        t = self._validate_prepare_time(t, q)
+        ret_unit = self.units['mass'] / self.units['length']**3
+
+        dens = self._density(q, t=t, n_threads=n_threads)
+        return (dens.T * ret_unit).to(self.units['mass density'])
+
+    def hessian(self, q, t=0., n_threads=None):
+        """
+        Compute the Hessian of the potential at the given position(s).
+
+        Parameters
+        ----------
+        q : `~gala.dynamics.PhaseSpacePosition`, `~astropy.units.Quantity`, array_like
+            The position to compute the value of the potential. If the
+            input position object has no units (i.e. is an `~numpy.ndarray`),
+            it is assumed to be in the same unit system as the potential.
+        n_threads : int (optional)
+            The number of OpenMP threads to use. If not specified, the default
+            set by ``gala.conf.n_threads`` is used. Set to 0 to use all
+            available CPU cores.
+
+        Returns
+        -------
+        hess : `~astropy.units.Quantity`
+            The Hessian matrix of second derivatives of the potential. If the input
+            position has shape ``q.shape``, the output energy will have shape
+            ``(q.shape[0],q.shape[0]) + q.shape[1:]``. That is, an ``n_dim`` by
+            ``n_dim`` array (matrix) for each position.
+        """
+        q = self._remove_units_prepare_shape(q)
+        orig_shape,q = self._get_c_valid_arr(q)
+        t = self._validate_prepare_time(t, q)
+        ret_unit = 1 / self.units['time']**2
+
+        hess = np.moveaxis(self._hessian(q, t=t, n_threads=n_threads), 0, -1)
+        return hess.reshape((orig_shape[0], orig_shape[0]) + orig_shape[1:]) * ret_unit
+
+    def mass_enclosed(self, q, t=0., n_threads=None):
         """
         mass_enclosed(q, t)
 
@@ -315,17 +743,23 @@ class CPotentialBase(PotentialBase):
         ----------
         q : array_like, numeric
             Position to compute the mass enclosed.
+        n_threads : int (optional)
+            The number of OpenMP threads to use. If not specified, the default
+            set by ``gala.conf.n_threads`` is used. Set to 0 to use all
+            available CPU cores.
         """
         q = self._remove_units_prepare_shape(q)
         orig_shape,q = self._get_c_valid_arr(q)
         t = self._validate_prepare_time(t, q)
+        n_threads = _validate_n_threads(n_threads)
 
         sgn = 1.
         if 'm' in self.parameters and self.parameters['m'] < 0:
             sgn = -1.
 
         try:
-            menc = self.c_instance.mass_enclosed(q, self.G, t=t)
+            menc = self.c_instance.mass_enclosed(q, self.G, t=t,
+                                                 n_threads=n_threads)
         except AttributeError,TypeError:
             raise ValueError("Potential C instance has no defined "
                              "mass_enclosed function")
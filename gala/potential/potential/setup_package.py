@@ -37,6 +37,9 @@ def get_extensions():
     cfg['include_dirs'].append('gala/potential')
     cfg['include_dirs'].append('gala')
     cfg['extra_compile_args'].append('--std=gnu99')
+    # sqrt() etc. never need to set errno, which allows the batch gradient
+    # loops to be vectorized
+    cfg['extra_compile_args'].append('-fno-math-errno')
     cfg['sources'].append('gala/potential/potential/builtin/cybuiltin.pyx')
     cfg['sources'].append('gala/potential/potential/builtin/builtin_potentials.c')
     cfg['sources'].append('gala/potential/potential/src/cpotential.c')
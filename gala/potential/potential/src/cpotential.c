@@ -1,4 +1,6 @@
 #include <math.h>
+#include <stddef.h>
+#include <stdlib.h>
 #include "cpotential.h"
 
 
@@ -46,17 +48,42 @@ void apply_shift_rotate(double *q_in, double *q0, double *R, int n_dim,
 }
 
 
-double c_potential(CPotential *p, double t, double *qp) {
-    double v = 0;
-    int i, j;
-    double qp_trans[p->n_dim];
+static double *transform_to_component(CPotential *p, int i, double *qp,
+                                      double *qp_trans) {
+    /*
+        Transform the input position into the frame of component i. This
+        returns a pointer to the position to evaluate the component at: if the
+        component has no origin shift and no rotation, this is just the input
+        position and no work is done.
+    */
+    int j;
 
-    for (i=0; i < p->n_components; i++) {
+    if ((p->do_rotate)[i]) {
         for (j=0; j < p->n_dim; j++)
             qp_trans[j] = 0.;
         apply_shift_rotate(qp, (p->q0)[i], (p->R)[i], p->n_dim, 0,
                            &qp_trans[0]);
-        v = v + (p->value)[i](t, (p->parameters)[i], &qp_trans[0], p->n_dim);
+        return qp_trans;
+
+    } else if ((p->do_shift)[i]) {
+        for (j=0; j < p->n_dim; j++)
+            qp_trans[j] = qp[j] - (p->q0)[i][j];
+        return qp_trans;
+    }
+
+    return qp;
+}
+
+
+double c_potential(CPotential *p, double t, double *qp) {
+    double v = 0;
+    int i;
+    double qp_trans[p->n_dim];
+    double *q;
+
+    for (i=0; i < p->n_components; i++) {
+        q = transform_to_component(p, i, qp, &qp_trans[0]);
+        v = v + (p->value)[i](t, (p->parameters)[i], q, p->n_dim);
     }
 
     return v;
@@ -65,15 +92,13 @@ double c_potential(CPotential *p, double t, double *qp) {
 
 double c_density(CPotential *p, double t, double *qp) {
     double v = 0;
-    int i, j;
+    int i;
     double qp_trans[p->n_dim];
+    double *q;
 
     for (i=0; i < p->n_components; i++) {
-        for (j=0; j < p->n_dim; j++)
-            qp_trans[j] = 0.;
-        apply_shift_rotate(qp, (p->q0)[i], (p->R)[i], p->n_dim, 0,
-                           &qp_trans[0]);
-        v = v + (p->density)[i](t, (p->parameters)[i], &qp_trans[0], p->n_dim);
+        q = transform_to_component(p, i, qp, &qp_trans[0]);
+        v = v + (p->density)[i](t, (p->parameters)[i], q, p->n_dim);
     }
 
     return v;
@@ -84,43 +109,239 @@ void c_gradient(CPotential *p, double t, double *qp, double *grad) {
     int i, j;
     double qp_trans[p->n_dim];
     double tmp_grad[p->n_dim];
+    double *q;
 
     for (i=0; i < p->n_dim; i++) {
         grad[i] = 0.;
-        tmp_grad[i] = 0.;
-        qp_trans[i] = 0.;
     }
 
     for (i=0; i < p->n_components; i++) {
-        for (j=0; j < p->n_dim; j++) {
-            tmp_grad[j] = 0.;
-            qp_trans[j] = 0.;
+        q = transform_to_component(p, i, qp, &qp_trans[0]);
+
+        if ((p->do_rotate)[i]) {
+            for (j=0; j < p->n_dim; j++)
+                tmp_grad[j] = 0.;
+
+            (p->gradient)[i](t, (p->parameters)[i], q, p->n_dim,
+                             &tmp_grad[0]);
+            apply_rotate(&tmp_grad[0], (p->R)[i], p->n_dim, 1, &grad[0]);
+
+        } else {
+            // the gradient functions add to the input array
+            (p->gradient)[i](t, (p->parameters)[i], q, p->n_dim, grad);
         }
+    }
+}
 
-        apply_shift_rotate(qp, (p->q0)[i], (p->R)[i], p->n_dim, 0,
-                           &qp_trans[0]);
-        (p->gradient)[i](t, (p->parameters)[i], &qp_trans[0], p->n_dim,
-                         &tmp_grad[0]);
 
-        apply_rotate(&tmp_grad[0], (p->R)[i], p->n_dim, 1, &grad[0]);
+double c_value_and_gradient(CPotential *p, double t, double *qp,
+                            double *grad) {
+    /*
+        Compute the potential energy and gradient at the same time. For
+        components that don't implement a fused value_and_gradient function,
+        this falls back to calling the value and gradient functions separately.
+    */
+    double v = 0;
+    int i, j;
+    double qp_trans[p->n_dim];
+    double tmp_grad[p->n_dim];
+    double *q, *g;
+
+    for (i=0; i < p->n_dim; i++) {
+        grad[i] = 0.;
     }
+
+    for (i=0; i < p->n_components; i++) {
+        q = transform_to_component(p, i, qp, &qp_trans[0]);
+
+        if ((p->do_rotate)[i]) {
+            for (j=0; j < p->n_dim; j++)
+                tmp_grad[j] = 0.;
+            g = &tmp_grad[0];
+        } else {
+            g = grad;
+        }
+
+        if ((p->value_and_gradient)[i] != NULL) {
+            v = v + (p->value_and_gradient)[i](t, (p->parameters)[i], q,
+                                               p->n_dim, g);
+        } else {
+            v = v + (p->value)[i](t, (p->parameters)[i], q, p->n_dim);
+            (p->gradient)[i](t, (p->parameters)[i], q, p->n_dim, g);
+        }
+
+        if ((p->do_rotate)[i])
+            apply_rotate(&tmp_grad[0], (p->R)[i], p->n_dim, 1, &grad[0]);
+    }
+
+    return v;
 }
 
 
-void c_hessian(CPotential *p, double t, double *qp, double *hess) {
+static void gradient_batch_pointwise(CPotential *p, int i, double t,
+                                     double *q_soa, int n, double *grad) {
+    /*
+        Add the gradient of component i at n positions (stored as
+        structure-of-arrays) to grad by evaluating the single-position gradient
+        function at each position.
+    */
+    int j, k;
+    int n_dim = p->n_dim;
+    double qp[n_dim], qp_trans[n_dim], tmp_grad[n_dim], rot_grad[n_dim];
+    double *q, *g;
+
+    for (j=0; j < n; j++) {
+        for (k=0; k < n_dim; k++) {
+            qp[k] = q_soa[k*n + j];
+            tmp_grad[k] = 0.;
+            rot_grad[k] = 0.;
+        }
+
+        q = transform_to_component(p, i, &qp[0], &qp_trans[0]);
+        (p->gradient)[i](t, (p->parameters)[i], q, n_dim, &tmp_grad[0]);
+
+        if ((p->do_rotate)[i]) {
+            apply_rotate(&tmp_grad[0], (p->R)[i], n_dim, 1, &rot_grad[0]);
+            g = &rot_grad[0];
+        } else {
+            g = &tmp_grad[0];
+        }
+
+        for (k=0; k < n_dim; k++)
+            grad[k*n + j] = grad[k*n + j] + g[k];
+    }
+}
+
+
+int c_has_gradient_batch(CPotential *p) {
+    /*
+        Whether any component implements a batch gradient function, i.e.
+        whether c_gradient_batch() is faster than calling c_gradient() at each
+        position.
+    */
     int i;
-    double qp_trans[p->n_dim];
+    for (i=0; i < p->n_components; i++) {
+        if ((p->gradient_batch)[i] != NULL)
+            return 1;
+    }
+    return 0;
+}
+
 
-    for (i=0; i < pow(p->n_dim,2); i++) {
+void c_gradient_batch(CPotential *p, double t, double *q, int n,
+                      double *grad) {
+    /*
+        Compute the gradient at n positions at once. The positions and
+        gradients are stored as structure-of-arrays: q[k*n + j] is the k-th
+        coordinate of position j. Components that implement a batch gradient
+        function are evaluated with a single call (over SIMD-friendly loops),
+        and the others fall back to evaluating one position at a time.
+    */
+    int i, j, k;
+    int n_dim = p->n_dim;
+    double qp[n_dim], qp_trans[n_dim], tmp_grad[n_dim];
+    double *q_comp, *g_comp, *q_j;
+    double *work = NULL;
+
+    for (j=0; j < n_dim*n; j++)
+        grad[j] = 0.;
+
+    for (i=0; i < p->n_components; i++) {
+        if ((p->gradient_batch)[i] == NULL) {
+            gradient_batch_pointwise(p, i, t, q, n, grad);
+            continue;
+        }
+
+        if (!(p->do_shift)[i] && !(p->do_rotate)[i]) {
+            // the batch gradient functions add to the input array
+            (p->gradient_batch)[i](t, (p->parameters)[i], q, n_dim, n, grad);
+            continue;
+        }
+
+        // Transform the positions into the frame of the component
+        if (work == NULL)
+            work = (double *)malloc(2 * n_dim * n * sizeof(double));
+        if (work == NULL) {
+            gradient_batch_pointwise(p, i, t, q, n, grad);
+            continue;
+        }
+        q_comp = work;
+        g_comp = work + n_dim * n;
+
+        if ((p->do_rotate)[i]) {
+            for (j=0; j < n; j++) {
+                for (k=0; k < n_dim; k++)
+                    qp[k] = q[k*n + j];
+                q_j = transform_to_component(p, i, &qp[0], &qp_trans[0]);
+                for (k=0; k < n_dim; k++)
+                    q_comp[k*n + j] = q_j[k];
+            }
+
+            for (j=0; j < n_dim*n; j++)
+                g_comp[j] = 0.;
+            (p->gradient_batch)[i](t, (p->parameters)[i], q_comp, n_dim, n,
+                                   g_comp);
+
+            // Rotate the gradient back to the input frame
+            for (j=0; j < n; j++) {
+                for (k=0; k < n_dim; k++) {
+                    qp[k] = g_comp[k*n + j];
+                    tmp_grad[k] = 0.;
+                }
+                apply_rotate(&qp[0], (p->R)[i], n_dim, 1, &tmp_grad[0]);
+                for (k=0; k < n_dim; k++)
+                    grad[k*n + j] = grad[k*n + j] + tmp_grad[k];
+            }
+
+        } else {
+            for (k=0; k < n_dim; k++) {
+                for (j=0; j < n; j++)
+                    q_comp[k*n + j] = q[k*n + j] - (p->q0)[i][k];
+            }
+            (p->gradient_batch)[i](t, (p->parameters)[i], q_comp, n_dim, n,
+                                   grad);
+        }
+    }
+
+    free(work);
+}
+
+
+void c_hessian(CPotential *p, double t, double *qp, double *hess) {
+    int i, j, k, l;
+    int n_dim = p->n_dim;
+    double qp_trans[n_dim];
+    double tmp_hess[n_dim*n_dim];
+    double *q, *R;
+
+    for (i=0; i < n_dim*n_dim; i++) {
         hess[i] = 0.;
     }
 
     for (i=0; i < p->n_components; i++) {
-        apply_shift_rotate(qp, (p->q0)[i], (p->R)[i], p->n_dim, 0,
-                           &qp_trans[0]);
-        (p->hessian)[i](t, (p->parameters)[i], &qp_trans[0], p->n_dim, hess);
-        // TODO: here - need to apply inverse rotation to the Hessian!
-        // - Hessian calculation for potentials with rotations are disabled
+        q = transform_to_component(p, i, qp, &qp_trans[0]);
+
+        if ((p->do_rotate)[i]) {
+            for (j=0; j < n_dim*n_dim; j++)
+                tmp_hess[j] = 0.;
+
+            (p->hessian)[i](t, (p->parameters)[i], q, n_dim, &tmp_hess[0]);
+
+            // Rotate back to the input frame: H = R^T H' R
+            R = (p->R)[i];
+            for (j=0; j < n_dim; j++) {
+                for (k=0; k < n_dim; k++) {
+                    for (l=0; l < n_dim*n_dim; l++) {
+                        hess[j*n_dim + k] = hess[j*n_dim + k] +
+                            R[(l / n_dim)*n_dim + j] * tmp_hess[l] *
+                            R[(l % n_dim)*n_dim + k];
+                    }
+                }
+            }
+
+        } else {
+            (p->hessian)[i](t, (p->parameters)[i], q, n_dim, hess);
+        }
     }
 
 }
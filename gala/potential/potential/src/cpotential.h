@@ -1,10 +1,5 @@
 #include "src/funcdefs.h"
 
-#ifndef MAX_N_COMPONENTS_H
-    #define MAX_N_COMPONENTS_H
-    #define MAX_N_COMPONENTS 16
-#endif
-
 #ifndef _CPotential_H
 #define _CPotential_H
     typedef struct _CPotential CPotential;
@@ -14,23 +9,41 @@
         int n_dim; // coordinate system dimensionality
         int null; // a short circuit: if null, can skip evaluation
 
+        // Below, all component tables have length n_components. The memory
+        // for these is owned (allocated and freed) by the Cython wrapper
+        // class, CPotentialWrapper.
+
         // arrays of pointers to each of the function types above
-        densityfunc density[MAX_N_COMPONENTS];
-        energyfunc value[MAX_N_COMPONENTS];
-        gradientfunc gradient[MAX_N_COMPONENTS];
-        hessianfunc hessian[MAX_N_COMPONENTS];
+        densityfunc *density;
+        energyfunc *value;
+        gradientfunc *gradient;
+        hessianfunc *hessian;
+
+        // optional: fused energy and gradient evaluation, or NULL if the
+        // component does not implement this
+        valuegradientfunc *value_and_gradient;
+
+        // optional: gradient evaluation at many positions at once (see
+        // gradientbatchfunc), or NULL if the component does not implement this
+        gradientbatchfunc *gradient_batch;
 
         // array containing the number of parameters in each component
-        int n_params[MAX_N_COMPONENTS];
+        int *n_params;
 
         // pointer to array of pointers to the parameter arrays
-        double *parameters[MAX_N_COMPONENTS];
+        double **parameters;
 
         // pointer to array of pointers containing the origin coordinates
-        double *q0[MAX_N_COMPONENTS];
+        double **q0;
 
         // pointer to array of pointers containing rotation matrix elements
-        double *R[MAX_N_COMPONENTS];
+        double **R;
+
+        // flags that specify whether each component has a non-zero origin
+        // shift or a non-identity rotation matrix. When both are 0, the
+        // coordinate transformation is skipped entirely.
+        int *do_shift;
+        int *do_rotate;
     };
 #endif
 
@@ -38,6 +51,9 @@ extern double c_potential(CPotential *p, double t, double *q);
 extern double c_density(CPotential *p, double t, double *q);
 extern void c_gradient(CPotential *p, double t, double *q, double *grad);
 extern void c_hessian(CPotential *p, double t, double *q, double *hess);
+extern double c_value_and_gradient(CPotential *p, double t, double *q, double *grad);
+extern void c_gradient_batch(CPotential *p, double t, double *q, int n, double *grad);
+extern int c_has_gradient_batch(CPotential *p);
 
 // TODO: err, what about reference frames...
 extern double c_d_dr(CPotential *p, double t, double *q, double *epsilon);
@@ -107,6 +107,25 @@ class PotentialTestBase(object):
             g = self.potential.gradient(arr[:self.ndim],
                                         t=t*self.potential.units['time'])
 
+    def test_energy_and_gradient(self):
+        for arr, v_shp, g_shp in zip(self.w0s, self._valu_return_shapes,
+                                     self._grad_return_shapes):
+            v, g = self.potential.energy_and_gradient(arr[:self.ndim])
+            assert v.shape == v_shp
+            assert g.shape == g_shp
+
+            assert u.allclose(v, self.potential.energy(arr[:self.ndim]),
+                              rtol=1e-12)
+            assert u.allclose(g, self.potential.gradient(arr[:self.ndim]),
+                              rtol=1e-12)
+
+            t = np.zeros(np.array(arr).shape[1:]) + 0.1
+            v, g = self.potential.energy_and_gradient(arr[:self.ndim], t=t)
+            assert u.allclose(v, self.potential.energy(arr[:self.ndim], t=t),
+                              rtol=1e-12)
+            assert u.allclose(g, self.potential.gradient(arr[:self.ndim], t=t),
+                              rtol=1e-12)
+
     def test_hessian(self):
         for arr,shp in zip(self.w0s, self._hess_return_shapes):
             g = self.potential.hessian(arr[:self.ndim])
@@ -242,6 +261,37 @@ class PotentialTestBase(object):
         grad = self.potential._gradient(xyz, t=np.array([0.]))
         assert np.allclose(num_grad, grad, rtol=self.tol)
 
+    def test_numerical_hessian_vs_hessian(self):
+        """
+        Check that the value of the implemented Hessian function is close to a
+        numerically estimated value, computed by finite-differencing the
+        gradient.
+        """
+
+        ndim = self.w0.size//2
+        dx = 1E-3 * np.sqrt(np.sum(self.w0[:ndim]**2))
+        max_x = np.sqrt(np.sum([x**2 for x in self.w0[:ndim]]))
+
+        grid = np.linspace(-max_x, max_x, 4)
+        grid = grid[grid != 0.]
+        grids = [grid for i in range(ndim)]
+        xyz = np.ascontiguousarray(np.vstack(list(map(np.ravel, np.meshgrid(*grids)))).T)
+        t = np.array([0.])
+
+        num_hess = np.zeros((xyz.shape[0], ndim, ndim))
+        for j in range(ndim):
+            dxyz = np.zeros(ndim)
+            dxyz[j] = dx
+            num_hess[:, :, j] = (
+                -self.potential._gradient(xyz + 2*dxyz, t=t)
+                + 8*self.potential._gradient(xyz + dxyz, t=t)
+                - 8*self.potential._gradient(xyz - dxyz, t=t)
+                + self.potential._gradient(xyz - 2*dxyz, t=t)) / (12*dx)
+
+        hess = self.potential._hessian(xyz, t=t)
+        assert np.allclose(num_hess, hess, rtol=self.tol,
+                           atol=self.tol * np.abs(num_hess).max())
+
     def test_orbit_integration(self):
         """
         Make sure we can integrate an orbit in this potential
@@ -255,11 +255,6 @@ class TestLongMuraliBarRotate(PotentialTestBase):
     vc = potential.circular_velocity([19.,0,0]*u.kpc).decompose(galactic).value[0]
     w0 = [19.0,0.2,-0.9,0.,vc,0.]
 
-    def test_hessian(self):
-        # TODO: when hessian for rotated potentials implemented, remove this
-        with pytest.raises(NotImplementedError):
-            self.potential.hessian([1., 2., 3.])
-
 class TestLongMuraliBarRotationScipy(PotentialTestBase):
     potential = LongMuraliBarPotential(units=galactic, m=1E11,
                                        a=4.*u.kpc, b=1*u.kpc, c=1.*u.kpc,
@@ -267,11 +262,6 @@ class TestLongMuraliBarRotationScipy(PotentialTestBase):
     vc = potential.circular_velocity([19.,0,0]*u.kpc).decompose(galactic).value[0]
     w0 = [19.0,0.2,-0.9,0.,vc,0.]
 
-    def test_hessian(self):
-        # TODO: when hessian for rotated potentials implemented, remove this
-        with pytest.raises(NotImplementedError):
-            self.potential.hessian([1., 2., 3.])
-
 class TestComposite(CompositePotentialTestBase):
     p1 = LogarithmicPotential(units=galactic,
                               v_c=0.17, r_h=10.,
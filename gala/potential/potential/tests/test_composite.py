@@ -1,3 +1,6 @@
+# Standard library
+import pickle
+
 # Third party
 import astropy.units as u
 import pytest
@@ -94,6 +97,31 @@ def test_failures():
     with pytest.raises(ValueError):
         p['jnsdfn'] = HenonHeilesPotential(units=solarsystem)
 
+def test_many_components():
+    # C composite potentials used to be limited to 16 components
+    rnd = np.random.RandomState(42)
+    n_components = 128
+    origins = rnd.uniform(-10, 10, size=(n_components, 3))
+
+    cp = CCompositePotential()
+    pp = CompositePotential()
+    for i in range(n_components):
+        p = HernquistPotential(m=1E9, c=0.5, origin=origins[i], units=galactic)
+        cp[str(i)] = p
+        pp[str(i)] = p
+
+    xyz = rnd.uniform(-10, 10, size=(3, 16))
+    assert u.allclose(cp.energy(xyz), pp.energy(xyz))
+    assert u.allclose(cp.gradient(xyz), pp.gradient(xyz))
+    assert u.allclose(cp.density(xyz), pp.density(xyz))
+
+    H = Hamiltonian(cp)
+    orbit = H.integrate_orbit([15., 0, 0, 0, 0.1, 0.], dt=1., n_steps=100)
+    assert np.all(np.isfinite(orbit.xyz))
+
+    pickled = pickle.loads(pickle.dumps(cp))
+    assert u.allclose(pickled.energy(xyz), cp.energy(xyz))
+
 def test_lock():
     p = CompositePotential()
     p['derp'] = KeplerPotential(m=1.*u.Msun, units=solarsystem)
@@ -1,9 +1,16 @@
 # Third party
 import astropy.units as u
+import numpy as np
+import pytest
 
 # This package
-from ..builtin import HernquistPotential
-from ....units import UnitSystem
+from ..builtin import (HernquistPotential, MiyamotoNagaiPotential,
+                       PlummerPotential, NFWPotential, KeplerPotential,
+                       IsochronePotential, LogarithmicPotential)
+from ..ccompositepotential import CCompositePotential
+from ..core import CompositePotential
+from ....units import UnitSystem, galactic
+from .... import conf
 
 
 def test_replace_units():
@@ -19,3 +26,108 @@ def test_replace_units():
     assert p2.parameters['c'].unit == usys2['length']
     assert p.units == usys1
     assert p2.units == usys2
+
+
+@pytest.mark.parametrize('n_threads', [1, 2, 4, 0])
+def test_n_threads(n_threads):
+    usys = UnitSystem([u.kpc, u.Myr, u.Msun, u.radian])
+    p = (HernquistPotential(m=1E10*u.Msun, c=1.*u.kpc, units=usys) +
+         MiyamotoNagaiPotential(m=5E10*u.Msun, a=3*u.kpc, b=0.3*u.kpc,
+                                units=usys))
+
+    rnd = np.random.RandomState(42)
+    xyz = rnd.uniform(-10, 10, size=(3, 1024)) * u.kpc
+
+    for name in ['energy', 'gradient', 'density', 'hessian',
+                 'mass_enclosed']:
+        func = getattr(p, name)
+        serial = func(xyz, n_threads=1)
+        threaded = func(xyz, n_threads=n_threads)
+        assert u.allclose(serial, threaded, rtol=0, atol=0*serial.unit)
+
+        # time array:
+        t = np.linspace(0, 1, xyz.shape[1])
+        serial = func(xyz, t=t, n_threads=1)
+        threaded = func(xyz, t=t, n_threads=n_threads)
+        assert u.allclose(serial, threaded, rtol=0, atol=0*serial.unit)
+
+    # global default
+    with conf.set_temp('n_threads', n_threads):
+        assert u.allclose(p.energy(xyz), p.energy(xyz, n_threads=1))
+
+
+def test_n_threads_invalid():
+    p = HernquistPotential(m=1E10, c=1., units=galactic)
+    with pytest.raises(ValueError):
+        p.energy([1., 2, 3.], n_threads=-1)
+
+
+def test_shift_rotate_components():
+    """
+    Components with and without origin shifts / rotations take different code
+    paths in the C layer -- make sure a mix of these agrees with the pure-Python
+    composition of the same components.
+    """
+    from scipy.spatial.transform import Rotation
+
+    R = Rotation.from_euler('zyx', [31., 12., -44.], degrees=True).as_matrix()
+    kw = dict(m=1E10, a=3., b=0.3, units=galactic)
+    components = [
+        MiyamotoNagaiPotential(**kw),
+        MiyamotoNagaiPotential(**kw, origin=[1., -2., 0.5] * u.kpc),
+        MiyamotoNagaiPotential(**kw, R=R),
+        MiyamotoNagaiPotential(**kw, origin=[-1., 0., 2.] * u.kpc, R=R)
+    ]
+
+    cp = CCompositePotential()
+    pp = CompositePotential()
+    for i, c in enumerate(components):
+        cp[str(i)] = c
+        pp[str(i)] = c
+
+    xyz = np.random.uniform(-10, 10, size=(3, 128))
+    for name in ['energy', 'gradient', 'density']:
+        assert u.allclose(getattr(cp, name)(xyz), getattr(pp, name)(xyz))
+
+    E, grad = cp.energy_and_gradient(xyz)
+    assert u.allclose(E, pp.energy(xyz))
+    assert u.allclose(grad, pp.gradient(xyz))
+
+
+@pytest.mark.parametrize('n_threads', [1, 4])
+def test_gradient_batch(n_threads):
+    """
+    The gradient at many positions and a single time is computed with the batch
+    gradient functions, where implemented -- compare to the single-position
+    functions, which are used when there is one time per position.
+    """
+    from scipy.spatial.transform import Rotation
+
+    R = Rotation.from_euler('zyx', [31., 12., -44.], degrees=True).as_matrix()
+    pots = [KeplerPotential(m=1E10, units=galactic),
+            IsochronePotential(m=1E10, b=1., units=galactic),
+            HernquistPotential(m=1E10, c=1., units=galactic),
+            PlummerPotential(m=1E10, b=1., units=galactic),
+            NFWPotential(m=1E11, r_s=15., units=galactic),
+            MiyamotoNagaiPotential(m=1E10, a=3., b=0.3, units=galactic)]
+
+    # a mix of components with and without batch functions, shifts, rotations
+    cp = CCompositePotential()
+    for i, p in enumerate(pots):
+        cp[str(i)] = p
+    cp['shift'] = PlummerPotential(m=1E10, b=1., units=galactic,
+                                   origin=[1., -2., 0.5])
+    cp['rotate'] = MiyamotoNagaiPotential(m=1E10, a=3., b=0.3, R=R,
+                                          units=galactic)
+    cp['log'] = LogarithmicPotential(v_c=0.2, r_h=1., q1=1., q2=0.9, q3=0.8,
+                                     units=galactic)
+
+    # not a multiple of the block size
+    q = np.ascontiguousarray(
+        np.random.RandomState(42).uniform(-10, 10, size=(1000, 3)))
+    for p in pots + [cp]:
+        grad1 = p.c_instance.gradient(q, t=np.array([0.]),
+                                      n_threads=n_threads)
+        grad2 = p.c_instance.gradient(q, t=np.zeros(len(q)),
+                                      n_threads=n_threads)
+        assert np.allclose(grad1, grad2, rtol=1E-13, atol=0)
@@ -1,8 +1,20 @@
+# Third-party
+import numpy as np
+import pytest
+
 # This project
-from ....units import solarsystem
-from ..util import from_equation
+from ....units import solarsystem, galactic
+from ..util import from_equation, _has_c_compiler
+from ..builtin import PlummerPotential
+from ..cpotential import CPotentialBase
+from ..ccompositepotential import CCompositePotential
+from ...hamiltonian import Hamiltonian
 from .helpers import PotentialTestBase
 
+requires_compiler = pytest.mark.skipif(
+    not _has_c_compiler(),
+    reason="A C compiler is required to compile potentials.")
+
 class EquationBase(PotentialTestBase):
     def test_plot(self):
         # Skip for now because contour plotting assumes 3D
@@ -27,6 +39,70 @@ class TestHarmonicOscillatorFromEquation(EquationBase):
         import numpy as np
         self.potential.gradient(np.random.random(size=(1,13)))
 
+@requires_compiler
+class TestHarmonicOscillatorFromEquationCompiled(EquationBase):
+    w0 = [1.,0.]
+
+    @classmethod
+    def setup_class(cls):
+        # compile here rather than at import, so that collection does not
+        # need a C compiler
+        cls.Potential = from_equation("1/2*k*x**2", vars="x", pars="k",
+                                      name='HarmonicOscillator',
+                                      hessian=True, compile=True)
+        cls.potential = cls.Potential(k=1.)
+        super().setup_class()
+
+    def test_c_enabled(self):
+        assert isinstance(self.potential, CPotentialBase)
+        assert Hamiltonian(self.potential).c_enabled
+
+
+@requires_compiler
+class TestPlummerFromEquationCompiled(EquationBase):
+    w0 = [8., 0.5, 0.2, 0.01, 0.2, 0.05]
+
+    @classmethod
+    def setup_class(cls):
+        cls.Potential = from_equation("-G*m/sqrt(x**2+y**2+z**2+b**2)",
+                                      vars=["x", "y", "z"],
+                                      pars=["G", "m", "b"], name='Plummer',
+                                      hessian=True, compile=True)
+        cls.potential = cls.Potential(G=galactic.get_constant('G'), m=1E11,
+                                      b=1., units=galactic)
+        super().setup_class()
+
+    def test_compare_builtin(self):
+        builtin = PlummerPotential(m=1E11, b=1., units=galactic)
+        xyz = np.random.RandomState(42).uniform(-10, 10, size=(3, 16))
+
+        for func in ['energy', 'gradient', 'density', 'hessian']:
+            val1 = getattr(self.potential, func)(xyz)
+            val2 = getattr(builtin, func)(xyz)
+            assert np.allclose(val1.value, val2.value, rtol=1E-10)
+
+        orbit1 = Hamiltonian(self.potential).integrate_orbit(
+            self.w0, dt=1., n_steps=1000)
+        orbit2 = Hamiltonian(builtin).integrate_orbit(
+            self.w0, dt=1., n_steps=1000)
+        assert np.allclose(orbit1.xyz.value, orbit2.xyz.value, rtol=1E-10)
+
+    def test_composite(self):
+        builtin = PlummerPotential(m=1E11, b=1., units=galactic)
+        pot = CCompositePotential(disk=self.potential, halo=builtin)
+        assert np.allclose(pot.energy(self.w0[:3]).value,
+                           2 * builtin.energy(self.w0[:3]).value)
+
+
+@requires_compiler
+def test_compiled_invalid():
+    with pytest.raises(ValueError):
+        from_equation("1/2*k*x**2 + y", vars="x", pars="k", compile=True)
+
+    Potential = from_equation("1/2*k*x**2", vars="x", pars="k", compile=True)
+    with pytest.raises(ValueError):
+        Potential()
+
 # class TestHarmonicOscillatorFromEquationUnits(EquationBase):
 #     Potential = from_equation("1/2*k*x**2", vars="x", pars="k",
 #                               name='HarmonicOscillator',
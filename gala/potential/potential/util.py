@@ -1,5 +1,16 @@
 """ Utilities for Potential classes """
 
+# Standard library
+from collections import OrderedDict
+import ctypes
+import hashlib
+import os
+import shlex
+import shutil
+import subprocess
+import sysconfig
+import tempfile
+
 # Third-party
 import numpy as np
 
@@ -15,7 +26,7 @@ __all__ = ['from_equation']
 #         words.append(word.capitalize())
 #     return "".join(words)
 
-def from_equation(expr, vars, pars, name=None, hessian=False):
+def from_equation(expr, vars, pars, name=None, hessian=False, compile=False):
     r"""
     Create a potential class from an expression for the potential.
 
@@ -41,6 +52,13 @@ def from_equation(expr, vars, pars, name=None, hessian=False):
         The name of the potential class returned.
     hessian : bool (optional)
         Generate a function to compute the Hessian.
+    compile : bool (optional)
+        Generate C code for the potential and compile it into a shared library,
+        and return a subclass of `~gala.potential.CPotentialBase`. The compiled
+        libraries are cached on disk (in the ``gala`` cache directory, see
+        :func:`astropy.config.get_cache_dir`) keyed by a hash of the
+        generated code, so each expression is only compiled once. This
+        requires a C compiler.
 
     Returns
     -------
@@ -67,6 +85,15 @@ def from_equation(expr, vars, pars, name=None, hessian=False):
         >>> H = Hamiltonian(p1)
         >>> orbit = H.integrate_orbit([1.,0], dt=0.01, n_steps=1000)
 
+    With ``compile=True``, the potential is instead implemented in C, so orbits
+    are integrated with the fast Cython integrators and the potential can be
+    combined with other C potentials in a
+    `~gala.potential.CCompositePotential`::
+
+        >>> Potential = from_equation("1/2*k*x**2", vars="x", pars="k",
+        ...                           name='HarmonicOscillator',
+        ...                           compile=True) # doctest: +SKIP
+
     """
     try:
         import sympy
@@ -83,6 +110,9 @@ def from_equation(expr, vars, pars, name=None, hessian=False):
     par_names = [p.name for p in pars]
     ndim = len(vars)
 
+    if compile:
+        return _compile_equation(expr, vars, pars, name=name, hessian=hessian)
+
     # Energy / value
     energyfunc = lambdify(vars + pars, expr, dummify=False, modules='numpy')
 
@@ -125,9 +155,7 @@ def from_equation(expr, vars, pars, name=None, hessian=False):
 
     if name is not None:
         # name = _classnamify(name)
-        if "potential" not in name.lower():
-            name = name + "Potential"
-        CustomPotential.__name__ = str(name)
+        CustomPotential.__name__ = _class_name(name)
 
     # Hessian
     if hessian:
@@ -164,6 +192,211 @@ def from_equation(expr, vars, pars, name=None, hessian=False):
     return CustomPotential
 
 
+def _class_name(name):
+    if "potential" not in name.lower():
+        name = name + "Potential"
+    return str(name)
+
+
+def _equation_c_source(expr, vars, pars, hessian=False):
+    """
+    Generate C code for the CPotential functions (value, gradient, density,
+    value_and_gradient, and optionally the Hessian) of a potential expression.
+    The variables and parameters are renamed so that they can't clash with any
+    C names: the parameter array follows the usual convention that the first
+    element is G.
+
+    Returns the source code and the names of the generated functions.
+    """
+    import sympy
+
+    ndim = len(vars)
+    q = [sympy.Symbol('q_{}'.format(i)) for i in range(ndim)]
+    p = [sympy.Symbol('p_{}'.format(i)) for i in range(len(pars))]
+    G = sympy.Symbol('G')
+    expr = expr.subs(dict(zip(vars + pars, q + p)), simultaneous=True)
+
+    unknown = expr.free_symbols - set(q + p)
+    if unknown:
+        raise ValueError("The expression contains symbols that are not "
+                         "variables or parameters: {}"
+                         .format(", ".join(sorted(map(str, unknown)))))
+
+    grad = [sympy.diff(expr, qi) for qi in q]
+    hess = [sympy.diff(expr, qi, qj) for qi in q for qj in q]
+    dens = sum(hess[i*ndim + i] for i in range(ndim)) / (4*sympy.pi*G)
+
+    header = ["double q_{0} = q[{0}];".format(i) for i in range(ndim)]
+    header += ["double p_{0} = pars[{1}];".format(i, i+1)
+               for i in range(len(pars))]
+
+    def ccode(x):
+        try:
+            return sympy.ccode(x, standard='C99')
+        except Exception as e:
+            raise ValueError("Failed to generate C code for the expression "
+                             "'{}': {}".format(x, str(e)))
+
+    def body(exprs, declare_G=False):
+        # common subexpressions are only evaluated once
+        tmps, exprs = sympy.cse(exprs,
+                                symbols=sympy.numbered_symbols('tmp'))
+        lines = list(header)
+        if declare_G:
+            lines.append("double G = pars[0];")
+        lines += ["double {} = {};".format(k, ccode(v)) for k, v in tmps]
+        return lines, [ccode(x) for x in exprs]
+
+    funcs = OrderedDict()
+
+    lines, (val, ) = body([expr])
+    funcs['value'] = ("double value(double t, double *pars, double *q, "
+                      "int n_dim)", lines + ["return {};".format(val)])
+
+    lines, (val, ) = body([dens], declare_G=True)
+    funcs['density'] = ("double density(double t, double *pars, double *q, "
+                        "int n_dim)", lines + ["return {};".format(val)])
+
+    lines, vals = body(grad)
+    funcs['gradient'] = ("void gradient(double t, double *pars, double *q, "
+                         "int n_dim, double *grad)",
+                         lines + ["grad[{0}] = grad[{0}] + {1};".format(i, v)
+                                  for i, v in enumerate(vals)])
+
+    lines, vals = body([expr] + grad)
+    funcs['value_and_gradient'] = (
+        "double value_and_gradient(double t, double *pars, double *q, "
+        "int n_dim, double *grad)",
+        lines + ["grad[{0}] = grad[{0}] + {1};".format(i, v)
+                 for i, v in enumerate(vals[1:])] +
+        ["return {};".format(vals[0])])
+
+    if hessian:
+        lines, vals = body(hess)
+        funcs['hessian'] = ("void hessian(double t, double *pars, double *q, "
+                            "int n_dim, double *hess)",
+                            lines + ["hess[{0}] = hess[{0}] + {1};"
+                                     .format(i, v)
+                                     for i, v in enumerate(vals)])
+
+    src = ["/* Generated by gala.potential.from_equation() for the potential:",
+           "    {}".format(sympy.sstr(expr)),
+           "*/",
+           "#include <math.h>",
+           "#ifndef M_PI",
+           "#define M_PI 3.14159265358979323846",
+           "#endif",
+           ""]
+    for signature, lines in funcs.values():
+        src.append(signature + " {")
+        src += ["    " + line for line in lines]
+        src += ["}", ""]
+    return "\n".join(src), list(funcs.keys())
+
+
+def _get_compile_cache_dir():
+    from astropy.config import get_cache_dir
+    path = os.path.join(get_cache_dir('gala'), 'from_equation')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _c_compiler():
+    """
+    The command (split into a list) of the C compiler that is used to compile
+    potentials: ``$CC`` if set, otherwise the compiler Python was built with.
+    """
+    return shlex.split(os.environ.get('CC',
+                                      sysconfig.get_config_var('CC') or 'cc'))
+
+
+def _has_c_compiler():
+    """
+    Return ``True`` if the C compiler that is needed by
+    ``from_equation(..., compile=True)`` is available.
+    """
+    cc = _c_compiler()
+    return bool(cc) and shutil.which(cc[0]) is not None
+
+
+def _compile_c_source(src):
+    """
+    Compile C source code into a shared library in the on-disk cache (if it
+    isn't already there) and return the path to the library.
+    """
+    key = hashlib.sha1(src.encode('utf-8')).hexdigest()
+    cache_dir = _get_compile_cache_dir()
+    lib_path = os.path.join(cache_dir, 'potential_{}.so'.format(key))
+    if os.path.exists(lib_path):
+        return lib_path
+
+    cc = _c_compiler()
+    with tempfile.TemporaryDirectory(dir=cache_dir) as tmpdir:
+        src_path = os.path.join(tmpdir, 'potential.c')
+        tmp_lib_path = os.path.join(tmpdir, 'potential.so')
+        with open(src_path, 'w') as f:
+            f.write(src)
+
+        cmd = cc + ['-O3', '-fPIC', '-shared', src_path,
+                                 '-o', tmp_lib_path, '-lm']
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE,
+                                  stderr=subprocess.STDOUT,
+                                  universal_newlines=True)
+        except OSError as e:
+            raise RuntimeError("Failed to run the C compiler '{}': {}"
+                               .format(' '.join(cc), str(e)))
+
+        if proc.returncode != 0:
+            raise RuntimeError("Failed to compile the potential:\n{}"
+                               .format(proc.stdout))
+
+        # atomic, so that concurrent processes never load a partial file
+        os.replace(tmp_lib_path, lib_path)
+
+    return lib_path
+
+
+def _compile_equation(expr, vars, pars, name=None, hessian=False):
+    from .cpotential import CPotentialBase, CFunctionWrapper
+
+    ndim = len(vars)
+    par_names = [p.name for p in pars]
+    src, func_names = _equation_c_source(expr, vars, pars, hessian=hessian)
+    lib = ctypes.CDLL(_compile_c_source(src))
+
+    Wrapper = type('CustomWrapper', (CFunctionWrapper, ), dict(
+        n_dim=ndim,
+        c_functions={k: ctypes.cast(getattr(lib, k), ctypes.c_void_p).value
+                     for k in func_names},
+        _lib=lib))  # keep a reference so the library is never unloaded
+
+    class CustomPotential(CPotentialBase):
+
+        def __init__(self, units=None, origin=None, R=None, **kwargs):
+            parameters = OrderedDict()
+            for par in par_names:
+                if par not in kwargs:
+                    raise ValueError("You must specify a value for "
+                                     "parameter '{}'.".format(par))
+                parameters[par] = kwargs[par]
+
+            super(CustomPotential, self).__init__(parameters=parameters,
+                                                  units=units,
+                                                  origin=origin,
+                                                  R=R,
+                                                  ndim=ndim,
+                                                  Wrapper=Wrapper)
+
+    if name is not None:
+        CustomPotential.__name__ = _class_name(name)
+        Wrapper.__name__ = CustomPotential.__name__.replace('Potential',
+                                                            'Wrapper')
+
+    CustomPotential.save = None
+    return CustomPotential
+
+
 def format_doc(*args, **kwargs):
     """
     Replaces the docstring of the decorated object and then formats it.
@@ -20,7 +20,7 @@ cimport cython
 # Gala
 from gala.units import galactic
 from gala.potential.potential.cpotential cimport (CPotentialWrapper,
-                                                  MAX_N_COMPONENTS, CPotential)
+                                                  CPotential)
 from gala.potential.potential.cpotential import CPotentialBase
 
 cdef extern from "extra_compile_macros.h":
@@ -0,0 +1,7 @@
+"""
+Potentials represented by spline interpolation of tabulated values.
+"""
+
+from .interp import InterpolatedPotential
+from .multipole import MultipolePotential
+from .cylspline import CylSplinePotential
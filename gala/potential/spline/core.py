@@ -0,0 +1,143 @@
+""" Functionality shared by the tabulated (spline) potential classes """
+
+# Third-party
+import astropy.units as u
+import numpy as np
+
+# Project
+from ...units import UnitSystem, DimensionlessUnitSystem, dimensionless
+
+__all__ = ['SplineTableMixin']
+
+
+def _axis_map(x, scale):
+    """Map grid axis coordinates to the coordinate the nodes are uniform in."""
+    if scale > 0:
+        return np.arcsinh(x / scale)
+    return x
+
+
+def _axis_unmap(u, scale):
+    if scale > 0:
+        return scale * np.sinh(u)
+    return u
+
+
+class SplineTableMixin:
+    """
+    Methods for comparing tabulated potentials to a reference potential and for
+    caching the tables to disk.
+
+    Subclasses must implement ``_sample_positions(rnd, n_samples)``, which
+    returns an array of random positions within the tabulated region, and may
+    list the names of integer-valued parameters in ``_int_parameters``.
+    """
+    _int_parameters = ()
+
+    def _sample_positions(self, rnd, n_samples):
+        raise NotImplementedError()
+
+    def error_report(self, potential, n_samples=4096, seed=None):
+        """
+        Compare the tabulated potential to a reference potential at random
+        positions within the tabulated region. The positions are transformed
+        with the rotation matrix ``R`` and shifted by the ``origin`` of the
+        tabulated potential before evaluating the reference potential.
+
+        Parameters
+        ----------
+        potential : :class:`~gala.potential.PotentialBase`
+            The reference potential, typically the potential used to create the
+            table.
+        n_samples : int (optional)
+            The number of random positions to test.
+        seed : int (optional)
+            Seed for the random number generator.
+
+        Returns
+        -------
+        report : dict
+            The maximum and median relative errors of the potential energy
+            and the magnitude of the gradient error relative to the magnitude of
+            the gradient, with keys ``'energy_max_rel_err'``,
+            ``'energy_median_rel_err'``, ``'gradient_max_rel_err'``, and
+            ``'gradient_median_rel_err'``.
+        """
+        rnd = np.random.RandomState(seed)
+
+        # Positions in the frame of the table: the potential is evaluated at
+        # R (q - origin), so invert this to get positions q
+        xyz = self._sample_positions(rnd, n_samples)
+        if self.R is not None:
+            xyz = self.R.T @ xyz
+        xyz = xyz + self.origin[:, None]
+        if not isinstance(self.units, DimensionlessUnitSystem):
+            xyz = xyz * self.units['length']
+
+        E1, grad1 = self.energy_and_gradient(xyz)
+        E2 = potential.energy(xyz)
+        grad2 = potential.gradient(xyz)
+
+        E_err = np.abs((E1 - E2) / E2).decompose().value
+        grad_err = (np.sqrt(np.sum((grad1 - grad2)**2, axis=0)) /
+                    np.sqrt(np.sum(grad2**2, axis=0))).decompose().value
+
+        return {'energy_max_rel_err': np.max(E_err),
+                'energy_median_rel_err': np.median(E_err),
+                'gradient_max_rel_err': np.max(grad_err),
+                'gradient_median_rel_err': np.median(grad_err)}
+
+    def save_table(self, filename):
+        """
+        Save the table and all other parameters of the potential to a numpy
+        ``.npz`` file.
+
+        Parameters
+        ----------
+        filename : str
+            The output filename.
+        """
+        if isinstance(self.units, DimensionlessUnitSystem):
+            units = []
+        else:
+            units = [str(x) for x in self.units.to_dict().values()]
+
+        R = np.eye(self.ndim) if self.R is None else self.R
+        np.savez(filename,
+                 units=np.array(units),
+                 origin=self.origin,
+                 R=R,
+                 **{k: v.value for k, v in self.parameters.items()})
+
+    @classmethod
+    def load_table(cls, filename):
+        """
+        Load a potential from a file written with ``save_table()``.
+
+        Parameters
+        ----------
+        filename : str
+            The filename of the saved table.
+
+        Returns
+        -------
+        pot : :class:`~gala.potential.PotentialBase`
+        """
+        with np.load(filename) as f:
+            data = dict(f)
+
+        units = data.pop('units')
+        if len(units) == 0:
+            units = dimensionless
+        else:
+            units = UnitSystem([u.Unit(str(x)) for x in units])
+
+        origin = data.pop('origin')
+        R = data.pop('R')
+        if np.allclose(R, np.eye(R.shape[0])):
+            R = None
+
+        kw = {k: v[()] if v.ndim == 0 else v for k, v in data.items()}
+        for k in cls._int_parameters:
+            kw[k] = int(kw[k])
+        return cls(units=units, origin=origin, R=R, **kw)
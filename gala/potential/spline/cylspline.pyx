@@ -0,0 +1,638 @@
+# cython: boundscheck=False
+# cython: nonecheck=False
+# cython: cdivision=True
+# cython: wraparound=False
+# cython: language_level=3
+
+""" Azimuthal harmonic expansion potential with 2D spline interpolation """
+
+# Standard library
+from collections import OrderedDict
+
+# Third party
+from astropy.constants import G
+import astropy.units as u
+import numpy as np
+cimport numpy as np
+np.import_array()
+from cython.parallel cimport prange
+
+# Gala
+from ..potential.core import _potential_docstring, PotentialBase
+from ..potential.util import format_doc
+from ..potential.cpotential import CPotentialBase, _validate_n_threads
+from ..potential.cpotential cimport CPotentialWrapper
+from ..potential.cpotential cimport (densityfunc, energyfunc, gradientfunc,
+                                     hessianfunc, valuegradientfunc)
+from .core import SplineTableMixin, _axis_map, _axis_unmap
+
+cdef extern from "spline/src/cylspline.h":
+    double cylspline_value(double t, double *pars, double *q, int n_dim) nogil
+    void cylspline_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double cylspline_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void cylspline_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
+    double cylspline_density(double t, double *pars, double *q, int n_dim) nogil
+
+    void cylspline_green_cells(int mmax, int symmetric, double R, double z,
+                               int n_cell, double *cells,
+                               int n_far, double *far_pts, double *far_w,
+                               int n_near, double *near_pts, double *near_w,
+                               double *out) nogil
+    void cylspline_green_points(int mmax, int symmetric, double R, double z,
+                                int n_src, double *pts, double *w,
+                                double eps2, double *out) nogil
+
+__all__ = ['CylSplinePotential']
+
+# Number of extra grid nodes tabulated on each side of each grid axis (see the
+# note on padding in interp.pyx)
+_PAD = 8
+
+# Gauss-Legendre nodes per cell (along each axis) used to integrate the density
+# in cells far from and close to the target node
+_N_GL_FAR = 2
+_N_GL_NEAR = 6
+
+# The density outside of the grid is integrated on cells with edges uniformly
+# spaced in ln(R) and ln|z|, out to e^8 times the grid extent
+_N_EXT = 32
+_D_EXT = 0.25
+
+
+cdef class CylSplineWrapper(CPotentialWrapper):
+
+    def __init__(self, G, parameters, q0, R):
+        self.init([G] + list(parameters),
+                  np.ascontiguousarray(q0),
+                  np.ascontiguousarray(R))
+        self.cpotential.value[0] = <energyfunc>(cylspline_value)
+        self.cpotential.density[0] = <densityfunc>(cylspline_density)
+        self.cpotential.gradient[0] = <gradientfunc>(cylspline_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(cylspline_value_and_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(cylspline_hessian)
+
+
+def _solve_cells(int mmax, int symmetric, double[::1] R, double[::1] z,
+                 double[:, ::1] cells,
+                 double[:, :, ::1] far_pts, double[:, :, ::1] far_w,
+                 double[:, :, ::1] near_pts, double[:, :, ::1] near_w,
+                 int n_threads):
+    cdef:
+        int i
+        int n = R.shape[0]
+        double[:, ::1] out = np.zeros((n, 2*mmax + 1))
+
+    for i in prange(n, nogil=True, num_threads=n_threads, schedule='dynamic'):
+        cylspline_green_cells(mmax, symmetric, R[i], z[i],
+                              cells.shape[0], &cells[0, 0],
+                              far_pts.shape[1], &far_pts[0, 0, 0],
+                              &far_w[0, 0, 0],
+                              near_pts.shape[1], &near_pts[0, 0, 0],
+                              &near_w[0, 0, 0],
+                              &out[i, 0])
+
+    return np.asarray(out)
+
+
+def _solve_points(int mmax, int symmetric, double[::1] R, double[::1] z,
+                  double[:, ::1] pts, double[:, ::1] w, double eps2,
+                  int n_threads):
+    cdef:
+        int i
+        int n = R.shape[0]
+        double[:, ::1] out = np.zeros((n, 2*mmax + 1))
+
+    for i in prange(n, nogil=True, num_threads=n_threads, schedule='static'):
+        cylspline_green_points(mmax, symmetric, R[i], z[i],
+                               pts.shape[0], &pts[0, 0], &w[0, 0], eps2,
+                               &out[i, 0])
+
+    return np.asarray(out)
+
+
+def _cell_points(R_edges, z_edges, n_gl):
+    """
+    Gauss-Legendre quadrature points and weights in each cell of the grid
+    defined by the input cell edges.
+    """
+    x, w = np.polynomial.legendre.leggauss(n_gl)
+    dR = np.diff(R_edges)
+    dz = np.diff(z_edges)
+    R = R_edges[:-1, None] + 0.5 * dR[:, None] * (x[None] + 1)
+    wR = 0.5 * dR[:, None] * w[None]
+    z = z_edges[:-1, None] + 0.5 * dz[:, None] * (x[None] + 1)
+    wz = 0.5 * dz[:, None] * w[None]
+
+    # shape: (n_cell_R, n_cell_z, n_gl, n_gl)
+    RR = np.broadcast_to(R[:, None, :, None], (len(dR), len(dz), n_gl, n_gl))
+    zz = np.broadcast_to(z[None, :, None, :], RR.shape)
+    ww = wR[:, None, :, None] * wz[None, :, None, :]
+
+    n_cell = len(dR) * len(dz)
+    pts = np.stack((RR.reshape(n_cell, n_gl**2), zz.reshape(n_cell, n_gl**2)),
+                   axis=-1)
+    return np.ascontiguousarray(pts), ww.reshape(n_cell, n_gl**2)
+
+
+def _median_height(z, mass):
+    """The mass-weighted median of the absolute heights ``z``."""
+    if len(z) == 0:
+        return 0.
+    z = np.abs(z)
+    idx = np.argsort(z)
+    M = np.cumsum(mass[idx])
+    M_tot = M[len(M) - 1]
+    if M_tot <= 0:
+        return 0.
+    i = min(np.searchsorted(M, 0.5 * M_tot), len(M) - 1)
+    return float(z[idx[i]])
+
+
+def _density_scale(density, R_max, z_max, symmetric, n=64):
+    """
+    The height that encloses half of the mass of the density within the grid,
+    estimated on cells spaced logarithmically in R and z.
+    """
+    R_edges = np.concatenate(([0.], np.geomspace(1E-4 * R_max, R_max, n)))
+    z_edges = np.concatenate(([0.], np.geomspace(1E-4 * z_max, z_max, n)))
+    R = 0.5 * (R_edges[1:] + R_edges[:-1])
+    z = 0.5 * (z_edges[1:] + z_edges[:-1])
+    RR, zz = np.meshgrid(R, z, indexing='ij')
+    xyz = np.stack((RR.ravel(), np.zeros(RR.size), zz.ravel()))
+
+    rho = density(xyz)
+    if not symmetric:
+        xyz[2] = -xyz[2]
+        rho = rho + density(xyz)
+    dm = rho * (RR * np.diff(R_edges)[:, None] * np.diff(z_edges)[None]).ravel()
+    if not np.all(np.isfinite(dm)):
+        return 0.
+    return _median_height(zz.ravel(), dm)
+
+
+def _harmonic_weights(mmax):
+    """The index m of each term, and whether it is a cos or sin term."""
+    m = np.abs(np.arange(-mmax, mmax+1))
+    is_cos = np.arange(-mmax, mmax+1) >= 0
+    return m, is_cos
+
+
+@format_doc(common_doc=_potential_docstring)
+class CylSplinePotential(SplineTableMixin, CPotentialBase):
+    r"""
+    CylSplinePotential(coeffs, R_max, z_max, mmax=0, scale=0, order=3, symmetric=False, m_out=0, units=None, origin=None, R=None)
+
+    An azimuthal (Fourier) harmonic expansion of the potential, with each term
+    tabulated on a 2D grid in cylindrical radius and height and evaluated with
+    cubic or quintic B-spline interpolation.
+
+    The potential is
+
+    .. math::
+
+        \Phi(R, \phi, z) = \sum_{{m=0}}^{{m_{{\rm max}}}}
+            \left[C_m(R, z) \cos(m\phi) + S_m(R, z) \sin(m\phi)\right]
+
+    This is well suited to flattened and disk-dominated mass distributions, which
+    are poorly represented by spherical harmonic expansions (see
+    :class:`~gala.potential.MultipolePotential`). The grid covers
+    :math:`0 \leq R \leq R_{{\rm max}}` and
+    :math:`|z| \leq z_{{\rm max}}` (or :math:`0 \leq z \leq z_{{\rm max}}` if
+    ``symmetric=True``). If a ``scale`` is specified, the grid nodes along each
+    axis are uniformly spaced in :math:`\sinh^{{-1}}(x / s)`. Outside of the
+    grid, the potential is extrapolated as a point mass with mass ``m_out``.
+
+    Most users will want to create an instance of this class from a density
+    with :meth:`~gala.potential.CylSplinePotential.from_density` or from a set
+    of particles with :meth:`~gala.potential.CylSplinePotential.from_particles`.
+
+    Parameters
+    ----------
+    coeffs : array_like, :class:`~astropy.units.Quantity` [energy per mass]
+        The B-spline coefficient tables, including padding nodes, with shape
+        ``(2*mmax + 1, n_R, n_z)``. The tables are ordered by
+        :math:`m = -m_{{\rm max}}, ..., m_{{\rm max}}`, where negative :math:`m`
+        correspond to the :math:`\sin(|m| \phi)` terms.
+    R_max : :class:`~astropy.units.Quantity`, numeric [length]
+        The maximum cylindrical radius of the grid.
+    z_max : :class:`~astropy.units.Quantity`, numeric [length]
+        The maximum height of the grid.
+    mmax : int (optional)
+        The maximum azimuthal order. Use ``mmax=0`` (the default) for
+        axisymmetric potentials.
+    scale : :class:`~astropy.units.Quantity`, numeric [length] (optional)
+        The scale used to stretch the grid axes. If 0 (the default), the grid
+        nodes are uniformly spaced.
+    order : int (optional)
+        The order of the B-spline interpolation: 3 (cubic) or 5 (quintic).
+    symmetric : bool (optional)
+        If True, the potential is assumed to be symmetric under reflection
+        :math:`z \rightarrow -z`, so the grid only covers positive :math:`z`.
+    m_out : :class:`~astropy.units.Quantity`, numeric [mass] (optional)
+        Mass used to extrapolate the potential outside of the grid as a point
+        mass. This is only accurate if the grid encloses most of the mass.
+    {common_doc}
+    """
+    _int_parameters = ('mmax', 'order', 'symmetric')
+    _physical_types = {'mmax': 'dimensionless',
+                       'order': 'dimensionless',
+                       'symmetric': 'dimensionless',
+                       'scale': 'length',
+                       'm_out': 'mass',
+                       'R_max': 'length',
+                       'z_max': 'length',
+                       'coeffs': 'specific energy'}
+
+    def __init__(self, coeffs, R_max, z_max, mmax=0, scale=0., order=3,
+                 symmetric=False, m_out=0., units=None, origin=None, R=None):
+
+        units = self._validate_units(units)
+
+        if not hasattr(coeffs, 'unit'):
+            coeffs = coeffs * (units['length'] / units['time'])**2
+        coeffs = np.array(coeffs.value, dtype=np.float64) * coeffs.unit
+
+        mmax = int(mmax)
+        if mmax < 0:
+            raise ValueError("The maximum azimuthal order must be >= 0.")
+
+        order = int(order)
+        if order not in [3, 5]:
+            raise ValueError("Only cubic (order=3) and quintic (order=5) "
+                             "interpolation is supported.")
+
+        if coeffs.ndim != 3 or coeffs.shape[0] != 2*mmax + 1:
+            raise ValueError("Invalid coefficient table shape {}: expected "
+                             "{} 2D tables for mmax={}."
+                             .format(coeffs.shape, 2*mmax + 1, mmax))
+
+        if np.any(np.array(coeffs.shape[1:]) < 2*_PAD + 2):
+            raise ValueError("Invalid coefficient table shape {}: the grid "
+                             "must have at least 2 nodes along each axis, plus "
+                             "{} padding nodes on each side."
+                             .format(coeffs.shape, _PAD))
+
+        # Precompute the grid node spacing in the mapped axis coordinates:
+        _p = self._prepare_parameters({'scale': scale, 'R_max': R_max,
+                                       'z_max': z_max}, units)
+        if _p['R_max'].value <= 0 or _p['z_max'].value <= 0:
+            raise ValueError("R_max and z_max must be positive.")
+        u_max = _axis_map(np.array([_p['R_max'].value, _p['z_max'].value]),
+                          _p['scale'].value)
+        u_min = np.array([0., 0. if symmetric else -u_max[1]])
+        n = np.array(coeffs.shape[1:]) - 2*_PAD
+
+        parameters = OrderedDict()
+        parameters['mmax'] = mmax
+        parameters['order'] = order
+        parameters['symmetric'] = int(symmetric)
+        parameters['scale'] = scale
+        parameters['m_out'] = m_out
+        parameters['pad'] = _PAD
+        parameters['shape'] = np.array(coeffs.shape[1:])
+        parameters['u_min'] = u_min
+        parameters['inv_h'] = (n - 1) / (u_max - u_min)
+        parameters['R_max'] = R_max
+        parameters['z_max'] = z_max
+        parameters['coeffs'] = coeffs
+
+        super().__init__(parameters=parameters,
+                         units=units,
+                         Wrapper=CylSplineWrapper,
+                         origin=origin,
+                         R=R,
+                         c_only=['pad', 'shape', 'u_min', 'inv_h'])
+
+    def _sample_positions(self, rnd, n_samples):
+        # Positions are drawn uniformly in the (possibly stretched) grid
+        # coordinates, and uniformly in azimuth
+        scale = self.parameters['scale'].value
+        u_R = _axis_map(self.parameters['R_max'].value, scale)
+        u_z = _axis_map(self.parameters['z_max'].value, scale)
+
+        R = _axis_unmap(rnd.uniform(0, u_R, size=n_samples), scale)
+        z = _axis_unmap(rnd.uniform(-u_z, u_z, size=n_samples), scale)
+        phi = rnd.uniform(0, 2*np.pi, size=n_samples)
+        return np.stack([R * np.cos(phi), R * np.sin(phi), z])
+
+    @classmethod
+    def _grid(cls, R_max, z_max, n_R, n_z, scale, symmetric):
+        """The grid nodes along each axis, including the padding nodes."""
+        if n_R < 2 or n_z < 2:
+            raise ValueError("The grid must have at least 2 nodes along each "
+                             "axis.")
+
+        u_R = _axis_map(R_max, scale)
+        R = _axis_unmap(u_R / (n_R - 1) * np.arange(-_PAD, n_R + _PAD), scale)
+
+        u_z = _axis_map(z_max, scale)
+        u_z_min = 0. if symmetric else -u_z
+        dz = (u_z - u_z_min) / (n_z - 1)
+        z = _axis_unmap(u_z_min + dz * np.arange(-_PAD, n_z + _PAD), scale)
+
+        return R, z
+
+    @classmethod
+    def _from_node_values(cls, Phi, R_max, z_max, mmax, scale, order,
+                          symmetric, units, G_):
+        """
+        Create an instance from the harmonic terms of the potential computed at
+        the grid nodes with R >= 0 (and z >= 0 if symmetric), with shape
+        (n_R, n_z, n_terms).
+        """
+        from scipy.ndimage import spline_filter1d
+
+        Phi = np.moveaxis(Phi, -1, 0)
+        m, _ = _harmonic_weights(mmax)
+
+        # Fill in the nodes at R < 0 (and z < 0) using symmetry: the m-th term
+        # is an even or odd function of R for even or odd m. We mirror more
+        # nodes than the padding so that the spline coefficients are symmetric
+        # (to round-off) about R=0 and z=0, and then crop to the padding.
+        n_mirror = [min(4*_PAD, Phi.shape[1] - 1),
+                    min(4*_PAD, Phi.shape[2] - 1)]
+        pad_R = (-1.)**m[:, None, None] * Phi[:, n_mirror[0]:0:-1]
+        Phi = np.concatenate((pad_R, Phi), axis=1)
+        if symmetric:
+            Phi = np.concatenate((Phi[:, :, n_mirror[1]:0:-1], Phi), axis=2)
+        else:
+            n_mirror[1] = _PAD
+
+        coeffs = spline_filter1d(Phi, order=order, axis=1, mode='mirror',
+                                 output=np.float64)
+        coeffs = spline_filter1d(coeffs, order=order, axis=2, mode='mirror',
+                                 output=np.float64)
+        crop = (slice(None), slice(n_mirror[0] - _PAD, None),
+                slice(n_mirror[1] - _PAD, None))
+        Phi = Phi[crop]
+        coeffs = coeffs[crop]
+
+        # Estimate the mass used to extrapolate outside of the grid from the
+        # axisymmetric part of the potential on the boundary of the grid
+        R, z = cls._grid(R_max, z_max, Phi.shape[1] - 2*_PAD,
+                         Phi.shape[2] - 2*_PAD, scale, symmetric)
+        inner = (slice(_PAD, -_PAD), slice(_PAD, -_PAD))
+        Phi0 = Phi[mmax][inner]
+        RR, zz = np.meshgrid(R[inner[0]], z[inner[1]], indexing='ij')
+        boundary = np.zeros(Phi0.shape, dtype=bool)
+        boundary[Phi0.shape[0] - 1] = True
+        boundary[:, Phi0.shape[1] - 1] = True
+        if not symmetric:
+            boundary[:, 0] = True
+        r = np.sqrt(RR**2 + zz**2)
+        m_out = max(np.median(-Phi0[boundary] * r[boundary]) / G_, 0.)
+
+        return cls(coeffs=coeffs * (units['length'] / units['time'])**2,
+                   R_max=R_max * units['length'],
+                   z_max=z_max * units['length'],
+                   mmax=mmax,
+                   scale=scale * units['length'],
+                   order=order,
+                   symmetric=symmetric,
+                   m_out=m_out * units['mass'],
+                   units=units)
+
+    @staticmethod
+    def _validate_grid_args(R_max, z_max, scale, units):
+        def _length(x):
+            if hasattr(x, 'unit'):
+                x = x.decompose(units).value
+            return float(x)
+
+        R_max = _length(R_max)
+        z_max = _length(z_max)
+        if scale is not None:
+            scale = _length(scale)
+        if R_max <= 0 or z_max <= 0:
+            raise ValueError("R_max and z_max must be positive.")
+
+        try:
+            G_ = G.decompose(units).value
+        except u.UnitConversionError:
+            G_ = 1.
+
+        return R_max, z_max, scale, G_
+
+    @classmethod
+    def from_density(cls, density, R_max, z_max, n_R=48, n_z=48, mmax=0,
+                     scale=None, symmetric=False, order=3, units=None,
+                     n_threads=None):
+        """
+        Compute the azimuthal harmonic expansion of the potential of a density
+        distribution.
+
+        The density is expanded in azimuthal harmonics and the potential of
+        each harmonic is computed at every grid node by integrating the density
+        times the Green's function of the Poisson equation for that harmonic,
+        which is evaluated with complete elliptic integrals. The integral
+        extends over the grid and a region around the grid that is 3000 times
+        larger.
+
+        Parameters
+        ----------
+        density : :class:`~gala.potential.PotentialBase`, callable
+            Either a potential instance, in which case its ``density()`` method
+            is used, or a function that accepts an array of Cartesian positions
+            with shape ``(3, n)`` and returns the density at each position.
+            If a function is passed, the positions and density are assumed to
+            be in the unit system specified by ``units``.
+        R_max : :class:`~astropy.units.Quantity`, numeric [length]
+            The maximum cylindrical radius of the grid.
+        z_max : :class:`~astropy.units.Quantity`, numeric [length]
+            The maximum height of the grid.
+        n_R : int (optional)
+            The number of grid nodes along the radial axis.
+        n_z : int (optional)
+            The number of grid nodes along the vertical axis.
+        mmax : int (optional)
+            The maximum azimuthal order.
+        scale : :class:`~astropy.units.Quantity`, numeric [length] (optional)
+            The grid nodes are uniformly spaced in :math:`\\sinh^{-1}(x / s)`
+            instead of :math:`x`. For disks, this should typically be
+            comparable to the scale height. If not specified, the height that
+            encloses half of the mass within the grid is used. Pass 0 for
+            uniformly spaced nodes.
+        symmetric : bool (optional)
+            If True, assume that the density is symmetric under reflection
+            :math:`z \\rightarrow -z`.
+        order : int (optional)
+            The order of the B-spline interpolation: 3 (cubic) or 5 (quintic).
+        units : `~gala.units.UnitSystem` (optional)
+            The unit system. Required if ``density`` is a function.
+        n_threads : int (optional)
+            The number of threads used to compute the potential at the grid
+            nodes. Defaults to ``gala.conf.n_threads``.
+
+        Returns
+        -------
+        pot : :class:`~gala.potential.CylSplinePotential`
+        """
+        if isinstance(density, PotentialBase):
+            potential = density
+            units = potential.units
+            def density(xyz):
+                return potential.density(xyz).decompose(units).value
+
+        elif units is None:
+            raise ValueError("A unit system must be specified if the density "
+                             "is passed in as a function.")
+
+        n_threads = _validate_n_threads(n_threads)
+        R_max, z_max, scale, G_ = cls._validate_grid_args(R_max, z_max, scale,
+                                                          units)
+        if scale is None:
+            scale = _density_scale(density, R_max, z_max, symmetric)
+        R, z = cls._grid(R_max, z_max, n_R, n_z, scale, symmetric)
+
+        # Quadrature cells: the grid cells, plus cells outside of the grid
+        ext = np.exp(_D_EXT * np.arange(1, _N_EXT + 1))
+        R_edges = np.concatenate((R[_PAD:_PAD+n_R], R_max * ext))
+        z_edges = np.concatenate((z[_PAD:_PAD+n_z], z_max * ext))
+        if not symmetric:
+            z_edges = np.concatenate((-z_max * ext[::-1], z_edges))
+        RR, zz = np.meshgrid(R_edges, z_edges, indexing='ij')
+        cells = np.stack((RR[:-1, :-1].ravel(), RR[1:, 1:].ravel(),
+                          zz[:-1, :-1].ravel(), zz[1:, 1:].ravel()), axis=-1)
+
+        # Azimuthal harmonics of the density at the quadrature points
+        n_phi = max(2*mmax + 2, 16)
+        phi = 2*np.pi * np.arange(n_phi) / n_phi
+        m, is_cos = _harmonic_weights(mmax)
+        trig = np.where(is_cos[:, None],
+                        np.cos(m[:, None] * phi[None]),
+                        np.sin(m[:, None] * phi[None]))
+        trig = trig * np.where(m == 0, 1., 2.)[:, None] / n_phi
+
+        weights = []
+        for n_gl in [_N_GL_FAR, _N_GL_NEAR]:
+            pts, W = _cell_points(R_edges, z_edges, n_gl)
+            pts_ = pts.reshape(-1, 2)
+            rho_m = np.zeros((len(pts_), len(m)))
+            n_batch = max(1, 2**17 // n_phi)
+            for i in range(0, len(pts_), n_batch):
+                Rq, zq = pts_[i:i+n_batch].T
+                xyz = np.stack((Rq[:, None] * np.cos(phi)[None],
+                                Rq[:, None] * np.sin(phi)[None],
+                                np.repeat(zq[:, None], n_phi, axis=1)))
+                rho = density(xyz.reshape(3, -1)).reshape(len(Rq), n_phi)
+                rho_m[i:i+n_batch] = rho @ trig.T
+
+            if not np.all(np.isfinite(rho_m)):
+                raise ValueError("The density is not finite at all "
+                                 "quadrature points.")
+
+            w = -2*np.pi*G_ * (pts_[:, 0] * W.ravel())[:, None] * rho_m
+            weights.append((pts, np.ascontiguousarray(w.reshape(pts.shape[:2] + (len(m), )))))
+
+        (far_pts, far_w), (near_pts, near_w) = weights
+
+        # The potential at the grid nodes with R >= 0 (and z >= 0)
+        R_t = R[_PAD:]
+        z_t = z[_PAD:] if symmetric else z
+        RR, zz = np.meshgrid(R_t, z_t, indexing='ij')
+        Phi = _solve_cells(mmax, int(symmetric), RR.ravel(), zz.ravel(),
+                           cells, far_pts, far_w, near_pts, near_w, n_threads)
+        Phi = Phi.reshape(RR.shape + (len(m), ))
+
+        return cls._from_node_values(Phi, R_max, z_max, mmax, scale, order,
+                                     symmetric, units, G_)
+
+    @classmethod
+    def from_particles(cls, xyz, mass, R_max, z_max, n_R=48, n_z=48, mmax=0,
+                       scale=None, symmetric=False, order=3, softening=0.,
+                       units=None, n_threads=None):
+        """
+        Compute the azimuthal harmonic expansion of the potential of a set of
+        particles.
+
+        The potential at each grid node is computed by direct summation over
+        the particles, so the cost scales as the number of particles times the
+        number of grid nodes.
+
+        Parameters
+        ----------
+        xyz : array_like, :class:`~astropy.units.Quantity` [length]
+            The Cartesian positions of the particles, with shape ``(3, n)``.
+        mass : array_like, :class:`~astropy.units.Quantity` [mass]
+            The particle masses: either a single value or an array with shape
+            ``(n, )``.
+        R_max : :class:`~astropy.units.Quantity`, numeric [length]
+            The maximum cylindrical radius of the grid.
+        z_max : :class:`~astropy.units.Quantity`, numeric [length]
+            The maximum height of the grid.
+        n_R : int (optional)
+            The number of grid nodes along the radial axis.
+        n_z : int (optional)
+            The number of grid nodes along the vertical axis.
+        mmax : int (optional)
+            The maximum azimuthal order.
+        scale : :class:`~astropy.units.Quantity`, numeric [length] (optional)
+            The grid nodes are uniformly spaced in :math:`\\sinh^{-1}(x / s)`
+            instead of :math:`x`. If not specified, the median height of the
+            particles within the grid is used. Pass 0 for uniformly spaced
+            nodes.
+        symmetric : bool (optional)
+            If True, symmetrize the particle distribution under reflection
+            :math:`z \\rightarrow -z`.
+        order : int (optional)
+            The order of the B-spline interpolation: 3 (cubic) or 5 (quintic).
+        softening : :class:`~astropy.units.Quantity`, numeric [length] (optional)
+            Plummer softening length of the particles.
+        units : `~gala.units.UnitSystem`
+            The unit system.
+        n_threads : int (optional)
+            The number of threads used to compute the potential at the grid
+            nodes. Defaults to ``gala.conf.n_threads``.
+
+        Returns
+        -------
+        pot : :class:`~gala.potential.CylSplinePotential`
+        """
+        if units is None:
+            raise ValueError("A unit system must be specified.")
+
+        if hasattr(xyz, 'unit'):
+            xyz = xyz.decompose(units).value
+        xyz = np.array(xyz, dtype=np.float64)
+        if xyz.ndim != 2 or xyz.shape[0] != 3:
+            raise ValueError("Particle positions must have shape (3, n).")
+
+        if hasattr(mass, 'unit'):
+            mass = mass.decompose(units).value
+        mass = np.broadcast_to(mass, xyz.shape[1:]).astype(np.float64)
+
+        if hasattr(softening, 'unit'):
+            softening = softening.decompose(units).value
+
+        n_threads = _validate_n_threads(n_threads)
+        R_max, z_max, scale, G_ = cls._validate_grid_args(R_max, z_max, scale,
+                                                          units)
+        if scale is None:
+            in_grid = ((xyz[0]**2 + xyz[1]**2 <= R_max**2) &
+                       (np.abs(xyz[2]) <= z_max))
+            scale = _median_height(xyz[2, in_grid], mass[in_grid])
+        R, z = cls._grid(R_max, z_max, n_R, n_z, scale, symmetric)
+
+        R_p = np.sqrt(xyz[0]**2 + xyz[1]**2)
+        phi_p = np.arctan2(xyz[1], xyz[0])
+        pts = np.ascontiguousarray(np.stack((R_p, xyz[2]), axis=-1))
+
+        m, is_cos = _harmonic_weights(mmax)
+        trig = np.where(is_cos[None],
+                        np.cos(m[None] * phi_p[:, None]),
+                        np.sin(m[None] * phi_p[:, None]))
+        w = -G_ * np.where(m == 0, 1., 2.)[None] * mass[:, None] * trig
+        if symmetric:
+            # each particle is split between its position and mirror image
+            w = 0.5 * w
+        w = np.ascontiguousarray(w)
+
+        R_t = R[_PAD:]
+        z_t = z[_PAD:] if symmetric else z
+        RR, zz = np.meshgrid(R_t, z_t, indexing='ij')
+        Phi = _solve_points(mmax, int(symmetric), RR.ravel(), zz.ravel(),
+                            pts, w, float(softening)**2, n_threads)
+        Phi = Phi.reshape(RR.shape + (len(m), ))
+
+        return cls._from_node_values(Phi, R_max, z_max, mmax, scale, order,
+                                     symmetric, units, G_)
@@ -0,0 +1,525 @@
+# cython: boundscheck=False
+# cython: nonecheck=False
+# cython: cdivision=True
+# cython: wraparound=False
+# cython: language_level=3
+
+""" Potentials tabulated on a grid and evaluated with spline interpolation """
+
+# Standard library
+from collections import OrderedDict
+import warnings
+
+# Third party
+import astropy.units as u
+import numpy as np
+cimport numpy as np
+np.import_array()
+
+# Gala
+from ..potential.core import _potential_docstring
+from ..potential.util import format_doc
+from ..potential.cpotential import CPotentialBase
+from ..potential.cpotential cimport CPotentialWrapper
+from ..potential.cpotential cimport (densityfunc, energyfunc, gradientfunc,
+                                     hessianfunc, valuegradientfunc)
+from ...units import DimensionlessUnitSystem
+from .core import SplineTableMixin, _axis_map, _axis_unmap
+
+cdef extern from "spline/src/interp.h":
+    double interp_value(double t, double *pars, double *q, int n_dim) nogil
+    void interp_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double interp_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void interp_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
+    double interp_density(double t, double *pars, double *q, int n_dim) nogil
+
+__all__ = ['InterpolatedPotential']
+
+# Number of extra grid nodes tabulated on each side of each grid axis. The
+# spline coefficients near the edge of the table are affected by the boundary
+# condition used when solving for the coefficients, so we pad the table with
+# enough nodes that this error is negligible within the requested grid.
+_PAD = 8
+
+
+cdef class InterpolatedWrapper(CPotentialWrapper):
+
+    def __init__(self, G, parameters, q0, R):
+        self.init([G] + list(parameters),
+                  np.ascontiguousarray(q0),
+                  np.ascontiguousarray(R))
+        self.cpotential.value[0] = <energyfunc>(interp_value)
+        self.cpotential.density[0] = <densityfunc>(interp_density)
+        self.cpotential.gradient[0] = <gradientfunc>(interp_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(interp_value_and_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(interp_hessian)
+
+
+@format_doc(common_doc=_potential_docstring)
+class InterpolatedPotential(SplineTableMixin, CPotentialBase):
+    r"""
+    InterpolatedPotential(coeffs, grid_min, grid_max, scale=0, order=3, symmetric=False, m_out=0, cusp_radius=0, cusp_slope=1, units=None, origin=None, R=None)
+
+    A potential tabulated on a regular grid and evaluated with cubic or quintic
+    B-spline interpolation.
+
+    The grid is either Cartesian, :math:`(x, y, z)`, or cylindrical,
+    :math:`(R, z)` for axisymmetric potentials, depending on whether the
+    coefficient table is 3D or 2D. If a ``scale`` is specified, the grid nodes
+    along each axis are uniformly spaced in :math:`\sinh^{{-1}}(x / s)`, which
+    concentrates the nodes within :math:`|x| \lesssim s`. Outside of the grid,
+    the potential is extrapolated along each ray from the origin as
+    :math:`a/r + b/r^2`, with :math:`a` and :math:`b` chosen to match the value
+    and the radial derivative of the interpolated potential where the ray
+    crosses the boundary of the grid. This is a point mass with an effective
+    mass that depends on the direction, and keeps the potential and its
+    gradient continuous at the boundary, but it is only accurate if the grid
+    encloses most of the mass. If the grid does not contain the
+    origin, the potential is instead extrapolated as a point mass with mass
+    ``m_out``.
+
+    A spline cannot represent the gradient of a central density cusp, which is
+    discontinuous at the origin. If ``cusp_radius`` is specified, within this
+    radius of the origin the potential is instead extrapolated inwards along
+    each ray as :math:`\Phi_0 + A r^\alpha + B r^{{\alpha + 1}}`, where
+    :math:`\Phi_0` is the interpolated potential at the origin and
+    :math:`\alpha` is ``cusp_slope``, with :math:`A` and :math:`B` chosen to
+    match the value and the radial derivative of the interpolated potential at
+    ``cusp_radius``. The origin should then be a grid node.
+
+    Most users will want to create an instance of this class with
+    :meth:`~gala.potential.InterpolatedPotential.from_potential` to tabulate an
+    existing (and more expensive) potential, and then
+    :meth:`~gala.potential.InterpolatedPotential.save_table` and
+    :meth:`~gala.potential.InterpolatedPotential.load_table` to cache the table.
+
+    Parameters
+    ----------
+    coeffs : array_like, :class:`~astropy.units.Quantity` [energy per mass]
+        The B-spline coefficient table, including padding nodes. This should be
+        a 3D array for a Cartesian grid, or a 2D array for a cylindrical grid.
+    grid_min : array_like, :class:`~astropy.units.Quantity` [length]
+        The lower bound of the grid along each axis.
+    grid_max : array_like, :class:`~astropy.units.Quantity` [length]
+        The upper bound of the grid along each axis.
+    scale : :class:`~astropy.units.Quantity`, numeric [length] (optional)
+        The scale used to stretch the grid axes. If 0 (the default), the grid
+        nodes are uniformly spaced.
+    order : int (optional)
+        The order of the B-spline interpolation: 3 (cubic) or 5 (quintic).
+    symmetric : bool (optional)
+        If True, the potential is assumed to be symmetric under reflections of
+        each grid axis (for a cylindrical grid, :math:`z \rightarrow -z`), so
+        the grid only needs to cover positive coordinates.
+    m_out : :class:`~astropy.units.Quantity`, numeric [mass] (optional)
+        Mass used to extrapolate the potential outside of the grid as a point
+        mass, if the grid does not contain the origin. This is only accurate if
+        the grid encloses most of the mass.
+    cusp_radius : :class:`~astropy.units.Quantity`, numeric [length] (optional)
+        Radius of the region around the origin in which the potential is
+        extrapolated as a power-law cusp. If 0 (the default), the potential is
+        interpolated everywhere within the grid.
+    cusp_slope : numeric (optional)
+        The power-law slope :math:`\alpha` of the central cusp, e.g., 1 for a
+        density :math:`\rho \propto r^{{-1}}`.
+    {common_doc}
+    """
+    _int_parameters = ('order', 'symmetric')
+    _physical_types = {'m_out': 'mass',
+                       'order': 'dimensionless',
+                       'symmetric': 'dimensionless',
+                       'scale': 'length',
+                       'cusp_radius': 'length',
+                       'cusp_slope': 'dimensionless',
+                       'grid_min': 'length',
+                       'grid_max': 'length',
+                       'coeffs': 'specific energy'}
+
+    def __init__(self, coeffs, grid_min, grid_max, scale=0., order=3,
+                 symmetric=False, m_out=0., cusp_radius=0., cusp_slope=1.,
+                 units=None, origin=None, R=None):
+
+        units = self._validate_units(units)
+
+        if not hasattr(coeffs, 'unit'):
+            coeffs = coeffs * (units['length'] / units['time'])**2
+        coeffs = np.array(coeffs.value, dtype=np.float64) * coeffs.unit
+
+        n_axes = coeffs.ndim
+        if n_axes not in [2, 3]:
+            raise ValueError("The coefficient table must be 2D (for a "
+                             "cylindrical grid) or 3D (for a Cartesian grid).")
+
+        grid_min = np.broadcast_to(grid_min, (n_axes, ), subok=True)
+        grid_max = np.broadcast_to(grid_max, (n_axes, ), subok=True)
+
+        order = int(order)
+        if order not in [3, 5]:
+            raise ValueError("Only cubic (order=3) and quintic (order=5) "
+                             "interpolation is supported.")
+
+        symmetric = int(symmetric)
+        if np.any(np.array(coeffs.shape) < 2*_PAD + 2):
+            raise ValueError("Invalid coefficient table shape {}: the grid "
+                             "must have at least 2 nodes along each axis, plus "
+                             "{} padding nodes on each side."
+                             .format(coeffs.shape, _PAD))
+
+        # Precompute the grid node spacing in the mapped axis coordinates:
+        _scale = self._prepare_parameters({'scale': scale}, units)['scale']
+        _grid_min = self._prepare_parameters({'grid_min': grid_min},
+                                             units)['grid_min']
+        _grid_max = self._prepare_parameters({'grid_max': grid_max},
+                                             units)['grid_max']
+        self._validate_grid(_grid_min.value, _grid_max.value, n_axes,
+                            symmetric)
+
+        _cusp_radius = self._prepare_parameters({'cusp_radius': cusp_radius},
+                                                units)['cusp_radius'].value
+        if _cusp_radius < 0 or float(cusp_slope) <= 0:
+            raise ValueError("The cusp radius must be >= 0 and the cusp slope "
+                             "must be positive.")
+        if _cusp_radius > 0:
+            # the sphere r < cusp_radius must be within the grid (the lower
+            # bound of a mirrored axis is a mirror plane)
+            dist = _grid_max.value.copy()
+            lower = np.ones(n_axes, dtype=bool)
+            if symmetric:
+                lower[:] = False
+            elif n_axes == 2:
+                lower[0] = False
+            dist[lower] = np.minimum(dist[lower], -_grid_min.value[lower])
+            if _cusp_radius > np.min(dist):
+                raise ValueError("The cusp region must be contained within "
+                                 "the grid.")
+
+        u_min = _axis_map(_grid_min.value, _scale.value)
+        u_max = _axis_map(_grid_max.value, _scale.value)
+        n = np.array(coeffs.shape) - 2*_PAD
+
+        parameters = OrderedDict()
+        parameters['m_out'] = m_out
+        parameters['order'] = order
+        parameters['symmetric'] = symmetric
+        parameters['scale'] = scale
+        parameters['cusp_radius'] = cusp_radius
+        parameters['cusp_slope'] = cusp_slope
+        parameters['n_axes'] = n_axes
+        parameters['pad'] = _PAD
+        parameters['shape'] = np.array(coeffs.shape)
+        parameters['u_min'] = u_min
+        parameters['inv_h'] = (n - 1) / (u_max - u_min)
+        parameters['grid_min'] = grid_min
+        parameters['grid_max'] = grid_max
+        parameters['coeffs'] = coeffs
+
+        super().__init__(parameters=parameters,
+                         units=units,
+                         Wrapper=InterpolatedWrapper,
+                         origin=origin,
+                         R=R,
+                         c_only=['n_axes', 'pad', 'shape', 'u_min', 'inv_h'])
+
+    def _sample_positions(self, rnd, n_samples):
+        # Positions are drawn uniformly in the (possibly stretched) grid
+        # coordinates, so that each grid cell is sampled equally.
+        scale = self.parameters['scale'].value
+        grid_min = self.parameters['grid_min'].value
+        grid_max = self.parameters['grid_max'].value
+
+        x = []
+        for i in range(len(grid_min)):
+            uu = rnd.uniform(_axis_map(grid_min[i], scale),
+                             _axis_map(grid_max[i], scale),
+                             size=n_samples)
+            x.append(_axis_unmap(uu, scale))
+
+        if self.grid_type == 'cartesian':
+            xyz = np.stack(x)
+        else:
+            phi = rnd.uniform(0, 2*np.pi, size=n_samples)
+            xyz = np.stack([x[0] * np.cos(phi), x[0] * np.sin(phi), x[1]])
+
+        if self.parameters['symmetric'].value:
+            xyz = xyz * rnd.choice([-1, 1], size=xyz.shape)
+
+        return xyz
+
+    def _exterior_gradient_error(self, potential, n_samples=1024, seed=None):
+        """
+        The maximum relative error of the extrapolated gradient compared to a
+        reference potential, at random positions between 1 and 2 times the
+        distance to the edge of the grid along rays from the origin. Returns
+        None if the grid does not contain the origin.
+        """
+        grid_min = self.parameters['grid_min'].value
+        grid_max = self.parameters['grid_max'].value
+        if np.any(grid_min > 0) or np.any(grid_max < 0):
+            return None
+
+        rnd = np.random.RandomState(seed)
+        xyz = self._sample_positions(rnd, n_samples)
+        if self.grid_type == 'cartesian':
+            x = xyz
+        else:
+            x = np.stack([np.sqrt(xyz[0]**2 + xyz[1]**2), xyz[2]])
+        if self.parameters['symmetric'].value:
+            x = np.abs(x)
+
+        # The fraction of the way to the edge of the grid along each ray
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = np.where(x > 0, x / grid_max[:, None], x / grid_min[:, None])
+        f = np.max(np.nan_to_num(f), axis=0)
+        xyz = xyz[:, f > 0] / f[f > 0] * rnd.uniform(1, 2, size=np.sum(f > 0))
+
+        if self.R is not None:
+            xyz = self.R.T @ xyz
+        xyz = xyz + self.origin[:, None]
+        if not isinstance(self.units, DimensionlessUnitSystem):
+            xyz = xyz * self.units['length']
+
+        grad1 = self.gradient(xyz)
+        grad2 = potential.gradient(xyz)
+        grad_err = (np.sqrt(np.sum((grad1 - grad2)**2, axis=0)) /
+                    np.sqrt(np.sum(grad2**2, axis=0))).decompose().value
+        return np.max(grad_err)
+
+    @staticmethod
+    def _validate_grid(grid_min, grid_max, n_axes, symmetric):
+        if np.any(grid_max <= grid_min):
+            raise ValueError("grid_max must be larger than grid_min along "
+                             "every axis.")
+
+        # The cylindrical radius, and the axes mirrored with symmetric=True,
+        # are only tabulated at positive coordinates
+        if symmetric and np.any(grid_min < 0):
+            raise ValueError("With symmetric=True, the grid must only cover "
+                             "positive coordinates (grid_min >= 0).")
+
+        if n_axes == 2 and grid_min[0] < 0:
+            raise ValueError("The cylindrical radius must be >= 0 over the "
+                             "grid (grid_min >= 0 along the R axis).")
+
+    @staticmethod
+    def _find_cusp(potential, nodes, symmetric, x0):
+        """
+        If the origin is a grid node and the potential has a cusp there,
+        return the radius of the cusp region and the slope of the cusp, and
+        otherwise return (0, 1). ``x0`` is the offset from the origin at which
+        the potential at the origin node was evaluated, if any.
+        """
+        units = potential.units
+        no_cusp = (0., 1.)
+
+        h = []
+        for x in nodes:
+            (i, ) = np.where(np.isclose(x, 0, atol=1E-10 * np.ptp(x)))
+            if len(i) != 1:
+                return no_cusp
+            h.append(x[i[0] + 1])
+
+        # Match to the interpolated potential four cells from the origin, where
+        # the spline is accurate again, if that is within the grid
+        r_c = 4 * max(h)
+        dist = [x[len(x) - 1 - _PAD] for x in nodes]
+        if len(nodes) == 3 and not symmetric:
+            dist += [-x[_PAD] for x in nodes]
+        elif len(nodes) == 2 and not symmetric:
+            dist += [-nodes[1][_PAD]]
+        if r_c > min(dist):
+            return no_cusp
+
+        # Measure the slope of the potential along each axis, well within the
+        # first grid cell
+        dirs = np.eye(3)
+        if not symmetric:
+            dirs = np.concatenate((dirs, -dirs), axis=1)
+        x0 = x0[0] if len(x0) > 0 else 0.
+        Phi0 = potential.energy([x0, 0., 0.]).decompose(units).value
+        r = np.array([0.01, 0.1]) * min(h)
+        xyz = (dirs[:, :, None] * r[None, None]).reshape(3, -1)
+        dPhi = potential.energy(xyz).decompose(units).value - Phi0
+        dPhi = dPhi.reshape(dirs.shape[1], len(r))
+
+        # A cusp is a minimum of the potential with Phi - Phi0 ~ r^alpha, with
+        # alpha ~ 1, and alpha = 2 for a smooth core
+        if not (np.all(np.isfinite(dPhi)) and np.all(dPhi > 0)):
+            return no_cusp
+        alpha = np.mean(np.log10(dPhi[:, 1] / dPhi[:, 0]))
+        if not (0.25 < alpha < 1.5):
+            return no_cusp
+
+        return r_c, alpha
+
+    @property
+    def grid_type(self):
+        """The grid type, either ``'cartesian'`` or ``'cylindrical'``."""
+        if self.parameters['coeffs'].ndim == 3:
+            return 'cartesian'
+        return 'cylindrical'
+
+    @classmethod
+    def from_potential(cls, potential, grid_min, grid_max, shape,
+                       grid_type='cartesian', scale=None, order=3,
+                       symmetric=False, rtol=None):
+        r"""
+        Tabulate an existing potential on a grid.
+
+        If the origin is a grid node and the potential has a central cusp, the
+        slope of the cusp is measured and the potential within four grid cells
+        of the origin is extrapolated as a cusp (see
+        :class:`~gala.potential.InterpolatedPotential`).
+
+        Parameters
+        ----------
+        potential : :class:`~gala.potential.PotentialBase`
+            The potential to tabulate. This can be any potential class,
+            including composite and pure-Python potentials.
+        grid_min : array_like, :class:`~astropy.units.Quantity` [length]
+            The lower bound of the grid along each axis (or a single value for
+            all axes). For a cylindrical grid, the axes are :math:`(R, z)` and
+            the grid should start at :math:`R=0`.
+        grid_max : array_like, :class:`~astropy.units.Quantity` [length]
+            The upper bound of the grid along each axis.
+        shape : int, iterable
+            The number of grid nodes along each axis (or a single value for all
+            axes).
+        grid_type : str (optional)
+            Either ``'cartesian'`` (the default) or ``'cylindrical'``. A
+            cylindrical grid assumes that the potential is axisymmetric.
+        scale : :class:`~astropy.units.Quantity`, numeric [length] (optional)
+            If specified, the grid nodes are uniformly spaced in
+            :math:`\sinh^{-1}(x / s)` instead of :math:`x`.
+        order : int (optional)
+            The order of the B-spline interpolation: 3 (cubic, the default) or
+            5 (quintic).
+        symmetric : bool (optional)
+            If True, assume that the potential is symmetric under reflection
+            about the coordinate planes so that only positive coordinates need
+            to be tabulated.
+        rtol : float (optional)
+            If specified, compute an error report (see
+            :meth:`~gala.potential.InterpolatedPotential.error_report`) and warn
+            if the maximum relative error in the gradient exceeds this value.
+            Also warn if the relative error of the extrapolated gradient just
+            outside of the grid exceeds this value, which happens if the grid
+            does not enclose most of the mass.
+
+        Returns
+        -------
+        pot : :class:`~gala.potential.InterpolatedPotential`
+        """
+        from scipy.ndimage import spline_filter
+
+        units = potential.units
+
+        if grid_type == 'cartesian':
+            n_axes = 3
+        elif grid_type == 'cylindrical':
+            n_axes = 2
+        else:
+            raise ValueError("Invalid grid type '{}': must be 'cartesian' or "
+                             "'cylindrical'.".format(grid_type))
+
+        if potential.ndim != 3:
+            raise ValueError("Only 3D potentials can be tabulated.")
+
+        def _length(x):
+            if hasattr(x, 'unit'):
+                x = x.decompose(units).value
+            return x
+
+        grid_min = np.broadcast_to(_length(grid_min), (n_axes, )).astype(float)
+        grid_max = np.broadcast_to(_length(grid_max), (n_axes, )).astype(float)
+        shape = np.broadcast_to(shape, (n_axes, )).astype(int)
+        if scale is None:
+            scale = 0.
+        scale = _length(scale)
+
+        cls._validate_grid(grid_min, grid_max, n_axes, symmetric)
+
+        if np.any(shape < 2):
+            raise ValueError("The grid must have at least 2 nodes along each "
+                             "axis.")
+
+        # The nodes, including the padding, along each axis:
+        nodes = []
+        for i in range(n_axes):
+            u_min = _axis_map(grid_min[i], scale)
+            u_max = _axis_map(grid_max[i], scale)
+            du = (u_max - u_min) / (shape[i] - 1)
+            uu = u_min + du * np.arange(-_PAD, shape[i] + _PAD)
+            nodes.append(_axis_unmap(uu, scale))
+
+        grids = np.meshgrid(*nodes, indexing='ij')
+        if n_axes == 3:
+            xyz = np.stack([g.ravel() for g in grids])
+        else:
+            R, z = grids
+            xyz = np.stack([R.ravel(), np.zeros(R.size), z.ravel()])
+
+        # Many potentials with a central cusp evaluate to nan exactly at the
+        # origin (e.g., 0/0), but have a finite limit there. For symmetric or
+        # cylindrical grids, the origin is always a grid node, so we evaluate
+        # the potential slightly offset from the origin instead.
+        at_origin = np.all(xyz == 0, axis=0)
+        xyz_eval = xyz.copy()
+        xyz_eval[0, at_origin] = 1e-8 * np.max(np.abs(grid_max - grid_min))
+
+        Phi = potential.energy(xyz_eval).decompose(units).value
+        Phi = Phi.reshape(grids[0].shape)
+
+        if not np.all(np.isfinite(Phi)):
+            raise ValueError("The potential is not finite at all grid nodes. "
+                             "This may happen if a grid node is exactly at a "
+                             "singular point of the potential (e.g., the "
+                             "origin for a point mass): try shifting or "
+                             "changing the number of nodes of the grid.")
+
+        coeffs = spline_filter(Phi, order=order, mode='mirror',
+                               output=np.float64)
+
+        # Estimate the mass used to extrapolate outside of the grid from the
+        # potential at the nodes on the boundary of the grid
+        edge = tuple([slice(_PAD, -_PAD)] * n_axes)
+        inner = np.zeros(Phi.shape, dtype=bool)
+        inner[edge] = True
+        boundary = inner.copy()
+        inner_edge = tuple([slice(_PAD + 1, -_PAD - 1)] * n_axes)
+        boundary[inner_edge] = False
+        r = np.sqrt(np.sum(xyz**2, axis=0)).reshape(Phi.shape)
+        G = potential.G
+        m_out = max(np.median(-Phi[boundary] * r[boundary]) / G, 0.)
+
+        cusp_radius, cusp_slope = cls._find_cusp(potential, nodes, symmetric,
+                                                 xyz_eval[0, at_origin])
+
+        pot = cls(coeffs=coeffs * (units['length'] / units['time'])**2,
+                  grid_min=grid_min * units['length'],
+                  grid_max=grid_max * units['length'],
+                  scale=scale * units['length'],
+                  order=order,
+                  symmetric=symmetric,
+                  m_out=m_out * units['mass'],
+                  cusp_radius=cusp_radius * units['length'],
+                  cusp_slope=cusp_slope,
+                  units=units)
+
+        if rtol is not None:
+            report = pot.error_report(potential)
+            if report['gradient_max_rel_err'] > rtol:
+                warnings.warn("The maximum relative error of the interpolated "
+                              "gradient is {:.2e}, larger than the requested "
+                              "tolerance {:.2e}. Consider using a finer grid."
+                              .format(report['gradient_max_rel_err'], rtol),
+                              RuntimeWarning)
+
+            err = pot._exterior_gradient_error(potential)
+            if err is not None and err > rtol:
+                warnings.warn("The maximum relative error of the extrapolated "
+                              "gradient outside of the grid is {:.2e}, larger "
+                              "than the requested tolerance {:.2e}. Consider "
+                              "using a grid that encloses more of the mass."
+                              .format(err, rtol), RuntimeWarning)
+
+        return pot
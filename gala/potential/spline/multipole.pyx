@@ -0,0 +1,477 @@
+# cython: boundscheck=False
+# cython: nonecheck=False
+# cython: cdivision=True
+# cython: wraparound=False
+# cython: language_level=3
+
+""" Multipole expansion potential with spline-interpolated radial functions """
+
+# Standard library
+from collections import OrderedDict
+
+# Third party
+from astropy.constants import G
+import astropy.units as u
+import numpy as np
+cimport numpy as np
+np.import_array()
+
+# Gala
+from ..potential.core import _potential_docstring, PotentialBase
+from ..potential.util import format_doc
+from ..potential.cpotential import CPotentialBase
+from ..potential.cpotential cimport CPotentialWrapper
+from ..potential.cpotential cimport (densityfunc, energyfunc, gradientfunc,
+                                     hessianfunc, valuegradientfunc)
+from .core import SplineTableMixin
+
+cdef extern from "spline/src/multipole.h":
+    double multipole_value(double t, double *pars, double *q, int n_dim) nogil
+    void multipole_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    double multipole_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad) nogil
+    void multipole_hessian(double t, double *pars, double *q, int n_dim, double *hess) nogil
+    double multipole_density(double t, double *pars, double *q, int n_dim) nogil
+
+__all__ = ['MultipolePotential']
+
+# Number of extra radial nodes tabulated on each side of the radial grid (see
+# the note on padding in interp.pyx)
+_PAD = 8
+
+# Gauss-Legendre nodes per ln(r) interval used for the radial integrals
+_N_GL = 8
+
+
+cdef class MultipoleWrapper(CPotentialWrapper):
+
+    def __init__(self, G, parameters, q0, R):
+        self.init([G] + list(parameters),
+                  np.ascontiguousarray(q0),
+                  np.ascontiguousarray(R))
+        self.cpotential.value[0] = <energyfunc>(multipole_value)
+        self.cpotential.density[0] = <densityfunc>(multipole_density)
+        self.cpotential.gradient[0] = <gradientfunc>(multipole_gradient)
+        self.cpotential.value_and_gradient[0] = <valuegradientfunc>(multipole_value_and_gradient)
+        self.cpotential.hessian[0] = <hessianfunc>(multipole_hessian)
+
+
+def _terms(lmax, mmax):
+    """
+    The (l, m) indices of the rows of the coefficient table, in order. Negative
+    m correspond to the sin(|m| phi) terms.
+    """
+    return [(l, m) for l in range(lmax+1)
+            for m in range(-min(l, mmax), min(l, mmax)+1)]
+
+
+def _real_harmonics(lmax, mmax, xyz):
+    """
+    Evaluate the orthonormal real spherical harmonics at the directions of the
+    input positions.
+
+    Returns
+    -------
+    Y : `~numpy.ndarray`
+        The harmonics, with shape ``(n_terms, n_positions)``.
+    norm : `~numpy.ndarray`
+        The normalization of each term, relative to the unnormalized associated
+        Legendre functions (without the Condon-Shortley phase) used in C.
+    """
+    from scipy.special import gammaln
+
+    r = np.sqrt(np.sum(xyz**2, axis=0))
+    R = np.sqrt(xyz[0]**2 + xyz[1]**2)
+    r_ = np.where(r > 0, r, 1.)
+    R_ = np.where(R > 0, R, 1.)
+    c = np.where(r > 0, xyz[2] / r_, 1.)
+    s = R / r_
+    phi = np.where(R > 0, np.arctan2(xyz[1] / R_, xyz[0] / R_), 0.)
+
+    # P[l, m] = s^m d^m P_l / dc^m, by recurrence in l for each m
+    P = np.zeros((lmax+1, mmax+1) + c.shape)
+    Pmm = np.ones_like(c)
+    for m in range(mmax+1):
+        if m > 0:
+            Pmm = Pmm * (2*m - 1) * s
+        P[m, m] = Pmm
+        if m < lmax:
+            P[m+1, m] = (2*m + 1) * c * Pmm
+        for l in range(m+2, lmax+1):
+            P[l, m] = ((2*l - 1) * c * P[l-1, m] -
+                       (l + m - 1) * P[l-2, m]) / (l - m)
+
+    terms = _terms(lmax, mmax)
+    Y = np.zeros((len(terms), ) + c.shape)
+    norm = np.zeros(len(terms))
+    for i, (l, m) in enumerate(terms):
+        am = abs(m)
+        norm[i] = np.sqrt((2*l + 1) / (4*np.pi) *
+                          np.exp(gammaln(l - am + 1) - gammaln(l + am + 1)))
+        if m == 0:
+            Y[i] = norm[i] * P[l, 0]
+        elif m > 0:
+            norm[i] = np.sqrt(2) * norm[i]
+            Y[i] = norm[i] * P[l, am] * np.cos(am * phi)
+        else:
+            norm[i] = np.sqrt(2) * norm[i]
+            Y[i] = norm[i] * P[l, am] * np.sin(am * phi)
+
+    return Y, norm
+
+
+def _radial_kernel(l, r, r_node):
+    """
+    The radial Green's function of the Poisson equation for multipole order l,
+    r_<^l / r_>^(l+1), for all pairs of source radii and node radii.
+    """
+    r = r[None]
+    r_node = r_node[:, None]
+    # the second branch is only used for r >= r_node > 0, but is evaluated
+    # everywhere, so avoid dividing by r = 0 (a particle at the origin)
+    r_ = np.where(r > 0, r, 1.)
+    return np.where(r < r_node,
+                    (r / r_node)**l / r_node,
+                    (r_node / r_)**l / r_)
+
+
+@format_doc(common_doc=_potential_docstring)
+class MultipolePotential(SplineTableMixin, CPotentialBase):
+    r"""
+    MultipolePotential(coeffs, r_min, r_max, lmax, mmax=None, order=3, units=None, origin=None, R=None)
+
+    A multipole (spherical harmonic) expansion of the potential, with the radial
+    dependence of each term interpolated with cubic or quintic B-splines on a
+    grid uniformly spaced in :math:`\ln r`.
+
+    The potential is
+
+    .. math::
+
+        \Phi(r, \theta, \phi) = \sum_{{l=0}}^{{l_{{\rm max}}}}
+            \sum_{{m=-\min(l, m_{{\rm max}})}}^{{\min(l, m_{{\rm max}})}}
+            \Phi_{{lm}}(r) \, Y_{{lm}}(\theta, \phi)
+
+    where :math:`Y_{{lm}}` are the real, orthonormal spherical harmonics. Inside
+    of ``r_min``, the :math:`l=0` term is extrapolated assuming a constant
+    density core and all other terms as :math:`r^l`. Outside of ``r_max``, all
+    terms are extrapolated as :math:`r^{{-(l+1)}}`, which assumes that there is
+    no mass outside of ``r_max``. Each evaluation costs
+    :math:`\mathcal{{O}}(l_{{\rm max}} \, m_{{\rm max}})` operations with no
+    special function calls.
+
+    Most users will want to create an instance of this class from a density
+    with :meth:`~gala.potential.MultipolePotential.from_density` or from a set
+    of particles with :meth:`~gala.potential.MultipolePotential.from_particles`.
+
+    Parameters
+    ----------
+    coeffs : array_like, :class:`~astropy.units.Quantity` [energy per mass]
+        The B-spline coefficients of the radial functions, with shape
+        ``(n_terms, n_r)``, including padding nodes. The rows are ordered by
+        :math:`l`, then by :math:`m`, where negative :math:`m` correspond to the
+        :math:`\sin(|m| \phi)` harmonics. The spline coefficients are
+        normalized relative to the associated Legendre functions (without the
+        Condon-Shortley phase) rather than the orthonormal harmonics.
+    r_min : :class:`~astropy.units.Quantity`, numeric [length]
+        The inner radius of the radial grid.
+    r_max : :class:`~astropy.units.Quantity`, numeric [length]
+        The outer radius of the radial grid.
+    lmax : int
+        The maximum spherical harmonic order :math:`l`.
+    mmax : int (optional)
+        The maximum azimuthal order :math:`m`. Defaults to ``lmax``. Use
+        ``mmax=0`` for axisymmetric potentials.
+    order : int (optional)
+        The order of the B-spline interpolation: 3 (cubic) or 5 (quintic).
+    {common_doc}
+    """
+    _int_parameters = ('lmax', 'mmax', 'order')
+    _physical_types = {'lmax': 'dimensionless',
+                       'mmax': 'dimensionless',
+                       'order': 'dimensionless',
+                       'r_min': 'length',
+                       'r_max': 'length',
+                       'coeffs': 'specific energy'}
+
+    def __init__(self, coeffs, r_min, r_max, lmax, mmax=None, order=3,
+                 units=None, origin=None, R=None):
+
+        units = self._validate_units(units)
+
+        if not hasattr(coeffs, 'unit'):
+            coeffs = coeffs * (units['length'] / units['time'])**2
+        coeffs = np.array(coeffs.value, dtype=np.float64) * coeffs.unit
+
+        lmax = int(lmax)
+        if mmax is None:
+            mmax = lmax
+        mmax = int(mmax)
+        if lmax < 0 or mmax < 0 or mmax > lmax:
+            raise ValueError("Invalid multipole orders: must have "
+                             "0 <= mmax <= lmax.")
+
+        order = int(order)
+        if order not in [3, 5]:
+            raise ValueError("Only cubic (order=3) and quintic (order=5) "
+                             "interpolation is supported.")
+
+        n_terms = len(_terms(lmax, mmax))
+        if coeffs.ndim != 2 or coeffs.shape[0] != n_terms:
+            raise ValueError("Invalid coefficient table shape {}: expected "
+                             "{} rows for lmax={}, mmax={}."
+                             .format(coeffs.shape, n_terms, lmax, mmax))
+
+        if coeffs.shape[1] < 2*_PAD + 2:
+            raise ValueError("Invalid coefficient table shape {}: the radial "
+                             "grid must have at least 2 nodes, plus {} padding "
+                             "nodes on each side.".format(coeffs.shape, _PAD))
+
+        # Precompute the radial grid node spacing in ln(r)
+        _r = self._prepare_parameters({'r_min': r_min, 'r_max': r_max}, units)
+        if not 0 < _r['r_min'].value < _r['r_max'].value:
+            raise ValueError("Must have 0 < r_min < r_max.")
+        s_min = np.log(_r['r_min'].value)
+        s_max = np.log(_r['r_max'].value)
+        n = coeffs.shape[1] - 2*_PAD
+
+        parameters = OrderedDict()
+        parameters['lmax'] = lmax
+        parameters['mmax'] = mmax
+        parameters['order'] = order
+        parameters['pad'] = _PAD
+        parameters['n_r'] = coeffs.shape[1]
+        parameters['s_min'] = s_min
+        parameters['inv_h'] = (n - 1) / (s_max - s_min)
+        parameters['r_min'] = r_min
+        parameters['r_max'] = r_max
+        parameters['coeffs'] = coeffs
+
+        super().__init__(parameters=parameters,
+                         units=units,
+                         Wrapper=MultipoleWrapper,
+                         origin=origin,
+                         R=R,
+                         c_only=['pad', 'n_r', 's_min', 'inv_h'])
+
+    def _sample_positions(self, rnd, n_samples):
+        # Positions are drawn uniformly in ln(r) and isotropically in angle
+        r_min = self.parameters['r_min'].value
+        r_max = self.parameters['r_max'].value
+        r = np.exp(rnd.uniform(np.log(r_min), np.log(r_max), size=n_samples))
+        xyz = rnd.normal(size=(3, n_samples))
+        return r * xyz / np.sqrt(np.sum(xyz**2, axis=0))
+
+    @staticmethod
+    def _radial_nodes(r_min, r_max, n_r):
+        """The radial grid nodes, including the padding nodes."""
+        s_min = np.log(r_min)
+        ds = (np.log(r_max) - s_min) / (n_r - 1)
+        return np.exp(s_min + ds * np.arange(-_PAD, n_r + _PAD))
+
+    @classmethod
+    def _from_node_values(cls, Phi_lm, norm, r_min, r_max, lmax, mmax, order,
+                          units):
+        from scipy.ndimage import spline_filter1d
+
+        # Convert from coefficients of the orthonormal harmonics to the
+        # normalization used in C, then solve for the B-spline coefficients
+        a_lm = Phi_lm * norm[:, None]
+        coeffs = spline_filter1d(a_lm, order=order, axis=1, mode='mirror',
+                                 output=np.float64)
+
+        return cls(coeffs=coeffs * (units['length'] / units['time'])**2,
+                   r_min=r_min * units['length'],
+                   r_max=r_max * units['length'],
+                   lmax=lmax, mmax=mmax, order=order, units=units)
+
+    @classmethod
+    def from_density(cls, density, r_min, r_max, n_r=64, lmax=8, mmax=None,
+                     order=3, units=None):
+        """
+        Compute the multipole expansion of the potential of a density
+        distribution.
+
+        The density is projected onto spherical harmonics with Gauss-Legendre
+        quadrature in :math:`\\cos\\theta` and uniform quadrature in
+        :math:`\\phi`, and the radial Poisson integrals are computed with
+        Gauss-Legendre quadrature in :math:`\\ln r`, including the density
+        inside of ``r_min`` and outside of ``r_max``.
+
+        Parameters
+        ----------
+        density : :class:`~gala.potential.PotentialBase`, callable
+            Either a potential instance, in which case its ``density()`` method
+            is used, or a function that accepts an array of Cartesian positions
+            with shape ``(3, n)`` and returns the density at each position.
+            If a function is passed, the positions and density are assumed to
+            be in the unit system specified by ``units``.
+        r_min : :class:`~astropy.units.Quantity`, numeric [length]
+            The inner radius of the radial grid.
+        r_max : :class:`~astropy.units.Quantity`, numeric [length]
+            The outer radius of the radial grid.
+        n_r : int (optional)
+            The number of radial grid nodes.
+        lmax : int (optional)
+            The maximum spherical harmonic order.
+        mmax : int (optional)
+            The maximum azimuthal order. Defaults to ``lmax``.
+        order : int (optional)
+            The order of the B-spline interpolation: 3 (cubic) or 5 (quintic).
+        units : `~gala.units.UnitSystem` (optional)
+            The unit system. Required if ``density`` is a function.
+
+        Returns
+        -------
+        pot : :class:`~gala.potential.MultipolePotential`
+        """
+        if isinstance(density, PotentialBase):
+            potential = density
+            units = potential.units
+            def density(xyz):
+                return potential.density(xyz).decompose(units).value
+
+        elif units is None:
+            raise ValueError("A unit system must be specified if the density "
+                             "is passed in as a function.")
+
+        if mmax is None:
+            mmax = lmax
+
+        r_min, r_max = cls._validate_radii(r_min, r_max, units)
+        r_node = cls._radial_nodes(r_min, r_max, n_r)
+
+        # Radial quadrature: Gauss-Legendre in ln(r) on each interval between
+        # nodes, extended by a factor e^20 inwards and outwards with intervals
+        # of unit width in ln(r)
+        s_node = np.log(r_node)
+        s_edge = np.concatenate((s_node[0] - np.arange(20, 0, -1),
+                                 s_node,
+                                 s_node[len(s_node)-1] + np.arange(1, 21)))
+        ds = np.diff(s_edge)
+        x_gl, w_gl = np.polynomial.legendre.leggauss(_N_GL)
+        s_q = (s_edge[:-1, None] + 0.5 * ds[:, None] * (x_gl[None] + 1)).ravel()
+        r_q = np.exp(s_q)
+        # the extra factor of r is from dr = r ds:
+        w_r = (0.5 * ds[:, None] * w_gl[None]).ravel() * r_q**3
+
+        # Angular quadrature: Gauss-Legendre in cos(theta), uniform in phi.
+        # This uses more nodes than needed to resolve the harmonics so that
+        # flattened density distributions are not too badly aliased.
+        n_ang = max(2*lmax + 2, 32)
+        c_q, w_c = np.polynomial.legendre.leggauss(n_ang)
+        phi_q = 2*np.pi * np.arange(n_ang) / n_ang
+        c_q, phi_q = map(np.ravel, np.meshgrid(c_q, phi_q, indexing='ij'))
+        w_ang = np.repeat(w_c, n_ang) * 2*np.pi / n_ang
+        s_q = np.sqrt(1 - c_q**2)
+        n_hat = np.stack([s_q * np.cos(phi_q), s_q * np.sin(phi_q), c_q])
+        Y, norm = _real_harmonics(lmax, mmax, n_hat)
+
+        # Project the density onto the harmonics at each quadrature radius,
+        # evaluating the density at many radii at once
+        rho_lm = np.zeros((Y.shape[0], len(r_q)))
+        n_batch = max(1, 2**17 // n_hat.shape[1])
+        for i in range(0, len(r_q), n_batch):
+            r = r_q[i:i+n_batch]
+            xyz = (r[None, :, None] * n_hat[:, None]).reshape(3, -1)
+            rho = density(xyz).reshape(len(r), -1)
+            rho_lm[:, i:i+n_batch] = Y @ (w_ang[None] * rho).T
+
+        if not np.all(np.isfinite(rho_lm)):
+            raise ValueError("The density is not finite at all quadrature "
+                             "points.")
+
+        G_ = cls._G(units)
+        Phi_lm = np.zeros((Y.shape[0], len(r_node)))
+        for i, (l, m) in enumerate(_terms(lmax, mmax)):
+            K = _radial_kernel(l, r_q, r_node)
+            Phi_lm[i] = -4*np.pi*G_ / (2*l + 1) * (K @ (w_r * rho_lm[i]))
+
+        return cls._from_node_values(Phi_lm, norm, r_min, r_max, lmax, mmax,
+                                     order, units)
+
+    @classmethod
+    def from_particles(cls, xyz, mass, r_min, r_max, n_r=64, lmax=4,
+                       mmax=None, order=3, units=None):
+        """
+        Compute the multipole expansion of the potential of a set of particles.
+
+        Parameters
+        ----------
+        xyz : array_like, :class:`~astropy.units.Quantity` [length]
+            The Cartesian positions of the particles, with shape ``(3, n)``.
+        mass : array_like, :class:`~astropy.units.Quantity` [mass]
+            The particle masses: either a single value or an array with shape
+            ``(n, )``.
+        r_min : :class:`~astropy.units.Quantity`, numeric [length]
+            The inner radius of the radial grid.
+        r_max : :class:`~astropy.units.Quantity`, numeric [length]
+            The outer radius of the radial grid.
+        n_r : int (optional)
+            The number of radial grid nodes.
+        lmax : int (optional)
+            The maximum spherical harmonic order. Higher orders capture more
+            detail, but are also more affected by particle noise.
+        mmax : int (optional)
+            The maximum azimuthal order. Defaults to ``lmax``.
+        order : int (optional)
+            The order of the B-spline interpolation: 3 (cubic) or 5 (quintic).
+        units : `~gala.units.UnitSystem`
+            The unit system.
+
+        Returns
+        -------
+        pot : :class:`~gala.potential.MultipolePotential`
+        """
+        if units is None:
+            raise ValueError("A unit system must be specified.")
+
+        if mmax is None:
+            mmax = lmax
+
+        if hasattr(xyz, 'unit'):
+            xyz = xyz.decompose(units).value
+        xyz = np.array(xyz, dtype=np.float64)
+        if xyz.ndim != 2 or xyz.shape[0] != 3:
+            raise ValueError("Particle positions must have shape (3, n).")
+
+        if hasattr(mass, 'unit'):
+            mass = mass.decompose(units).value
+        mass = np.broadcast_to(mass, xyz.shape[1:]).astype(np.float64)
+
+        r_min, r_max = cls._validate_radii(r_min, r_max, units)
+        r_node = cls._radial_nodes(r_min, r_max, n_r)
+        r = np.sqrt(np.sum(xyz**2, axis=0))
+
+        terms = _terms(lmax, mmax)
+        Phi_lm = np.zeros((len(terms), len(r_node)))
+        G_ = cls._G(units)
+        chunk = 65536
+        for j in range(0, xyz.shape[1], chunk):
+            Y, norm = _real_harmonics(lmax, mmax, xyz[:, j:j+chunk])
+            mY = Y * mass[j:j+chunk]
+            for l in range(lmax+1):
+                K = _radial_kernel(l, r[j:j+chunk], r_node)
+                ix = [i for i, (ll, _) in enumerate(terms) if ll == l]
+                Phi_lm[ix] += -4*np.pi*G_ / (2*l + 1) * (mY[ix] @ K.T)
+
+        return cls._from_node_values(Phi_lm, norm, r_min, r_max, lmax, mmax,
+                                     order, units)
+
+    @staticmethod
+    def _validate_radii(r_min, r_max, units):
+        if hasattr(r_min, 'unit'):
+            r_min = r_min.decompose(units).value
+        if hasattr(r_max, 'unit'):
+            r_max = r_max.decompose(units).value
+
+        if not 0 < r_min < r_max:
+            raise ValueError("Must have 0 < r_min < r_max.")
+
+        return float(r_min), float(r_max)
+
+    @staticmethod
+    def _G(units):
+        try:
+            return G.decompose(units).value
+        except u.UnitConversionError:
+            return 1.
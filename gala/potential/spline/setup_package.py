@@ -0,0 +1,52 @@
+from distutils.core import Extension
+from collections import defaultdict
+
+
+def get_extensions():
+    import numpy as np
+
+    exts = []
+
+    # malloc
+    mac_incl_path = "/usr/include/malloc"
+
+    cfg = defaultdict(list)
+    cfg['include_dirs'].append(np.get_include())
+    cfg['include_dirs'].append(mac_incl_path)
+    cfg['include_dirs'].append('gala/potential')
+    cfg['include_dirs'].append('gala')
+    cfg['extra_compile_args'].append('--std=gnu99')
+    cfg['sources'].append('gala/potential/spline/interp.pyx')
+    cfg['sources'].append('gala/potential/spline/src/interp.c')
+    cfg['sources'].append('gala/potential/spline/src/bspline.c')
+    exts.append(Extension('gala.potential.spline.interp', **cfg))
+
+    cfg = defaultdict(list)
+    cfg['include_dirs'].append(np.get_include())
+    cfg['include_dirs'].append(mac_incl_path)
+    cfg['include_dirs'].append('gala/potential')
+    cfg['include_dirs'].append('gala')
+    cfg['extra_compile_args'].append('--std=gnu99')
+    cfg['sources'].append('gala/potential/spline/multipole.pyx')
+    cfg['sources'].append('gala/potential/spline/src/multipole.c')
+    cfg['sources'].append('gala/potential/spline/src/bspline.c')
+    exts.append(Extension('gala.potential.spline.multipole', **cfg))
+
+    cfg = defaultdict(list)
+    cfg['include_dirs'].append(np.get_include())
+    cfg['include_dirs'].append(mac_incl_path)
+    cfg['include_dirs'].append('gala/potential')
+    cfg['include_dirs'].append('gala')
+    cfg['extra_compile_args'].append('--std=gnu99')
+    cfg['sources'].append('gala/potential/spline/cylspline.pyx')
+    cfg['sources'].append('gala/potential/spline/src/cylspline.c')
+    cfg['sources'].append('gala/potential/spline/src/bspline.c')
+    exts.append(Extension('gala.potential.spline.cylspline', **cfg))
+
+    return exts
+
+
+def get_package_data():
+
+    return {'gala.potential.spline':
+            ['*.pyx', 'src/*.h', 'src/*.c']}
@@ -0,0 +1,105 @@
+#include "bspline.h"
+
+static void cubic_weights(double f, double *w, double *dw, double *d2w) {
+    // Closed-form version of bspline_weights() for order=3
+    double g = 1 - f;
+    double f2 = f*f;
+
+    w[0] = g*g*g / 6.;
+    w[1] = (3*f2*f - 6*f2 + 4) / 6.;
+    w[2] = (-3*f2*f + 3*f2 + 3*f + 1) / 6.;
+    w[3] = f2*f / 6.;
+
+    dw[0] = -0.5*g*g;
+    dw[1] = 1.5*f2 - 2*f;
+    dw[2] = -1.5*f2 + f + 0.5;
+    dw[3] = 0.5*f2;
+
+    d2w[0] = g;
+    d2w[1] = 3*f - 2;
+    d2w[2] = -3*f + 1;
+    d2w[3] = f;
+}
+
+void bspline_weights(int order, double f, double *w, double *dw, double *d2w) {
+    /*
+        Compute the weights of the order+1 uniform B-spline basis functions that
+        are non-zero at fractional position f (0 <= f < 1) within a grid cell,
+        along with the first and second derivatives of the weights with
+        respect to the (unit-spaced) grid coordinate.
+
+        The basis functions are centered on the grid nodes, so for cell index i
+        the weights correspond to the coefficients with indices
+        i - (order-1)/2 ... i - (order-1)/2 + order.
+
+        This uses the Cox-de Boor recursion for uniform knots:
+            N_d[k] = ((f + d - k) N_{d-1}[k-1] + (k + 1 - f) N_{d-1}[k]) / d
+    */
+    double N[BSPLINE_MAX_ORDER+1][BSPLINE_MAX_ORDER+1];
+    double a, b;
+    int d, k;
+
+    if (order == 3) {
+        cubic_weights(f, w, dw, d2w);
+        return;
+    }
+
+    N[0][0] = 1.;
+    for (d=1; d <= order; d++) {
+        for (k=0; k <= d; k++) {
+            a = (k > 0) ? N[d-1][k-1] : 0.;
+            b = (k < d) ? N[d-1][k] : 0.;
+            N[d][k] = ((f + d - k) * a + (k + 1 - f) * b) / d;
+        }
+    }
+
+    for (k=0; k <= order; k++) {
+        w[k] = N[order][k];
+
+        // first derivative: difference of the order-1 basis functions
+        a = (k > 0) ? N[order-1][k-1] : 0.;
+        b = (k < order) ? N[order-1][k] : 0.;
+        dw[k] = a - b;
+
+        // second derivative: second difference of the order-2 basis functions
+        d2w[k] = 0.;
+        if ((k >= 2) && (k-2 <= order-2))
+            d2w[k] = d2w[k] + N[order-2][k-2];
+        if ((k >= 1) && (k-1 <= order-2))
+            d2w[k] = d2w[k] - 2*N[order-2][k-1];
+        if (k <= order-2)
+            d2w[k] = d2w[k] + N[order-2][k];
+    }
+}
+
+void bspline_weights_d3(int order, double f, double *d3w) {
+    /*
+        Compute the third derivatives of the weights computed by
+        bspline_weights(), i.e. the third difference of the order-3 basis
+        functions. These are piecewise constant for order=3.
+    */
+    double N[BSPLINE_MAX_ORDER+1][BSPLINE_MAX_ORDER+1];
+    double a, b;
+    int d, k;
+
+    N[0][0] = 1.;
+    for (d=1; d <= order-3; d++) {
+        for (k=0; k <= d; k++) {
+            a = (k > 0) ? N[d-1][k-1] : 0.;
+            b = (k < d) ? N[d-1][k] : 0.;
+            N[d][k] = ((f + d - k) * a + (k + 1 - f) * b) / d;
+        }
+    }
+
+    for (k=0; k <= order; k++) {
+        d3w[k] = 0.;
+        if ((k >= 3) && (k-3 <= order-3))
+            d3w[k] = d3w[k] + N[order-3][k-3];
+        if ((k >= 2) && (k-2 <= order-3))
+            d3w[k] = d3w[k] - 3*N[order-3][k-2];
+        if ((k >= 1) && (k-1 <= order-3))
+            d3w[k] = d3w[k] + 3*N[order-3][k-1];
+        if (k <= order-3)
+            d3w[k] = d3w[k] - N[order-3][k];
+    }
+}
@@ -0,0 +1,6 @@
+// Maximum supported order (degree) of the B-spline interpolation
+#define BSPLINE_MAX_ORDER 5
+
+extern void bspline_weights(int order, double f, double *w, double *dw,
+                            double *d2w);
+extern void bspline_weights_d3(int order, double f, double *d3w);
@@ -0,0 +1,413 @@
+#include <math.h>
+#include <stddef.h>
+#include "bspline.h"
+#include "cylspline.h"
+
+/*
+    An azimuthal harmonic expansion of the potential,
+
+        Phi(R, phi, z) = sum_{m=0}^{mmax} [C_m(R, z) cos(m phi) + S_m(R, z) sin(m phi)],
+
+    where the functions C_m and S_m are tabulated on a regular 2D grid in
+    (R, z) and interpolated with uniform B-splines. Like the cylindrical grids
+    of InterpolatedPotential, the grid axes can be stretched with the mapping
+    u = asinh(x / scale). Outside of the grid, the potential is extrapolated as
+    a point mass with mass m_out.
+
+    The coefficient table has 2*mmax+1 2D tables, ordered by
+    m = -mmax ... mmax, where negative m correspond to the sin(|m| phi) terms.
+
+    pars:
+        0 - G (Gravitational constant)
+        1 - mmax
+        2 - order (B-spline order: 3 or 5)
+        3 - symmetric (reflection symmetric about z=0)
+        4 - scale (axis stretching scale, or 0 for a linear grid)
+        5 - m_out (mass used to extrapolate outside of the grid)
+        6 - pad (number of padding nodes on each side of each axis)
+        7 - shape (2 values: the shape of the coefficient table of each term)
+        9 - u_min (2 values: the grid minimum in mapped coordinates)
+        11 - inv_h (2 values: the inverse node spacing in mapped coordinates)
+        13 - R_max
+        14 - z_max
+        15 - coeffs (the B-spline coefficient tables, C-ordered)
+*/
+
+static double cylspline_all(double *pars, double *q, double *grad) {
+    /*
+        Compute the potential and (optionally) add the gradient to the input
+        array. The gradient can be NULL.
+    */
+    double G = pars[0];
+    int mmax = (int)pars[1];
+    int order = (int)pars[2];
+    int symmetric = (int)pars[3];
+    double scale = pars[4];
+    double m_out = pars[5];
+    int pad = (int)pars[6];
+    int shape[2] = {(int)pars[7], (int)pars[8]};
+    double *u_min = &pars[9];
+    double *inv_h = &pars[11];
+    double R_max = pars[13];
+    double z_max = pars[14];
+    double *coeffs = &pars[15];
+
+    double w[2][BSPLINE_MAX_ORDER+1];
+    double dw[2][BSPLINE_MAX_ORDER+1];
+    double d2w[2][BSPLINE_MAX_ORDER+1];
+    double x[2], da_dx[2];
+    int offset[2];
+
+    double R, r2, r, GM, sgn = 1.;
+    double cp, sp, cm, sm, tmp, u, tt, s2, c, s, s_d;
+    double F, F_R, F_z, T, dT;
+    double Phi = 0., Phi_R = 0., Phi_z = 0., Phi_phi = 0., Fs1_R = 0.;
+    int i, j, k0, k1, m, t, n, idx;
+    int n_k = order + 1;
+
+    R = sqrt(q[0]*q[0] + q[1]*q[1]);
+    x[0] = R;
+    x[1] = q[2];
+    if (symmetric && (q[2] < 0)) {
+        x[1] = -q[2];
+        sgn = -1.;
+    }
+
+    if ((R > R_max) || (x[1] > z_max) || (x[1] < (symmetric ? 0. : -z_max))) {
+        // Outside of the grid: extrapolate with a point mass
+        r2 = q[0]*q[0] + q[1]*q[1] + q[2]*q[2];
+        r = sqrt(r2);
+        GM = G * m_out;
+
+        if (grad != NULL) {
+            for (j=0; j < 3; j++)
+                grad[j] = grad[j] + GM * q[j] / (r2*r);
+        }
+
+        return -GM / r;
+    }
+
+    // B-spline weights along each axis
+    for (j=0; j < 2; j++) {
+        if (scale > 0) {
+            u = asinh(x[j] / scale);
+            s2 = x[j]*x[j] + scale*scale;
+            da_dx[j] = inv_h[j] / sqrt(s2);
+        } else {
+            u = x[j];
+            da_dx[j] = inv_h[j];
+        }
+
+        n = shape[j] - 2*pad;
+        tt = (u - u_min[j]) * inv_h[j];
+        i = (int)floor(tt);
+        if (i > n - 2)
+            i = n - 2;
+        if (i < 0)
+            i = 0;
+
+        offset[j] = i + pad - (order - 1) / 2;
+        bspline_weights(order, tt - i, &w[j][0], &dw[j][0], &d2w[j][0]);
+    }
+
+    if (R > 0) {
+        cp = q[0] / R;
+        sp = q[1] / R;
+    } else {
+        cp = 1.;
+        sp = 0.;
+    }
+
+    cm = 1.;
+    sm = 0.;
+    for (m=0; m <= mmax; m++) {
+        if (m > 0) {
+            tmp = cm * cp - sm * sp;
+            sm = sm * cp + cm * sp;
+            cm = tmp;
+        }
+
+        for (j=0; j < ((m > 0) ? 2 : 1); j++) {
+            // j=0: cos(m phi) term, j=1: sin(m phi) term
+            t = (j == 0) ? mmax + m : mmax - m;
+
+            F = 0.;
+            F_R = 0.;
+            F_z = 0.;
+            for (k0=0; k0 < n_k; k0++) {
+                idx = (t*shape[0] + offset[0] + k0)*shape[1] + offset[1];
+                s = 0.;
+                s_d = 0.;
+                for (k1=0; k1 < n_k; k1++) {
+                    c = coeffs[idx + k1];
+                    s = s + c * w[1][k1];
+                    s_d = s_d + c * dw[1][k1];
+                }
+                F = F + w[0][k0] * s;
+                F_R = F_R + dw[0][k0] * s;
+                F_z = F_z + w[0][k0] * s_d;
+            }
+            F_R = F_R * da_dx[0];
+            F_z = F_z * da_dx[1];
+
+            if (j == 0) {
+                T = cm;
+                dT = -m * sm;
+            } else {
+                T = sm;
+                dT = m * cm;
+                if (m == 1)
+                    Fs1_R = F_R;
+            }
+
+            Phi = Phi + F * T;
+            Phi_R = Phi_R + F_R * T;
+            Phi_z = Phi_z + F_z * T;
+            Phi_phi = Phi_phi + F * dT;
+        }
+    }
+
+    if (grad != NULL) {
+        if (R > 0) {
+            grad[0] = grad[0] + cp * Phi_R - sp * Phi_phi / R;
+            grad[1] = grad[1] + sp * Phi_R + cp * Phi_phi / R;
+        } else {
+            // On the axis, only the m=1 terms contribute to the x, y gradient
+            grad[0] = grad[0] + Phi_R;
+            grad[1] = grad[1] + Fs1_R;
+        }
+        grad[2] = grad[2] + sgn * Phi_z;
+    }
+
+    return Phi;
+}
+
+double cylspline_value(double t, double *pars, double *q, int n_dim) {
+    return cylspline_all(pars, q, NULL);
+}
+
+void cylspline_gradient(double t, double *pars, double *q, int n_dim,
+                        double *grad) {
+    cylspline_all(pars, q, grad);
+}
+
+double cylspline_value_and_gradient(double t, double *pars, double *q,
+                                    int n_dim, double *grad) {
+    return cylspline_all(pars, q, grad);
+}
+
+void cylspline_hessian(double t, double *pars, double *q, int n_dim,
+                       double *hess) {
+    /*
+        The Hessian is computed with central finite differences of the
+        (analytic) gradient.
+    */
+    double r = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+    double h = 1e-5 * (r + 1e-3 * pars[13]);
+    double qq[3], grad_p[3], grad_m[3];
+    int j, k;
+
+    for (j=0; j < 3; j++) {
+        for (k=0; k < 3; k++) {
+            qq[k] = q[k];
+            grad_p[k] = 0.;
+            grad_m[k] = 0.;
+        }
+
+        qq[j] = q[j] + h;
+        cylspline_all(pars, &qq[0], &grad_p[0]);
+        qq[j] = q[j] - h;
+        cylspline_all(pars, &qq[0], &grad_m[0]);
+
+        for (k=0; k < 3; k++)
+            hess[3*j + k] = hess[3*j + k] + (grad_p[k] - grad_m[k]) / (2*h);
+    }
+}
+
+double cylspline_density(double t, double *pars, double *q, int n_dim) {
+    // From Poisson's equation: the trace of the Hessian
+    double hess[9] = {0.};
+    cylspline_hessian(t, pars, q, n_dim, &hess[0]);
+    return (hess[0] + hess[4] + hess[8]) / (4*M_PI*pars[0]);
+}
+
+/*
+    Green's function of the Poisson equation for azimuthal harmonics.
+
+    The inverse distance between two points can be expanded as
+
+        1/|x - x'| = 1/(pi sqrt(R R')) sum_m eps_m Q_{m-1/2}(chi) cos(m (phi - phi'))
+
+    with chi = (R^2 + R'^2 + (z - z')^2) / (2 R R'), eps_0 = 1, eps_m = 2, and
+    Q_{m-1/2} the Legendre functions of the second kind of half-integer degree
+    (toroidal functions). Q_{-1/2} and Q_{1/2} are computed from the complete
+    elliptic integrals, and higher orders with the (upward) recurrence
+    relation. This recurrence is unstable far from the source, where we instead
+    use the hypergeometric series for Q_{m-1/2}.
+*/
+
+static void ellip_KE(double k_prime, double *K, double *E) {
+    // Complete elliptic integrals K(k) and E(k) with the arithmetic-geometric
+    // mean, as a function of the complementary modulus k' = sqrt(1 - k^2)
+    double a = 1., b = k_prime, c, an;
+    double pow2 = 0.5, sum = 0.5 * (1 - k_prime*k_prime);
+    int i;
+
+    for (i=0; i < 64; i++) {
+        c = 0.5 * (a - b);
+        an = 0.5 * (a + b);
+        b = sqrt(a * b);
+        a = an;
+        pow2 = 2 * pow2;
+        sum = sum + pow2 * c*c;
+        if (fabs(c) < 1e-16 * a)
+            break;
+    }
+
+    *K = M_PI / (2*a);
+    *E = *K * (1 - sum);
+}
+
+void legendre_q_half(int mmax, double chi, double chi_m1, double *Q) {
+    /*
+        Compute Q[m] = Q_{m-1/2}(chi) for m = 0 ... mmax. The argument chi - 1 is
+        passed in separately to avoid round-off error close to the source.
+    */
+    double K, E, k, pref, x, a, b, c, term, sum;
+    int m, n;
+
+    if (chi < 1.5) {
+        k = sqrt(2 / (chi + 1));
+        ellip_KE(sqrt(chi_m1 / (chi + 1)), &K, &E);
+        Q[0] = k * K;
+        if (mmax > 0)
+            Q[1] = chi * k * K - sqrt(2 * (chi + 1)) * E;
+        for (m=1; m < mmax; m++)
+            Q[m+1] = (4*m * chi * Q[m] - (2*m - 1) * Q[m-1]) / (2*m + 1);
+
+    } else {
+        // Q_{m-1/2}(chi) = sqrt(pi) Gamma(m+1/2) / Gamma(m+1) / (2 chi)^(m+1/2)
+        //                  * 2F1((2m+3)/4, (2m+1)/4; m+1; 1/chi^2)
+        x = 1 / (chi*chi);
+        pref = M_PI / sqrt(2*chi);
+        for (m=0; m <= mmax; m++) {
+            if (m > 0)
+                pref = pref * (m - 0.5) / m / (2*chi);
+
+            a = (2*m + 3) / 4.;
+            b = (2*m + 1) / 4.;
+            c = m + 1;
+            term = 1.;
+            sum = 1.;
+            for (n=0; n < 256; n++) {
+                term = term * (a + n) * (b + n) / ((c + n) * (n + 1)) * x;
+                sum = sum + term;
+                if (term < 1e-16 * sum)
+                    break;
+            }
+            Q[m] = pref * sum;
+        }
+    }
+}
+
+static void ring_kernel(int mmax, double R, double z, double Rs, double zs,
+                        double eps2, double *Q, double *K) {
+    /*
+        The functions K_m = Q_{m-1/2}(chi) / (pi sqrt(R R')), such that
+        1/|x - x'| = sum_m eps_m K_m cos(m (phi - phi')).
+    */
+    double dz2 = (z - zs) * (z - zs) + eps2;
+    double RR, chi_m1;
+    int m;
+
+    if ((R == 0) || (Rs == 0)) {
+        K[0] = 1 / sqrt(R*R + Rs*Rs + dz2);
+        for (m=1; m <= mmax; m++)
+            K[m] = 0.;
+        return;
+    }
+
+    RR = 2 * R * Rs;
+    chi_m1 = ((R - Rs) * (R - Rs) + dz2) / RR;
+    legendre_q_half(mmax, 1 + chi_m1, chi_m1, Q);
+    for (m=0; m <= mmax; m++)
+        K[m] = Q[m] / (M_PI * sqrt(R * Rs));
+}
+
+static void add_sources(int mmax, int symmetric, double R, double z,
+                        int n_src, double *pts, double *w, double eps2,
+                        double *Q, double *K, double *out) {
+    // Add the potential of a set of weighted sources to the output array
+    int n_terms = 2*mmax + 1;
+    int i, j, m;
+
+    for (i=0; i < n_src; i++) {
+        ring_kernel(mmax, R, z, pts[2*i], pts[2*i+1], eps2, Q, K);
+        if (symmetric) {
+            // add the mirror image of the source, so the output is symmetric
+            ring_kernel(mmax, R, z, pts[2*i], -pts[2*i+1], eps2, Q, &K[mmax+1]);
+            for (m=0; m <= mmax; m++)
+                K[m] = K[m] + K[mmax + 1 + m];
+        }
+
+        for (j=0; j < n_terms; j++) {
+            m = (j < mmax) ? mmax - j : j - mmax;
+            out[j] = out[j] + w[i*n_terms + j] * K[m];
+        }
+    }
+}
+
+void cylspline_green_cells(int mmax, int symmetric, double R, double z,
+                           int n_cell, double *cells,
+                           int n_far, double *far_pts, double *far_w,
+                           int n_near, double *near_pts, double *near_w,
+                           double *out) {
+    /*
+        Compute the harmonic terms of the potential at (R, z) from a density
+        discretized on a set of quadrature cells. Each cell (with bounds
+        R0, R1, z0, z1) has a coarse set of n_far quadrature points, which are
+        used for cells far from (R, z), and a fine set of n_near quadrature
+        points, used for the cells that are close to (R, z) where the Green's
+        function has a (logarithmic) singularity. The weights must include the
+        quadrature weights, the density, and all constant factors.
+    */
+    int n_terms = 2*mmax + 1;
+    double Q[mmax+1], K[2*mmax+2];
+    double dR, dz;
+    int c, j, near;
+
+    for (j=0; j < n_terms; j++)
+        out[j] = 0.;
+
+    for (c=0; c < n_cell; c++) {
+        dR = cells[4*c+1] - cells[4*c];
+        dz = cells[4*c+3] - cells[4*c+2];
+        near = ((R > cells[4*c] - dR) && (R < cells[4*c+1] + dR)) &&
+               (((z > cells[4*c+2] - dz) && (z < cells[4*c+3] + dz)) ||
+                (symmetric && (-z > cells[4*c+2] - dz) && (-z < cells[4*c+3] + dz)));
+
+        if (near)
+            add_sources(mmax, symmetric, R, z, n_near, &near_pts[2*c*n_near],
+                        &near_w[c*n_near*n_terms], 0., Q, K, out);
+        else
+            add_sources(mmax, symmetric, R, z, n_far, &far_pts[2*c*n_far],
+                        &far_w[c*n_far*n_terms], 0., Q, K, out);
+    }
+}
+
+void cylspline_green_points(int mmax, int symmetric, double R, double z,
+                            int n_src, double *pts, double *w, double eps2,
+                            double *out) {
+    /*
+        Compute the harmonic terms of the potential at (R, z) from a set of
+        weighted point sources, with a Plummer softening length sqrt(eps2).
+    */
+    int n_terms = 2*mmax + 1;
+    double Q[mmax+1], K[2*mmax+2];
+    int j;
+
+    for (j=0; j < n_terms; j++)
+        out[j] = 0.;
+
+    add_sources(mmax, symmetric, R, z, n_src, pts, w, eps2, Q, K, out);
+}
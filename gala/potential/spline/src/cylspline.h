@@ -0,0 +1,15 @@
+extern double cylspline_value(double t, double *pars, double *q, int n_dim);
+extern void cylspline_gradient(double t, double *pars, double *q, int n_dim, double *grad);
+extern double cylspline_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad);
+extern void cylspline_hessian(double t, double *pars, double *q, int n_dim, double *hess);
+extern double cylspline_density(double t, double *pars, double *q, int n_dim);
+
+extern void legendre_q_half(int mmax, double chi, double chi_m1, double *Q);
+extern void cylspline_green_cells(int mmax, int symmetric, double R, double z,
+                                  int n_cell, double *cells,
+                                  int n_far, double *far_pts, double *far_w,
+                                  int n_near, double *near_pts, double *near_w,
+                                  double *out);
+extern void cylspline_green_points(int mmax, int symmetric, double R, double z,
+                                   int n_src, double *pts, double *w,
+                                   double eps2, double *out);
@@ -0,0 +1,632 @@
+#include <math.h>
+#include <stddef.h>
+#include "bspline.h"
+#include "interp.h"
+
+/*
+    A potential tabulated on a regular grid and evaluated with uniform
+    B-spline interpolation. The grid is either Cartesian (x, y, z) or
+    cylindrical (R, z). Each grid axis can optionally be stretched with the
+    mapping u = asinh(x / scale), so that the nodes are uniformly spaced in u.
+
+    Outside of the grid, the potential is extrapolated along each ray from the
+    origin as a/r + b/r^2, matching the value and the radial derivative of the
+    interpolated potential where the ray leaves the grid. This is a point mass
+    with an effective mass that depends on the direction, and the potential and
+    its gradient are continuous at the boundary of the grid. If the grid does
+    not contain the origin, the potential is extrapolated as a point mass with
+    mass m_out.
+
+    A spline cannot follow the gradient of a central cusp, which is
+    discontinuous at the origin. If cusp_radius > 0, the potential within
+    this radius of the origin is instead extrapolated inwards along each ray
+    as Phi_0 + A r^alpha + B r^(alpha + 1), where Phi_0 is the interpolated
+    potential at the origin and alpha is cusp_slope, matching the value and
+    the radial derivative of the interpolated potential at r = cusp_radius.
+
+    pars:
+        0 - G (Gravitational constant)
+        1 - m_out (mass used to extrapolate outside of a grid that does not
+                   contain the origin)
+        2 - order (B-spline order: 3 or 5)
+        3 - symmetric (reflection symmetric about the coordinate planes)
+        4 - scale (axis stretching scale, or 0 for a linear grid)
+        5 - cusp_radius (radius of the central cusp region, or 0)
+        6 - cusp_slope (power-law slope of the central cusp)
+        7 - n_axes (2 for a cylindrical grid, 3 for a Cartesian grid)
+        8 - pad (number of padding nodes on each side of each axis)
+        9 - shape (n_axes values: the shape of the coefficient table)
+        ... - u_min (n_axes values: the grid minimum in mapped coordinates)
+        ... - inv_h (n_axes values: the inverse node spacing in mapped coords.)
+        ... - grid_min (n_axes values)
+        ... - grid_max (n_axes values)
+        ... - coeffs (the B-spline coefficient table, C-ordered)
+*/
+
+static int interp_eval(double *pars, double *x, double *F, double *F_x,
+                       double *F_xx, double *F_xxx) {
+    /*
+        Evaluate the interpolated function and its first and (optionally)
+        second and third derivatives with respect to the grid axis coordinates
+        x. The third derivatives can only be computed along with the second
+        derivatives. Returns 0 if the position is outside of the grid.
+    */
+    int order = (int)pars[2];
+    double scale = pars[4];
+    int n_axes = (int)pars[7];
+    int pad = (int)pars[8];
+    double *shape = &pars[9];
+    double *u_min = &pars[9 + n_axes];
+    double *inv_h = &pars[9 + 2*n_axes];
+    double *grid_min = &pars[9 + 3*n_axes];
+    double *grid_max = &pars[9 + 4*n_axes];
+    double *coeffs = &pars[9 + 5*n_axes];
+
+    double w[3][BSPLINE_MAX_ORDER+1];
+    double dw[3][BSPLINE_MAX_ORDER+1];
+    double d2w[3][BSPLINE_MAX_ORDER+1];
+    double d3w[3][BSPLINE_MAX_ORDER+1];
+    double *wm[3][4];
+    double da_dx[3], d2a_dx2[3], d3a_dx3[3];
+    double F_a[3], F_ab[9], F_abc[4][4];
+    int n_k[3], offset[3], stride[3], m[3];
+
+    double u, tt, f, s2, c, s, s_d, s_dd, s_ddd, S[4];
+    int i, j, l, k0, k1, k2, m0, m1, n, idx;
+
+    // Compute the B-spline weights along each axis
+    for (j=0; j < 3; j++) {
+        if (j >= n_axes) {
+            // dummy axis, so that 2D and 3D grids share the code below
+            n_k[j] = 1;
+            offset[j] = 0;
+            w[j][0] = 1.;
+            dw[j][0] = 0.;
+            d2w[j][0] = 0.;
+            d3w[j][0] = 0.;
+            continue;
+        }
+
+        if ((x[j] < grid_min[j]) || (x[j] > grid_max[j]))
+            return 0;
+
+        if (scale > 0) {
+            u = asinh(x[j] / scale);
+            s2 = x[j]*x[j] + scale*scale;
+            da_dx[j] = inv_h[j] / sqrt(s2);
+            d2a_dx2[j] = -inv_h[j] * x[j] / (s2 * sqrt(s2));
+            d3a_dx3[j] = inv_h[j] * (2*x[j]*x[j] - scale*scale) /
+                (s2 * s2 * sqrt(s2));
+        } else {
+            u = x[j];
+            da_dx[j] = inv_h[j];
+            d2a_dx2[j] = 0.;
+            d3a_dx3[j] = 0.;
+        }
+
+        n = (int)shape[j] - 2*pad;
+        tt = (u - u_min[j]) * inv_h[j];
+        i = (int)floor(tt);
+        if (i > n - 2)
+            i = n - 2;
+        if (i < 0)
+            i = 0;
+        f = tt - i;
+
+        n_k[j] = order + 1;
+        offset[j] = i + pad - (order - 1) / 2;
+        bspline_weights(order, f, &w[j][0], &dw[j][0], &d2w[j][0]);
+        if (F_xxx != NULL)
+            bspline_weights_d3(order, f, &d3w[j][0]);
+    }
+
+    for (j=0; j < 3; j++) {
+        wm[j][0] = &w[j][0];
+        wm[j][1] = &dw[j][0];
+        wm[j][2] = &d2w[j][0];
+        wm[j][3] = &d3w[j][0];
+    }
+
+    stride[2] = 1;
+    stride[1] = (n_axes > 2) ? (int)shape[2] : 1;
+    stride[0] = stride[1] * (int)shape[1];
+
+    // Sum over the tensor-product basis functions. The innermost sums over
+    // the last axis are accumulated first.
+    *F = 0.;
+    for (j=0; j < 3; j++)
+        F_a[j] = 0.;
+    for (j=0; j < 9; j++)
+        F_ab[j] = 0.;
+    for (m0=0; m0 < 4; m0++) {
+        for (m1=0; m1 < 4; m1++)
+            F_abc[m0][m1] = 0.;
+    }
+
+    for (k0=0; k0 < n_k[0]; k0++) {
+        for (k1=0; k1 < n_k[1]; k1++) {
+            idx = (offset[0] + k0)*stride[0] + (offset[1] + k1)*stride[1] + offset[2];
+
+            s = 0.;
+            s_d = 0.;
+            s_dd = 0.;
+            s_ddd = 0.;
+            for (k2=0; k2 < n_k[2]; k2++) {
+                c = coeffs[idx + k2];
+                s = s + c * w[2][k2];
+                s_d = s_d + c * dw[2][k2];
+                s_dd = s_dd + c * d2w[2][k2];
+                if (F_xxx != NULL)
+                    s_ddd = s_ddd + c * d3w[2][k2];
+            }
+
+            *F = *F + w[0][k0] * w[1][k1] * s;
+            F_a[0] = F_a[0] + dw[0][k0] * w[1][k1] * s;
+            F_a[1] = F_a[1] + w[0][k0] * dw[1][k1] * s;
+            F_a[2] = F_a[2] + w[0][k0] * w[1][k1] * s_d;
+
+            if (F_xx != NULL) {
+                F_ab[0] = F_ab[0] + d2w[0][k0] * w[1][k1] * s;
+                F_ab[1] = F_ab[1] + dw[0][k0] * dw[1][k1] * s;
+                F_ab[2] = F_ab[2] + dw[0][k0] * w[1][k1] * s_d;
+                F_ab[4] = F_ab[4] + w[0][k0] * d2w[1][k1] * s;
+                F_ab[5] = F_ab[5] + w[0][k0] * dw[1][k1] * s_d;
+                F_ab[8] = F_ab[8] + w[0][k0] * w[1][k1] * s_dd;
+            }
+
+            if (F_xxx != NULL) {
+                // F_abc[m0][m1]: m0, m1 and 3-m0-m1 derivatives along the
+                // three axes
+                S[0] = s;
+                S[1] = s_d;
+                S[2] = s_dd;
+                S[3] = s_ddd;
+                for (m0=0; m0 < 4; m0++) {
+                    for (m1=0; m1 < 4-m0; m1++)
+                        F_abc[m0][m1] = F_abc[m0][m1] + wm[0][m0][k0] *
+                            wm[1][m1][k1] * S[3-m0-m1];
+                }
+            }
+        }
+    }
+
+    // Convert derivatives with respect to the table coordinates to derivatives
+    // with respect to the grid axis coordinates
+    for (j=0; j < n_axes; j++)
+        F_x[j] = F_a[j] * da_dx[j];
+
+    if (F_xx != NULL) {
+        F_ab[3] = F_ab[1];
+        F_ab[6] = F_ab[2];
+        F_ab[7] = F_ab[5];
+        for (j=0; j < n_axes; j++) {
+            for (i=0; i < n_axes; i++) {
+                F_xx[j*n_axes + i] = F_ab[3*j + i] * da_dx[j] * da_dx[i];
+            }
+            F_xx[j*n_axes + j] = F_xx[j*n_axes + j] + F_a[j] * d2a_dx2[j];
+        }
+    }
+
+    if (F_xxx != NULL) {
+        // F_xxx[(j*n_axes + i)*n_axes + l] = d^3F / dx_j dx_i dx_l. The axis
+        // mapping is separable, so only the diagonal terms pick up the
+        // derivatives of the mapping.
+        for (j=0; j < n_axes; j++) {
+            for (i=0; i < n_axes; i++) {
+                for (l=0; l < n_axes; l++) {
+                    m[0] = (j == 0) + (i == 0) + (l == 0);
+                    m[1] = (j == 1) + (i == 1) + (l == 1);
+                    f = F_abc[m[0]][m[1]] * da_dx[j] * da_dx[i] * da_dx[l];
+                    if (j == i)
+                        f = f + F_ab[3*j + l] * d2a_dx2[j] * da_dx[l];
+                    if (j == l)
+                        f = f + F_ab[3*j + i] * d2a_dx2[j] * da_dx[i];
+                    if (i == l)
+                        f = f + F_ab[3*j + i] * da_dx[j] * d2a_dx2[i];
+                    if ((j == i) && (i == l))
+                        f = f + F_a[j] * d3a_dx3[j];
+                    F_xxx[(j*n_axes + i)*n_axes + l] = f;
+                }
+            }
+        }
+    }
+
+    return 1;
+}
+
+static int interp_exterior(double *pars, double *x, double *F, double *F_x,
+                           double *F_xx) {
+    /*
+        Evaluate the extrapolated function outside of the grid, and its first
+        and (optionally) second derivatives with respect to the grid axis
+        coordinates x. Returns 0 if the grid does not contain the origin.
+
+        Along the ray from the origin through x, the function is extrapolated
+        as a/r + b/r^2, with a and b chosen to match the value and the radial
+        derivative of the interpolated function at the point y = s x where the
+        ray leaves the grid. With Q = Phi + y . grad Phi (both at y), this is
+
+            E(x) = G(s, y) = s Phi(y) + s (1 - s) Q(y),
+
+        where s = c / x_j for the face x_j = c of the grid that the ray
+        crosses.
+    */
+    int n_axes = (int)pars[7];
+    double *grid_min = &pars[9 + 3*n_axes];
+    double *grid_max = &pars[9 + 4*n_axes];
+
+    double y[3], Phi, Phi_y[3], Phi_yy[9], Phi_yyy[27];
+    double Q, Q_y[3], Q_yy[9];
+    double G_s, G_ss, G_sy[3], G_y[3], G_yy[9];
+    double s_x[3], s_xx, Y[9], YG, f;
+    double s = 1., s_j, x_j;
+    int i, j, k, l, n, face = -1;
+
+    for (j=0; j < n_axes; j++) {
+        if ((grid_min[j] > 0) || (grid_max[j] < 0))
+            return 0;
+
+        if (x[j] > grid_max[j])
+            s_j = grid_max[j] / x[j];
+        else if (x[j] < grid_min[j])
+            s_j = grid_min[j] / x[j];
+        else
+            continue;
+
+        // the ray from the origin leaves the grid at the origin
+        if (!(s_j > 0))
+            return 0;
+
+        if (s_j < s) {
+            s = s_j;
+            face = j;
+        }
+    }
+
+    if (face < 0)
+        return 0;
+
+    // The point at which the ray leaves the grid, on the face exactly
+    for (j=0; j < n_axes; j++)
+        y[j] = fmin(fmax(s * x[j], grid_min[j]), grid_max[j]);
+    y[face] = (x[face] > 0) ? grid_max[face] : grid_min[face];
+
+    if (interp_eval(pars, &y[0], &Phi, &Phi_y[0], &Phi_yy[0],
+                    (F_xx != NULL) ? &Phi_yyy[0] : NULL) == 0)
+        return 0;
+
+    // Q and its derivatives with respect to y
+    Q = Phi;
+    for (n=0; n < n_axes; n++)
+        Q = Q + y[n] * Phi_y[n];
+
+    for (i=0; i < n_axes; i++) {
+        Q_y[i] = 2*Phi_y[i];
+        for (n=0; n < n_axes; n++)
+            Q_y[i] = Q_y[i] + y[n] * Phi_yy[n*n_axes + i];
+    }
+
+    // Derivatives of G(s, y)
+    G_s = Phi + (1 - 2*s) * Q;
+    G_ss = -2 * Q;
+    for (i=0; i < n_axes; i++) {
+        G_sy[i] = Phi_y[i] + (1 - 2*s) * Q_y[i];
+        G_y[i] = s * Phi_y[i] + s * (1 - s) * Q_y[i];
+    }
+
+    // Derivatives of s(x) and y(x) = s(x) x:
+    //   ds/dx_k = -delta_jk s / x_j,  d^2s/dx_j^2 = 2 s / x_j^2
+    //   Y_ik = dy_i/dx_k = ds/dx_k x_i + s delta_ik
+    x_j = x[face];
+    for (k=0; k < n_axes; k++)
+        s_x[k] = (k == face) ? -s / x_j : 0.;
+    s_xx = 2 * s / (x_j*x_j);
+
+    for (i=0; i < n_axes; i++) {
+        for (k=0; k < n_axes; k++)
+            Y[i*n_axes + k] = s_x[k] * x[i] + ((i == k) ? s : 0.);
+    }
+
+    *F = s * Phi + s * (1 - s) * Q;
+    for (k=0; k < n_axes; k++) {
+        F_x[k] = G_s * s_x[k];
+        for (i=0; i < n_axes; i++)
+            F_x[k] = F_x[k] + G_y[i] * Y[i*n_axes + k];
+    }
+
+    if (F_xx != NULL) {
+        for (i=0; i < n_axes; i++) {
+            for (l=0; l < n_axes; l++) {
+                Q_yy[i*n_axes + l] = 3*Phi_yy[i*n_axes + l];
+                for (n=0; n < n_axes; n++)
+                    Q_yy[i*n_axes + l] = Q_yy[i*n_axes + l] +
+                        y[n] * Phi_yyy[(n*n_axes + i)*n_axes + l];
+                G_yy[i*n_axes + l] = s * Phi_yy[i*n_axes + l] +
+                    s * (1 - s) * Q_yy[i*n_axes + l];
+            }
+        }
+
+        // Only d^2s/dx_j^2 is non-zero, so the second derivatives of y are
+        //   d^2y_i/dx_k dx_l = d^2s/dx_k dx_l x_i + ds/dx_k delta_il
+        //                      + ds/dx_l delta_ik
+        for (k=0; k < n_axes; k++) {
+            for (l=0; l < n_axes; l++) {
+                f = G_ss * s_x[k] * s_x[l];
+                for (i=0; i < n_axes; i++) {
+                    f = f + G_sy[i] * (s_x[k] * Y[i*n_axes + l] +
+                                       s_x[l] * Y[i*n_axes + k]);
+                    for (n=0; n < n_axes; n++)
+                        f = f + G_yy[i*n_axes + n] * Y[i*n_axes + k] *
+                            Y[n*n_axes + l];
+                }
+
+                YG = s_x[k] * G_y[l] + s_x[l] * G_y[k];
+                if ((k == face) && (l == face)) {
+                    f = f + G_s * s_xx;
+                    for (i=0; i < n_axes; i++)
+                        YG = YG + s_xx * x[i] * G_y[i];
+                }
+                F_xx[k*n_axes + l] = f + YG;
+            }
+        }
+    }
+
+    return 1;
+}
+
+static int interp_interior(double *pars, double *x, double *F, double *F_x,
+                           double *F_xx) {
+    /*
+        Evaluate the extrapolated function within the central cusp region, and
+        its first and (optionally) second derivatives with respect to the grid
+        axis coordinates x. Returns 0 if x is not in the cusp region.
+
+        Along the ray from the origin through x, the function is extrapolated
+        from the point y = x / t on the sphere r = r_c, with t = r / r_c. With
+        P = Phi(y) - Phi_0 and D = y . grad Phi (both at y), this is
+
+            E(x) = G(t, y) = Phi_0 + a(y) t^alpha + b(y) t^(alpha + 1),
+
+        where a = (alpha + 1) P - D and b = D - alpha P.
+    */
+    double r_c = pars[5];
+    double alpha = pars[6];
+    int n_axes = (int)pars[7];
+    double *grid_min = &pars[9 + 3*n_axes];
+    double *grid_max = &pars[9 + 4*n_axes];
+
+    double y[3], zero[3] = {0., 0., 0.}, Phi0, Phi0_x[3];
+    double Phi, Phi_y[3], Phi_yy[9], Phi_yyy[27];
+    double D_y[3], D_yy, a, b, a_y[3], b_y[3], a_yy, b_yy;
+    double G_r, G_rr, G_y[3], G_ry[3], G_yy[9];
+    double r_x[3], r_xx, Y[9], Y_kl, P, D, f;
+    double r, r2 = 0., t, ta;
+    int i, j, k, l, n;
+
+    if (!(r_c > 0))
+        return 0;
+
+    for (j=0; j < n_axes; j++)
+        r2 = r2 + x[j]*x[j];
+
+    // at the origin itself, the interpolated value is exact
+    if ((r2 >= r_c*r_c) || (r2 == 0))
+        return 0;
+
+    r = sqrt(r2);
+    t = r / r_c;
+    for (j=0; j < n_axes; j++)
+        y[j] = fmin(fmax(x[j] / t, grid_min[j]), grid_max[j]);
+
+    if ((interp_eval(pars, &zero[0], &Phi0, &Phi0_x[0], NULL, NULL) == 0) ||
+        (interp_eval(pars, &y[0], &Phi, &Phi_y[0], &Phi_yy[0],
+                     (F_xx != NULL) ? &Phi_yyy[0] : NULL) == 0))
+        return 0;
+
+    P = Phi - Phi0;
+    D = 0.;
+    for (n=0; n < n_axes; n++)
+        D = D + y[n] * Phi_y[n];
+
+    for (i=0; i < n_axes; i++) {
+        D_y[i] = Phi_y[i];
+        for (n=0; n < n_axes; n++)
+            D_y[i] = D_y[i] + y[n] * Phi_yy[n*n_axes + i];
+    }
+
+    a = (alpha + 1) * P - D;
+    b = D - alpha * P;
+    ta = pow(t, alpha);
+
+    G_r = (alpha * a * ta / t + (alpha + 1) * b * ta) / r_c;
+    for (i=0; i < n_axes; i++) {
+        a_y[i] = (alpha + 1) * Phi_y[i] - D_y[i];
+        b_y[i] = D_y[i] - alpha * Phi_y[i];
+        G_y[i] = a_y[i] * ta + b_y[i] * ta * t;
+    }
+
+    // Derivatives of r(x) and y(x) = r_c x / r (G_r is dG/dr):
+    //   dr/dx_k = x_k / r,  d^2r/dx_k dx_l = (delta_kl - x_k x_l / r^2) / r
+    //   Y_ik = dy_i/dx_k = r_c (delta_ik - x_i x_k / r^2) / r
+    for (k=0; k < n_axes; k++)
+        r_x[k] = x[k] / r;
+
+    for (i=0; i < n_axes; i++) {
+        for (k=0; k < n_axes; k++)
+            Y[i*n_axes + k] = r_c * (((i == k) ? 1. : 0.) - r_x[i] * r_x[k]) / r;
+    }
+
+    *F = Phi0 + a * ta + b * ta * t;
+    for (k=0; k < n_axes; k++) {
+        F_x[k] = G_r * r_x[k];
+        for (i=0; i < n_axes; i++)
+            F_x[k] = F_x[k] + G_y[i] * Y[i*n_axes + k];
+    }
+
+    if (F_xx != NULL) {
+        G_rr = (alpha * (alpha - 1) * a * ta / (t*t) +
+                (alpha + 1) * alpha * b * ta / t) / (r_c*r_c);
+        for (i=0; i < n_axes; i++) {
+            G_ry[i] = (alpha * a_y[i] * ta / t +
+                       (alpha + 1) * b_y[i] * ta) / r_c;
+            for (l=0; l < n_axes; l++) {
+                D_yy = 2*Phi_yy[i*n_axes + l];
+                for (n=0; n < n_axes; n++)
+                    D_yy = D_yy + y[n] * Phi_yyy[(n*n_axes + i)*n_axes + l];
+                a_yy = (alpha + 1) * Phi_yy[i*n_axes + l] - D_yy;
+                b_yy = D_yy - alpha * Phi_yy[i*n_axes + l];
+                G_yy[i*n_axes + l] = a_yy * ta + b_yy * ta * t;
+            }
+        }
+
+        //   d^2y_i/dx_k dx_l = -(x_l Y_ik + x_k Y_il + x_i Y_kl) / r^2
+        for (k=0; k < n_axes; k++) {
+            for (l=0; l < n_axes; l++) {
+                r_xx = (((k == l) ? 1. : 0.) - r_x[k] * r_x[l]) / r;
+                f = G_rr * r_x[k] * r_x[l] + G_r * r_xx;
+                for (i=0; i < n_axes; i++) {
+                    f = f + G_ry[i] * (r_x[k] * Y[i*n_axes + l] +
+                                       r_x[l] * Y[i*n_axes + k]);
+                    for (n=0; n < n_axes; n++)
+                        f = f + G_yy[i*n_axes + n] * Y[i*n_axes + k] *
+                            Y[n*n_axes + l];
+                    Y_kl = -(x[l] * Y[i*n_axes + k] + x[k] * Y[i*n_axes + l] +
+                             x[i] * Y[k*n_axes + l]) / r2;
+                    f = f + G_y[i] * Y_kl;
+                }
+                F_xx[k*n_axes + l] = f;
+            }
+        }
+    }
+
+    return 1;
+}
+
+static double interp_all(double *pars, double *q, double *grad, double *hess) {
+    /*
+        Compute the potential and (optionally) add the gradient and Hessian to
+        the input arrays. The gradient and Hessian can be NULL.
+    */
+    double G = pars[0];
+    double m_out = pars[1];
+    int symmetric = (int)pars[3];
+    int n_axes = (int)pars[7];
+
+    double x[3], sgn[3] = {1., 1., 1.};
+    double F, F_x[3], F_xx[9];
+    double R, r, r2, GM;
+    int j, k;
+
+    if (n_axes == 3) {
+        for (j=0; j < 3; j++) {
+            x[j] = q[j];
+            if (symmetric && (q[j] < 0)) {
+                x[j] = -q[j];
+                sgn[j] = -1.;
+            }
+        }
+    } else {
+        R = sqrt(q[0]*q[0] + q[1]*q[1]);
+        x[0] = R;
+        x[1] = q[2];
+        if (symmetric && (q[2] < 0)) {
+            x[1] = -q[2];
+            sgn[2] = -1.;
+        }
+    }
+
+    if ((interp_interior(pars, &x[0], &F, &F_x[0],
+                         (hess != NULL) ? &F_xx[0] : NULL) == 0) &&
+        (interp_eval(pars, &x[0], &F, &F_x[0],
+                     (hess != NULL) ? &F_xx[0] : NULL, NULL) == 0) &&
+        (interp_exterior(pars, &x[0], &F, &F_x[0],
+                         (hess != NULL) ? &F_xx[0] : NULL) == 0)) {
+        // Outside of a grid that does not contain the origin: extrapolate
+        // with a point mass
+        r2 = q[0]*q[0] + q[1]*q[1] + q[2]*q[2];
+        r = sqrt(r2);
+        GM = G * m_out;
+
+        if (grad != NULL) {
+            for (j=0; j < 3; j++)
+                grad[j] = grad[j] + GM * q[j] / (r2*r);
+        }
+
+        if (hess != NULL) {
+            for (j=0; j < 3; j++) {
+                for (k=0; k < 3; k++)
+                    hess[3*j + k] = hess[3*j + k] - 3*GM * q[j]*q[k] / (r2*r2*r);
+                hess[3*j + j] = hess[3*j + j] + GM / (r2*r);
+            }
+        }
+
+        return -GM / r;
+    }
+
+    if (n_axes == 3) {
+        if (grad != NULL) {
+            for (j=0; j < 3; j++)
+                grad[j] = grad[j] + sgn[j] * F_x[j];
+        }
+
+        if (hess != NULL) {
+            for (j=0; j < 3; j++) {
+                for (k=0; k < 3; k++)
+                    hess[3*j + k] = hess[3*j + k] + sgn[j] * sgn[k] * F_xx[3*j + k];
+            }
+        }
+
+    } else {
+        // Cylindrical grid: F_x = (dPhi/dR, dPhi/dz)
+        if (grad != NULL) {
+            if (R > 0) {
+                grad[0] = grad[0] + F_x[0] * q[0] / R;
+                grad[1] = grad[1] + F_x[0] * q[1] / R;
+            }
+            grad[2] = grad[2] + sgn[2] * F_x[1];
+        }
+
+        if (hess != NULL) {
+            if (R > 0) {
+                for (j=0; j < 2; j++) {
+                    for (k=0; k < 2; k++) {
+                        hess[3*j + k] = hess[3*j + k] + q[j]*q[k] / (R*R) * (F_xx[0] - F_x[0] / R);
+                    }
+                    hess[3*j + j] = hess[3*j + j] + F_x[0] / R;
+                    hess[3*j + 2] = hess[3*j + 2] + sgn[2] * F_xx[1] * q[j] / R;
+                    hess[6 + j] = hess[6 + j] + sgn[2] * F_xx[1] * q[j] / R;
+                }
+            } else {
+                hess[0] = hess[0] + F_xx[0];
+                hess[4] = hess[4] + F_xx[0];
+            }
+            hess[8] = hess[8] + F_xx[3];
+        }
+    }
+
+    return F;
+}
+
+double interp_value(double t, double *pars, double *q, int n_dim) {
+    return interp_all(pars, q, NULL, NULL);
+}
+
+void interp_gradient(double t, double *pars, double *q, int n_dim, double *grad) {
+    interp_all(pars, q, grad, NULL);
+}
+
+double interp_value_and_gradient(double t, double *pars, double *q, int n_dim,
+                                 double *grad) {
+    return interp_all(pars, q, grad, NULL);
+}
+
+void interp_hessian(double t, double *pars, double *q, int n_dim, double *hess) {
+    interp_all(pars, q, NULL, hess);
+}
+
+double interp_density(double t, double *pars, double *q, int n_dim) {
+    // From Poisson's equation: the trace of the Hessian
+    double hess[9] = {0.};
+    interp_all(pars, q, NULL, hess);
+    return (hess[0] + hess[4] + hess[8]) / (4*M_PI*pars[0]);
+}
@@ -0,0 +1,5 @@
+extern double interp_value(double t, double *pars, double *q, int n_dim);
+extern void interp_gradient(double t, double *pars, double *q, int n_dim, double *grad);
+extern double interp_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad);
+extern void interp_hessian(double t, double *pars, double *q, int n_dim, double *hess);
+extern double interp_density(double t, double *pars, double *q, int n_dim);
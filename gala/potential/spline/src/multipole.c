@@ -0,0 +1,316 @@
+#include <math.h>
+#include <stddef.h>
+#include "bspline.h"
+#include "multipole.h"
+
+/*
+    A multipole expansion of the potential,
+
+        Phi(r, theta, phi) = sum_{l,m} P_l^m(cos theta) [a_lm(r) cos(m phi) + b_lm(r) sin(m phi)],
+
+    where P_l^m are the associated Legendre functions (without the
+    Condon-Shortley phase, and without normalization: the normalization is
+    absorbed into the radial functions a_lm, b_lm). The radial functions are
+    tabulated on a grid uniformly spaced in ln(r) and interpolated with uniform
+    B-splines. Inside of r_min, the l=0 term is extrapolated as a constant
+    density core and the l>0 terms as r^l; outside of r_max, all terms are
+    extrapolated as r^-(l+1) (i.e. assuming there is no mass outside of r_max).
+
+    The coefficient table has one row of spline coefficients for each (l, m)
+    term. For each l, the rows are ordered by m = -min(l, mmax) ... min(l, mmax)
+    where negative m correspond to the sin(|m| phi) terms.
+
+    pars:
+        0 - G (Gravitational constant)
+        1 - lmax
+        2 - mmax
+        3 - order (B-spline order: 3 or 5)
+        4 - pad (number of padding nodes on each side of the radial grid)
+        5 - n_r (number of radial spline coefficients per term, with padding)
+        6 - s_min (ln(r_min))
+        7 - inv_h (inverse node spacing in ln(r))
+        8 - r_min
+        9 - r_max
+        10 - coeffs (the B-spline coefficient table, C-ordered)
+*/
+
+static inline int term_offset(int l, int mmax) {
+    // Index of the first row of the coefficient table for multipole order l
+    if (l <= mmax + 1)
+        return l*l;
+    return (mmax+1)*(mmax+1) + (l - mmax - 1) * (2*mmax + 1);
+}
+
+static double multipole_all(double *pars, double *q, double *grad,
+                            double *dens) {
+    /*
+        Compute the potential and (optionally) add the gradient to the input
+        array and store the density. The gradient and density can be NULL.
+    */
+    double G = pars[0];
+    int lmax = (int)pars[1];
+    int mmax = (int)pars[2];
+    int order = (int)pars[3];
+    int pad = (int)pars[4];
+    int n_r = (int)pars[5];
+    double s_min = pars[6];
+    double inv_h = pars[7];
+    double r_min = pars[8];
+    double r_max = pars[9];
+    double *coeffs = &pars[10];
+
+    double w[BSPLINE_MAX_ORDER+1], dw[BSPLINE_MAX_ORDER+1], d2w[BSPLINE_MAX_ORDER+1];
+    double R, r, c, s, cp, sp, cm, sm, tmp;
+    double tt, f, rho, rho_l, rho_lm1, rho_lm2;
+    double Phi = 0., g_r = 0., g_th = 0., g_ph = 0., lap = 0.;
+    double Qmm, Q, Q1, Q2, dP0, dP1, dP2, smm1;
+    double P, dP_dth, P_s, trig, dtrig;
+    double val[2] = {0.}, dval[2] = {0.}, d2val[2] = {0.};
+    double a, da, d2a;
+    int region, i, offset, j, k, l, m, lm, row[2];
+    int n = n_r - 2*pad;
+
+    r = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+    R = sqrt(q[0]*q[0] + q[1]*q[1]);
+
+    // Radial grid cell and B-spline weights. Outside of the grid, the weights
+    // are evaluated at the grid boundary for the extrapolation.
+    if (r < r_min) {
+        region = -1;
+        i = 0;
+        f = 0.;
+        rho = r / r_min;
+    } else if (r > r_max) {
+        region = 1;
+        i = n - 2;
+        f = 1.;
+        rho = r_max / r;
+    } else {
+        region = 0;
+        tt = (log(r) - s_min) * inv_h;
+        i = (int)floor(tt);
+        if (i > n - 2)
+            i = n - 2;
+        if (i < 0)
+            i = 0;
+        f = tt - i;
+        rho = 1.;
+    }
+    offset = i + pad - (order - 1) / 2;
+    bspline_weights(order, f, &w[0], &dw[0], &d2w[0]);
+
+    // Angular coordinates
+    if (r > 0) {
+        c = q[2] / r;
+        s = R / r;
+    } else {
+        c = 1.;
+        s = 0.;
+    }
+    if (R > 0) {
+        cp = q[0] / R;
+        sp = q[1] / R;
+    } else {
+        cp = 1.;
+        sp = 0.;
+    }
+
+    cm = 1.; // cos(m phi)
+    sm = 0.; // sin(m phi)
+    Qmm = 1.; // (2m-1)!!
+    smm1 = 1.; // sin(theta)^(m-1), for m >= 1
+    for (m=0; m <= mmax; m++) {
+        if (m > 0) {
+            tmp = cm * cp - sm * sp;
+            sm = sm * cp + cm * sp;
+            cm = tmp;
+            Qmm = Qmm * (2*m - 1);
+            if (m > 1)
+                smm1 = smm1 * s;
+        }
+
+        // Q_l^m = d^m P_l / dc^m, with P_l^m = s^m Q_l^m. Also keep track of
+        // P_l' for the theta derivative of the m=0 terms
+        Q1 = 0.;
+        Q = Qmm;
+        dP1 = 0.;
+        dP0 = 0.;
+        rho_l = 1.;
+        rho_lm1 = 0.;
+        rho_lm2 = 0.;
+        for (l=m; l <= lmax; l++) {
+            if (l > m) {
+                Q2 = Q1;
+                Q1 = Q;
+                Q = ((2*l - 1) * c * Q1 - (l + m - 1) * Q2) / (l - m);
+            }
+
+            if (m == 0) {
+                // P_l' = P_{l-2}' + (2l - 1) P_{l-1}
+                dP2 = dP1;
+                dP1 = dP0;
+                dP0 = (l > 0) ? dP2 + (2*l - 1) * Q1 : 0.;
+                P = Q;
+                dP_dth = -s * dP0;
+                P_s = 0.;
+            } else {
+                P_s = smm1 * Q;
+                P = s * P_s;
+                dP_dth = smm1 * (l * c * Q - (l + m) * Q1);
+            }
+
+            // Powers of rho for the extrapolation
+            if (region != 0 && l > m) {
+                rho_lm2 = rho_lm1;
+                rho_lm1 = rho_l;
+                rho_l = rho_l * rho;
+            } else if (region != 0) {
+                rho_l = pow(rho, l);
+                rho_lm1 = (l > 0) ? pow(rho, l-1) : 0.;
+                rho_lm2 = (l > 1) ? pow(rho, l-2) : 0.;
+            }
+
+            lm = term_offset(l, mmax) + ((l < mmax) ? l : mmax);
+            row[0] = lm + m;
+            row[1] = lm - m;
+            for (j=0; j < ((m > 0) ? 2 : 1); j++) {
+                a = 0.;
+                da = 0.;
+                d2a = 0.;
+                for (k=0; k <= order; k++) {
+                    tmp = coeffs[row[j]*n_r + offset + k];
+                    a = a + tmp * w[k];
+                    da = da + tmp * dw[k];
+                    d2a = d2a + tmp * d2w[k];
+                }
+                da = da * inv_h; // d/d(ln r)
+                d2a = d2a * inv_h * inv_h;
+
+                if (region == 0) {
+                    val[j] = a;
+                    dval[j] = da / r;
+                    d2val[j] = (d2a - da) / (r*r);
+                } else if (region < 0) {
+                    // value and derivative at r_min
+                    da = da / r_min;
+                    if (l == 0) {
+                        val[j] = a + 0.5 * da * r_min * (rho*rho - 1);
+                        dval[j] = da * rho;
+                        d2val[j] = da / r_min;
+                    } else {
+                        val[j] = a * rho_l;
+                        dval[j] = a * l * rho_lm1 / r_min;
+                        d2val[j] = a * l * (l - 1) * rho_lm2 / (r_min*r_min);
+                    }
+                } else {
+                    val[j] = a * rho_l * rho;
+                    dval[j] = -(l + 1) * val[j] / r;
+                    d2val[j] = (l + 1) * (l + 2) * val[j] / (r*r);
+                }
+            }
+
+            if (m == 0) {
+                val[1] = 0.;
+                dval[1] = 0.;
+                d2val[1] = 0.;
+            }
+
+            trig = val[0] * cm + val[1] * sm;
+            Phi = Phi + P * trig;
+
+            if (grad != NULL) {
+                g_r = g_r + P * (dval[0] * cm + dval[1] * sm);
+                g_th = g_th + dP_dth * trig;
+                if (m > 0) {
+                    dtrig = m * (val[1] * cm - val[0] * sm);
+                    g_ph = g_ph + P_s * dtrig;
+                }
+            }
+
+            if ((dens != NULL) && (r > 0)) {
+                lap = lap + P * ((d2val[0] + 2*dval[0]/r - l*(l+1)*val[0]/(r*r)) * cm +
+                                 (d2val[1] + 2*dval[1]/r - l*(l+1)*val[1]/(r*r)) * sm);
+            } else if ((dens != NULL) && (l == 0)) {
+                lap = lap + 3 * d2val[0];
+            }
+        }
+    }
+
+    if (grad != NULL) {
+        if (r > 0) {
+            g_th = g_th / r;
+            g_ph = g_ph / r;
+            grad[0] = grad[0] + g_r * s * cp + g_th * c * cp - g_ph * sp;
+            grad[1] = grad[1] + g_r * s * sp + g_th * c * sp + g_ph * cp;
+            grad[2] = grad[2] + g_r * c - g_th * s;
+        } else {
+            // Only the (linear) l=1 terms contribute at the origin: the rows
+            // of the l=1 terms are ordered as (y, z, x) if mmax > 0, or (z)
+            if (lmax >= 1) {
+                lm = term_offset(1, mmax) + ((mmax > 0) ? 1 : 0);
+                for (j=0; j < 3; j++) {
+                    if ((mmax == 0) && (j < 2))
+                        continue;
+                    row[0] = (j == 0) ? lm + 1 : ((j == 1) ? lm - 1 : lm);
+                    a = 0.;
+                    for (k=0; k <= order; k++)
+                        a = a + coeffs[row[0]*n_r + offset + k] * w[k];
+                    grad[j] = grad[j] + a / r_min;
+                }
+            }
+        }
+    }
+
+    if (dens != NULL)
+        *dens = lap / (4*M_PI*G);
+
+    return Phi;
+}
+
+double multipole_value(double t, double *pars, double *q, int n_dim) {
+    return multipole_all(pars, q, NULL, NULL);
+}
+
+void multipole_gradient(double t, double *pars, double *q, int n_dim,
+                        double *grad) {
+    multipole_all(pars, q, grad, NULL);
+}
+
+double multipole_value_and_gradient(double t, double *pars, double *q,
+                                    int n_dim, double *grad) {
+    return multipole_all(pars, q, grad, NULL);
+}
+
+void multipole_hessian(double t, double *pars, double *q, int n_dim,
+                       double *hess) {
+    /*
+        The Hessian is computed with central finite differences of the
+        (analytic) gradient.
+    */
+    double r = sqrt(q[0]*q[0] + q[1]*q[1] + q[2]*q[2]);
+    double h = 1e-5 * (r + pars[8]);
+    double qq[3], grad_p[3], grad_m[3];
+    int j, k;
+
+    for (j=0; j < 3; j++) {
+        for (k=0; k < 3; k++) {
+            qq[k] = q[k];
+            grad_p[k] = 0.;
+            grad_m[k] = 0.;
+        }
+
+        qq[j] = q[j] + h;
+        multipole_all(pars, &qq[0], &grad_p[0], NULL);
+        qq[j] = q[j] - h;
+        multipole_all(pars, &qq[0], &grad_m[0], NULL);
+
+        for (k=0; k < 3; k++)
+            hess[3*j + k] = hess[3*j + k] + (grad_p[k] - grad_m[k]) / (2*h);
+    }
+}
+
+double multipole_density(double t, double *pars, double *q, int n_dim) {
+    double dens;
+    multipole_all(pars, q, NULL, &dens);
+    return dens;
+}
@@ -0,0 +1,5 @@
+extern double multipole_value(double t, double *pars, double *q, int n_dim);
+extern void multipole_gradient(double t, double *pars, double *q, int n_dim, double *grad);
+extern double multipole_value_and_gradient(double t, double *pars, double *q, int n_dim, double *grad);
+extern void multipole_hessian(double t, double *pars, double *q, int n_dim, double *hess);
+extern double multipole_density(double t, double *pars, double *q, int n_dim);
@@ -0,0 +1,36 @@
+# Third-party
+import numpy as np
+
+# Project
+from ...potential.tests.helpers import PotentialTestBase
+
+
+class SplineTestBase(PotentialTestBase):
+    tol = 1E-4
+
+    def test_compare(self):
+        # the integer table parameters can't be scaled like the others
+        other = self.potential.__class__(units=self.potential.units,
+                                         **self.potential.parameters)
+        assert other == self.potential
+
+        pars = self.potential.parameters.copy()
+        pars['coeffs'] = 1.1 * pars['coeffs']
+        other = self.potential.__class__(units=self.potential.units, **pars)
+        assert other != self.potential
+
+    def test_save_load(self, tmpdir):
+        fn = str(tmpdir.join("{}.npz".format(self.name)))
+        self.potential.save_table(fn)
+        p = self.potential.__class__.load_table(fn)
+        assert p == self.potential
+
+        q = self.w0[:self.ndim]
+        assert np.allclose(p.energy(q), self.potential.energy(q))
+        assert np.allclose(p.gradient(q), self.potential.gradient(q))
+
+    def test_accuracy(self):
+        report = self.potential.error_report(self.source, seed=42)
+        assert report['energy_median_rel_err'] < 1E-6
+        assert report['gradient_median_rel_err'] < 1E-4
+        assert report['energy_max_rel_err'] < 1E-3
@@ -0,0 +1,160 @@
+# Third-party
+import astropy.units as u
+import numpy as np
+import pytest
+
+# Project
+from ...potential import (MiyamotoNagaiPotential, PlummerPotential,
+                          HernquistPotential)
+from ....units import UnitSystem, galactic
+from ..cylspline import CylSplinePotential
+from .helpers import SplineTestBase
+
+
+class TestCylSplineDisk(SplineTestBase):
+    source = MiyamotoNagaiPotential(m=6E10, a=3., b=0.28, units=galactic)
+    potential = CylSplinePotential.from_density(source, 30*u.kpc, 30*u.kpc,
+                                                n_R=24, n_z=24,
+                                                scale=0.5*u.kpc,
+                                                symmetric=True)
+    w0 = [8., 0.5, 0.2, 0.01, 0.2, 0.05]
+
+    def test_accuracy(self):
+        report = self.potential.error_report(self.source, seed=42)
+        assert report['energy_median_rel_err'] < 1E-4
+        assert report['gradient_median_rel_err'] < 1E-3
+        assert report['energy_max_rel_err'] < 1E-2
+
+
+class TestCylSplineOffset(SplineTestBase):
+    # an offset Plummer sphere has non-zero terms at all m
+    source = PlummerPotential(m=1E11, b=1., units=galactic,
+                              origin=[0.3, 0.1, 0.])
+    potential = CylSplinePotential.from_density(source, 30*u.kpc, 30*u.kpc,
+                                                n_R=24, n_z=24, mmax=2,
+                                                scale=1*u.kpc,
+                                                symmetric=True)
+    w0 = [8., 0.5, 0.2, 0.01, 0.2, 0.05]
+
+    def test_accuracy(self):
+        report = self.potential.error_report(self.source, seed=42)
+        assert report['energy_median_rel_err'] < 1E-4
+        assert report['gradient_median_rel_err'] < 1E-3
+        assert report['energy_max_rel_err'] < 1E-2
+
+
+def test_asymmetric():
+    # a disk shifted along z is not symmetric under z -> -z
+    source = MiyamotoNagaiPotential(m=6E10, a=3., b=0.28, units=galactic,
+                                    origin=[0, 0, 0.5])
+    pot = CylSplinePotential.from_density(source, 30., 30., n_R=24, n_z=48,
+                                          scale=0.5)
+    assert pot.parameters['coeffs'].shape[0] == 1
+
+    report = pot.error_report(source, seed=42)
+    assert report['energy_median_rel_err'] < 1E-4
+    assert report['gradient_median_rel_err'] < 1E-3
+
+
+def test_default_scale():
+    # with a uniform grid, a thin disk is only resolved by a few nodes, so by
+    # default the grid is stretched on the scale of the disk height
+    source = MiyamotoNagaiPotential(m=6E10, a=3., b=0.28, units=galactic)
+    pot = CylSplinePotential.from_density(source, 50., 50., n_R=24, n_z=24,
+                                          symmetric=True)
+    assert 0.05 < pot.parameters['scale'].to_value(u.kpc) < 0.5
+
+    report = pot.error_report(source, seed=42)
+    assert report['energy_median_rel_err'] < 1E-3
+    assert report['gradient_median_rel_err'] < 1E-2
+
+    xyz = [8., 0, 0] * u.kpc
+    assert np.allclose(pot.energy(xyz), source.energy(xyz), rtol=1E-2)
+
+
+def test_density_function():
+    source = PlummerPotential(m=1E11, b=1., units=galactic)
+    kw = dict(n_R=16, n_z=16, scale=1., symmetric=True)
+    pot1 = CylSplinePotential.from_density(source, 20, 20, **kw)
+    pot2 = CylSplinePotential.from_density(
+        lambda xyz: source.density(xyz).value, 20, 20, units=galactic, **kw)
+    assert pot1 == pot2
+
+    with pytest.raises(ValueError):
+        CylSplinePotential.from_density(lambda xyz: xyz[0], 20, 20, **kw)
+
+
+def test_particles():
+    source = PlummerPotential(m=1E11, b=1., units=galactic)
+
+    # sample particles from a Plummer sphere
+    rnd = np.random.RandomState(42)
+    n = 20000
+    r = 1. / np.sqrt(rnd.uniform(size=n)**(-2/3) - 1)
+    xyz = rnd.normal(size=(3, n))
+    xyz = r * xyz / np.sqrt(np.sum(xyz**2, axis=0))
+
+    pot = CylSplinePotential.from_particles(xyz*u.kpc, 1E11/n*u.Msun,
+                                            20*u.kpc, 20*u.kpc, n_R=16,
+                                            n_z=16, scale=1*u.kpc,
+                                            symmetric=True,
+                                            softening=0.1*u.kpc,
+                                            units=galactic)
+    report = pot.error_report(source, seed=42)
+    assert report['energy_median_rel_err'] < 2E-2
+    assert report['gradient_median_rel_err'] < 5E-2
+
+
+def test_extrapolation():
+    source = HernquistPotential(m=1E11, c=0.5, units=galactic)
+    pot = CylSplinePotential.from_density(source, 20., 20., n_R=16, n_z=16,
+                                          scale=1., symmetric=True)
+
+    # Outside of the grid, the potential is a point mass with (most of) the
+    # total mass
+    xyz = [50., 20., -30.] * u.kpc
+    assert np.allclose(pot.energy(xyz), source.energy(xyz), rtol=2E-2)
+    assert np.allclose(pot.gradient(xyz), source.gradient(xyz), rtol=2E-2)
+
+    # Just inside and outside of the boundary, the potential is continuous
+    xyz = np.array([[20 - 1E-8, 20 + 1E-8], [0, 0], [5., 5.]])
+    E = pot.energy(xyz).value
+    assert np.allclose(E[0], E[1], rtol=1E-2)
+
+
+def test_replace_units():
+    source = MiyamotoNagaiPotential(m=1E11, a=3., b=0.3, units=galactic)
+    pot = CylSplinePotential.from_density(source, 30., 30., n_R=16, n_z=16,
+                                          symmetric=True)
+
+    # the table holds energies, so it must be converted to the new units
+    usys = UnitSystem(u.pc, u.Gyr, u.radian, u.Msun)
+    pot2 = pot.replace_units(usys)
+    assert pot2.units == usys
+
+    xyz = [[8., 0.5, 0.2], [0.02, 0.01, -0.03], [50., 20., -30.]] * u.kpc
+    assert u.allclose(pot2.energy(xyz.T), pot.energy(xyz.T), rtol=1E-10)
+    assert u.allclose(pot2.gradient(xyz.T), pot.gradient(xyz.T), rtol=1E-10)
+
+    # and back to the original units
+    pot3 = pot2.replace_units(galactic)
+    assert u.allclose(pot3.parameters['coeffs'], pot.parameters['coeffs'],
+                      rtol=1E-12)
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        CylSplinePotential(np.zeros((3, 32, 32)), 10., 10., mmax=2)
+
+    with pytest.raises(ValueError):
+        CylSplinePotential(np.zeros((1, 32, 32)), 10., 10., order=4)
+
+    with pytest.raises(ValueError):
+        CylSplinePotential(np.zeros((1, 32, 8)), 10., 10.)
+
+    with pytest.raises(ValueError):
+        CylSplinePotential(np.zeros((1, 32, 32)), -10., 10.)
+
+    with pytest.raises(ValueError):
+        CylSplinePotential.from_density(PlummerPotential(1E11, 1., galactic),
+                                        10., 10., n_R=1)
@@ -0,0 +1,251 @@
+# Third-party
+import astropy.units as u
+import numpy as np
+import pytest
+
+# Project
+from ...potential import (HernquistPotential, MiyamotoNagaiPotential,
+                          NFWPotential, PlummerPotential, CCompositePotential)
+from ...hamiltonian import Hamiltonian
+from ....units import galactic
+from ..interp import InterpolatedPotential
+from .helpers import SplineTestBase
+
+
+def _disk_halo():
+    pot = CCompositePotential()
+    pot['disk'] = MiyamotoNagaiPotential(m=6E10, a=3., b=0.28, units=galactic)
+    pot['halo'] = NFWPotential(m=6E11, r_s=16., units=galactic)
+    return pot
+
+
+class TestInterpolatedCartesian(SplineTestBase):
+    source = HernquistPotential(m=1E11, c=2., units=galactic)
+    potential = InterpolatedPotential.from_potential(
+        source, -20*u.kpc, 20*u.kpc, 64, scale=2*u.kpc)
+    w0 = [8., 0.5, 0.2, 0.01, 0.2, 0.05]
+
+
+class TestInterpolatedCartesianQuintic(SplineTestBase):
+    source = PlummerPotential(m=1E11, b=1., units=galactic)
+    potential = InterpolatedPotential.from_potential(
+        source, -20*u.kpc, 20*u.kpc, 48, scale=1*u.kpc, order=5)
+    w0 = [8., 0.5, 0.2, 0.01, 0.2, 0.05]
+
+
+class TestInterpolatedCartesianSymmetric(SplineTestBase):
+    source = HernquistPotential(m=1E11, c=2., units=galactic)
+    potential = InterpolatedPotential.from_potential(
+        source, 0., 20*u.kpc, 48, scale=2*u.kpc, symmetric=True)
+    w0 = [8., -0.5, 0.2, 0.01, 0.2, 0.05]
+
+
+class TestInterpolatedCylindrical(SplineTestBase):
+    source = _disk_halo()
+    potential = InterpolatedPotential.from_potential(
+        source, [0, 0]*u.kpc, [40, 40]*u.kpc, [96, 96],
+        grid_type='cylindrical', scale=0.5*u.kpc, symmetric=True)
+    w0 = [8., 0.5, 0.2, 0.01, 0.2, 0.05]
+
+
+def test_extrapolation():
+    source = PlummerPotential(m=1E11, b=1., units=galactic)
+    pot = InterpolatedPotential.from_potential(source, -10*u.kpc, 10*u.kpc,
+                                               32, scale=1*u.kpc)
+
+    # Far from the grid, the potential should approach a point mass:
+    xyz = [50., 20., -30.] * u.kpc
+    assert np.allclose(pot.energy(xyz), source.energy(xyz), rtol=1E-2)
+    assert np.allclose(pot.gradient(xyz), source.gradient(xyz), rtol=1E-2)
+
+
+def test_boundary_continuity():
+    source = HernquistPotential(m=1E11, c=2., units=galactic)
+    pot = InterpolatedPotential.from_potential(source, -20*u.kpc, 20*u.kpc,
+                                               64, scale=2*u.kpc)
+
+    # The extrapolation should be continuous across the edge of the grid:
+    eps = 1E-6
+    for x in [[20., 3., -5.], [12., -20., 19.], [-7., 4., 20.]]:
+        x = np.array(x)
+        face = np.argmax(np.abs(x))
+        n = np.zeros(3)
+        n[face] = np.sign(x[face])
+        x_in = (x - eps*n) * u.kpc
+        x_out = (x + eps*n) * u.kpc
+
+        assert np.allclose(pot.energy(x_in), pot.energy(x_out), rtol=1E-6)
+        assert np.allclose(pot.gradient(x_in), pot.gradient(x_out),
+                           rtol=1E-4)
+
+    # The gradient and Hessian outside of the grid should be consistent with
+    # finite differences of the energy:
+    for x in [[30., 3., -5.], [12., -40., 19.], [-7., 4., 25.]]:
+        x = np.array(x)
+        h = 1E-4
+        grad = pot.gradient(x*u.kpc).decompose(galactic).value[:, 0]
+        hess = pot.hessian(x*u.kpc).decompose(galactic).value[:, :, 0]
+        for j in range(3):
+            dx = np.zeros(3)
+            dx[j] = h
+            E1 = pot.energy((x + dx)*u.kpc).decompose(galactic).value
+            E2 = pot.energy((x - dx)*u.kpc).decompose(galactic).value
+            assert np.allclose((E1 - E2) / (2*h), grad[j], rtol=1E-6)
+
+            g1 = pot.gradient((x + dx)*u.kpc).decompose(galactic).value
+            g2 = pot.gradient((x - dx)*u.kpc).decompose(galactic).value
+            assert np.allclose((g1 - g2)[:, 0] / (2*h), hess[:, j], rtol=1E-5,
+                               atol=1E-8 * np.abs(hess).max())
+
+
+@pytest.mark.parametrize("source", [
+    HernquistPotential(m=1E11, c=1., units=galactic),
+    PlummerPotential(m=1E11, b=1., units=galactic),
+])
+@pytest.mark.parametrize("kwargs", [
+    dict(grid_min=0., grid_max=20., shape=32, symmetric=True),
+    dict(grid_min=[0, -20.], grid_max=20., shape=[32, 63],
+         grid_type='cylindrical'),
+    dict(grid_min=0., grid_max=20., shape=32, grid_type='cylindrical',
+         symmetric=True),
+])
+def test_gradient_accuracy(source, kwargs):
+    # In these modes the origin is a grid node, and many of the sampled
+    # positions are close to it: the gradient of a cusp is extrapolated
+    pot = InterpolatedPotential.from_potential(source, scale=1., **kwargs)
+    assert ((pot.parameters['cusp_radius'] > 0) ==
+            isinstance(source, HernquistPotential))
+
+    report = pot.error_report(source, n_samples=16384, seed=42)
+    assert report['gradient_median_rel_err'] < 1E-4
+    assert report['gradient_max_rel_err'] < 0.1
+
+    # close to the axis and to the mirror plane, away from the origin
+    rnd = np.random.RandomState(42)
+    xyz = rnd.uniform(-5, 5, size=(3, 1024))
+    xyz[rnd.randint(3, size=1024), np.arange(1024)] = 1E-6
+    xyz = xyz[:, np.linalg.norm(xyz, axis=0) > 1.]
+    grad1 = pot.gradient(xyz).value
+    grad2 = source.gradient(xyz).value
+    err = (np.linalg.norm(grad1 - grad2, axis=0) /
+           np.linalg.norm(grad2, axis=0))
+    assert err.max() < 1E-3
+
+
+def test_cusp():
+    source = HernquistPotential(m=1E11, c=1., units=galactic)
+    pot = InterpolatedPotential.from_potential(source, 0., 20., 32, scale=1.,
+                                               grid_type='cylindrical',
+                                               symmetric=True)
+    r_c = pot.parameters['cusp_radius'].value
+    assert np.isclose(pot.parameters['cusp_slope'], 1., atol=1E-2)
+
+    # The potential and its gradient are continuous across the edge of the
+    # cusp region, and the gradient and Hessian within it are consistent with
+    # finite differences of the energy
+    n = np.array([0.3, -0.5, 0.8]) / np.sqrt(0.98)
+    x = n[:, None] * r_c * np.array([1 - 1E-9, 1 + 1E-9])[None]
+    assert np.allclose(pot.energy(x)[0], pot.energy(x)[1], rtol=1E-8)
+    assert np.allclose(pot.gradient(x)[:, 0], pot.gradient(x)[:, 1],
+                       rtol=1E-6)
+
+    for r in [0.1, 0.5, 0.9]:
+        x = n * r * r_c
+        h = 1E-6
+        grad = pot.gradient(x).value[:, 0]
+        hess = pot.hessian(x).value[:, :, 0]
+        for j in range(3):
+            dx = np.zeros(3)
+            dx[j] = h
+            E1 = pot.energy(x + dx).value
+            E2 = pot.energy(x - dx).value
+            assert np.allclose((E1 - E2) / (2*h), grad[j], rtol=1E-6)
+
+            g1 = pot.gradient(x + dx).value
+            g2 = pot.gradient(x - dx).value
+            assert np.allclose((g1 - g2)[:, 0] / (2*h), hess[:, j], rtol=1E-5,
+                               atol=1E-8 * np.abs(hess).max())
+
+
+def test_error_report_rotated():
+    from scipy.spatial.transform import Rotation
+    R = Rotation.from_euler('zxz', [30, 60, -20], degrees=True).as_matrix()
+
+    source = MiyamotoNagaiPotential(m=6E10, a=3., b=0.28, units=galactic)
+    pot = InterpolatedPotential.from_potential(
+        source, 0., 20., 48, grid_type='cylindrical', scale=0.5,
+        symmetric=True)
+
+    # The table is evaluated in the rotated frame, so it should be compared to
+    # the rotated source potential
+    pars = dict(pot.parameters)
+    pot_R = InterpolatedPotential(**pars, units=galactic, R=R,
+                                  origin=[1., 2., 3.])
+    source_R = MiyamotoNagaiPotential(m=6E10, a=3., b=0.28, units=galactic,
+                                      R=R, origin=[1., 2., 3.])
+    report = pot.error_report(source, seed=42)
+    report_R = pot_R.error_report(source_R, seed=42)
+    assert np.isclose(report['gradient_median_rel_err'],
+                      report_R['gradient_median_rel_err'], rtol=1E-2)
+    assert report_R['energy_median_rel_err'] < 1E-6
+
+
+def test_exterior_warning():
+    source = _disk_halo()
+
+    # The halo extends far beyond this grid
+    with pytest.warns(RuntimeWarning, match="outside of the grid"):
+        InterpolatedPotential.from_potential(
+            source, 0., 10., 24, grid_type='cylindrical', scale=0.5,
+            symmetric=True, rtol=0.05)
+
+
+def test_orbit():
+    source = _disk_halo()
+    pot = InterpolatedPotential.from_potential(
+        source, [0, 0]*u.kpc, [40, 40]*u.kpc, [96, 96],
+        grid_type='cylindrical', scale=0.5*u.kpc, symmetric=True)
+
+    w0 = [8., 0., 0.5, 0., 0.2, 0.02]
+    orbit1 = Hamiltonian(source).integrate_orbit(w0, dt=0.5, n_steps=2000)
+    orbit2 = Hamiltonian(pot).integrate_orbit(w0, dt=0.5, n_steps=2000)
+
+    dx = np.sqrt(np.sum((orbit1.xyz - orbit2.xyz)**2, axis=0))
+    assert dx.max() < 1E-2*u.kpc
+
+    E = orbit2.energy()
+    assert np.abs((E[-1] - E[0]) / E[0]) < 1E-4
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        InterpolatedPotential(np.zeros((32, 32, 32, 32)), -1., 1.)
+
+    with pytest.raises(ValueError):
+        InterpolatedPotential(np.zeros((32, 32, 32)), -1., 1., order=4)
+
+    with pytest.raises(ValueError):
+        InterpolatedPotential(np.zeros((8, 32, 32)), -1., 1.)
+
+    # The cylindrical radius and the mirrored axes must be >= 0
+    with pytest.raises(ValueError):
+        InterpolatedPotential(np.zeros((32, 32)), [-1., -1.], 1.)
+
+    with pytest.raises(ValueError):
+        InterpolatedPotential(np.zeros((32, 32, 32)), -1., 1., symmetric=True)
+
+    with pytest.raises(ValueError):
+        InterpolatedPotential.from_potential(
+            HernquistPotential(m=1E11, c=1., units=galactic), [-1, 0], 1.,
+            24, grid_type='cylindrical')
+
+    with pytest.raises(ValueError):
+        InterpolatedPotential(np.zeros((32, 32, 32)), 1., -1.)
+
+    # The cusp region must be within the grid
+    with pytest.raises(ValueError):
+        InterpolatedPotential(np.zeros((32, 32, 32)), -1., 1., cusp_radius=2.)
+
+    with pytest.raises(ValueError):
+        InterpolatedPotential(np.zeros((32, 32, 32)), -1., 1., cusp_radius=0.5,
+                              cusp_slope=0.)
@@ -0,0 +1,145 @@
+# Standard library
+import warnings
+
+# Third-party
+import astropy.units as u
+import numpy as np
+import pytest
+
+# Project
+from ...potential import HernquistPotential, PlummerPotential
+from ....units import UnitSystem, galactic
+from ..multipole import MultipolePotential
+from .helpers import SplineTestBase
+
+
+class TestMultipoleSpherical(SplineTestBase):
+    source = HernquistPotential(m=1E11, c=2., units=galactic)
+    potential = MultipolePotential.from_density(source, 0.01*u.kpc,
+                                                200*u.kpc, lmax=2)
+    w0 = [8., 0.5, 0.2, 0.01, 0.2, 0.05]
+
+
+class TestMultipoleOffset(SplineTestBase):
+    # an offset Plummer sphere has non-zero terms at all (l, m)
+    source = PlummerPotential(m=1E11, b=1., units=galactic,
+                              origin=[0.2, 0.1, -0.1])
+    potential = MultipolePotential.from_density(source, 0.05*u.kpc,
+                                                200*u.kpc, lmax=12,
+                                                order=5)
+    w0 = [8., 0.5, 0.2, 0.01, 0.2, 0.05]
+
+    def test_accuracy(self):
+        report = self.potential.error_report(self.source, seed=42)
+        assert report['energy_median_rel_err'] < 1E-5
+        assert report['gradient_median_rel_err'] < 1E-4
+
+
+def test_axisymmetric():
+    source = PlummerPotential(m=1E11, b=1., units=galactic,
+                              origin=[0, 0, 0.2])
+    pot = MultipolePotential.from_density(source, 0.05, 200, lmax=12, mmax=0)
+    assert pot.parameters['coeffs'].shape[0] == 13
+
+    report = pot.error_report(source, seed=42)
+    assert report['energy_median_rel_err'] < 1E-5
+    assert report['gradient_median_rel_err'] < 1E-4
+
+
+def test_density_function():
+    source = PlummerPotential(m=1E11, b=1., units=galactic)
+    pot1 = MultipolePotential.from_density(source, 0.01, 100, lmax=0)
+    pot2 = MultipolePotential.from_density(
+        lambda xyz: source.density(xyz).value, 0.01, 100, lmax=0,
+        units=galactic)
+    assert pot1 == pot2
+
+    with pytest.raises(ValueError):
+        MultipolePotential.from_density(lambda xyz: xyz[0], 0.01, 100)
+
+
+def test_particles():
+    source = PlummerPotential(m=1E11, b=1., units=galactic)
+
+    # sample particles from a Plummer sphere
+    rnd = np.random.RandomState(42)
+    n = 100000
+    r = 1. / np.sqrt(rnd.uniform(size=n)**(-2/3) - 1)
+    xyz = rnd.normal(size=(3, n))
+    xyz = r * xyz / np.sqrt(np.sum(xyz**2, axis=0))
+
+    pot = MultipolePotential.from_particles(xyz*u.kpc, 1E11/n*u.Msun,
+                                            0.1*u.kpc, 50*u.kpc, n_r=32,
+                                            lmax=2, units=galactic)
+    report = pot.error_report(source, seed=42)
+    assert report['energy_median_rel_err'] < 1E-2
+    assert report['gradient_median_rel_err'] < 5E-2
+
+
+def test_particles_at_origin():
+    xyz = np.zeros((3, 4))
+    xyz[:, 1:] = [[1., 0, 0], [0, -2., 0], [0, 0, 3.]]
+
+    # should not divide by zero for the particle at the origin
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        pot = MultipolePotential.from_particles(xyz, 1E10, 0.1, 10., n_r=16,
+                                                lmax=2, units=galactic)
+        assert np.all(np.isfinite(pot.parameters['coeffs']))
+
+    # a particle at the origin only contributes to the monopole
+    pot0 = MultipolePotential.from_particles(xyz[:, 1:], 1E10, 0.1, 10.,
+                                             n_r=16, lmax=2, units=galactic)
+    dcoeffs = pot.parameters['coeffs'] - pot0.parameters['coeffs']
+    assert np.all(dcoeffs[1:] == 0)
+
+
+def test_extrapolation():
+    source = PlummerPotential(m=1E11, b=1., units=galactic)
+    pot = MultipolePotential.from_density(source, 0.1, 20, lmax=2)
+
+    # Outside of the grid, the potential is a point mass (with the mass inside
+    # of r_max, which here is 99.6% of the total):
+    xyz = [50., 20., -30.] * u.kpc
+    assert np.allclose(pot.energy(xyz), source.energy(xyz), rtol=1E-2)
+    assert np.allclose(pot.gradient(xyz), source.gradient(xyz), rtol=1E-2)
+
+    # Inside of the grid, the core has constant density (equal to the mean
+    # density within r_min):
+    xyz = [[0., 0., 0.], [0.02, 0.01, -0.03]] * u.kpc
+    assert np.allclose(pot.energy(xyz.T), source.energy(xyz.T), rtol=1E-3)
+    assert np.allclose(pot.density(xyz.T), source.density(xyz.T), rtol=2E-2)
+    assert np.allclose(pot.gradient(xyz.T)[:, 0].value, 0.)
+
+
+def test_replace_units():
+    source = PlummerPotential(m=1E11, b=1., units=galactic)
+    pot = MultipolePotential.from_density(source, 0.05, 200, lmax=2)
+
+    # the table holds energies, so it must be converted to the new units
+    usys = UnitSystem(u.pc, u.Gyr, u.radian, u.Msun)
+    pot2 = pot.replace_units(usys)
+    assert pot2.units == usys
+
+    xyz = [[8., 0.5, 0.2], [0.02, 0.01, -0.03], [50., 20., -30.]] * u.kpc
+    assert u.allclose(pot2.energy(xyz.T), pot.energy(xyz.T), rtol=1E-10)
+    assert u.allclose(pot2.gradient(xyz.T), pot.gradient(xyz.T), rtol=1E-10)
+
+    # and back to the original units
+    pot3 = pot2.replace_units(galactic)
+    assert u.allclose(pot3.parameters['coeffs'], pot.parameters['coeffs'],
+                      rtol=1E-12)
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        MultipolePotential(np.zeros((9, 32)), 0.1, 10., lmax=2, mmax=3)
+
+    with pytest.raises(ValueError):
+        MultipolePotential(np.zeros((8, 32)), 0.1, 10., lmax=2)
+
+    with pytest.raises(ValueError):
+        MultipolePotential(np.zeros((9, 32)), 10., 0.1, lmax=2)
+
+    with pytest.raises(ValueError):
+        MultipolePotential(np.zeros((9, 8)), 0.1, 10., lmax=2)
@@ -4,6 +4,11 @@
     typedef double (*energyfunc)(double t, double *pars, double *q, int n_dim);
     typedef void (*gradientfunc)(double t, double *pars, double *q, int n_dim, double *grad);
     typedef void (*hessianfunc)(double t, double *pars, double *q, int n_dim, double *hess);
+    typedef double (*valuegradientfunc)(double t, double *pars, double *q, int n_dim, double *grad);
+
+    // Gradient at n positions at once, stored as structure-of-arrays: the
+    // k-th coordinate of position i is q[k*n + i] (and the same for grad)
+    typedef void (*gradientbatchfunc)(double t, double *pars, double *q, int n_dim, int n, double *grad);
 #endif
 
 
@@ -151,6 +151,55 @@ else:
 
 print("-" * 79)
 
+# ----------------------------------------------------------------------------
+# OpenMP support
+#
+import tempfile
+from distutils.ccompiler import new_compiler
+from distutils.errors import CompileError, LinkError
+from distutils.sysconfig import customize_compiler
+
+# First, see if the user wants to install without OpenMP:
+noopenmp = bool(int(os.environ.get('GALA_NOOPENMP', 0)))
+
+
+def _compiler_has_openmp():
+    """Check whether the C compiler can build and link a trivial OpenMP
+    program with ``-fopenmp``."""
+    test_prog = ("#include <omp.h>\n"
+                 "int main(void) { return omp_get_max_threads() > 0 ? 0 : 1; }")
+
+    compiler = new_compiler()
+    customize_compiler(compiler)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fn = os.path.join(tmpdir, 'test_openmp.c')
+        with open(fn, 'w') as f:
+            f.write(test_prog)
+
+        try:
+            objs = compiler.compile([fn], output_dir=tmpdir,
+                                    extra_postargs=['-fopenmp'])
+            compiler.link_executable(objs, os.path.join(tmpdir, 'test_openmp'),
+                                     extra_postargs=['-fopenmp'])
+        except (CompileError, LinkError):
+            return False
+
+    return True
+
+
+if noopenmp:
+    openmp_enabled = False
+    print('Installing without OpenMP support.')
+else:
+    openmp_enabled = _compiler_has_openmp()
+    if openmp_enabled:
+        print('OpenMP found: installing with OpenMP support')
+    else:
+        print('OpenMP not found: installing without OpenMP support. The C '
+              'potential and integration routines will run single-threaded.')
+
+print("-" * 79)
+
 extensions = get_extensions()
 for ext in extensions:
     if 'potential.potential' in ext.name or 'scf' in ext.name:
@@ -163,12 +212,22 @@ for ext in extensions:
             if 'gslcblas' not in ext.libraries:
                 ext.libraries.append('gslcblas')
 
+    if openmp_enabled and ext.name != 'gala._cconfig':
+        if '-fopenmp' not in ext.extra_compile_args:
+            ext.extra_compile_args.append('-fopenmp')
+            ext.extra_link_args.append('-fopenmp')
+
 with open(extra_compile_macros_file, 'w') as f:
     if gsl_version is not None:
         f.writelines(['#define USE_GSL 1'])
     else:
         f.writelines(['#define USE_GSL 0'])
 
+    if openmp_enabled:
+        f.writelines(['\n#define USE_OPENMP 1'])
+    else:
+        f.writelines(['\n#define USE_OPENMP 0'])
+
 
 setup(use_scm_version={'write_to': os.path.join('gala', 'version.py'),
                        'write_to_template': VERSION_TEMPLATE},